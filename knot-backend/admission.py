@@ -0,0 +1,230 @@
+"""
+Admission control and load shedding for the scan endpoints.
+
+Without it every upload is accepted and processed in turn. Under a burst each
+request holds its video on disk and its model outputs in memory until
+everything ahead of it has finished, so latency keeps climbing. With admission
+control (KNOT_ADMISSION=1) each scan is priced in work units before any frame
+is decoded:
+
+    work = frames to run + frames decoded x DECODE_UNITS_PER_MEGAPIXEL x source megapixels
+
+For videos the frame count, resolution and keyframes come from the container
+header (probe.py): a seek decodes from the previous keyframe, and a dense pass
+decodes every frame, so frames decoded can be well above frames run. At
+most KNOT_MAX_CONCURRENT_SCANS scans run at once. The rest wait in a priority
+queue: interactive before batch, FIFO within a class. A request is shed
+instead of queued when:
+
+    429  its class queue is full (KNOT_MAX_QUEUED_SCANS, batch gets half)
+    503  its estimated completion (work ahead / concurrency + its own work,
+         times the observed seconds per unit) exceeds KNOT_ADMISSION_MAX_LATENCY,
+         or it waited that long without being admitted
+
+Both carry a Retry-After header with the estimated time until a slot frees up.
+Seconds per work unit is an exponential moving average of finished scans, so
+the estimates follow the actual backend. The queue-depth check also runs in a
+middleware before the upload is read, so a full queue is rejected without
+receiving the video.
+
+Environment:
+    KNOT_ADMISSION                    1 to enable (default off)
+    KNOT_MAX_CONCURRENT_SCANS         scans processed at once (default 1, or the
+                                      number of inference server processes)
+    KNOT_MAX_QUEUED_SCANS             interactive queue depth (default 8)
+    KNOT_MAX_QUEUED_BATCH_SCANS       batch queue depth (default half of the above)
+    KNOT_ADMISSION_MAX_LATENCY        seconds (default 120)
+    KNOT_ADMISSION_SECONDS_PER_UNIT   initial cost estimate (default 0.5)
+
+Clients pick a class with the X-Scan-Priority header (interactive | batch).
+"""
+
+import asyncio
+import heapq
+import itertools
+import logging
+import math
+import os
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+PRIORITIES = ("interactive", "batch")  # served in this order
+DEFAULT_PRIORITY = "interactive"
+PRIORITY_HEADER = "X-Scan-Priority"
+DECODE_UNITS_PER_MEGAPIXEL = 0.05  # decoding a 1080p frame costs ~10% of a model pass
+COST_SMOOTHING = 0.2
+
+
+class Overloaded(Exception):
+    """A shed request: HTTP status, Retry-After seconds and the reason."""
+
+    def __init__(self, status_code, retry_after, reason):
+        super().__init__(reason)
+        self.status_code = status_code
+        self.retry_after = retry_after
+        self.reason = reason
+
+
+def estimate_work(frames, width, height, decoded=None):
+    """
+    Work units for running `frames` frames of a width x height source, of which
+    `decoded` frames have to be decoded to get there (default: one per frame).
+    """
+    megapixels = max(float(width or 0), 0.0) * max(float(height or 0), 0.0) / 1e6
+    decoded = frames if decoded is None else decoded
+    return frames + decoded * DECODE_UNITS_PER_MEGAPIXEL * megapixels
+
+
+def enabled_from_env():
+    return os.getenv("KNOT_ADMISSION", "0").lower() in ("1", "true", "on")
+
+
+class AdmissionController:
+    """
+    Slot/queue accounting for one worker process. Runs on the event loop: acquire()
+    and release() must be called from it (the admitted work itself can run in a thread).
+    """
+
+    def __init__(self, max_concurrent=1, max_queued=8, max_queued_batch=None, max_latency=120.0,
+                 seconds_per_unit=0.5):
+        self.max_concurrent = max(1, int(max_concurrent))
+        self.queue_limits = {
+            "interactive": max(0, int(max_queued)),
+            "batch": max(0, int(max_queued // 2 if max_queued_batch is None else max_queued_batch)),
+        }
+        self.max_latency = float(max_latency)
+        self.seconds_per_unit = float(seconds_per_unit)
+        self.running = 0
+        self.running_work = 0.0
+        self.queued = {p: 0 for p in PRIORITIES}
+        self.queued_work = {p: 0.0 for p in PRIORITIES}
+        self._waiters = []  # heap of (rank, seq, work, priority, future)
+        self._seq = itertools.count()
+
+    @classmethod
+    def from_env(cls, default_concurrency=1):
+        """AdmissionController from the KNOT_* settings, or None when disabled."""
+        if not enabled_from_env():
+            return None
+        batch = os.getenv("KNOT_MAX_QUEUED_BATCH_SCANS")
+        return cls(
+            max_concurrent=int(os.getenv("KNOT_MAX_CONCURRENT_SCANS", str(default_concurrency))),
+            max_queued=int(os.getenv("KNOT_MAX_QUEUED_SCANS", "8")),
+            max_queued_batch=int(batch) if batch else None,
+            max_latency=float(os.getenv("KNOT_ADMISSION_MAX_LATENCY", "120")),
+            seconds_per_unit=float(os.getenv("KNOT_ADMISSION_SECONDS_PER_UNIT", "0.5")),
+        )
+
+    def work_ahead(self, priority):
+        """Running work plus queued work that would be served before a new `priority` request."""
+        rank = PRIORITIES.index(priority)
+        return self.running_work + sum(self.queued_work[p] for p in PRIORITIES[:rank + 1])
+
+    def estimated_wait(self, priority):
+        """Seconds until a new `priority` request would start."""
+        if self.running < self.max_concurrent and not any(self.queued[p] for p in PRIORITIES[:PRIORITIES.index(priority) + 1]):
+            return 0.0
+        return self.work_ahead(priority) * self.seconds_per_unit / self.max_concurrent
+
+    def retry_after(self, priority):
+        return max(1, math.ceil(self.estimated_wait(priority)))
+
+    def check(self, priority, work=None):
+        """
+        Overloaded if a request should be shed now, else None. Without `work` (the
+        upload has not been read yet) only the queue depth and the wait are checked.
+        """
+        if self.running >= self.max_concurrent and self.queued[priority] >= self.queue_limits[priority]:
+            return Overloaded(429, self.retry_after(priority),
+                              f"{priority} queue full ({self.queued[priority]} scans waiting)")
+        wait = self.estimated_wait(priority)
+        if wait > 0:
+            completion = wait + (work or 0.0) * self.seconds_per_unit
+            if completion > self.max_latency:
+                return Overloaded(503, self.retry_after(priority),
+                                  f"estimated completion in {completion:.1f}s exceeds {self.max_latency:.1f}s")
+        return None
+
+    def _reject(self, priority, rejection):
+        metrics.ADMISSION_REJECTS.inc(status=rejection.status_code, priority=priority)
+        logger.info(f"Shedding {priority} scan ({rejection.status_code}): {rejection.reason}")
+        return rejection
+
+    def precheck(self, priority):
+        """check() before the request body is read; counts the rejection."""
+        rejection = self.check(priority)
+        return self._reject(priority, rejection) if rejection else None
+
+    async def acquire(self, work, priority=DEFAULT_PRIORITY):
+        """Wait for a slot for `work` units. Raises Overloaded when the request is shed."""
+        rejection = self.check(priority, work)
+        if rejection:
+            raise self._reject(priority, rejection)
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        if self.running < self.max_concurrent and not any(self.queued.values()):
+            self._start(work)
+            metrics.ADMISSION_WAIT_SECONDS.observe(0.0, priority=priority)
+            return
+        future = loop.create_future()
+        heapq.heappush(self._waiters, (PRIORITIES.index(priority), next(self._seq), work, priority, future))
+        self.queued[priority] += 1
+        self.queued_work[priority] += work
+        metrics.SCANS_QUEUED.set(self.queued[priority], priority=priority)
+        admitted = False
+        try:
+            await asyncio.wait_for(future, timeout=max(self.max_latency - work * self.seconds_per_unit, 1.0))
+            admitted = True
+        except asyncio.TimeoutError:
+            raise self._reject(priority, Overloaded(503, self.retry_after(priority),
+                                                    f"not admitted within {loop.time() - start:.1f}s"))
+        finally:
+            if not admitted:
+                if future.done() and not future.cancelled():
+                    # Admitted just as the request was cancelled: hand the slot back
+                    self.release(work)
+                else:
+                    # Timed out or the client went away while queued
+                    future.cancel()
+                    self._dequeue(work, priority)
+        metrics.ADMISSION_WAIT_SECONDS.observe(loop.time() - start, priority=priority)
+
+    def release(self, work, seconds=None):
+        """Free a slot; `seconds` (how long the admitted work took) refines the cost estimate."""
+        self.running -= 1
+        self.running_work = max(0.0, self.running_work - work)
+        metrics.SCANS_RUNNING.set(self.running)
+        if seconds is not None and work > 0:
+            self.seconds_per_unit += COST_SMOOTHING * (seconds / work - self.seconds_per_unit)
+        self._dispatch()
+
+    def _start(self, work):
+        self.running += 1
+        self.running_work += work
+        metrics.SCANS_RUNNING.set(self.running)
+
+    def _dequeue(self, work, priority):
+        self.queued[priority] -= 1
+        self.queued_work[priority] = max(0.0, self.queued_work[priority] - work)
+        metrics.SCANS_QUEUED.set(self.queued[priority], priority=priority)
+
+    def _dispatch(self):
+        while self.running < self.max_concurrent and self._waiters:
+            _, _, work, priority, future = heapq.heappop(self._waiters)
+            if future.done():
+                continue  # timed out / cancelled, already dequeued
+            self._dequeue(work, priority)
+            self._start(work)
+            future.set_result(None)
+
+    def status(self):
+        return {
+            "running": self.running,
+            "max_concurrent": self.max_concurrent,
+            "queued": dict(self.queued),
+            "queue_limits": dict(self.queue_limits),
+            "seconds_per_unit": round(self.seconds_per_unit, 4),
+            "estimated_wait_seconds": {p: round(self.estimated_wait(p), 2) for p in PRIORITIES},
+        }
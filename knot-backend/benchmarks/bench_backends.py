@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Eager torch vs. ONNX Runtime latency on the same clips.
+
+Decodes sampled frames from synthetic clips (or --video files), runs
+romp(frame) with the eager network and then with the exported ONNX model,
+and reports per-frame p50/p95, frames/s and the network-level output
+difference. Requires ROMP and an export from export_onnx.py.
+
+Usage:
+    python benchmarks/bench_backends.py
+    python benchmarks/bench_backends.py --video scan1.mp4 --video scan2.mp4 --repeats 3
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+DEFAULT_OUTPUT = BACKEND_DIR / "benchmarks" / "results" / "backends.json"
+
+
+def sample_frames(video_path, count=10):
+    cap = cv2.VideoCapture(str(video_path))
+    frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    frames = []
+    for ratio in np.linspace(0.2, 0.8, count):
+        cap.set(cv2.CAP_PROP_POS_FRAMES, int(frame_count * ratio))
+        success, frame = cap.read()
+        if success:
+            frames.append(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+    cap.release()
+    return frames
+
+
+def time_backend(romp, frames, repeats):
+    import torch_runtime
+
+    with torch_runtime.inference_context():
+        romp(frames[0])  # warm-up
+    latencies = []
+    start_all = time.perf_counter()
+    for _ in range(repeats):
+        for frame in frames:
+            start = time.perf_counter()
+            with torch_runtime.inference_context():
+                romp(frame)
+            latencies.append(time.perf_counter() - start)
+    elapsed = time.perf_counter() - start_all
+    arr = np.asarray(latencies) * 1000.0
+    return {
+        "frames": len(latencies),
+        "p50_ms": float(np.percentile(arr, 50)),
+        "p95_ms": float(np.percentile(arr, 95)),
+        "frames_per_s": len(latencies) / elapsed,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Eager torch vs. ONNX Runtime")
+    parser.add_argument("--video", action="append", help="clip to sample (repeatable); default: synthetic clips")
+    parser.add_argument("--onnx", help="exported model (default: KNOT_ONNX_PATH)")
+    parser.add_argument("--repeats", type=int, default=2)
+    parser.add_argument("--output", default=str(DEFAULT_OUTPUT))
+    args = parser.parse_args()
+
+    os.environ["KNOT_INFERENCE_BACKEND"] = "torch"
+    os.environ.setdefault("KNOT_WARMUP_RUNS", "0")
+    os.chdir(BACKEND_DIR)
+    import main as app_main
+    import onnx_backend
+    import torch_runtime
+    from synthetic_video import write_synthetic_video
+
+    romp = app_main.romp
+    if romp is None:
+        print("ROMP is not loaded; nothing to compare.")
+        return 1
+
+    with tempfile.TemporaryDirectory(prefix="knot_bench_") as tmp_dir:
+        videos = args.video or [
+            write_synthetic_video(Path(tmp_dir) / f"clip_{w}x{h}.mp4", w, h, 60)
+            for w, h in ((640, 360), (1280, 720), (1920, 1080))
+        ]
+        clips = {Path(v).name: sample_frames(v) for v in videos if v}
+
+    results = {"clips": []}
+    for name, frames in clips.items():
+        if not frames:
+            continue
+        eager_net = romp.model
+        net = onnx_backend.network_module(romp)
+        inputs = onnx_backend.capture_network_inputs(romp, frames)
+        row = {"clip": name, "torch": time_backend(romp, frames, args.repeats)}
+
+        previous = onnx_backend.enable_onnx_backend(
+            romp, onnx_path=args.onnx, threads=torch_runtime.configure_torch_runtime()["threads"])
+        if previous is None:
+            print("ONNX model unavailable; run export_onnx.py first.")
+            return 1
+        try:
+            row["onnx"] = time_backend(romp, frames, args.repeats)
+            max_abs, max_rel = onnx_backend.compare_outputs(romp.model.session, net, inputs, romp.model.output_names)
+            row["parity"] = {"max_abs_diff": max_abs, "max_rel_diff": max_rel}
+        finally:
+            romp.model = eager_net
+        row["speedup"] = row["torch"]["p50_ms"] / row["onnx"]["p50_ms"]
+        results["clips"].append(row)
+        print(f"{name:<22} torch p50 {row['torch']['p50_ms']:7.1f} ms ({row['torch']['frames_per_s']:.2f} fps)"
+              f"  onnx p50 {row['onnx']['p50_ms']:7.1f} ms ({row['onnx']['frames_per_s']:.2f} fps)"
+              f"  x{row['speedup']:.2f}  max rel diff {row['parity']['max_rel_diff']:.1e}")
+
+    output = Path(args.output)
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(results, indent=2))
+    print(f"\nResults written to {output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+"""
+Dense overlay pass: serial seek-decode-infer loop vs. the pipelined stages.
+
+Both modes process every --stride-th frame of the same clip and build a
+per-frame mesh list from each detection:
+
+    serial     seek + decode + preprocess + model + post-process, one frame at
+               a time (the sampled-mode loop applied to every frame)
+    pipelined  pipeline.detect_dense_frames: sequential decode, preprocess,
+               inference and post-processing as concurrent stages joined by
+               bounded queues
+
+Reported: sustained frames/s (frames through the model per wall-clock second),
+per-stage seconds, and whether both modes produced the same detections.
+
+By default the model is a stand-in: a fixed latency that, like torch, releases
+the GIL while it runs, plus ROMP-shaped outputs derived from the frame content.
+--model romp uses the real model when it is installed.
+
+Usage:
+    python benchmarks/bench_dense.py
+    python benchmarks/bench_dense.py --width 1920 --height 1080 --frames 300 --model-ms 40
+    python benchmarks/bench_dense.py --model romp --video scan.mp4 --stride 2
+"""
+
+import argparse
+import hashlib
+import json
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+import pipeline  # noqa: E402
+import stage_timing  # noqa: E402
+
+DEFAULT_OUTPUT = BACKEND_DIR / "benchmarks" / "results" / "dense.json"
+
+
+class LatencyModel:
+    """ROMP-shaped outputs seeded by the frame content, after model_ms of GIL-free waiting."""
+
+    def __init__(self, model_ms):
+        self.seconds = model_ms / 1000.0
+
+    def __call__(self, frame):
+        time.sleep(self.seconds)
+        seed = int(hashlib.blake2b(np.ascontiguousarray(frame[::8, ::8]).tobytes(), digest_size=4).hexdigest(), 16)
+        rng = np.random.default_rng(seed)
+        return {
+            "verts": rng.normal(size=(1, 6890, 3)).astype(np.float32),
+            "joints": rng.normal(size=(1, 71, 3)).astype(np.float32),
+            "params": {
+                "betas": rng.normal(size=(1, 10)).astype(np.float32),
+                "poses": rng.normal(size=(1, 72)).astype(np.float32),
+                "cam": rng.normal(size=(1, 3)).astype(np.float32),
+            },
+        }
+
+
+def encode(frame):
+    """Stand-in for the per-frame overlay mesh (main.frame_mesh): centre, scale, to lists."""
+    verts = pipeline.vertex_array(frame["verts"])
+    verts = verts - verts.mean(axis=0)
+    return (verts / max(float(np.abs(verts).max()), 1e-9)).tolist()
+
+
+def run_serial(model, video, stride, timings):
+    cap = cv2.VideoCapture(str(video))
+    frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    # Frame centres, so int(frame_count * ratio) lands on idx despite float rounding
+    ratios = [(idx + 0.5) / frame_count for idx in range(0, frame_count, stride)]
+    reducer = pipeline.ResultReducer()
+    meshes = []
+    start = time.perf_counter()
+    inferred = 0
+    for frame_idx, ratio, frame, frame_rgb in pipeline.iter_sampled_frames(cap, frame_count, ratios, timings):
+        inferred += 1
+        detection = pipeline.detect_person(model, None, False, frame, frame_rgb, frame_idx, ratio, frame_count, timings)
+        if detection is not None:
+            with timings.stage("smoothing"):
+                slim = reducer.add(detection)
+            with timings.stage("serialize"):
+                meshes.append(encode(slim))
+    seconds = time.perf_counter() - start
+    cap.release()
+    return reducer, meshes, {"frames_inferred": inferred, "seconds": seconds, "fps": inferred / seconds}
+
+
+def run_pipelined(model, video, stride, timings, depth):
+    cap = cv2.VideoCapture(str(video))
+    frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    reducer = pipeline.ResultReducer()
+    meshes = []
+
+    def on_frame(frame):
+        with timings.stage("serialize"):
+            meshes.append(encode(frame))
+
+    stats = {}
+    pipeline.detect_dense_frames(model, None, False, cap, frame_count, stride, timings, reducer=reducer,
+                                 on_frame=on_frame, stats=stats, depth=depth)
+    cap.release()
+    return reducer, meshes, stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Dense overlay pass: serial loop vs. pipelined stages")
+    parser.add_argument("--model", choices=("synthetic", "romp"), default="synthetic")
+    parser.add_argument("--model-ms", type=float, default=30.0, help="synthetic model latency per frame")
+    parser.add_argument("--video", help="clip to process (default: a generated synthetic clip)")
+    parser.add_argument("--width", type=int, default=1280)
+    parser.add_argument("--height", type=int, default=720)
+    parser.add_argument("--frames", type=int, default=150)
+    parser.add_argument("--stride", type=int, default=1)
+    parser.add_argument("--depth", type=int, default=None, help="queue depth between stages")
+    parser.add_argument("--output", default=str(DEFAULT_OUTPUT))
+    args = parser.parse_args()
+
+    if args.model == "romp":
+        import romp_loader
+        model, _ = romp_loader.load_models()
+        if model is None:
+            print("⏭️  ROMP not loaded; nothing to measure")
+            return 0
+    else:
+        model = LatencyModel(args.model_ms)
+
+    with tempfile.TemporaryDirectory(prefix="knot_dense_") as tmp:
+        video = args.video
+        if video is None:
+            from synthetic_video import write_synthetic_video
+            video = write_synthetic_video(Path(tmp) / "clip.mp4", args.width, args.height, args.frames)
+            if video is None:
+                print("❌ Could not write a synthetic clip (mp4v codec missing); pass --video")
+                return 1
+
+        rows, outputs = {}, {}
+        for mode in ("serial", "pipelined"):
+            timings = stage_timing.StageTimings()
+            if mode == "serial":
+                reducer, meshes, stats = run_serial(model, video, args.stride, timings)
+            else:
+                reducer, meshes, stats = run_pipelined(model, video, args.stride, timings,
+                                                       args.depth or pipeline.DENSE_QUEUE_DEPTH)
+            outputs[mode] = (reducer, meshes)
+            rows[mode] = {**{k: stats[k] for k in ("frames_inferred", "seconds", "fps")},
+                          "detections": len(reducer), "stage_seconds": dict(timings.durations)}
+
+    serial, pipelined = outputs["serial"], outputs["pipelined"]
+    same = (len(serial[0]) == len(pipelined[0])
+            and [f["_frame_idx"] for f in serial[0].frames] == [f["_frame_idx"] for f in pipelined[0].frames]
+            and serial[1] == pipelined[1])
+    if args.model == "romp":
+        same = None  # real model outputs are not bit-reproducible across runs; compare counts only
+
+    for mode, row in rows.items():
+        stages = ", ".join(f"{k} {v:.2f}s" for k, v in sorted(row["stage_seconds"].items(), key=lambda kv: -kv[1]))
+        print(f"{mode:<10} {row['frames_inferred']} frames in {row['seconds']:6.2f}s  "
+              f"{row['fps']:6.1f} frames/s  ({stages})")
+    speedup = rows["pipelined"]["fps"] / rows["serial"]["fps"] if rows["serial"]["fps"] else None
+    if speedup:
+        print(f"\nPipelined: {speedup:.2f}x sustained frames/s")
+    if same is not None:
+        print("Detections: " + ("✅ identical in both modes" if same else "⚠️  differ between modes"))
+
+    output = Path(args.output)
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps({"model": args.model, "model_ms": args.model_ms if args.model == "synthetic" else None,
+                                  "video": str(args.video or "synthetic"), "resolution": [args.width, args.height],
+                                  "stride": args.stride, "modes": rows, "speedup": speedup,
+                                  "identical": same}, indent=2))
+    print(f"Results written to {output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
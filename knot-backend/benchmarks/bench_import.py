@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+"""
+Import-time profile of the backend modules (python -X importtime).
+
+Imports each target in a fresh interpreter a few times and reports the median
+cumulative import time, the slowest direct imports, and whether the heavy
+modules (torch, cv2, romp) were loaded. Heavy modules are loaded lazily
+(compat.lazy_import), so without ROMP installed `import main` should pull in
+neither torch nor cv2. With ROMP installed, `import main` also builds the
+model, so its time includes model loading.
+
+`import main` is also timed with a cold mesh LOD cache (KNOT_LOD_CACHE pointed
+at an empty directory), which is what a fresh worker sees without a
+provisioned ~/.romp: the LODs must not be decimated at import.
+
+The client-mode check then runs one /process-scan in a worker whose model is
+behind the inference server (benchmarks/stub_inference_server.py, so no ROMP is
+needed) and fails if torch was imported: those workers must stay light.
+
+The raw -X importtime output of the last run per target is kept next to the
+results (e.g. for `tuna benchmarks/results/importtime_main.txt`).
+
+Usage:
+    python benchmarks/bench_import.py
+    python benchmarks/bench_import.py --targets main,bulk_process --budget-ms 800
+    python benchmarks/bench_import.py --baseline benchmarks/results/import_baseline.json
+    python benchmarks/bench_import.py --targets main --skip-client-check
+"""
+
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+DEFAULT_OUTPUT = BACKEND_DIR / "benchmarks" / "results" / "import_time.json"
+DEFAULT_TARGETS = "main,pipeline,bulk_process,inference_server,scan_store"
+HEAVY_MODULES = ("torch", "cv2", "romp")
+LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+
+def parse_importtime(text):
+    """[(module, self_us, cumulative_us, depth)] from -X importtime output."""
+    rows = []
+    for line in text.splitlines():
+        match = LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            rows.append((name, int(self_us), int(cumulative_us), len(indent) // 2))
+    return rows
+
+
+def profile_target(target, repeats, cold_lod_cache=False):
+    """Import target in `repeats` fresh interpreters; cold_lod_cache gives each one an empty LOD cache."""
+    env = dict(os.environ, KNOT_WARMUP_RUNS="0", PYTHONDONTWRITEBYTECODE="1")
+    # A lazily imported module stays a _LazyModule until first use
+    code = (f"import json, sys, {target}; "
+            f"print(json.dumps([m for m in {list(HEAVY_MODULES)!r} "
+            f"if m in sys.modules and type(sys.modules[m]).__name__ != '_LazyModule']))")
+    runs = []
+    for _ in range(repeats):
+        with tempfile.TemporaryDirectory(prefix="knot_lod_") as lod_dir:
+            lod_cache = Path(lod_dir) / "smpl_lod.npz"
+            if cold_lod_cache:
+                env["KNOT_LOD_CACHE"] = str(lod_cache)
+            start = time.perf_counter()
+            proc = subprocess.run([sys.executable, "-X", "importtime", "-c", code], cwd=BACKEND_DIR, env=env,
+                                  capture_output=True, text=True)
+            wall = time.perf_counter() - start
+            lod_built = lod_cache.exists()
+        if proc.returncode != 0:
+            raise RuntimeError(f"import {target} failed:\n{proc.stderr[-2000:]}")
+        rows = parse_importtime(proc.stderr)
+        total = next((cum for name, _, cum, _ in rows if name == target), 0)
+        runs.append({"import_ms": total / 1000, "wall_ms": wall * 1000, "rows": rows, "raw": proc.stderr,
+                     "heavy_loaded": json.loads(proc.stdout.strip().splitlines()[-1]), "lod_built": lod_built})
+    return runs
+
+
+CLIENT_CHECK = """
+import json, sys, threading, time
+sys.path.insert(0, "benchmarks")
+from stub_inference_server import StubInferenceServer
+socket_path, clip = sys.argv[1], sys.argv[2]
+server = StubInferenceServer(socket_path)
+server.start()
+threading.Thread(target=server.serve_forever, daemon=True).start()
+while not __import__("os").path.exists(socket_path):
+    time.sleep(0.01)
+try:
+    import main
+    from fastapi.testclient import TestClient
+    with open(clip, "rb") as f:
+        response = TestClient(main.app).post("/process-scan", files={"video": ("clip.mp4", f, "video/mp4")})
+    loaded = [m for m in ("torch", "torch._C") if m in sys.modules and type(sys.modules[m]).__name__ != "_LazyModule"]
+    print(json.dumps({"status": response.status_code, "frames": response.json().get("frames_processed"),
+                      "torch_loaded": loaded}))
+finally:
+    server.shutdown()
+"""
+
+
+def client_worker_check():
+    """{status, frames, torch_loaded} of one scan through a client-mode worker (stub inference server)."""
+    from synthetic_video import write_synthetic_video
+
+    with tempfile.TemporaryDirectory(prefix="knot_client_") as tmp:
+        clip = write_synthetic_video(Path(tmp) / "clip.mp4", 640, 360, 30)
+        if clip is None:
+            return None
+        socket_path = str(Path(tmp) / "inference.sock")
+        env = dict(os.environ, KNOT_INFERENCE_SOCKET=socket_path, KNOT_WARMUP_RUNS="0")
+        proc = subprocess.run([sys.executable, "-c", CLIENT_CHECK, socket_path, str(clip)], cwd=BACKEND_DIR,
+                              env=env, capture_output=True, text=True, timeout=300)
+    if proc.returncode != 0:
+        raise RuntimeError(f"client-mode check failed:\n{proc.stderr[-2000:]}")
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def summarize(target, runs, top):
+    rows = runs[-1]["rows"]
+    # importtime lists children before their parent: the target's direct imports are the
+    # depth-1 rows between the previous top-level row and the target's own row
+    direct = {}
+    end = next((i for i, row in enumerate(rows) if row[0] == target and row[3] == 0), 0)
+    for name, _, cumulative, depth in reversed(rows[:end]):
+        if depth == 0:
+            break
+        if depth == 1:
+            direct[name] = cumulative
+    return {
+        "target": target,
+        "import_ms": statistics.median(r["import_ms"] for r in runs),
+        "wall_ms": statistics.median(r["wall_ms"] for r in runs),
+        "heavy_loaded": runs[-1]["heavy_loaded"],
+        "top_imports": [{"module": name, "ms": us / 1000}
+                        for name, us in sorted(direct.items(), key=lambda item: -item[1])[:top]],
+    }
+
+
+def compare_with_baseline(results, baseline_path, tolerance):
+    baseline = {t["target"]: t for t in json.loads(Path(baseline_path).read_text()).get("targets", [])}
+    regressions = []
+    for target in results["targets"]:
+        old = baseline.get(target["target"])
+        if not old:
+            continue
+        if target["import_ms"] > old["import_ms"] * (1 + tolerance):
+            regressions.append(f"{target['target']}: {old['import_ms']:.0f} ms -> {target['import_ms']:.0f} ms")
+        newly_heavy = sorted(set(target["heavy_loaded"]) - set(old["heavy_loaded"]))
+        if newly_heavy:
+            regressions.append(f"{target['target']}: now imports {', '.join(newly_heavy)} eagerly")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import-time profile of backend modules")
+    parser.add_argument("--targets", default=DEFAULT_TARGETS, help="comma-separated modules to import")
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--top", type=int, default=8, help="slowest direct imports to list per target")
+    parser.add_argument("--budget-ms", type=float, default=1000.0, help="fail if `import main` takes longer")
+    parser.add_argument("--baseline", help="previous results JSON to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown vs baseline (0.25 = 25%%)")
+    parser.add_argument("--output", default=str(DEFAULT_OUTPUT))
+    parser.add_argument("--skip-client-check", action="store_true",
+                        help="skip the scan through a client-mode worker (torch must stay unloaded)")
+    args = parser.parse_args()
+
+    output = Path(args.output)
+    output.parent.mkdir(parents=True, exist_ok=True)
+    results = {"python": sys.version.split()[0], "repeats": args.repeats, "targets": []}
+    for target in [t for t in args.targets.split(",") if t]:
+        runs = profile_target(target, args.repeats)
+        (output.parent / f"importtime_{target}.txt").write_text(runs[-1]["raw"])
+        summary = summarize(target, runs, args.top)
+        results["targets"].append(summary)
+        heavy = ", ".join(summary["heavy_loaded"]) or "none"
+        print(f"{target:<18} import {summary['import_ms']:7.0f} ms  process {summary['wall_ms']:7.0f} ms  heavy: {heavy}")
+        for row in summary["top_imports"]:
+            print(f"    {row['module']:<28} {row['ms']:7.1f} ms")
+
+    failures = []
+    if "main" in args.targets.split(","):
+        cold_runs = profile_target("main", args.repeats, cold_lod_cache=True)
+        cold = summarize("main", cold_runs, args.top)
+        cold["lod_cache_built"] = any(r["lod_built"] for r in cold_runs)
+        results["main_cold_lod_cache"] = cold
+        print(f"\nmain, cold LOD cache: import {cold['import_ms']:7.0f} ms  process {cold['wall_ms']:7.0f} ms  "
+              f"LODs built at import: {'yes' if cold['lod_cache_built'] else 'no'}")
+        if cold["import_ms"] > args.budget_ms:
+            failures.append(f"main (cold LOD cache): {cold['import_ms']:.0f} ms over the {args.budget_ms:.0f} ms budget")
+        if cold["lod_cache_built"]:
+            failures.append("main: mesh LODs decimated at import")
+
+    if not args.skip_client_check:
+        sys.path.insert(0, str(BACKEND_DIR))
+        client = client_worker_check()
+        results["client_worker"] = client
+        if client is None:
+            print("\n⏭️  Client-mode check skipped (could not write a synthetic clip)")
+        else:
+            print(f"\nclient-mode worker: /process-scan {client['status']} ({client['frames']} frames), "
+                  f"torch loaded: {', '.join(client['torch_loaded']) or 'no'}")
+            if client["status"] != 200:
+                failures.append(f"client-mode worker: /process-scan returned {client['status']}")
+            if client["torch_loaded"]:
+                failures.append("client-mode worker: torch imported during a scan")
+
+    output.write_text(json.dumps(results, indent=2))
+    print(f"\nResults written to {output}")
+
+    main_result = next((t for t in results["targets"] if t["target"] == "main"), None)
+    if main_result and main_result["import_ms"] > args.budget_ms:
+        failures.append(f"main: {main_result['import_ms']:.0f} ms over the {args.budget_ms:.0f} ms budget")
+    if args.baseline:
+        failures += compare_with_baseline(results, args.baseline, args.tolerance)
+    if failures:
+        print("\nRegressions:")
+        for line in failures:
+            print(f"  {line}")
+        return 1
+    print("\nWithin budget" + (" and baseline." if args.baseline else "."))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
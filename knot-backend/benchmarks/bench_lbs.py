@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Throughput of the batched SMPL skinning engine (smpl_lbs.py).
+
+Re-skins random parameter sets in posed and canonical mode across a few chunk
+sizes. Uses the SMPL model from ~/.romp when present, otherwise random buffers
+with SMPL's shapes (same cost, meaningless vertices).
+
+Usage:
+    python benchmarks/bench_lbs.py
+    python benchmarks/bench_lbs.py --count 8192 --batch-sizes 128,512
+"""
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+DEFAULT_OUTPUT = BACKEND_DIR / "benchmarks" / "results" / "lbs.json"
+SMPL_PARENTS = [-1, 0, 0, 0, 1, 2, 3, 4, 5, 6, 7, 8, 9, 9, 9, 12, 13, 14, 16, 17, 18, 19, 20, 21]
+
+
+def surrogate_model_data(num_vertices=6890, seed=0):
+    rng = np.random.default_rng(seed)
+    weights = rng.random((num_vertices, 24))
+    regressor = rng.random((24, num_vertices))
+    return {
+        "v_template": rng.normal(size=(num_vertices, 3)),
+        "shapedirs": rng.normal(size=(num_vertices, 3, 10)) * 0.01,
+        "posedirs": rng.normal(size=(num_vertices, 3, 207)) * 0.01,
+        "J_regressor": regressor / regressor.sum(1, keepdims=True),
+        "weights": weights / weights.sum(1, keepdims=True),
+        "kintree_table": np.stack([SMPL_PARENTS, np.arange(24)]),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Batched SMPL skinning throughput")
+    parser.add_argument("--count", type=int, default=4096, help="parameter sets per run")
+    parser.add_argument("--batch-sizes", default="64,256,1024")
+    parser.add_argument("--output", default=str(DEFAULT_OUTPUT))
+    args = parser.parse_args()
+
+    import compat
+    import smpl_lbs
+    import torch_runtime
+
+    torch_runtime.configure_torch_runtime()
+    smpl_data = compat.load_smpl_model_data()
+    source = "smpl" if smpl_data is not None else "surrogate"
+    model = smpl_lbs.SMPLModel.from_model_data(smpl_data if smpl_data is not None else surrogate_model_data())
+    print(f"Model: {source}, {model.v_template.shape[0]} vertices, {model.num_betas} betas")
+
+    rng = np.random.default_rng(1)
+    betas = rng.normal(size=(args.count, model.num_betas)).astype(np.float32)
+    poses = (rng.normal(size=(args.count, smpl_lbs.POSE_DIM)) * 0.3).astype(np.float32)
+    model.forward(betas[:8], poses[:8])  # warm-up
+
+    results = {"source": source, "count": args.count, "runs": []}
+    for batch_size in [int(b) for b in args.batch_sizes.split(",")]:
+        for mode in ("posed", "canonical"):
+            start = time.perf_counter()
+            if mode == "posed":
+                model.forward(betas, poses, batch_size=batch_size)
+            else:
+                model.canonical(betas, batch_size=batch_size)
+            elapsed = time.perf_counter() - start
+            row = {"batch_size": batch_size, "mode": mode, "seconds": elapsed, "sets_per_s": args.count / elapsed}
+            results["runs"].append(row)
+            print(f"batch {batch_size:>5}  {mode:<10} {row['sets_per_s']:8.0f} sets/s")
+
+    output = Path(args.output)
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(results, indent=2))
+    print(f"\nResults written to {output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
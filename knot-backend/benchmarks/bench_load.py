@@ -0,0 +1,387 @@
+#!/usr/bin/env python3
+"""
+Load test for /process-scan: throughput and latency as concurrency ramps up.
+
+Starts the app with uvicorn (mock and/or real backend) and drives it with a
+pool of asyncio/httpx clients. Each client uploads synthetic clips in a closed
+loop: it sends the next upload as soon as the previous response arrives. Every
+concurrency step runs for --step-seconds. For each step it records:
+
+- throughput     successful scans per minute
+- latency        p50 / p95 / p99 of successful scans, client side
+- error rate     non-200 responses and failed requests (by status)
+- RSS            server process tree, sampled over time
+
+The saturation report gives two figures. The sustainable throughput is the best
+step that stays within --max-error-rate and, when given, --slo-ms at p95. The
+knee is the first step where adding clients raised throughput by less than
+--min-gain. Keep the JSON from one commit and pass it as --baseline on
+another to compare capacity (exit code 1 on regression).
+
+--url targets an already running server instead. Its RSS is only sampled
+when --server-pid is given.
+
+Usage:
+    python benchmarks/bench_load.py
+    python benchmarks/bench_load.py --backends mock --concurrency 1,4,16,64 --step-seconds 20
+    python benchmarks/bench_load.py --backends real --slo-ms 15000
+    python benchmarks/bench_load.py --baseline benchmarks/results/load_baseline.json
+    python benchmarks/bench_load.py --url http://127.0.0.1:8000 --server-pid 12345
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import platform
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import httpx
+import numpy as np
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+from synthetic_video import CODEC_EXTENSIONS, write_synthetic_video  # noqa: E402
+
+DEFAULT_OUTPUT = BACKEND_DIR / "benchmarks" / "results" / "load.json"
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR, stderr=subprocess.DEVNULL
+        ).decode().strip()
+    except Exception:
+        return None
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def process_tree(pid):
+    """pid and all of its descendants (uvicorn --workers forks)."""
+    pids, pending = [], [pid]
+    while pending:
+        current = pending.pop()
+        pids.append(current)
+        for task in Path(f"/proc/{current}/task").glob("*"):
+            try:
+                pending.extend(int(c) for c in (task / "children").read_text().split())
+            except OSError:
+                pass
+    return pids
+
+
+def tree_rss_mb(pid):
+    total = 0
+    for p in process_tree(pid):
+        try:
+            for line in Path(f"/proc/{p}/status").read_text().splitlines():
+                if line.startswith("VmRSS:"):
+                    total += int(line.split()[1])
+        except OSError:
+            pass
+    return total / 1024
+
+
+class Server:
+    """uvicorn main:app in a subprocess."""
+
+    def __init__(self, backend, workers, env_overrides):
+        self.port = free_port()
+        self.url = f"http://127.0.0.1:{self.port}"
+        env = dict(os.environ, **env_overrides)
+        if backend == "mock":
+            env["KNOT_MOCK_MODE"] = "1"
+        self.log = tempfile.TemporaryFile()
+        self.proc = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(self.port),
+             "--workers", str(workers), "--log-level", "warning"],
+            cwd=BACKEND_DIR, env=env, stdout=self.log, stderr=subprocess.STDOUT)
+
+    def wait_ready(self, timeout):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self.proc.poll() is not None:
+                self.log.seek(0)
+                raise RuntimeError(f"server exited:\n{self.log.read().decode(errors='replace')[-2000:]}")
+            try:
+                if httpx.get(self.url + "/", timeout=1.0).status_code == 200:
+                    return
+            except httpx.HTTPError:
+                pass
+            time.sleep(0.5)
+        raise RuntimeError(f"server not ready after {timeout:.0f}s")
+
+    def stop(self):
+        self.proc.terminate()
+        try:
+            self.proc.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            self.proc.kill()
+        self.log.close()
+
+
+async def sample_rss(pid, interval, timeline, state, t0):
+    while True:
+        timeline.append({
+            "t": round(time.perf_counter() - t0, 2),
+            "rss_mb": round(tree_rss_mb(pid), 1) if pid else None,
+            "concurrency": state["concurrency"],
+            "in_flight": state["in_flight"],
+        })
+        await asyncio.sleep(interval)
+
+
+async def run_step(client, url, clips, concurrency, duration, state, backoff=True):
+    """
+    Closed-loop clients for `duration` seconds; returns one record per request.
+    With backoff a client waits out a shed response's Retry-After, as real clients do.
+    """
+    records = []
+    deadline = time.perf_counter() + duration
+    clip_cycle = itertools.cycle(clips)
+
+    async def worker():
+        while time.perf_counter() < deadline:
+            name, payload = next(clip_cycle)
+            start = time.perf_counter()
+            state["in_flight"] += 1
+            retry_after = None
+            try:
+                response = await client.post(url + "/process-scan",
+                                             files={"video": (name, payload, "application/octet-stream")})
+                status = response.status_code
+                retry_after = response.headers.get("retry-after")
+            except httpx.HTTPError as e:
+                status = type(e).__name__
+            finally:
+                state["in_flight"] -= 1
+            records.append({"start": start, "end": time.perf_counter(), "status": status})
+            if backoff and retry_after and retry_after.isdigit():
+                await asyncio.sleep(min(float(retry_after), max(0.0, deadline - time.perf_counter())))
+
+    step_start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return records, time.perf_counter() - step_start
+
+
+def summarize_step(concurrency, records, elapsed, timeline_slice):
+    ok = [r["end"] - r["start"] for r in records if r["status"] == 200]
+    errors = {}
+    for r in records:
+        if r["status"] != 200:
+            errors[str(r["status"])] = errors.get(str(r["status"]), 0) + 1
+    latency = None
+    if ok:
+        arr = np.asarray(ok) * 1000.0
+        latency = {f"p{q}_ms": float(np.percentile(arr, q)) for q in (50, 95, 99)}
+        latency["mean_ms"] = float(arr.mean())
+    rss = [s["rss_mb"] for s in timeline_slice if s["rss_mb"] is not None]
+    return {
+        "concurrency": concurrency,
+        "requests": len(records),
+        "ok": len(ok),
+        "seconds": round(elapsed, 2),
+        "throughput_per_min": len(ok) / elapsed * 60 if elapsed > 0 else 0.0,
+        "error_rate": (len(records) - len(ok)) / len(records) if records else 0.0,
+        "errors": errors,
+        "latency": latency,
+        "rss_mb_max": max(rss) if rss else None,
+        "rss_mb_mean": float(np.mean(rss)) if rss else None,
+    }
+
+
+def saturation(steps, max_error_rate, slo_ms, min_gain):
+    """Sustainable throughput (best step within error rate / SLO) and the knee of the curve."""
+    healthy = [s for s in steps if s["latency"] and s["error_rate"] <= max_error_rate
+               and (slo_ms is None or s["latency"]["p95_ms"] <= slo_ms)]
+    best = max(healthy, key=lambda s: s["throughput_per_min"]) if healthy else None
+    knee = None
+    peak = 0.0
+    for s in steps:
+        if peak > 0 and s["throughput_per_min"] < peak * (1 + min_gain):
+            knee = s["concurrency"]
+            break
+        peak = max(peak, s["throughput_per_min"])
+    return {
+        "sustainable_per_min": best["throughput_per_min"] if best else 0.0,
+        "sustainable_concurrency": best["concurrency"] if best else None,
+        "p95_ms_at_sustainable": best["latency"]["p95_ms"] if best else None,
+        "knee_concurrency": knee,
+        "peak_per_min": max((s["throughput_per_min"] for s in steps), default=0.0),
+    }
+
+
+async def load_test(url, pid, clips, levels, step_seconds, rss_interval, timeout, backoff):
+    timeline, steps = [], []
+    state = {"concurrency": 0, "in_flight": 0}
+    t0 = time.perf_counter()
+    sampler = asyncio.create_task(sample_rss(pid, rss_interval, timeline, state, t0))
+    limits = httpx.Limits(max_connections=max(levels), max_keepalive_connections=max(levels))
+    try:
+        async with httpx.AsyncClient(timeout=timeout, limits=limits) as client:
+            for concurrency in levels:
+                state["concurrency"] = concurrency
+                first_sample = len(timeline)
+                print(f"  {concurrency:>4} clients for {step_seconds:.0f}s ...", file=sys.stderr)
+                records, elapsed = await run_step(client, url, clips, concurrency, step_seconds, state, backoff)
+                steps.append(summarize_step(concurrency, records, elapsed, timeline[first_sample:]))
+    finally:
+        sampler.cancel()
+    return steps, timeline
+
+
+def probe_backend(url, clips):
+    """'mock' or 'real' depending on what the server actually answers with."""
+    name, payload = clips[0]
+    response = httpx.post(url + "/process-scan", files={"video": (name, payload, "application/octet-stream")},
+                          timeout=600)
+    body = response.json() if response.headers.get("content-type", "").startswith("application/json") else {}
+    return "mock" if body.get("is_mock") else "real"
+
+
+def compare_with_baseline(results, baseline_path, tolerance):
+    baseline = {r["backend"]: r for r in json.loads(Path(baseline_path).read_text()).get("runs", [])}
+    regressions = []
+    for run in results["runs"]:
+        old = baseline.get(run["backend"])
+        if not old:
+            continue
+        before, after = old["saturation"]["sustainable_per_min"], run["saturation"]["sustainable_per_min"]
+        if before > 0 and after < before * (1 - tolerance):
+            regressions.append(f"{run['backend']}: sustainable {before:.1f} -> {after:.1f} scans/min")
+        old_steps = {s["concurrency"]: s for s in old["steps"]}
+        for step in run["steps"]:
+            prev = old_steps.get(step["concurrency"])
+            if prev and prev["latency"] and step["latency"]:
+                old_p95, new_p95 = prev["latency"]["p95_ms"], step["latency"]["p95_ms"]
+                if new_p95 > old_p95 * (1 + tolerance):
+                    regressions.append(f"{run['backend']} @{step['concurrency']}: p95 {old_p95:.0f} -> {new_p95:.0f} ms")
+    return regressions
+
+
+def print_report(run):
+    print(f"\n{run['backend']} backend")
+    header = f"{'clients':>7} {'scans/min':>10} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'errors':>7} {'RSS max MB':>11}"
+    print(header)
+    print("-" * len(header))
+    for s in run["steps"]:
+        lat = s["latency"] or {}
+        rss = f"{s['rss_mb_max']:.0f}" if s["rss_mb_max"] is not None else "-"
+        print(f"{s['concurrency']:>7} {s['throughput_per_min']:>10.1f} {lat.get('p50_ms', 0):>9.0f} "
+              f"{lat.get('p95_ms', 0):>9.0f} {lat.get('p99_ms', 0):>9.0f} {s['error_rate']:>6.1%} {rss:>11}")
+    sat = run["saturation"]
+    knee = sat["knee_concurrency"] if sat["knee_concurrency"] is not None else "not reached"
+    print(f"sustainable: {sat['sustainable_per_min']:.1f} scans/min at {sat['sustainable_concurrency']} clients; "
+          f"knee: {knee}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrency ramp / saturation test for /process-scan")
+    parser.add_argument("--backends", default="mock,real", help="comma-separated: mock,real")
+    parser.add_argument("--url", help="test this running server instead of starting one")
+    parser.add_argument("--server-pid", type=int, help="pid of --url's server, for RSS sampling")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn workers for the started server")
+    parser.add_argument("--concurrency", default="1,2,4,8,16", help="client counts to ramp through")
+    parser.add_argument("--step-seconds", type=float, default=30.0)
+    parser.add_argument("--resolutions", default="1280x720")
+    parser.add_argument("--frames", type=int, default=90, help="clip length in frames")
+    parser.add_argument("--codec", default="mp4v", help=f"FourCC ({', '.join(CODEC_EXTENSIONS)})")
+    parser.add_argument("--rss-interval", type=float, default=0.5)
+    parser.add_argument("--no-backoff", action="store_true", help="ignore Retry-After on 429/503 responses")
+    parser.add_argument("--timeout", type=float, default=600.0, help="per-request timeout (s)")
+    parser.add_argument("--max-error-rate", type=float, default=0.01)
+    parser.add_argument("--slo-ms", type=float, help="p95 latency a sustainable step must meet")
+    parser.add_argument("--min-gain", type=float, default=0.05, help="throughput gain below which the curve has knee'd")
+    parser.add_argument("--env", action="append", default=[], help="KEY=VALUE for the started server (repeatable)")
+    parser.add_argument("--output", default=str(DEFAULT_OUTPUT))
+    parser.add_argument("--baseline", help="previous results JSON to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="allowed capacity loss vs baseline")
+    args = parser.parse_args()
+
+    levels = [int(n) for n in args.concurrency.split(",") if n]
+    env_overrides = dict(item.split("=", 1) for item in args.env)
+    results = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "workers": args.workers,
+            "step_seconds": args.step_seconds,
+            "backoff": not args.no_backoff,
+            "env": env_overrides,
+        },
+        "runs": [],
+        "skipped": [],
+    }
+
+    with tempfile.TemporaryDirectory(prefix="knot_load_") as tmp_dir:
+        clips = []
+        for resolution in args.resolutions.split(","):
+            width, height = (int(v) for v in resolution.lower().split("x"))
+            path = Path(tmp_dir) / f"clip_{width}x{height}{CODEC_EXTENSIONS.get(args.codec, '.avi')}"
+            if write_synthetic_video(path, width, height, args.frames, codec=args.codec) is None:
+                print(f"❌ Codec {args.codec} not available")
+                return 1
+            clips.append((path.name, path.read_bytes()))
+
+        backends = ["external"] if args.url else [b.strip() for b in args.backends.split(",") if b.strip()]
+        for backend in backends:
+            server = None
+            if args.url:
+                url, pid = args.url.rstrip("/"), args.server_pid
+            else:
+                print(f"🚀 Starting {backend} server ...", file=sys.stderr)
+                server = Server(backend, args.workers, env_overrides)
+                url, pid = server.url, server.proc.pid
+            try:
+                if server is not None:
+                    server.wait_ready(timeout=600)
+                answered = probe_backend(url, clips)
+                if backend == "real" and answered == "mock":
+                    results["skipped"].append("real backend: no model loaded")
+                    continue
+                steps, timeline = asyncio.run(load_test(url, pid, clips, levels, args.step_seconds,
+                                                        args.rss_interval, args.timeout, not args.no_backoff))
+                run = {"backend": answered if backend == "external" else backend, "url": url, "steps": steps,
+                       "saturation": saturation(steps, args.max_error_rate, args.slo_ms, args.min_gain),
+                       "timeline": timeline}
+                results["runs"].append(run)
+                print_report(run)
+            finally:
+                if server is not None:
+                    server.stop()
+
+    output = Path(args.output)
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(results, indent=2))
+    for note in results["skipped"]:
+        print(f"skipped: {note}")
+    print(f"\nResults written to {output}")
+
+    if args.baseline:
+        regressions = compare_with_baseline(results, args.baseline, args.tolerance)
+        if regressions:
+            print("\nRegressions:")
+            for line in regressions:
+                print(f"  {line}")
+            return 1
+        print("\nNo capacity regressions against baseline.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+"""
+Peak RSS per scan: retaining every model output vs. streaming reduction.
+
+Each mode runs in a fresh interpreter and processes the same clip several
+times. Before each scan the kernel's peak-RSS counter is reset through
+/proc/self/clear_refs. The figure reported is the peak above the RSS the scan
+started with.
+
+    retain  the previous behaviour: append every full output dict, then
+            exponential_smooth_results and the per-frame loop
+    stream  pipeline.ResultReducer: slim + smooth each detection as it arrives
+
+By default the model is a stand-in that returns ROMP-shaped outputs plus a
+frame-sized rendered image, the kind of intermediate that used to stay alive
+until the end of the scan. --model romp uses the real model when it is
+installed.
+
+Usage:
+    python benchmarks/bench_memory.py
+    python benchmarks/bench_memory.py --width 1920 --height 1080 --frames 300
+    python benchmarks/bench_memory.py --model romp
+"""
+
+import argparse
+import gc
+import json
+import os
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+import numpy as np
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+DEFAULT_OUTPUT = BACKEND_DIR / "benchmarks" / "results" / "memory.json"
+MODES = ("retain", "stream")
+
+
+class SyntheticModel:
+    """ROMP-shaped outputs for any frame, including a frame-sized rendered image."""
+
+    def __init__(self, seed=0):
+        self.rng = np.random.default_rng(seed)
+
+    def __call__(self, frame):
+        rng = self.rng
+        return {
+            "verts": rng.normal(size=(1, 6890, 3)).astype(np.float32),
+            "joints": rng.normal(size=(1, 71, 3)).astype(np.float32),
+            "params": {
+                "betas": rng.normal(size=(1, 10)).astype(np.float32),
+                "poses": rng.normal(size=(1, 72)).astype(np.float32),
+                "cam": rng.normal(size=(1, 3)).astype(np.float32),
+            },
+            "pj2d_org": rng.random((1, 71, 2)).astype(np.float32),
+            "center_map": rng.random((1, 1, 64, 64)).astype(np.float32),
+            "rendered_image": np.ascontiguousarray(frame).astype(np.float32),
+        }
+
+
+def proc_status_kb(field):
+    try:
+        for line in Path("/proc/self/status").read_text().splitlines():
+            if line.startswith(field + ":"):
+                return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+
+def reset_peak_rss():
+    """Reset VmHWM (Linux); returns False where that is not supported."""
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def run_scan(mode, model, video_path):
+    import cv2
+    import pipeline
+
+    cap = cv2.VideoCapture(str(video_path))
+    frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    frame_ratios = pipeline.frame_sample_ratios(frame_count)
+    try:
+        if mode == "retain":
+            results = []
+            for frame_idx, ratio, frame, frame_rgb in pipeline.iter_sampled_frames(cap, frame_count, frame_ratios):
+                detection = pipeline.detect_person(model, None, False, frame, frame_rgb, frame_idx, ratio, frame_count)
+                if detection is not None:
+                    results.append(detection)
+            best = pipeline.exponential_smooth_results(results, alpha=pipeline.SMOOTHING_ALPHA)
+        else:
+            reducer = pipeline.ResultReducer(alpha=pipeline.SMOOTHING_ALPHA)
+            results = pipeline.detect_sampled_frames(model, None, False, cap, frame_count, frame_ratios, reducer=reducer)
+            best = reducer.result()
+        per_frame = [pipeline.vertex_array(r.get("verts", [])) for r in results]
+    finally:
+        cap.release()
+    return len(results), best, per_frame
+
+
+def child(mode, model_name, video_path, scans):
+    if model_name == "romp":
+        import romp_loader
+        model, _ = romp_loader.load_models()
+        if model is None:
+            print(json.dumps({"mode": mode, "skipped": "ROMP not loaded"}))
+            return
+    else:
+        model = SyntheticModel()
+
+    run_scan(mode, model, video_path)  # warm-up: imports, allocator pools, model caches
+    peaks, detected = [], 0
+    for _ in range(scans):
+        gc.collect()
+        start_kb = proc_status_kb("VmRSS")
+        if reset_peak_rss():
+            outcome = run_scan(mode, model, video_path)
+            peak_kb = proc_status_kb("VmHWM")
+        else:
+            outcome = run_scan(mode, model, video_path)
+            peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        detected = outcome[0]
+        del outcome
+        peaks.append((peak_kb - start_kb) / 1024)
+    print(json.dumps({
+        "mode": mode,
+        "frames_detected": detected,
+        "peak_mb_median": statistics.median(peaks),
+        "peak_mb_max": max(peaks),
+        "rss_mb_after": proc_status_kb("VmRSS") / 1024,
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Peak RSS per scan, retained outputs vs. streaming reduction")
+    parser.add_argument("--model", choices=("synthetic", "romp"), default="synthetic")
+    parser.add_argument("--video", help="clip to scan (default: a generated synthetic clip)")
+    parser.add_argument("--width", type=int, default=1280)
+    parser.add_argument("--height", type=int, default=720)
+    parser.add_argument("--frames", type=int, default=120)
+    parser.add_argument("--scans", type=int, default=5)
+    parser.add_argument("--output", default=str(DEFAULT_OUTPUT))
+    parser.add_argument("--child", choices=MODES, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args.child, args.model, args.video, args.scans)
+        return 0
+
+    with tempfile.TemporaryDirectory() as tmp:
+        video = args.video
+        if video is None:
+            from synthetic_video import write_synthetic_video
+            video = write_synthetic_video(Path(tmp) / "clip.mp4", args.width, args.height, args.frames)
+            if video is None:
+                print("❌ Could not write a synthetic clip (mp4v codec missing); pass --video")
+                return 1
+        rows = []
+        for mode in MODES:
+            proc = subprocess.run([sys.executable, __file__, "--child", mode, "--model", args.model,
+                                   "--video", str(video), "--scans", str(args.scans)],
+                                  cwd=BACKEND_DIR, env=dict(os.environ, KNOT_WARMUP_RUNS="0"),
+                                  capture_output=True, text=True)
+            if proc.returncode != 0:
+                print(f"❌ {mode} failed:\n{proc.stderr[-2000:]}")
+                return 1
+            rows.append(json.loads(proc.stdout.strip().splitlines()[-1]))
+
+    for row in rows:
+        if "skipped" in row:
+            print(f"⏭️  {row['mode']}: {row['skipped']}")
+            return 0
+        print(f"{row['mode']:<8} peak +{row['peak_mb_median']:7.1f} MB (max +{row['peak_mb_max']:.1f} MB) "
+              f"over {row['frames_detected']} detections")
+    retain, stream = rows
+    if retain["peak_mb_median"] > 0:
+        print(f"\nStreaming reduction: {100 * (1 - stream['peak_mb_median'] / retain['peak_mb_median']):.0f}% lower peak RSS per scan")
+
+    output = Path(args.output)
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps({"model": args.model, "video": str(args.video or "synthetic"),
+                                  "resolution": [args.width, args.height], "modes": rows}, indent=2))
+    print(f"Results written to {output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Person prefilter cost, savings and wrong rejections.
+
+Scores frames sampled across each clip with person_filter.person_score and,
+when ROMP is loaded, also runs the model on every frame, so each prefilter
+decision can be checked against ROMP's answer:
+
+- reject rate        frames the prefilter would skip
+- false reject rate  rejected frames where ROMP found a person / all ROMP detections
+- net saving         ROMP time of correctly rejected frames minus prefilter time
+
+Usage:
+    python benchmarks/bench_prefilter.py --video scan1.mp4 --video empty_room.mp4
+    python benchmarks/bench_prefilter.py --samples 40 --threshold 0.3
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+DEFAULT_OUTPUT = BACKEND_DIR / "benchmarks" / "results" / "prefilter.json"
+
+
+def evaluate_clip(video_path, samples, romp, threshold, height):
+    import person_filter
+    import pipeline
+
+    cap = cv2.VideoCapture(str(video_path))
+    frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    rows = []
+    for frame_idx in np.linspace(0, max(0, frame_count - 1), samples).astype(int):
+        cap.set(cv2.CAP_PROP_POS_FRAMES, int(frame_idx))
+        success, frame = cap.read()
+        if not success:
+            continue
+        frame, frame_rgb = pipeline.preprocess_frame(frame)
+        start = time.perf_counter()
+        accepted = person_filter.person_score(frame, height, threshold) is not None
+        row = {"frame_idx": int(frame_idx), "accepted": accepted, "prefilter_ms": (time.perf_counter() - start) * 1000}
+        if romp is not None:
+            start = time.perf_counter()
+            detection = pipeline.detect_person(romp, None, False, frame, frame_rgb, int(frame_idx), 0.0, frame_count)
+            row["romp_ms"] = (time.perf_counter() - start) * 1000
+            row["detected"] = detection is not None
+        rows.append(row)
+    cap.release()
+    return rows
+
+
+def summarize(rows):
+    if not rows:
+        return {}
+    rejected = [r for r in rows if not r["accepted"]]
+    summary = {
+        "frames": len(rows),
+        "reject_rate": len(rejected) / len(rows),
+        "prefilter_p50_ms": float(np.percentile([r["prefilter_ms"] for r in rows], 50)),
+    }
+    if "detected" in rows[0]:
+        detected = [r for r in rows if r["detected"]]
+        false_rejects = [r for r in rejected if r["detected"]]
+        true_rejects = [r for r in rejected if not r["detected"]]
+        romp_ms = float(np.percentile([r["romp_ms"] for r in rows], 50))
+        summary.update({
+            "romp_p50_ms": romp_ms,
+            "false_rejects": len(false_rejects),
+            "false_reject_rate": len(false_rejects) / len(detected) if detected else 0.0,
+            "true_rejects": len(true_rejects),
+            "net_saving_ms": sum(r["romp_ms"] for r in true_rejects) - sum(r["prefilter_ms"] for r in rows),
+        })
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Person prefilter accuracy and savings")
+    parser.add_argument("--video", action="append", help="clip to evaluate (repeatable); default: synthetic clips")
+    parser.add_argument("--samples", type=int, default=30, help="frames per clip")
+    parser.add_argument("--threshold", type=float, default=float(os.getenv("KNOT_PREFILTER_THRESHOLD", "0.0")))
+    parser.add_argument("--height", type=int, default=int(os.getenv("KNOT_PREFILTER_HEIGHT", "256")))
+    parser.add_argument("--output", default=str(DEFAULT_OUTPUT))
+    args = parser.parse_args()
+
+    os.environ["KNOT_PERSON_PREFILTER"] = "off"
+    os.environ.setdefault("KNOT_WARMUP_RUNS", "0")
+    os.chdir(BACKEND_DIR)
+    import main as app_main
+    from synthetic_video import write_synthetic_video
+
+    romp = app_main.romp
+    if romp is None:
+        print("ROMP is not loaded; reporting prefilter decisions and cost only.")
+
+    results = {"threshold": args.threshold, "height": args.height, "clips": []}
+    with tempfile.TemporaryDirectory(prefix="knot_bench_") as tmp_dir:
+        videos = args.video or [write_synthetic_video(Path(tmp_dir) / "clip_1280x720.mp4", 1280, 720, 60)]
+        for video in videos:
+            if not video:
+                continue
+            rows = evaluate_clip(video, args.samples, romp, args.threshold, args.height)
+            summary = summarize(rows)
+            results["clips"].append({"clip": Path(video).name, "summary": summary, "frames": rows})
+            line = (f"{Path(video).name:<24} reject {summary.get('reject_rate', 0):5.0%}"
+                    f"  prefilter p50 {summary.get('prefilter_p50_ms', 0):6.1f} ms")
+            if "romp_p50_ms" in summary:
+                line += (f"  romp p50 {summary['romp_p50_ms']:7.1f} ms  false rejects {summary['false_rejects']}"
+                         f" ({summary['false_reject_rate']:.0%})  net saving {summary['net_saving_ms'] / 1000:.2f} s")
+            print(line)
+
+    output = Path(args.output)
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(results, indent=2))
+    print(f"\nResults written to {output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
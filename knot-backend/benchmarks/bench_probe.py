@@ -0,0 +1,271 @@
+#!/usr/bin/env python3
+"""
+Container probe (probe.py) vs. finding out the same things with cv2.
+
+For each clip:
+
+    header     time to codec / size / frame count: probe.probe on the upload
+               buffer vs. the old path (copy the upload to disk, open it with
+               cv2.VideoCapture); bytes the probe read; whether both agree
+    truncated  the same clip cut in half (an interrupted upload): time to reject
+    reads      decode seconds of the sampled frames, each seeked to (no keyframe
+               table) vs. planned from the probe's keyframes (read on when that
+               decodes fewer frames, pipeline.read_forward); frames decoded as
+               estimated for admission (pipeline.frames_decoded) vs. measured
+               (decode seconds / sequential seconds per frame); identical frames
+
+Before the clips, hand-built containers check probe.probe / probe.check
+verdicts (exit code 1 on a mismatch): a fragmented MP4 (frame count and duration
+unknown, accepted), an empty upload (400), an MPEG-TS stream (unrecognized, left
+to cv2) and an MP4 without moov (400).
+
+Usage:
+    python benchmarks/bench_probe.py
+    python benchmarks/bench_probe.py --width 1920 --height 1080 --frames 900
+    python benchmarks/bench_probe.py --video scan.mp4 --video scan.webm
+"""
+
+import argparse
+import hashlib
+import io
+import json
+import os
+import struct
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import cv2
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+import pipeline  # noqa: E402
+import probe  # noqa: E402
+
+DEFAULT_OUTPUT = BACKEND_DIR / "benchmarks" / "results" / "probe.json"
+
+
+def best_of(fn, repeats):
+    best, result = None, None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def cv2_header(payload, tmp_dir):
+    """The pre-probe path: write the upload to disk, open it, read the properties."""
+    fd, path = tempfile.mkstemp(dir=tmp_dir, suffix=".mp4")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(payload)
+        cap = cv2.VideoCapture(path)
+        if not cap.isOpened():
+            return None
+        info = (int(cap.get(cv2.CAP_PROP_FRAME_COUNT)), int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)),
+                int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)))
+        cap.release()
+        return info
+    finally:
+        os.unlink(path)
+
+
+def probe_header(payload):
+    try:
+        return probe.probe(io.BytesIO(payload))
+    except probe.Rejected as e:
+        return e
+
+
+def box(box_type, *payload):
+    body = b"".join(payload)
+    return struct.pack(">I4s", 8 + len(body), box_type.encode()) + body
+
+
+def full_box(box_type, *payload):
+    return box(box_type, b"\x00\x00\x00\x00", *payload)
+
+
+def fragmented_mp4(width=640, height=360):
+    """ftyp + moov (empty sample tables, mvex) + one moof/mdat fragment, as browsers record."""
+    visual_entry = b"\x00" * 6 + struct.pack(">H", 1) + b"\x00" * 16 + struct.pack(">HH", width, height) + b"\x00" * 50
+    stbl = box("stbl",
+               full_box("stsd", struct.pack(">I", 1), box("avc1", visual_entry)),
+               full_box("stts", struct.pack(">I", 0)),
+               full_box("stsc", struct.pack(">I", 0)),
+               full_box("stsz", struct.pack(">II", 0, 0)),
+               full_box("stco", struct.pack(">I", 0)))
+    mdia = box("mdia",
+               full_box("mdhd", struct.pack(">IIII", 0, 0, 90000, 0), b"\x00" * 4),
+               full_box("hdlr", b"\x00" * 4, b"vide", b"\x00" * 12, b"video\x00"),
+               box("minf", stbl))
+    tkhd = full_box("tkhd", b"\x00" * 72, struct.pack(">II", width << 16, height << 16))
+    moov = box("moov",
+               full_box("mvhd", struct.pack(">IIII", 0, 0, 1000, 0), b"\x00" * 80),
+               box("trak", tkhd, mdia),
+               box("mvex", full_box("trex", struct.pack(">5I", 1, 1, 0, 0, 0))))
+    fragment = box("moof", full_box("mfhd", struct.pack(">I", 1))) + box("mdat", b"\x00" * 64)
+    return box("ftyp", b"iso5", struct.pack(">I", 512), b"iso5iso6mp41") + moov + fragment
+
+
+CONTAINER_CASES = [
+    # (name, payload, expected verdict, expected VideoInfo fields)
+    ("fragmented mp4", fragmented_mp4(), "accepted",
+     {"container": "mp4", "codec": "h264", "width": 640, "height": 360, "frame_count": None, "duration": None}),
+    ("empty upload", b"", 400, None),
+    ("mpeg-ts", bytes([0x47, 0x40, 0x00, 0x10]) + b"\xff" * 184, "unrecognized", None),
+    ("mp4 without moov", box("ftyp", b"isom", struct.pack(">I", 512)) + box("mdat", b"\x00" * 64), 400, None),
+]
+
+
+def container_checks():
+    """[(name, ok, detail)] for CONTAINER_CASES."""
+    results = []
+    for name, payload, expected, fields in CONTAINER_CASES:
+        try:
+            info = probe.probe(io.BytesIO(payload))
+            probe.check(info, len(payload))
+            verdict = "accepted" if info is not None else "unrecognized"
+        except probe.Rejected as e:
+            info, verdict = None, e.status_code
+        ok = verdict == expected
+        detail = f"{verdict}"
+        if ok and fields:
+            got = {key: getattr(info, key) for key in fields}
+            ok = got == fields
+            detail += f" {got}"
+        results.append((name, ok, detail))
+    return results
+
+
+def sampled_reads(video, frame_count, ratios, keyframes):
+    """(seconds, frame digests) of pipeline.iter_sampled_frames over the clip."""
+    cap = cv2.VideoCapture(str(video))
+    start = time.perf_counter()
+    digests = [hashlib.blake2b(frame.tobytes(), digest_size=8).hexdigest()
+               for _, _, frame, _ in pipeline.iter_sampled_frames(cap, frame_count, ratios, keyframes=keyframes)]
+    seconds = time.perf_counter() - start
+    cap.release()
+    return seconds, digests
+
+
+def sequential_seconds_per_frame(video, frame_count):
+    cap = cv2.VideoCapture(str(video))
+    start = time.perf_counter()
+    read = 0
+    while read < frame_count and cap.read()[0]:
+        read += 1
+    seconds = time.perf_counter() - start
+    cap.release()
+    return seconds / max(read, 1)
+
+
+def bench_clip(video, repeats, tmp_dir):
+    payload = Path(video).read_bytes()
+    probe_s, info = best_of(lambda: probe_header(payload), repeats)
+    cv2_s, cv2_info = best_of(lambda: cv2_header(payload, tmp_dir), repeats)
+    row = {
+        "video": str(video),
+        "bytes": len(payload),
+        "probe_ms": probe_s * 1000,
+        "cv2_ms": cv2_s * 1000,
+        "info": info.as_dict() if isinstance(info, probe.VideoInfo) else None,
+        "header_bytes": info.header_bytes if isinstance(info, probe.VideoInfo) else None,
+    }
+    if isinstance(info, probe.VideoInfo) and cv2_info is not None:
+        row["agrees_with_cv2"] = (info.frame_count, info.width, info.height) == cv2_info
+
+    truncated = payload[:len(payload) // 2]
+    reject_s, rejected = best_of(lambda: probe_header(truncated), repeats)
+    cv2_reject_s, _ = best_of(lambda: cv2_header(truncated, tmp_dir), repeats)
+    row["truncated"] = {
+        "probe_ms": reject_s * 1000,
+        "cv2_ms": cv2_reject_s * 1000,
+        "probe_rejects": isinstance(rejected, probe.Rejected),
+    }
+
+    if isinstance(info, probe.VideoInfo) and cv2_info is not None:
+        frame_count = cv2_info[0]
+        per_frame = sequential_seconds_per_frame(video, frame_count)
+        ratios = pipeline.frame_sample_ratios(frame_count)
+        indices = pipeline.sample_indices(frame_count, ratios)
+        keyframes = info.keyframes or list(range(frame_count))
+        row["reads"] = {}
+        digests = {}
+        for mode, mode_keyframes in (("seek", None), ("planned", info.keyframes)):
+            seconds, (_, digests[mode]) = best_of(lambda: sampled_reads(video, frame_count, ratios, mode_keyframes), repeats)
+            predicted = (pipeline.frames_decoded(indices, mode_keyframes) if mode_keyframes
+                         else sum(pipeline.seek_cost(idx, keyframes) for idx in indices))
+            row["reads"][mode] = {
+                "samples": len(indices),
+                "predicted_frames_decoded": predicted,
+                "measured_frames_decoded": seconds / per_frame if per_frame else None,
+                "decode_ms": seconds * 1000,
+            }
+        row["identical_frames"] = digests["seek"] == digests["planned"]
+    return row
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Container probe vs. cv2 for header info and early rejection")
+    parser.add_argument("--video", action="append", help="clip(s) to probe (default: generated synthetic clips)")
+    parser.add_argument("--width", type=int, default=1280)
+    parser.add_argument("--height", type=int, default=720)
+    parser.add_argument("--frames", type=int, default=300)
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--output", default=str(DEFAULT_OUTPUT))
+    args = parser.parse_args()
+
+    checks = container_checks()
+    for name, ok, detail in checks:
+        print(f"{'✅' if ok else '❌'} {name}: {detail}")
+
+    rows = []
+    with tempfile.TemporaryDirectory(prefix="knot_probe_") as tmp:
+        videos = args.video
+        if not videos:
+            from synthetic_video import write_synthetic_video
+            videos = [v for v in (write_synthetic_video(Path(tmp) / "clip.mp4", args.width, args.height, args.frames),
+                                  write_synthetic_video(Path(tmp) / "clip.avi", args.width, args.height, args.frames,
+                                                        codec="MJPG"))
+                      if v is not None]
+            if not videos:
+                print("❌ Could not write a synthetic clip; pass --video")
+                return 1
+        for video in videos:
+            rows.append(bench_clip(video, args.repeats, tmp))
+
+    for row in rows:
+        info = row["info"] or {}
+        print(f"{Path(row['video']).name}: {row['bytes'] / 1e6:.1f} MB, {info.get('container')}/{info.get('codec')} "
+              f"{info.get('width')}x{info.get('height')}, {info.get('frame_count')} frames, "
+              f"keyframe interval {info.get('keyframe_interval')}")
+        agree = row.get("agrees_with_cv2")
+        print(f"  header     probe {row['probe_ms']:7.2f} ms ({row['header_bytes'] or 0:,} bytes read)  "
+              f"cv2 {row['cv2_ms']:7.2f} ms  " + ("✅ same info" if agree else "⚠️  differs from cv2" if agree is False else ""))
+        t = row["truncated"]
+        print(f"  truncated  probe {t['probe_ms']:7.2f} ms  cv2 {t['cv2_ms']:7.2f} ms  "
+              + ("✅ rejected by the probe" if t["probe_rejects"] else "⏭️  left to cv2"))
+        for mode, s in row.get("reads", {}).items():
+            measured = s["measured_frames_decoded"]
+            measured = f"~{measured:.0f}" if measured is not None else "n/a"
+            print(f"  reads      {mode:<8} {s['samples']} samples, {s['decode_ms']:7.1f} ms decode, "
+                  f"frames decoded: estimated {s['predicted_frames_decoded']}, measured {measured}")
+        if "identical_frames" in row:
+            print("             " + ("✅ same frames" if row["identical_frames"] else "⚠️  frames differ"))
+
+    output = Path(args.output)
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps({"containers": [{"case": name, "ok": ok, "result": detail}
+                                                 for name, ok, detail in checks],
+                                  "clips": rows}, indent=2))
+    print(f"Results written to {output}")
+    return 0 if all(ok for _, ok, _ in checks) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
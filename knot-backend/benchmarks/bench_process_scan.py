@@ -0,0 +1,279 @@
+#!/usr/bin/env python3
+"""
+End-to-end benchmark for /process-scan.
+
+Generates synthetic clips (resolutions x lengths x codecs), posts each one to
+/process-scan through the FastAPI test client with the mock and/or real
+backend, and reports p50/p95 per pipeline stage. Results are written as JSON;
+pass --baseline to compare against an earlier run and fail on regressions.
+
+--profiles runs every clip once per scan profile (profiles.py) and checks each
+profile's latency target: total p95 of the real backend on the reference clip
+(profiles.REFERENCE_CLIP) must stay within latency_target_ms x --target-scale.
+
+Usage:
+    python benchmarks/bench_process_scan.py
+    python benchmarks/bench_process_scan.py --backends mock --repeats 20
+    python benchmarks/bench_process_scan.py --baseline benchmarks/results/baseline.json
+    python benchmarks/bench_process_scan.py --backends real --profiles preview,standard,precise \
+        --resolutions 1280x720 --lengths 150 --codecs mp4v
+"""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+import profiles  # noqa: E402
+import stage_timing  # noqa: E402
+from synthetic_video import CODEC_EXTENSIONS, write_synthetic_video  # noqa: E402
+
+DEFAULT_OUTPUT = BACKEND_DIR / "benchmarks" / "results" / "process_scan.json"
+
+
+def percentiles(values):
+    if not values:
+        return None
+    arr = np.asarray(values, dtype=np.float64) * 1000.0
+    return {
+        "p50_ms": float(np.percentile(arr, 50)),
+        "p95_ms": float(np.percentile(arr, 95)),
+        "mean_ms": float(arr.mean()),
+        "n": int(arr.size),
+    }
+
+
+def parse_resolutions(text):
+    return [tuple(int(v) for v in item.lower().split("x")) for item in text.split(",") if item]
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR, stderr=subprocess.DEVNULL
+        ).decode().strip()
+    except Exception:
+        return None
+
+
+def run_case(client, video_path, repeats, warmup, profile=None):
+    """Post one clip repeatedly; return client latencies and per-stage samples."""
+    payload = video_path.read_bytes()
+    data = {"profile": profile} if profile else None
+    captured = []
+    stage_timing.add_listener(captured.append)
+    latencies = []
+    errors = 0
+    try:
+        for i in range(warmup + repeats):
+            if i == warmup:
+                captured.clear()
+            start = time.perf_counter()
+            response = client.post(
+                "/process-scan",
+                files={"video": (video_path.name, payload, "application/octet-stream")},
+                data=data,
+            )
+            elapsed = time.perf_counter() - start
+            if i < warmup:
+                continue
+            latencies.append(elapsed)
+            if response.status_code != 200:
+                errors += 1
+    finally:
+        stage_timing.remove_listener(captured.append)
+
+    stages = {}
+    for name in stage_timing.STAGES:
+        samples = [t.durations[name] for t in captured if name in t.durations]
+        if samples:
+            stages[name] = percentiles(samples)
+    return {
+        "file_bytes": len(payload),
+        "errors": errors,
+        "total": percentiles(latencies),
+        "stages": stages,
+    }
+
+
+def case_key(case):
+    key = f"{case['backend']}/{case['codec']}/{case['width']}x{case['height']}/{case['frames']}f"
+    return f"{key}/{case['profile']}" if case.get("profile") else key
+
+
+def check_latency_targets(results, scale):
+    """
+    (failures, checked profile names): each profile's real-backend p95 on the
+    reference clip against its latency target x scale.
+    """
+    width, height, frames = profiles.REFERENCE_CLIP
+    failures, checked = [], set()
+    for case in results["cases"]:
+        profile = profiles.PROFILES.get(case.get("profile"))
+        if (profile is None or case["backend"] != "real" or not case.get("total")
+                or (case["width"], case["height"], case["frames"]) != (width, height, frames)):
+            continue
+        checked.add(profile.name)
+        target = profile.latency_target_ms * scale
+        p95 = case["total"]["p95_ms"]
+        if case["errors"] or p95 > target:
+            failures.append(f"{case_key(case)}: p95 {p95:.1f} ms, target {target:.0f} ms"
+                            + (f", {case['errors']} errors" if case["errors"] else ""))
+    return failures, checked
+
+
+def compare_with_baseline(results, baseline_path, tolerance):
+    """Return a list of regression descriptions (total p95 beyond tolerance)."""
+    baseline = json.loads(Path(baseline_path).read_text())
+    base_cases = {case_key(c): c for c in baseline.get("cases", [])}
+    regressions = []
+    for case in results["cases"]:
+        base = base_cases.get(case_key(case))
+        if not base or not base.get("total") or not case.get("total"):
+            continue
+        old = base["total"]["p95_ms"]
+        new = case["total"]["p95_ms"]
+        if old > 0 and new > old * (1 + tolerance):
+            regressions.append(f"{case_key(case)}: p95 {old:.1f} ms -> {new:.1f} ms (+{(new / old - 1) * 100:.0f}%)")
+    return regressions
+
+
+def print_table(results):
+    header = f"{'case':<40} {'total p50':>10} {'p95':>9}  stage p50/p95 (ms)"
+    print(header)
+    print("-" * len(header))
+    for case in results["cases"]:
+        if not case.get("total"):
+            continue
+        stage_text = "  ".join(
+            f"{name}={s['p50_ms']:.1f}/{s['p95_ms']:.1f}" for name, s in case["stages"].items()
+        )
+        print(f"{case_key(case):<40} {case['total']['p50_ms']:>10.1f} {case['total']['p95_ms']:>9.1f}  {stage_text}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the /process-scan pipeline")
+    parser.add_argument("--backends", default="mock,real", help="comma-separated: mock,real")
+    parser.add_argument("--resolutions", default="640x360,1280x720,1920x1080")
+    parser.add_argument("--lengths", default="30,150", help="clip lengths in frames")
+    parser.add_argument("--codecs", default="mp4v,MJPG", help=f"FourCCs ({', '.join(CODEC_EXTENSIONS)})")
+    parser.add_argument("--fps", type=int, default=30)
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--warmup", type=int, default=1)
+    parser.add_argument("--output", default=str(DEFAULT_OUTPUT))
+    parser.add_argument("--baseline", help="previous results JSON to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed p95 slowdown vs baseline (0.25 = 25%%)")
+    parser.add_argument("--profiles", help=f"comma-separated scan profiles ({', '.join(profiles.PROFILES)}); "
+                                           "checks their latency targets")
+    parser.add_argument("--target-scale", type=float, default=1.0,
+                        help="multiplier on the profile latency targets (slower / faster hardware)")
+    args = parser.parse_args()
+    scan_profiles = [p.strip() for p in args.profiles.split(",") if p.strip()] if args.profiles else [None]
+    for name in scan_profiles:
+        if name is not None and name not in profiles.PROFILES:
+            parser.error(f"unknown profile {name}")
+
+    # Importing main initializes the model (or falls back to MOCK MODE)
+    os.chdir(BACKEND_DIR)
+    import main as app_main
+    from fastapi.testclient import TestClient
+
+    client = TestClient(app_main.app)
+    real_model = (app_main.romp, app_main.bev)
+
+    results = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "repeats": args.repeats,
+            "target_scale": args.target_scale if args.profiles else None,
+        },
+        "cases": [],
+        "skipped": [],
+    }
+
+    backends = [b.strip() for b in args.backends.split(",") if b.strip()]
+    with tempfile.TemporaryDirectory(prefix="knot_bench_") as tmp_dir:
+        clips = []
+        for codec in args.codecs.split(","):
+            for width, height in parse_resolutions(args.resolutions):
+                for frames in (int(n) for n in args.lengths.split(",")):
+                    path = Path(tmp_dir) / f"clip_{codec}_{width}x{height}_{frames}{CODEC_EXTENSIONS.get(codec, '.avi')}"
+                    if write_synthetic_video(path, width, height, frames, fps=args.fps, codec=codec) is None:
+                        results["skipped"].append(f"codec {codec} unavailable")
+                        continue
+                    clips.append((codec, width, height, frames, path))
+
+        for backend in backends:
+            if backend == "mock":
+                app_main.romp, app_main.bev = None, None
+            elif backend == "real":
+                if real_model == (None, None):
+                    results["skipped"].append("real backend: no model loaded")
+                    continue
+                app_main.romp, app_main.bev = real_model
+            else:
+                parser.error(f"unknown backend {backend}")
+
+            for codec, width, height, frames, path in clips:
+                for profile in scan_profiles:
+                    case = {"backend": backend, "codec": codec, "width": width, "height": height, "frames": frames}
+                    if profile:
+                        case["profile"] = profile
+                    print(f"Running {case_key(case)} ...", file=sys.stderr)
+                    case.update(run_case(client, path, args.repeats, args.warmup, profile))
+                    results["cases"].append(case)
+
+        app_main.romp, app_main.bev = real_model
+
+    output = Path(args.output)
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(results, indent=2))
+    print_table(results)
+    for note in sorted(set(results["skipped"])):
+        print(f"skipped: {note}")
+    print(f"\nResults written to {output}")
+
+    failed = False
+    if args.profiles:
+        failures, checked = check_latency_targets(results, args.target_scale)
+        unchecked = [p for p in scan_profiles if p not in checked]
+        if unchecked:
+            width, height, frames = profiles.REFERENCE_CLIP
+            print(f"\n⏭️  Latency targets not checked for {', '.join(unchecked)} "
+                  f"(needs the real backend on a {width}x{height} {frames}-frame clip)")
+        if failures:
+            print("\n❌ Profiles over their latency target:")
+            for line in failures:
+                print(f"  {line}")
+            failed = True
+        elif checked:
+            print(f"\n✅ Latency targets met: {', '.join(sorted(checked))}")
+
+    if args.baseline:
+        regressions = compare_with_baseline(results, args.baseline, args.tolerance)
+        if regressions:
+            print("\nRegressions:")
+            for line in regressions:
+                print(f"  {line}")
+            sys.exit(1)
+        print("\nNo regressions against baseline.")
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
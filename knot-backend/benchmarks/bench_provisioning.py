@@ -0,0 +1,278 @@
+#!/usr/bin/env python3
+"""
+Model provisioning (provisioning.py) against a local stand-in for the release
+server: a generated smpl_model_data.zip served over http.server, with HTTP range
+support that can be switched off or made to fail part-way.
+
+    ranged      parallel range download + extraction into an empty dir; every
+                extracted file (subfolders included) is in the manifest and a
+                corrupted nested file fails verify(full=True)
+    resume      the server fails every range from the middle of the archive
+                onwards; the next run fetches only the missing chunks
+    sha256      a wrong KNOT_MODEL_SHA256: ProvisioningError, no partial or
+                model files left behind
+    lock        several `python provisioning.py` processes on one dir at once:
+                all succeed, the archive is downloaded once
+    no-range    a server that ignores Range: one stream, same files
+
+Exit code 1 if any case fails. No network access or real model data is needed.
+
+Usage:
+    python benchmarks/bench_provisioning.py
+    python benchmarks/bench_provisioning.py --archive-mb 64 --processes 8
+"""
+
+import argparse
+import hashlib
+import io
+import json
+import logging
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import zipfile
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+# Small chunks so a test archive splits into many ranges (read by provisioning.download)
+os.environ.setdefault("KNOT_DOWNLOAD_CHUNK_MB", "1")
+
+import provisioning  # noqa: E402
+
+DEFAULT_OUTPUT = BACKEND_DIR / "benchmarks" / "results" / "provisioning.json"
+NESTED_FILE = "smpl_model_data/J_regressor/J_regressor_extra.npy"
+
+
+def build_archive(size_mb):
+    """Stored (incompressible) zip shaped like the release: one top-level folder, one subfolder."""
+    rng = os.urandom
+    romp_bytes = int(size_mb * (1 << 20) * 0.75)
+    members = {
+        "smpl_model_data/ROMP.pkl": rng(romp_bytes),
+        "smpl_model_data/SMPL_NEUTRAL.pth": rng(int(size_mb * (1 << 20)) - romp_bytes),
+        NESTED_FILE: rng(64 << 10),
+    }
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_STORED) as zf:
+        for name, data in members.items():
+            zf.writestr(name, data)
+    return buffer.getvalue()
+
+
+class ArchiveHandler(BaseHTTPRequestHandler):
+    """Serves server.payload; honours single-range requests when server.ranges is set."""
+
+    def do_GET(self):
+        server = self.server
+        payload = server.payload
+        requested = self.headers.get("Range", "")
+        if server.ranges and requested.startswith("bytes="):
+            first, _, last = requested[len("bytes="):].partition("-")
+            start = int(first)
+            end = min(int(last) if last else len(payload) - 1, len(payload) - 1)
+            if server.fail_from is not None and start >= server.fail_from:
+                self.send_error(503, "Simulated outage")
+                return
+            status, body = 206, payload[start:end + 1]
+            headers = {"Content-Range": f"bytes {start}-{end}/{len(payload)}", "Accept-Ranges": "bytes"}
+        else:
+            status, body, headers = 200, payload, {}
+        self.send_response(status)
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("ETag", server.etag)
+        for key, value in headers.items():
+            self.send_header(key, value)
+        self.end_headers()
+        try:
+            self.wfile.write(body)
+        except (BrokenPipeError, ConnectionResetError):
+            return  # the client only wanted the headers (provisioning._probe)
+        with server.stats_lock:
+            server.stats["requests"] += 1
+            server.stats["partial" if status == 206 else "full"] += 1
+            server.stats["bytes"] += len(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class ArchiveServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, payload):
+        super().__init__(("127.0.0.1", 0), ArchiveHandler)
+        self.payload = payload
+        self.etag = '"' + hashlib.sha256(payload).hexdigest()[:16] + '"'
+        self.ranges = True
+        self.fail_from = None
+        self.stats_lock = threading.Lock()
+        self.reset_stats()
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}/{provisioning.ARCHIVE_NAME}"
+
+    def reset_stats(self):
+        with self.stats_lock:
+            self.stats = {"requests": 0, "partial": 0, "full": 0, "bytes": 0}
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return time.perf_counter() - start, result
+
+
+def case_ranged(server, work, sha256):
+    romp_dir = work / "ranged"
+    server.reset_stats()
+    seconds, _ = timed(lambda: provisioning.ensure_models(romp_dir, url=server.url, mirror="", sha256=sha256))
+    files = json.loads((romp_dir / provisioning.MANIFEST_NAME).read_text())["files"]
+    nested = NESTED_FILE.split("/", 1)[1]
+    clean = provisioning.verify(romp_dir, full=True)
+    with open(romp_dir / nested, "r+b") as f:
+        f.write(b"corrupt")
+    corrupted = provisioning.verify(romp_dir, full=True)
+    ok = nested in files and not clean and f"sha256 mismatch {nested}" in corrupted
+    return ok, {"seconds": seconds, "manifest_files": sorted(files), "server": dict(server.stats),
+                "verify_after_corruption": corrupted}
+
+
+def case_resume(server, work, sha256):
+    romp_dir = work / "resume"
+    size = len(server.payload)
+    retries = provisioning.RETRIES
+    server.reset_stats()
+    server.fail_from = size // 2
+    provisioning.RETRIES = 1  # fail on the first refused chunk instead of backing off
+    try:
+        provisioning.ensure_models(romp_dir, url=server.url, mirror="", sha256=sha256)
+        interrupted = False
+    except (OSError, provisioning.ProvisioningError):
+        interrupted = True
+    finally:
+        provisioning.RETRIES = retries
+        server.fail_from = None
+    first = dict(server.stats)
+    state_path = romp_dir / (provisioning.ARCHIVE_NAME + ".part.json")
+    saved_chunks = len(json.loads(state_path.read_text())["done"]) if state_path.exists() else 0
+
+    server.reset_stats()
+    seconds, _ = timed(lambda: provisioning.ensure_models(romp_dir, url=server.url, mirror="", sha256=sha256))
+    second = dict(server.stats)
+    # The resumed run fetches only the chunks not kept (plus the 1-byte probe)
+    chunk_size = int(float(os.environ["KNOT_DOWNLOAD_CHUNK_MB"]) * (1 << 20))
+    ok = interrupted and saved_chunks > 0 and second["bytes"] <= size - saved_chunks * chunk_size + 1
+    return ok, {"interrupted": interrupted, "chunks_kept": saved_chunks, "first_run": first,
+                "resumed_run": second, "resumed_fraction": second["bytes"] / size, "seconds": seconds}
+
+
+def case_sha256(server, work):
+    romp_dir = work / "sha256"
+    try:
+        provisioning.ensure_models(romp_dir, url=server.url, mirror="", sha256="0" * 64)
+        raised = False
+    except provisioning.ProvisioningError:
+        raised = True
+    leftovers = sorted(p.name for p in romp_dir.iterdir() if p.name != provisioning.LOCK_NAME)
+    return raised and not leftovers, {"raised": raised, "leftovers": leftovers}
+
+
+def case_lock(server, work, sha256, processes):
+    romp_dir = work / "lock"
+    server.reset_stats()
+    command = [sys.executable, str(BACKEND_DIR / "provisioning.py"), "--dir", str(romp_dir),
+               "--url", server.url, "--sha256", sha256, "--mirror", ""]
+    start = time.perf_counter()
+    procs = [subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+             for _ in range(processes)]
+    outputs = [proc.communicate()[0] for proc in procs]
+    seconds = time.perf_counter() - start
+    codes = [proc.returncode for proc in procs]
+    waited = sum("provisioned by another process" in out for out in outputs)
+    size = len(server.payload)
+    # One archive plus one 1-byte probe per process
+    ok = codes == [0] * processes and server.stats["bytes"] <= size + processes and waited == processes - 1
+    return ok, {"processes": processes, "exit_codes": codes, "waited_for_lock": waited,
+                "server": dict(server.stats), "archive_downloads": server.stats["bytes"] / size, "seconds": seconds}
+
+
+def case_no_range(server, work, sha256):
+    romp_dir = work / "no-range"
+    server.reset_stats()
+    server.ranges = False
+    try:
+        seconds, _ = timed(lambda: provisioning.ensure_models(romp_dir, url=server.url, mirror="", sha256=sha256))
+    finally:
+        server.ranges = True
+    ok = server.stats["partial"] == 0 and not provisioning.verify(romp_dir, full=True)
+    return ok, {"seconds": seconds, "server": dict(server.stats)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="provisioning.py against a local range-capable archive server")
+    parser.add_argument("--archive-mb", type=float, default=16)
+    parser.add_argument("--processes", type=int, default=4, help="concurrent provisioning.py runs for the lock case")
+    parser.add_argument("--output", default=str(DEFAULT_OUTPUT))
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+
+    payload = build_archive(args.archive_mb)
+    sha256 = hashlib.sha256(payload).hexdigest()
+    server = ArchiveServer(payload)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    print(f"Serving a {len(payload) / 1e6:.1f} MB archive at {server.url}")
+
+    results = {}
+    try:
+        with tempfile.TemporaryDirectory(prefix="knot_provision_") as tmp:
+            work = Path(tmp)
+            cases = [
+                ("ranged", lambda: case_ranged(server, work, sha256)),
+                ("resume", lambda: case_resume(server, work, sha256)),
+                ("sha256", lambda: case_sha256(server, work)),
+                ("lock", lambda: case_lock(server, work, sha256, args.processes)),
+                ("no-range", lambda: case_no_range(server, work, sha256)),
+            ]
+            for name, run in cases:
+                try:
+                    ok, details = run()
+                except Exception as e:
+                    ok, details = False, {"error": repr(e)}
+                results[name] = {"ok": ok, **details}
+    finally:
+        server.shutdown()
+
+    for name, row in results.items():
+        if "error" in row:
+            summary = row["error"]
+        elif name == "ranged":
+            summary = f"{row['seconds']:.2f} s, {row['server']['partial']} range requests, manifest {row['manifest_files']}"
+        elif name == "resume":
+            summary = (f"interrupted with {row['chunks_kept']} chunks kept, resumed run fetched "
+                       f"{row['resumed_fraction']:.0%} of the archive")
+        elif name == "sha256":
+            summary = "mismatch raised" if row["raised"] else "mismatch not detected"
+            summary += f", leftovers {row['leftovers']}" if row["leftovers"] else ", nothing left behind"
+        elif name == "lock":
+            summary = (f"{row['processes']} processes, exit codes {row['exit_codes']}, "
+                       f"{row['waited_for_lock']} waited, archive downloaded {row['archive_downloads']:.2f}x")
+        else:
+            summary = f"{row['seconds']:.2f} s single stream, {row['server']['partial']} range responses"
+        print(f"{'✅' if row['ok'] else '❌'} {name:<9} {summary}")
+
+    output = Path(args.output)
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps({"archive_bytes": len(payload), "cases": results}, indent=2))
+    print(f"Results written to {output}")
+    return 0 if all(row["ok"] for row in results.values()) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
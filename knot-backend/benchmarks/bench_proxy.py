@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+Overhead of the Next.js upload proxy (knot-frontend/src/app/api/upload-scan).
+
+Posts the same clip to the backend directly and through the proxy, one after
+another, and reports the difference. Both the backend and the frontend must
+already be running (`uvicorn main:app`, `npm run dev` or `npm start`).
+
+- latency        p50 / p95 of the full request, and time to first response byte
+- memory         RSS of the proxy's process tree: before any request, after the
+                 warm-up and the peak while measuring (needs --proxy-pid; for
+                 `next dev`, the pid of the next-server process). A proxy that
+                 buffers uploads keeps them in its heap after the warm-up, so
+                 compare the absolute peak of fresh processes.
+- pass-through   whether the proxied response bytes equal the direct ones
+                 (only meaningful in MOCK MODE, where responses are deterministic)
+
+Usage:
+    python benchmarks/bench_proxy.py --proxy-pid $(pgrep -f next-server)
+    python benchmarks/bench_proxy.py --width 1920 --height 1080 --frames 300 --repeats 20
+"""
+
+import argparse
+import hashlib
+import json
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+import httpx
+import numpy as np
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from bench_load import tree_rss_mb  # noqa: E402
+from synthetic_video import write_synthetic_video  # noqa: E402
+
+DEFAULT_OUTPUT = BACKEND_DIR / "benchmarks" / "results" / "proxy.json"
+
+
+class RssSampler(threading.Thread):
+    """Peak RSS of a process tree while running."""
+
+    def __init__(self, pid, interval=0.05):
+        super().__init__(daemon=True)
+        self.pid, self.interval = pid, interval
+        self.peak = 0.0
+        self.done = threading.Event()
+
+    def run(self):
+        while not self.done.is_set():
+            self.peak = max(self.peak, tree_rss_mb(self.pid))
+            self.done.wait(self.interval)
+
+    def stop(self):
+        self.done.set()
+        self.join()
+        return self.peak
+
+
+def post(client, url, name, payload):
+    start = time.perf_counter()
+    with client.stream("POST", url, files={"video": (name, payload, "video/mp4")}) as response:
+        first_byte = None
+        digest = hashlib.sha256()
+        size = 0
+        for chunk in response.iter_raw():
+            if first_byte is None:
+                first_byte = time.perf_counter() - start
+            digest.update(chunk)
+            size += len(chunk)
+    return {
+        "status": response.status_code,
+        "seconds": time.perf_counter() - start,
+        "ttfb": first_byte if first_byte is not None else time.perf_counter() - start,
+        "bytes": size,
+        "sha256": digest.hexdigest(),
+        "is_json": response.headers.get("content-type", "").startswith("application/json"),
+    }
+
+
+def percentiles(values):
+    arr = np.asarray(values) * 1000.0
+    return {"p50_ms": float(np.percentile(arr, 50)), "p95_ms": float(np.percentile(arr, 95))}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Latency / memory overhead of the upload-scan proxy")
+    parser.add_argument("--backend-url", default="http://localhost:8000/process-scan")
+    parser.add_argument("--proxy-url", default="http://localhost:3000/api/upload-scan")
+    parser.add_argument("--proxy-pid", type=int, help="frontend server pid, for RSS sampling")
+    parser.add_argument("--video", help="clip to upload (default: a generated synthetic clip)")
+    parser.add_argument("--width", type=int, default=1280)
+    parser.add_argument("--height", type=int, default=720)
+    parser.add_argument("--frames", type=int, default=150)
+    parser.add_argument("--repeats", type=int, default=10)
+    parser.add_argument("--warmup", type=int, default=2)
+    parser.add_argument("--output", default=str(DEFAULT_OUTPUT))
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="knot_proxy_") as tmp:
+        video = Path(args.video) if args.video else write_synthetic_video(
+            Path(tmp) / "clip.mp4", args.width, args.height, args.frames)
+        if video is None:
+            print("❌ Could not write a synthetic clip (mp4v codec missing); pass --video")
+            return 1
+        payload = video.read_bytes()
+
+    results = {"upload_bytes": len(payload), "targets": {}}
+    with httpx.Client(timeout=600) as client:
+        for target, url in (("direct", args.backend_url), ("proxy", args.proxy_url)):
+            start = tree_rss_mb(args.proxy_pid) if args.proxy_pid and target == "proxy" else None
+            for _ in range(args.warmup):
+                post(client, url, video.name, payload)
+            idle = tree_rss_mb(args.proxy_pid) if args.proxy_pid and target == "proxy" else None
+            sampler = RssSampler(args.proxy_pid) if idle is not None else None
+            if sampler:
+                sampler.start()
+            runs = [post(client, url, video.name, payload) for _ in range(args.repeats)]
+            peak = sampler.stop() if sampler else None
+            ok = [r for r in runs if r["status"] == 200]
+            results["targets"][target] = {
+                "requests": len(runs),
+                "ok": len(ok),
+                "statuses": sorted({r["status"] for r in runs}),
+                "total": percentiles([r["seconds"] for r in ok]) if ok else None,
+                "ttfb": percentiles([r["ttfb"] for r in ok]) if ok else None,
+                "response_bytes": ok[0]["bytes"] if ok else None,
+                "digests": sorted({r["sha256"] for r in ok}),
+                "rss_start_mb": start,
+                "rss_idle_mb": idle,
+                "rss_peak_mb": peak,
+            }
+
+    direct, proxy = results["targets"]["direct"], results["targets"]["proxy"]
+    print(f"upload {len(payload) / 1e6:.1f} MB, response {direct['response_bytes'] or 0:,} bytes")
+    for name, t in results["targets"].items():
+        if t["total"] is None:
+            print(f"{name:<7} no successful responses (statuses {t['statuses']})")
+            continue
+        print(f"{name:<7} total p50 {t['total']['p50_ms']:8.1f} ms  p95 {t['total']['p95_ms']:8.1f} ms  "
+              f"ttfb p50 {t['ttfb']['p50_ms']:8.1f} ms")
+    if direct["total"] and proxy["total"]:
+        overhead = {q: proxy["total"][q] - direct["total"][q] for q in ("p50_ms", "p95_ms")}
+        results["overhead"] = overhead
+        print(f"\nProxy overhead: p50 {overhead['p50_ms']:+.1f} ms, p95 {overhead['p95_ms']:+.1f} ms per scan")
+        if len(direct["digests"]) == 1:
+            same = proxy["digests"] == direct["digests"]
+            results["byte_identical"] = same
+            print("Pass-through: " + ("✅ byte-identical responses" if same else "⚠️  responses differ from the backend's"))
+    if proxy["rss_peak_mb"] is not None:
+        results["rss_overhead_mb"] = proxy["rss_peak_mb"] - proxy["rss_idle_mb"]
+        print(f"Proxy RSS: start {proxy['rss_start_mb']:.0f} MB, idle {proxy['rss_idle_mb']:.0f} MB, peak {proxy['rss_peak_mb']:.0f} MB "
+              f"(+{results['rss_overhead_mb']:.1f} MB)")
+
+    output = Path(args.output)
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(results, indent=2))
+    print(f"Results written to {output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+"""
+Throughput vs. worker x thread layout for model inference.
+
+For each layout, starts N worker processes with KNOT_WORKERS / KNOT_TORCH_THREADS
+(and optionally KNOT_CPU_AFFINITY=auto) set the way a deployment would, runs
+inference on synthetic frames concurrently for a fixed duration, and reports
+aggregate frames/s and per-frame latency. Uses the real ROMP model when it
+loads, otherwise a convolutional surrogate of similar input size.
+
+Usage:
+    python benchmarks/bench_threads.py
+    python benchmarks/bench_threads.py --layouts 1x32,2x16,4x8,8x4 --pin --duration 20
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+DEFAULT_OUTPUT = BACKEND_DIR / "benchmarks" / "results" / "threads.json"
+
+
+def build_surrogate():
+    """Conv stack roughly shaped like a 512x512 pose backbone."""
+    import torch.nn as nn
+
+    def block(cin, cout, stride):
+        return nn.Sequential(nn.Conv2d(cin, cout, 3, stride, 1, bias=False), nn.BatchNorm2d(cout), nn.ReLU(inplace=True))
+
+    net = nn.Sequential(
+        block(3, 32, 2), block(32, 64, 2),
+        block(64, 64, 1), block(64, 128, 2),
+        block(128, 128, 1), block(128, 256, 2),
+        block(256, 256, 1), nn.Conv2d(256, 64, 1),
+    ).eval()
+
+    def forward(frame_rgb):
+        import cv2
+        import torch
+
+        image = cv2.resize(frame_rgb, (512, 512))
+        tensor = torch.from_numpy(image).permute(2, 0, 1)[None].float() / 255.0
+        return net(tensor)
+
+    return forward
+
+
+def run_child(args):
+    """Worker process: configure runtime from env, run inference until the deadline."""
+    import cv2
+
+    import torch_runtime
+    from synthetic_video import synthetic_frame
+
+    model_name = "surrogate"
+    model = None
+    if args.model == "real":
+        os.chdir(BACKEND_DIR)
+        import main as app_main  # configures the runtime and loads ROMP
+
+        model = app_main.romp
+        model_name = "romp"
+    torch_runtime.configure_torch_runtime()
+    if model is None:
+        model = build_surrogate()
+        model_name = "surrogate"
+
+    frames = [cv2.cvtColor(synthetic_frame(1280, 720, t=i / 10), cv2.COLOR_BGR2RGB) for i in range(8)]
+    with torch_runtime.inference_context():
+        model(frames[0])  # warm-up
+
+    time.sleep(max(0.0, args.start_at - time.time()))
+    deadline = time.time() + args.duration
+    latencies = []
+    i = 0
+    while time.time() < deadline:
+        start = time.perf_counter()
+        with torch_runtime.inference_context():
+            model(frames[i % len(frames)])
+        latencies.append(time.perf_counter() - start)
+        i += 1
+
+    import torch
+
+    print(json.dumps({
+        "model": model_name,
+        "frames": len(latencies),
+        "latencies": latencies,
+        "threads": torch.get_num_threads(),
+        "affinity": sorted(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else None,
+    }))
+
+
+def run_layout(workers, threads, args):
+    env = dict(os.environ)
+    env["KNOT_WORKERS"] = str(workers)
+    env["KNOT_TORCH_THREADS"] = str(threads)
+    env["KNOT_WARMUP_RUNS"] = "0"
+    if args.pin:
+        env["KNOT_CPU_AFFINITY"] = "auto"
+    start_at = time.time() + args.startup_grace
+    cmd = [sys.executable, __file__, "--child", "--model", args.model,
+           "--duration", str(args.duration), "--start-at", str(start_at)]
+    procs = [subprocess.Popen(cmd, env=env, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL) for _ in range(workers)]
+    reports = []
+    for proc in procs:
+        out, _ = proc.communicate()
+        if proc.returncode == 0 and out:
+            reports.append(json.loads(out.decode().strip().splitlines()[-1]))
+
+    latencies = np.array([lat for r in reports for lat in r["latencies"]]) * 1000.0
+    total_frames = sum(r["frames"] for r in reports)
+    return {
+        "workers": workers,
+        "threads": threads,
+        "pinned": args.pin,
+        "model": reports[0]["model"] if reports else None,
+        "completed_workers": len(reports),
+        "frames_per_s": total_frames / args.duration,
+        "p50_ms": float(np.percentile(latencies, 50)) if latencies.size else None,
+        "p95_ms": float(np.percentile(latencies, 95)) if latencies.size else None,
+    }
+
+
+def default_layouts():
+    cores = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else (os.cpu_count() or 1)
+    layouts = []
+    workers = 1
+    while workers <= cores:
+        layouts.append((workers, max(1, cores // workers)))
+        workers *= 2
+    # The oversubscribed case: every worker keeps torch's default of all cores
+    if cores > 1:
+        layouts.append((min(4, cores), cores))
+    return layouts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inference throughput vs. workers x threads")
+    parser.add_argument("--layouts", help="comma-separated WORKERSxTHREADS, e.g. 1x8,2x4,4x2")
+    parser.add_argument("--model", choices=["real", "surrogate"], default="real")
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--startup-grace", type=float, default=15.0, help="seconds allowed for workers to load")
+    parser.add_argument("--pin", action="store_true", help="set KNOT_CPU_AFFINITY=auto")
+    parser.add_argument("--output", default=str(DEFAULT_OUTPUT))
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--start-at", type=float, default=0.0, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args)
+        return
+
+    if args.layouts:
+        layouts = [tuple(int(v) for v in item.split("x")) for item in args.layouts.split(",")]
+    else:
+        layouts = default_layouts()
+
+    rows = []
+    print(f"{'workers':>7} {'threads':>7} {'frames/s':>9} {'p50 ms':>8} {'p95 ms':>8}  model")
+    for workers, threads in layouts:
+        row = run_layout(workers, threads, args)
+        rows.append(row)
+        p50 = f"{row['p50_ms']:.1f}" if row["p50_ms"] is not None else "-"
+        p95 = f"{row['p95_ms']:.1f}" if row["p95_ms"] is not None else "-"
+        print(f"{workers:>7} {threads:>7} {row['frames_per_s']:>9.2f} {p50:>8} {p95:>8}  {row['model']}")
+
+    output = Path(args.output)
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps({"layouts": rows, "duration_s": args.duration}, indent=2))
+    print(f"\nResults written to {output}")
+
+
+if __name__ == "__main__":
+    main()
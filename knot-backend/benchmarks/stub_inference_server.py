@@ -0,0 +1,61 @@
+"""
+Stand-in for inference_server.py without ROMP: the same socket / shared-memory
+protocol, but every frame is answered with fixed ROMP-shaped outputs and no
+model processes are started. For checks of the HTTP-worker side (client mode)
+on machines without the model, e.g. bench_import.py's client-mode check.
+
+    server = StubInferenceServer(socket_path="/tmp/knot_stub.sock")
+    server.start()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+"""
+
+import os
+import sys
+from multiprocessing import shared_memory
+from pathlib import Path
+
+import numpy as np
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+import inference_server  # noqa: E402
+
+
+def stub_outputs(seed=0):
+    rng = np.random.default_rng(seed)
+    return {
+        "verts": rng.normal(size=(1, 6890, 3)).astype(np.float32),
+        "joints": rng.normal(size=(1, 71, 3)).astype(np.float32),
+        "params": {
+            "betas": rng.normal(size=(1, 10)).astype(np.float32),
+            "poses": rng.normal(size=(1, 72)).astype(np.float32),
+            "cam": rng.normal(size=(1, 3)).astype(np.float32),
+        },
+    }
+
+
+class StubInferenceServer(inference_server.InferenceServer):
+    """InferenceServer whose "model" returns stub_outputs() for every frame."""
+
+    def __init__(self, socket_path, slots=4):
+        super().__init__(1, socket_path=socket_path, slots=slots)
+        self.model_info = {"inference_backend": "stub", "inference_precision": "fp32"}
+        self.outputs = stub_outputs()
+
+    def start(self):
+        self.shm = shared_memory.SharedMemory(create=True, size=self.layout.total_bytes)
+        for slot in range(self.layout.slots):
+            self._free_slots.put(slot)
+
+    def infer(self, slot, header):
+        layout = inference_server.pack_outputs(self.outputs, self.shm.buf, self.layout.output_offset(slot),
+                                               self.layout.output_bytes)
+        return {"ok": True, "layout": layout}
+
+    def shutdown(self):
+        if self.shm is not None:
+            self.shm.close()
+            self.shm.unlink()
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
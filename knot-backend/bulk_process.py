@@ -0,0 +1,329 @@
+#!/usr/bin/env python3
+"""
+Reprocess a directory of scan videos offline.
+
+Runs the same frame pipeline as /process-scan (pipeline.py) over every video
+under --input, spread across a pool of model processes. Inside each process a
+decode thread runs ahead of inference. Results are written in columnar .npz
+shards: one row per video, with vertices, joints, SMPL params and girth
+measurements. Progress goes to checkpoint.jsonl, so an interrupted run picks
+up where it stopped.
+
+Usage:
+    python bulk_process.py --input ~/scans --output ~/scans_out --workers 4
+    python bulk_process.py --input ~/scans --output ~/scans_out --retry-failed
+
+With KNOT_INFERENCE_SOCKET set, workers only decode and send frames to a
+running inference_server.py instead of loading ROMP themselves.
+
+With KNOT_FRAME_CACHE_MB and KNOT_FRAME_CACHE_DIR set, decoded frames are
+kept in the spill directory (frame_cache.py), so a rerun with other model
+settings (--output elsewhere) skips decoding.
+
+Output layout:
+    results-00000.npz   video, vertices [N,V,3], joints [N,J,3], betas/poses/cam,
+                        chest_cm/waist_cm/hips_cm/..., frames_detected, frame_count
+    checkpoint.jsonl    one line per finished video (status, shard, error, seconds)
+    summary.json        throughput of the last run
+"""
+
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from multiprocessing import get_context
+from pathlib import Path
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+CHECKPOINT_NAME = "checkpoint.jsonl"
+PARAM_KEYS = ("betas", "poses", "cam")
+
+# Per-process model state (set by _init_worker)
+_romp = None
+_bev = None
+_use_bev = False
+_frame_cache = None
+
+
+def _init_worker(workers, verbose):
+    global _romp, _bev, _use_bev, _frame_cache
+    # Split the machine's cores across pool processes (see torch_runtime.py)
+    os.environ["KNOT_WORKERS"] = str(workers)
+    logging.basicConfig(level=logging.INFO if verbose else logging.WARNING)
+
+    import romp_loader
+
+    socket_path = os.getenv("KNOT_INFERENCE_SOCKET")
+    if socket_path:
+        from inference_server import InferenceClient
+        _romp = InferenceClient(socket_path)
+    else:
+        _romp, _bev = romp_loader.load_models()
+        _use_bev = romp_loader.USE_BEV
+
+    import frame_cache
+    _frame_cache = frame_cache.FrameCache.from_env()
+
+
+def process_video(path, key):
+    """Run the /process-scan frame pipeline on one video. Returns a result record."""
+    import cv2
+
+    import pipeline
+    import stage_timing
+    from measurements import compute_measurements
+
+    if _romp is None and _bev is None:
+        raise RuntimeError("ROMP is not loaded (MOCK MODE). Install ROMP and the SMPL models first.")
+
+    start = time.perf_counter()
+    timings = stage_timing.StageTimings()
+    record = {"video": key, "status": "failed"}
+
+    try:
+        cap = cv2.VideoCapture(str(path))
+        if not cap.isOpened():
+            record["error"] = "Could not open video file"
+            return record
+        frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        if frame_count == 0:
+            cap.release()
+            record["error"] = "Video has no frames"
+            return record
+
+        frame_ratios = pipeline.frame_sample_ratios(frame_count)
+        video_id = None
+        if _frame_cache is not None:
+            import frame_cache
+            video_id = frame_cache.file_digest(path)
+        try:
+            reducer = pipeline.ResultReducer(alpha=pipeline.SMOOTHING_ALPHA)
+            results = pipeline.detect_sampled_frames(_romp, _bev, _use_bev, cap, frame_count, frame_ratios,
+                                                     timings, prefetch_frames=True, reducer=reducer,
+                                                     cache=_frame_cache, video_id=video_id)
+        finally:
+            cap.release()
+
+        record.update(frame_count=frame_count, frames_sampled=len(frame_ratios), frames_detected=len(results))
+        if not results:
+            record["error"] = "No body detected in any frame"
+        else:
+            with timings.stage("smoothing"):
+                best = reducer.result()
+                vertices = pipeline.vertex_array(best.get("verts", []))
+            if vertices is None:
+                record["error"] = "No vertices in model output"
+            else:
+                with timings.stage("measurement"):
+                    record["measurements"] = compute_measurements(vertices, assumed_height_cm=170.0)
+                arrays = {"vertices": vertices.astype(np.float32)}
+                if best.get("joints") is not None:
+                    arrays["joints"] = pipeline.vertex_array(best["joints"]).astype(np.float32)
+                params = best.get("params") or {}
+                for name in PARAM_KEYS:
+                    if params.get(name) is not None:
+                        arrays[name] = pipeline.to_numpy(params[name]).astype(np.float32).reshape(-1)
+                record["arrays"] = arrays
+                record["status"] = "ok"
+        return record
+    except Exception as e:
+        # One bad video fails alone (and is checkpointed) instead of aborting the archive run
+        logger.warning(f"{key}: {type(e).__name__}: {e}")
+        record["error"] = f"{type(e).__name__}: {e}"
+        return record
+    finally:
+        record["stages"] = dict(timings.durations)
+        record["seconds"] = time.perf_counter() - start
+
+
+class ShardWriter:
+    """Buffers successful rows and writes them as columnar .npz shards."""
+
+    def __init__(self, output_dir, checkpoint, shard_size):
+        self.output_dir = output_dir
+        self.checkpoint = checkpoint
+        self.shard_size = shard_size
+        self.rows = []
+        self.next_index = len(list(output_dir.glob("results-*.npz")))
+
+    def add(self, record):
+        signature = {k: v.shape for k, v in record["arrays"].items()}
+        if self.rows and signature != {k: v.shape for k, v in self.rows[0]["arrays"].items()}:
+            self.flush()  # columns must stack; start a new shard on a layout change
+        self.rows.append(record)
+        if len(self.rows) >= self.shard_size:
+            self.flush()
+
+    def flush(self):
+        if not self.rows:
+            return
+        name = f"results-{self.next_index:05d}.npz"
+        columns = {
+            "video": np.array([r["video"] for r in self.rows]),
+            "frames_detected": np.array([r["frames_detected"] for r in self.rows], dtype=np.int32),
+            "frame_count": np.array([r["frame_count"] for r in self.rows], dtype=np.int32),
+        }
+        for key in self.rows[0]["arrays"]:
+            columns[key] = np.stack([r["arrays"][key] for r in self.rows])
+        measurement_keys = sorted({k for r in self.rows for k, v in r["measurements"].items()
+                                   if isinstance(v, (int, float))})
+        for key in measurement_keys:
+            columns[key] = np.array([r["measurements"].get(key, np.nan) for r in self.rows], dtype=np.float32)
+
+        # Write then rename so a crash never leaves a truncated shard behind
+        tmp_path = self.output_dir / f".{name}.tmp.npz"
+        np.savez(tmp_path, **columns)
+        os.replace(tmp_path, self.output_dir / name)
+        for r in self.rows:
+            self.checkpoint.write(_checkpoint_line(r, shard=name))
+        self.checkpoint.flush()
+        os.fsync(self.checkpoint.fileno())
+        self.next_index += 1
+        self.rows = []
+
+
+def _checkpoint_line(record, shard=None):
+    entry = {k: record.get(k) for k in ("video", "status", "error", "frames_detected", "seconds")}
+    entry["shard"] = shard
+    return json.dumps(entry) + "\n"
+
+
+def load_checkpoint(path):
+    """Map of video key -> last checkpoint entry."""
+    done = {}
+    if path.exists():
+        for line in path.read_text().splitlines():
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                continue  # partially written last line
+            done[entry["video"]] = entry
+    return done
+
+
+def collect_videos(input_dir):
+    from pipeline import VIDEO_SUFFIXES
+
+    return sorted(p for p in input_dir.rglob("*") if p.is_file() and p.suffix.lower() in VIDEO_SUFFIXES)
+
+
+def summarize(records, skipped, elapsed, workers):
+    ok = [r for r in records if r["status"] == "ok"]
+    stage_totals = {}
+    for r in records:
+        for stage, seconds in r.get("stages", {}).items():
+            stage_totals[stage] = stage_totals.get(stage, 0.0) + seconds
+    frames = sum(r.get("frames_sampled", 0) for r in records)
+    video_seconds = np.array([r["seconds"] for r in records]) if records else np.zeros(1)
+    return {
+        "workers": workers,
+        "videos_processed": len(records),
+        "videos_ok": len(ok),
+        "videos_failed": len(records) - len(ok),
+        "videos_skipped": skipped,
+        "wall_seconds": elapsed,
+        "videos_per_s": len(records) / elapsed if elapsed > 0 else 0.0,
+        "frames_per_s": frames / elapsed if elapsed > 0 else 0.0,
+        "video_p50_s": float(np.percentile(video_seconds, 50)),
+        "video_p95_s": float(np.percentile(video_seconds, 95)),
+        "stage_seconds": stage_totals,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline bulk processing of scan videos")
+    parser.add_argument("--input", required=True, help="directory of scan videos (searched recursively)")
+    parser.add_argument("--output", required=True, help="directory for .npz shards and the checkpoint")
+    parser.add_argument("--workers", type=int, default=max(1, (os.cpu_count() or 1) // 8),
+                        help="model processes (torch threads are split across them)")
+    parser.add_argument("--shard-size", type=int, default=256, help="videos per .npz shard")
+    parser.add_argument("--retry-failed", action="store_true", help="reprocess videos that failed last time")
+    parser.add_argument("--limit", type=int, help="process at most N videos")
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args()
+
+    os.chdir(Path(__file__).resolve().parent)
+    input_dir = Path(args.input).expanduser().resolve()
+    output_dir = Path(args.output).expanduser().resolve()
+    output_dir.mkdir(parents=True, exist_ok=True)
+    checkpoint_path = output_dir / CHECKPOINT_NAME
+
+    done = load_checkpoint(checkpoint_path)
+    videos = collect_videos(input_dir)
+    pending = []
+    for path in videos:
+        key = str(path.relative_to(input_dir))
+        entry = done.get(key)
+        if entry and (entry["status"] == "ok" or not args.retry_failed):
+            continue
+        pending.append((path, key))
+    skipped = len(videos) - len(pending)
+    if args.limit:
+        pending = pending[:args.limit]
+
+    print(f"🎬 {len(videos)} videos found, {skipped} already done, {len(pending)} to process with {args.workers} worker(s)")
+    if not pending:
+        return 0
+
+    records = []
+    start = time.perf_counter()
+    interrupted = False
+    with open(checkpoint_path, "a") as checkpoint:
+        writer = ShardWriter(output_dir, checkpoint, args.shard_size)
+        executor = ProcessPoolExecutor(max_workers=args.workers, mp_context=get_context("spawn"),
+                                       initializer=_init_worker, initargs=(args.workers, args.verbose))
+        remaining = iter(pending)
+        in_flight = {}
+        try:
+            # Keep a bounded window of submissions so huge archives don't queue up front
+            for path, key in remaining:
+                in_flight[executor.submit(process_video, str(path), key)] = key
+                if len(in_flight) >= args.workers * 2:
+                    break
+            while in_flight:
+                finished, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    key = in_flight.pop(future)
+                    record = future.result()
+                    records.append(record)
+                    if record["status"] == "ok":
+                        writer.add(record)
+                    else:
+                        checkpoint.write(_checkpoint_line(record))
+                        checkpoint.flush()
+                        print(f"⚠️  {key}: {record['error']}")
+                    if len(records) % 25 == 0:
+                        elapsed = time.perf_counter() - start
+                        print(f"   {len(records)}/{len(pending)} videos ({len(records) / elapsed:.2f} videos/s)")
+                    next_item = next(remaining, None)
+                    if next_item is not None:
+                        in_flight[executor.submit(process_video, str(next_item[0]), next_item[1])] = next_item[1]
+        except KeyboardInterrupt:
+            interrupted = True
+            print("\n⏸️  Interrupted; saving finished results (rerun the same command to resume)")
+        except RuntimeError as e:
+            print(f"❌ {e}")
+            return 1
+        finally:
+            executor.shutdown(wait=not interrupted, cancel_futures=True)
+            writer.flush()
+
+    elapsed = time.perf_counter() - start
+    summary = summarize(records, skipped, elapsed, args.workers)
+    (output_dir / "summary.json").write_text(json.dumps(summary, indent=2))
+    print(f"✅ {summary['videos_ok']} ok, {summary['videos_failed']} failed in {elapsed:.1f}s "
+          f"({summary['videos_per_s']:.2f} videos/s, {summary['frames_per_s']:.1f} frames/s)")
+    for stage, seconds in sorted(summary["stage_seconds"].items(), key=lambda kv: -kv[1]):
+        print(f"   {stage:<12} {seconds:8.1f}s")
+    print(f"📁 Results in {output_dir}")
+    return 130 if interrupted else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,141 @@
+"""
+Compatibility shims for ROMP, chumpy and the original SMPL files.
+
+The original SMPL_NEUTRAL.pth is a Python 2 pickle that holds chumpy objects.
+Loading it on a current stack needs:
+
+- inspect.getargspec (removed in Python 3.11), which chumpy calls
+- numpy.bool / numpy.int / ... aliases (removed from NumPy), which chumpy imports
+- torch.load with weights_only=False and latin1 decoding of Python 2 pickles
+
+apply() installs all of them, once per process, before romp or chumpy is
+imported. romp_loader, test_romp.py and convert_smpl_to_py3.py all share it.
+The numpy/inspect part is cheap. The torch part imports torch, so
+apply_torch_compat() only runs when a model or a torch-saved file is loaded.
+
+lazy_import() defers importing a heavy module (torch, cv2) until first
+attribute access. That way the app, tooling and the mock/health paths start
+without paying for them, or without them installed at all (an HTTP worker
+behind the inference server has no torch).
+"""
+
+import functools
+import importlib.util
+import inspect
+import logging
+import pickle
+import sys
+from pathlib import Path
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Aliases removed from NumPy that chumpy still imports
+_NUMPY_ALIASES = {
+    "bool": "bool_",
+    "int": "int_",
+    "float": "float64",
+    "complex": "complex128",
+    "object": "object_",
+    "unicode": "str_",
+    "str": "str_",
+}
+
+_applied = set()
+
+
+def lazy_import(name):
+    """Module object for name that is imported on first attribute access, or None if it is not installed."""
+    if name in sys.modules:
+        return sys.modules[name]
+    spec = importlib.util.find_spec(name)
+    if spec is None:
+        return None
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+    return module
+
+
+def apply_python_compat():
+    """getargspec and the NumPy aliases chumpy needs (no heavy imports)."""
+    if "python" in _applied:
+        return
+    _applied.add("python")
+    if not hasattr(inspect, "getargspec"):
+        inspect.getargspec = inspect.getfullargspec
+    for alias, target in _NUMPY_ALIASES.items():
+        # __dict__, not hasattr: probing removed aliases warns on NumPy 2
+        if alias not in np.__dict__ and target in np.__dict__:
+            setattr(np, alias, getattr(np, target))
+
+
+def apply_torch_compat():
+    """torch.load defaults to weights_only=False and reads Python 2 pickles as latin1."""
+    if "torch" in _applied:
+        return
+    _applied.add("torch")
+    import torch
+    import torch.serialization
+
+    original_legacy_load = torch.serialization._legacy_load
+
+    def patched_legacy_load(opened_file, map_location, pickle_module, **pickle_load_args):
+        original_pickle_load = pickle_module.load
+
+        def latin1_load(file, **kwargs):
+            kwargs.setdefault("encoding", "latin1")
+            return original_pickle_load(file, **kwargs)
+
+        pickle_module.load = latin1_load
+        try:
+            return original_legacy_load(opened_file, map_location, pickle_module, **pickle_load_args)
+        finally:
+            pickle_module.load = original_pickle_load
+
+    original_torch_load = torch.load
+
+    def patched_torch_load(*args, **kwargs):
+        kwargs.setdefault("weights_only", False)
+        return original_torch_load(*args, **kwargs)
+
+    torch.serialization._legacy_load = patched_legacy_load
+    torch.load = patched_torch_load
+
+
+def apply():
+    apply_python_compat()
+    apply_torch_compat()
+
+
+@functools.lru_cache(maxsize=1)
+def load_smpl_model_data():
+    """
+    Load the raw SMPL model dict from ~/.romp (cached).
+    Prefers the Python 3 converted file. Returns None if no file can be loaded.
+    """
+    romp_dir = Path.home() / ".romp"
+    smpl_file_py3 = romp_dir / "SMPL_NEUTRAL_py3.pth"
+    smpl_file = romp_dir / "SMPL_NEUTRAL.pth"
+
+    # Prefer Python 3 converted version
+    smpl_file_to_use = smpl_file_py3 if smpl_file_py3.exists() else smpl_file
+    if not smpl_file_to_use.exists():
+        return None
+
+    apply_python_compat()
+    try:
+        # Try pickle first (for Python 3 converted files), then torch.load
+        try:
+            with open(str(smpl_file_to_use), 'rb') as f:
+                return pickle.load(f, encoding='latin1')
+        except Exception:
+            apply_torch_compat()
+            import torch
+            return torch.load(str(smpl_file_to_use), map_location='cpu', weights_only=False)
+    except Exception as e:
+        logger.debug(f"Could not load SMPL file {smpl_file_to_use}: {e}")
+        return None
@@ -0,0 +1,2 @@
+# test_romp.py is a manual check against the installed ROMP models, not a pytest module
+collect_ignore = ["test_romp.py"]
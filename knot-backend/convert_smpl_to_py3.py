@@ -13,23 +13,12 @@ import sys
 import pickle
 import torch
 from pathlib import Path
-import inspect
-import numpy
+import numpy as np
 
-# Fix chumpy compatibility
-if not hasattr(inspect, 'getargspec'):
-    inspect.getargspec = inspect.getfullargspec
+import compat
 
-# Patch numpy for chumpy
-for attr in ['bool', 'int', 'float', 'complex', 'object', 'unicode', 'str']:
-    if not hasattr(numpy, attr):
-        mapping = {
-            'bool': 'bool_', 'int': 'int_', 'float': 'float_',
-            'complex': 'complex_', 'object': 'object_',
-            'unicode': 'str_', 'str': 'str_'
-        }
-        if mapping[attr] in dir(numpy):
-            setattr(numpy, attr, getattr(numpy, mapping[attr]))
+# chumpy needs these to unpickle the original SMPL file
+compat.apply()
 
 def convert_smpl_file():
     """Convert SMPL file from Python 2 to Python 3 format."""
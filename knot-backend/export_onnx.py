@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Export the ROMP network to ONNX for the ONNX Runtime CPU backend.
+
+Loads ROMP the same way the backend does, traces romp.model with the tensors
+ROMP's preprocessing produces, and checks ONNX Runtime against eager torch.
+
+Usage:
+    python export_onnx.py
+    python export_onnx.py --video scan.mp4 --output ~/.romp/ROMP_knot.onnx
+
+Then start the backend with KNOT_INFERENCE_BACKEND=onnx.
+"""
+
+import argparse
+import os
+import sys
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+
+def load_frames(video_path, count):
+    """Sample RGB frames evenly from a video file."""
+    cap = cv2.VideoCapture(str(video_path))
+    frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    frames = []
+    for ratio in np.linspace(0.2, 0.8, count):
+        cap.set(cv2.CAP_PROP_POS_FRAMES, int(frame_count * ratio))
+        success, frame = cap.read()
+        if success:
+            frames.append(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+    cap.release()
+    return frames
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export ROMP to ONNX")
+    parser.add_argument("--output", help="ONNX file (default: KNOT_ONNX_PATH or ~/.romp/ROMP_knot.onnx)")
+    parser.add_argument("--video", help="sample frames from this video instead of synthetic frames")
+    parser.add_argument("--frames", type=int, default=4)
+    parser.add_argument("--opset", type=int, default=17)
+    parser.add_argument("--tolerance", type=float, default=1e-3, help="max relative difference vs eager torch")
+    args = parser.parse_args()
+
+    # Export from the eager network, whatever the backend is configured to use
+    os.environ["KNOT_INFERENCE_BACKEND"] = "torch"
+    os.chdir(Path(__file__).resolve().parent)
+    sys.argv = sys.argv[:1]
+    import main as app_main
+    import onnx_backend
+    from synthetic_video import synthetic_frame
+
+    if app_main.romp is None:
+        print("❌ ROMP is not loaded (MOCK MODE). Install ROMP and the SMPL models first.")
+        return 1
+
+    if args.video:
+        frames = load_frames(args.video, args.frames)
+    else:
+        frames = [cv2.cvtColor(synthetic_frame(1280, 720, t=i / 10, seed=i), cv2.COLOR_BGR2RGB)
+                  for i in range(args.frames)]
+    if not frames:
+        print("❌ No frames to export with")
+        return 1
+
+    print(f"🔄 Exporting ROMP network with {len(frames)} frames...")
+    try:
+        metadata = onnx_backend.export_onnx(app_main.romp, frames, onnx_path=args.output,
+                                            opset=args.opset, tolerance=args.tolerance)
+    except Exception as e:
+        print(f"❌ Export failed: {e}")
+        return 1
+
+    parity = metadata["parity"]
+    print(f"✅ Exported: input {metadata['input_shape']}, outputs {metadata['output_names']}")
+    print(f"   max abs diff {parity['max_abs_diff']:.2e}, max rel diff {parity['max_rel_diff']:.2e}")
+    print("Next: start the backend with KNOT_INFERENCE_BACKEND=onnx")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,307 @@
+"""
+Cache of decoded, preprocessed frames, for re-processing the same video.
+
+Tuning the sampling ratios or the smoothing used to mean re-uploading the
+video and decoding every sampled frame again. With the cache on
+(KNOT_FRAME_CACHE_MB), each frame the pipeline decodes is kept after
+preprocessing (resized to MAX_FRAME_DIM, RGB). Entries are keyed by the
+SHA-256 of the video and the frame index. /process-scan returns that hash as
+video_id. /reprocess-scan, or a second upload of the same file, is then
+served from the cache and only pays for inference.
+
+Two tiers, both LRU:
+
+    memory   up to KNOT_FRAME_CACHE_MB of frames
+    spill    frames evicted from memory are written as .npy files under
+             KNOT_FRAME_CACHE_DIR and read back memory-mapped; the uploaded
+             videos are kept there too, so a reprocess with new sampling
+             ratios can decode frames that were never cached. Bounded by
+             KNOT_FRAME_CACHE_DISK_MB.
+
+The spill directory survives restarts (and can be shared by several
+workers), so changing ROMP settings such as center_thresh, which are applied
+when the model loads, does not cost a re-decode either.
+
+Environment:
+    KNOT_FRAME_CACHE_MB        in-memory budget; unset / 0 = cache disabled
+    KNOT_FRAME_CACHE_DIR       spill directory; unset = evicted frames are dropped
+    KNOT_FRAME_CACHE_DISK_MB   spill budget, frames + videos (default 2048)
+"""
+
+import hashlib
+import json
+import logging
+import os
+import shutil
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+import numpy as np
+
+import compat
+import metrics
+
+cv2 = compat.lazy_import("cv2")
+
+logger = logging.getLogger(__name__)
+
+HASH_CHUNK = 1 << 20
+SOURCE_SUFFIX = ".video"
+
+
+def file_digest(path):
+    """SHA-256 hex digest of a file (the video_id of an uploaded video)."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def copy_and_hash(src, dst):
+    """shutil.copyfileobj that also hashes what it copies; returns the SHA-256 hex digest."""
+    digest = hashlib.sha256()
+    for chunk in iter(lambda: src.read(HASH_CHUNK), b""):
+        digest.update(chunk)
+        dst.write(chunk)
+    return digest.hexdigest()
+
+
+def is_video_id(value):
+    return isinstance(value, str) and len(value) == 64 and all(c in "0123456789abcdef" for c in value)
+
+
+class FrameCache:
+    """
+    LRU of preprocessed frames keyed by (video_id, frame_idx), with an optional
+    memory-mapped disk tier. Thread-safe. Only the RGB frame is stored: the BGR
+    frame the pipeline also uses is a lossless channel swap of it.
+    """
+
+    def __init__(self, max_bytes, spill_dir=None, max_spill_bytes=2048 << 20):
+        self.max_bytes = int(max_bytes)
+        self.max_spill_bytes = int(max_spill_bytes)
+        self.spill_dir = Path(spill_dir).expanduser() if spill_dir else None
+        self._memory = OrderedDict()  # (video_id, frame_idx) -> read-only array
+        self._memory_bytes = 0
+        self._spill = OrderedDict()   # (video_id, frame_idx or None for the video) -> (path, bytes)
+        self._spill_bytes = 0
+        self._videos = {}             # video_id -> info (frame_count, width, height, filename)
+        self._lock = threading.Lock()
+        if self.spill_dir is not None:
+            self.spill_dir.mkdir(parents=True, exist_ok=True)
+            self._load_spill_index()
+
+    @classmethod
+    def from_env(cls):
+        """FrameCache from the KNOT_FRAME_CACHE_* settings, or None when disabled."""
+        megabytes = float(os.getenv("KNOT_FRAME_CACHE_MB", "0") or 0)
+        if megabytes <= 0:
+            return None
+        return cls(
+            max_bytes=megabytes * (1 << 20),
+            spill_dir=os.getenv("KNOT_FRAME_CACHE_DIR") or None,
+            max_spill_bytes=float(os.getenv("KNOT_FRAME_CACHE_DISK_MB", "2048")) * (1 << 20),
+        )
+
+    # Frames
+
+    def get(self, video_id, frame_idx):
+        """(frame, frame_rgb) as preprocess_frame returned them, or None on a miss."""
+        key = (video_id, int(frame_idx))
+        with self._lock:
+            stored = self._memory.get(key)
+            if stored is not None:
+                self._memory.move_to_end(key)
+                metrics.CACHE_HITS.inc(cache="frames")
+                return _unpack(stored)
+            spilled = self._spill.get(key)
+        if spilled is not None:
+            try:
+                # Memory-mapped: pages come from the page cache, no decode and no read() copy
+                stored = np.load(spilled[0], mmap_mode="r")
+            except (OSError, ValueError):
+                stored = None  # evicted by another worker sharing the directory
+            if stored is not None:
+                stored = self._insert(key, np.array(stored), spilled=True)
+                metrics.CACHE_HITS.inc(cache="frames_spill")
+                return _unpack(stored)
+            with self._lock:
+                self._drop_spilled(key, unlink=False)
+        metrics.CACHE_MISSES.inc(cache="frames")
+        return None
+
+    def put(self, video_id, frame_idx, frame, frame_rgb):
+        """Cache the preprocessed frame pair for (video_id, frame_idx)."""
+        stored = frame_rgb  # frame itself for non-BGR frames (see preprocess_frame)
+        if stored.nbytes > self.max_bytes:
+            return
+        self._insert((video_id, int(frame_idx)), np.array(stored), spilled=False)
+
+    def contains(self, video_id, frame_idx):
+        key = (video_id, int(frame_idx))
+        with self._lock:
+            return key in self._memory or key in self._spill
+
+    def _insert(self, key, array, spilled):
+        array.flags.writeable = False  # shared between requests
+        evicted = []
+        with self._lock:
+            previous = self._memory.pop(key, None)
+            if previous is not None:
+                self._memory_bytes -= previous.nbytes
+            self._memory[key] = array
+            self._memory_bytes += array.nbytes
+            while self._memory_bytes > self.max_bytes and len(self._memory) > 1:
+                old_key, old = self._memory.popitem(last=False)
+                self._memory_bytes -= old.nbytes
+                if old_key not in self._spill:
+                    evicted.append((old_key, old))
+            if spilled:
+                self._touch_spilled(key)
+            self._update_gauges()
+        if self.spill_dir is not None:
+            for old_key, old in evicted:
+                self._spill_frame(old_key, old)
+        return array
+
+    def _spill_frame(self, key, array):
+        path = self.spill_dir / f"{key[0]}-{key[1]}.npy"
+        tmp_path = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        try:
+            with open(tmp_path, "wb") as f:
+                np.save(f, array)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning(f"Could not spill frame {key[1]} of {key[0][:12]}: {e}")
+            tmp_path.unlink(missing_ok=True)
+            return
+        with self._lock:
+            self._add_spilled(key, path, array.nbytes)
+
+    # Videos
+
+    def add_video(self, video_id, path=None, **info):
+        """
+        Record a video's info (frame_count, width, height, filename) and, with a
+        spill directory, keep a copy of the file itself for frames that are not cached.
+        """
+        with self._lock:
+            self._videos[video_id] = info
+        if self.spill_dir is None:
+            return
+        info_path = self.spill_dir / f"{video_id}.json"
+        source = self.spill_dir / f"{video_id}{SOURCE_SUFFIX}"
+        try:
+            info_path.write_text(json.dumps(info))
+            if path is not None and not source.exists():
+                tmp_path = source.with_name(f".{source.name}.{os.getpid()}.tmp")
+                shutil.copyfile(path, tmp_path)
+                os.replace(tmp_path, source)
+                with self._lock:
+                    self._add_spilled((video_id, None), source, source.stat().st_size)
+            elif source.exists():
+                with self._lock:
+                    self._touch_spilled((video_id, None))
+        except OSError as e:
+            logger.warning(f"Could not keep video {video_id[:12]} in the frame cache: {e}")
+
+    def video(self, video_id):
+        """Info recorded by add_video, or None for an unknown video."""
+        with self._lock:
+            info = self._videos.get(video_id)
+        if info is None and self.spill_dir is not None:
+            try:
+                info = json.loads((self.spill_dir / f"{video_id}.json").read_text())
+            except (OSError, ValueError):
+                return None
+            with self._lock:
+                self._videos[video_id] = info
+        return info
+
+    def source_path(self, video_id):
+        """Path of the kept copy of the video, or None."""
+        if self.spill_dir is None:
+            return None
+        path = self.spill_dir / f"{video_id}{SOURCE_SUFFIX}"
+        return path if path.exists() else None
+
+    # Spill bookkeeping (callers hold the lock)
+
+    def _load_spill_index(self):
+        entries = []
+        for path in self.spill_dir.iterdir():
+            if path.name.startswith("."):
+                continue
+            if path.suffix == ".npy":
+                video_id, _, frame_idx = path.stem.rpartition("-")
+                if not (is_video_id(video_id) and frame_idx.isdigit()):
+                    continue
+                key = (video_id, int(frame_idx))
+            elif path.suffix == SOURCE_SUFFIX and is_video_id(path.stem):
+                key = (path.stem, None)
+            else:
+                continue
+            stat = path.stat()
+            entries.append((stat.st_mtime, key, path, stat.st_size))
+        for _, key, path, size in sorted(entries, key=lambda e: e[0]):
+            self._add_spilled(key, path, size)
+        if entries:
+            logger.info(f"Frame cache: {len(entries)} spilled entries ({self._spill_bytes / 1e6:.0f} MB) in {self.spill_dir}")
+
+    def _add_spilled(self, key, path, size):
+        previous = self._spill.pop(key, None)
+        if previous is not None:
+            self._spill_bytes -= previous[1]
+        self._spill[key] = (path, size)
+        self._spill_bytes += size
+        while self._spill_bytes > self.max_spill_bytes and len(self._spill) > 1:
+            old_key = next(iter(self._spill))
+            self._drop_spilled(old_key)
+        self._update_gauges()
+
+    def _touch_spilled(self, key):
+        entry = self._spill.get(key)
+        if entry is None:
+            return
+        self._spill.move_to_end(key)
+        try:
+            os.utime(entry[0])  # keeps the LRU order across restarts
+        except OSError:
+            pass
+
+    def _drop_spilled(self, key, unlink=True):
+        entry = self._spill.pop(key, None)
+        if entry is None:
+            return
+        self._spill_bytes -= entry[1]
+        if unlink:
+            entry[0].unlink(missing_ok=True)
+        if key[1] is None:
+            (self.spill_dir / f"{key[0]}.json").unlink(missing_ok=True)
+            self._videos.pop(key[0], None)
+        self._update_gauges()
+
+    def _update_gauges(self):
+        metrics.FRAME_CACHE_BYTES.set(self._memory_bytes, tier="memory")
+        metrics.FRAME_CACHE_BYTES.set(self._spill_bytes, tier="spill")
+
+    def status(self):
+        with self._lock:
+            return {
+                "memory_frames": len(self._memory),
+                "memory_mb": round(self._memory_bytes / (1 << 20), 1),
+                "max_memory_mb": round(self.max_bytes / (1 << 20), 1),
+                "spilled_entries": len(self._spill),
+                "spill_mb": round(self._spill_bytes / (1 << 20), 1),
+                "max_spill_mb": round(self.max_spill_bytes / (1 << 20), 1) if self.spill_dir else None,
+                "videos": len(self._videos),
+            }
+
+
+def _unpack(stored):
+    """(frame, frame_rgb) from a stored RGB frame (grayscale frames are stored as-is)."""
+    if stored.ndim == 3 and stored.shape[2] == 3:
+        return cv2.cvtColor(stored, cv2.COLOR_RGB2BGR), stored
+    return stored, stored
@@ -0,0 +1,569 @@
+#!/usr/bin/env python3
+"""
+Multi-process inference server with shared-memory frame transport.
+
+HTTP workers stay light (no ROMP/SMPL weights): they decode and preprocess
+frames, then hand them to N model processes through a
+multiprocessing.shared_memory block instead of pickling arrays. Memory per
+node then grows with the number of model processes, not with HTTP concurrency.
+
+    python inference_server.py --servers 2
+    KNOT_INFERENCE_SOCKET=/tmp/knot_inference.sock uvicorn main:app --workers 8
+
+Layout: one shared-memory block split into slots, each with an input area
+(the preprocessed RGB frame) and an output area (ROMP's output arrays). A
+frame holds a slot from "acquire" until "release"; only small JSON control
+messages (shapes, dtypes, offsets) travel over the Unix socket:
+
+    server -> client  {"shm", "slot_bytes", "input_bytes", "output_bytes", "servers", ...}   (on connect)
+    client -> server  {"op": "acquire"}                  -> {"ok": true, "slot": 3}
+    client -> server  {"op": "infer", "slot": 3, "shape": [...], "dtype": "|u1"}   (frame written first)
+    server -> client  {"ok": true, "layout": {...}}      (arrays in the slot's output area)
+    client -> server  {"op": "release", "slot": 3}       (no reply)
+
+Frames wait in one in-server queue; each model process has its own pipe and a
+feeder thread that sends it the next frame. Model processes that exit are
+respawned, and a frame that takes longer than KNOT_INFERENCE_TIMEOUT is failed
+(its process is terminated and respawned with a new pipe, so the others are
+unaffected).
+Either way the waiting client gets {"ok": false, "unavailable": true} and raises
+InferenceUnavailable, which fails the scan instead of counting as "no person".
+A client that cannot reach the server (down or restarting) raises it as well.
+
+Environment:
+    KNOT_INFERENCE_SOCKET    Unix socket path; set on HTTP workers to use the server
+    KNOT_SHM_SLOTS           concurrent in-flight frames (default 16)
+    KNOT_SHM_INPUT_BYTES     per-slot frame capacity (default: a square RGB frame at the largest
+                             profile resolution, profiles.MAX_INPUT_DIM)
+    KNOT_SHM_OUTPUT_BYTES    per-slot result capacity (default 4 MiB); only the output keys
+                             the HTTP side reads are shipped (output_keys())
+    KNOT_INFERENCE_TIMEOUT   seconds a frame may take in a model process (default 120)
+"""
+
+import argparse
+import json
+import logging
+import multiprocessing as mp
+import os
+import queue
+import signal
+import socket
+import socketserver
+import sys
+import threading
+import time
+from multiprocessing import resource_tracker, shared_memory
+
+import numpy as np
+
+import profiles
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SOCKET = "/tmp/knot_inference.sock"
+ALIGN = 64
+DEFAULT_INPUT_BYTES = profiles.MAX_INPUT_DIM * profiles.MAX_INPUT_DIM * 3
+
+
+class SlotCapacityError(ValueError):
+    """
+    A frame, or the outputs for it, larger than the server's per-slot input or
+    output area (KNOT_SHM_INPUT_BYTES / KNOT_SHM_OUTPUT_BYTES).
+    """
+
+
+class InferenceUnavailable(RuntimeError):
+    """The model process running a frame died or timed out, or the server is unreachable."""
+
+    # Seconds for HTTP clients to wait before retrying (a respawned process reloads ROMP)
+    retry_after = 10
+
+
+def _env_int(name, default):
+    return int(os.getenv(name, str(default)))
+
+
+def attach_shared_memory(name):
+    """Attach from an unrelated process without letting its resource tracker unlink the block."""
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)  # Python 3.13+
+    except TypeError:
+        shm = shared_memory.SharedMemory(name=name)
+        try:
+            resource_tracker.unregister(shm._name, "shared_memory")
+        except Exception:
+            pass
+        return shm
+
+
+def output_keys():
+    """
+    Top-level output keys the HTTP side reads: the detection (pipeline.RESULT_KEYS) and the
+    2D joints the person ROI tracks. Per-person extras (verts_camed, maps) stay in the model process.
+    """
+    # pipeline imports this module: resolve it at call time
+    import person_roi
+    import pipeline
+
+    return pipeline.RESULT_KEYS + (person_roi.JOINTS_2D_KEY,)
+
+
+def pack_outputs(outputs, buf, offset, capacity, keys=None):
+    """
+    Copy the arrays of a ROMP outputs dict into buf[offset:offset + capacity],
+    only its top-level keys in keys when given. Returns a JSON-able layout; plain
+    JSON values travel in the layout itself. SlotCapacityError if the arrays do not fit.
+    """
+    layout = {"arrays": [], "values": []}
+    if keys is not None:
+        outputs = {key: value for key, value in outputs.items() if key in keys}
+    cursor = 0
+
+    def visit(key, value):
+        nonlocal cursor
+        if isinstance(value, dict):
+            for k, v in value.items():
+                visit(key + [str(k)], v)
+            return
+        if hasattr(value, "detach"):
+            value = value.detach().cpu().numpy()
+        if isinstance(value, np.ndarray):
+            if value.dtype == object:
+                return
+            value = np.ascontiguousarray(value)
+            cursor = (cursor + ALIGN - 1) // ALIGN * ALIGN
+            if cursor + value.nbytes > capacity:
+                raise SlotCapacityError(f"Outputs exceed the inference server's slot capacity of {capacity} bytes "
+                                        f"at {'.'.join(key)}; raise KNOT_SHM_OUTPUT_BYTES on the server")
+            target = np.ndarray(value.shape, dtype=value.dtype, buffer=buf, offset=offset + cursor)
+            target[...] = value
+            layout["arrays"].append({"key": key, "dtype": value.dtype.str, "shape": list(value.shape), "offset": cursor})
+            cursor += value.nbytes
+            return
+        if isinstance(value, np.generic):
+            value = value.item()
+        try:
+            json.dumps(value)
+        except TypeError:
+            return
+        layout["values"].append({"key": key, "value": value})
+
+    visit([], outputs)
+    return layout
+
+
+def unpack_outputs(layout, buf, offset):
+    """Rebuild the outputs dict from a layout, copying arrays out of the slot."""
+    outputs = {}
+
+    def assign(key, value):
+        node = outputs
+        for part in key[:-1]:
+            node = node.setdefault(part, {})
+        node[key[-1]] = value
+
+    for item in layout["arrays"]:
+        view = np.ndarray(tuple(item["shape"]), dtype=np.dtype(item["dtype"]), buffer=buf, offset=offset + item["offset"])
+        assign(item["key"], view.copy())
+    for item in layout["values"]:
+        assign(item["key"], item["value"])
+    return outputs
+
+
+class SlotLayout:
+    """Offsets of each slot's input and output areas inside the shared block."""
+
+    def __init__(self, slots, input_bytes, output_bytes):
+        self.slots = slots
+        self.input_bytes = input_bytes
+        self.output_bytes = output_bytes
+        self.slot_bytes = input_bytes + output_bytes
+
+    @property
+    def total_bytes(self):
+        return self.slots * self.slot_bytes
+
+    def input_offset(self, slot):
+        return slot * self.slot_bytes
+
+    def output_offset(self, slot):
+        return slot * self.slot_bytes + self.input_bytes
+
+
+def _model_process(index, count, shm_name, layout, conn):
+    """
+    Model process: load ROMP once, then serve frames from shared memory. Jobs and
+    replies travel over conn, a pipe only this process and its feeder thread use.
+    """
+    # Split the node's cores across model processes, not HTTP workers
+    os.environ["KNOT_WORKERS"] = str(count)
+    logging.basicConfig(level=logging.INFO, format=f"[model {index}] %(levelname)s:%(name)s:%(message)s")
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+    import romp_loader
+    import torch_runtime
+
+    romp, _ = romp_loader.load_models()
+    keys = output_keys()
+    # Spawned children share the launcher's resource tracker, so attach normally
+    shm = shared_memory.SharedMemory(name=shm_name)
+    conn.send({
+        "loaded": romp is not None,
+        "inference_backend": romp_loader.INFERENCE_BACKEND,
+        "inference_precision": romp_loader.INFERENCE_PRECISION,
+    })
+
+    frame = None
+    try:
+        while True:
+            try:
+                job = conn.recv()
+            except EOFError:
+                break  # server gone
+            if job is None:
+                break
+            slot, header = job
+            try:
+                frame = np.ndarray(tuple(header["shape"]), dtype=np.dtype(header["dtype"]),
+                                   buffer=shm.buf, offset=layout.input_offset(slot))
+                with torch_runtime.inference_context():
+                    outputs = romp(frame)
+                if outputs is None:
+                    reply = {"ok": True, "none": True}
+                elif isinstance(outputs, dict):
+                    reply = {"ok": True, "layout": pack_outputs(
+                        outputs, shm.buf, layout.output_offset(slot), layout.output_bytes, keys=keys)}
+                else:
+                    reply = {"ok": False, "error": f"Unsupported outputs type {type(outputs).__name__}"}
+            except SlotCapacityError as e:
+                logger.error(str(e))
+                reply = {"ok": False, "capacity": True, "error": str(e)}
+            except Exception as e:
+                logger.exception("Inference failed")
+                reply = {"ok": False, "error": str(e)}
+            conn.send(reply)
+    finally:
+        frame = None  # release the buffer export before closing
+        shm.close()
+
+
+class InferenceServer:
+    """
+    Model processes behind a Unix socket. Each process has its own pipe and a feeder
+    thread in the server that hands it the next queued frame and waits for the reply.
+    A process that dies or overruns KNOT_INFERENCE_TIMEOUT is terminated and respawned
+    with a new pipe: nothing it shared with the other processes can be left corrupted.
+    """
+
+    def __init__(self, servers, socket_path=DEFAULT_SOCKET, slots=None, input_bytes=None, output_bytes=None,
+                 timeout=None):
+        self.servers = servers
+        self.socket_path = socket_path
+        self.timeout = timeout or float(os.getenv("KNOT_INFERENCE_TIMEOUT", "120"))
+        self.layout = SlotLayout(
+            slots or _env_int("KNOT_SHM_SLOTS", 16),
+            input_bytes or _env_int("KNOT_SHM_INPUT_BYTES", DEFAULT_INPUT_BYTES),
+            output_bytes or _env_int("KNOT_SHM_OUTPUT_BYTES", 4 * 1024 * 1024),
+        )
+        self.shm = None
+        self.procs = []
+        self.conns = []
+        self.model_info = {}
+        self._free_slots = queue.Queue()
+        self._pending = queue.Queue()  # (slot, header) waiting for a model process
+        self._replies = {}
+        self._events = {}
+        self._stopping = False
+
+    def _spawn(self, index):
+        """Start model process index with a fresh pipe; returns its info once the model is loaded."""
+        conn, child_conn = self.ctx.Pipe()
+        proc = self.ctx.Process(target=_model_process, name=f"knot-model-{index}",
+                                args=(index, self.servers, self.shm.name, self.layout, child_conn))
+        proc.start()
+        child_conn.close()  # only the child holds its end: recv() sees EOF when it dies
+        self.procs[index], self.conns[index] = proc, conn
+
+    def _ready(self, index):
+        """Info the model process sends after loading, or None if it exited first."""
+        try:
+            return self.conns[index].recv()
+        except (EOFError, OSError):
+            self.procs[index].join()
+            return None
+
+    def _kill(self, index):
+        """Terminate model process index and drop its pipe (no other process uses either)."""
+        proc = self.procs[index]
+        if proc.is_alive():
+            proc.terminate()
+        proc.join()
+        self.conns[index].close()
+
+    def _respawn(self, index):
+        """Replace a dead or killed model process, retrying until one comes up."""
+        while not self._stopping:
+            self._spawn(index)
+            info = self._ready(index)
+            if info is not None:
+                log = logger.info if info["loaded"] else logger.error
+                log(f"Model process {index} {'ready' if info['loaded'] else 'could not load ROMP'} after respawn")
+                return
+            logger.error(f"Model process {index} exited during startup (code {self.procs[index].exitcode})")
+            self.conns[index].close()
+            time.sleep(1.0)  # don't spin on a process that dies at startup
+
+    def start(self):
+        self.shm = shared_memory.SharedMemory(create=True, size=self.layout.total_bytes)
+        self.ctx = mp.get_context("spawn")
+        self.procs = [None] * self.servers
+        self.conns = [None] * self.servers
+        for index in range(self.servers):
+            self._spawn(index)
+
+        for index in range(self.servers):
+            info = self._ready(index)
+            if not info or not info["loaded"]:
+                raise RuntimeError(f"Model process {index} could not load ROMP")
+            self.model_info = info
+        logger.info(f"{self.servers} model process(es) ready ({self.model_info}); "
+                    f"{self.layout.slots} slots x {self.layout.slot_bytes // 1024} KiB in {self.shm.name}")
+
+        for slot in range(self.layout.slots):
+            self._free_slots.put(slot)
+            self._events[slot] = threading.Event()
+        for index in range(self.servers):
+            threading.Thread(target=self._feed, args=(index,), name=f"knot-feed-{index}", daemon=True).start()
+
+    def _feed(self, index):
+        """Feeder for model process index: one queued frame at a time, with the inference timeout."""
+        while True:
+            job = self._pending.get()
+            if job is None or self._stopping:
+                return
+            slot, header = job
+            if not self.procs[index].is_alive():
+                logger.error(f"Model process {index} exited (code {self.procs[index].exitcode}); respawning")
+                self._kill(index)
+                self._respawn(index)
+            conn = self.conns[index]
+            try:
+                conn.send((slot, {"shape": header["shape"], "dtype": header["dtype"]}))
+                if conn.poll(self.timeout):
+                    reply = conn.recv()
+                else:
+                    logger.error(f"Model process {index} exceeded {self.timeout:.0f}s; terminating it")
+                    reply = {"ok": False, "unavailable": True,
+                             "error": f"Inference did not finish within {self.timeout:.0f}s"}
+            except (EOFError, OSError):
+                logger.error(f"Model process {index} exited during inference; respawning")
+                reply = {"ok": False, "unavailable": True, "error": f"Model process {index} exited during inference"}
+            if reply.get("unavailable"):
+                # Terminated before the reply is sent, so the slot is no longer written to when it is freed
+                self._kill(index)
+            self._replies[slot] = reply
+            self._events[slot].set()
+            if reply.get("unavailable"):
+                self._respawn(index)
+
+    def infer(self, slot, header):
+        event = self._events[slot]
+        event.clear()
+        self._pending.put((slot, header))
+        event.wait()
+        return self._replies.pop(slot)
+
+    def release(self, slot):
+        self._free_slots.put(slot)
+
+    def hello(self):
+        return {
+            "shm": self.shm.name,
+            "slot_bytes": self.layout.slot_bytes,
+            "input_bytes": self.layout.input_bytes,
+            "output_bytes": self.layout.output_bytes,
+            "servers": self.servers,
+            **{k: v for k, v in self.model_info.items() if k != "loaded"},
+        }
+
+    def serve_forever(self):
+        server = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                held = set()
+                try:
+                    self._send(server.hello())
+                    for line in self.rfile:
+                        message = json.loads(line)
+                        op = message.get("op")
+                        if op == "acquire":
+                            slot = server._free_slots.get()
+                            held.add(slot)
+                            self._send({"ok": True, "slot": slot})
+                        elif op == "infer" and message.get("slot") in held:
+                            self._send(server.infer(message["slot"], message))
+                        elif op == "release" and message.get("slot") in held:
+                            held.discard(message["slot"])
+                            server.release(message["slot"])
+                        elif op == "ping":
+                            self._send({"ok": True})
+                        else:
+                            self._send({"ok": False, "error": f"invalid request {message}"})
+                except (ConnectionError, BrokenPipeError):
+                    pass
+                finally:
+                    for slot in held:
+                        server.release(slot)
+
+            def _send(self, message):
+                self.wfile.write(json.dumps(message).encode() + b"\n")
+                self.wfile.flush()
+
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+        socketserver.ThreadingUnixStreamServer.daemon_threads = True
+        with socketserver.ThreadingUnixStreamServer(self.socket_path, Handler) as unix_server:
+            logger.info(f"Inference server listening on {self.socket_path}")
+            try:
+                unix_server.serve_forever()
+            except KeyboardInterrupt:
+                pass
+
+    def shutdown(self):
+        self._stopping = True
+        for _ in self.procs:
+            self._pending.put(None)
+        for index, proc in enumerate(self.procs):
+            try:
+                self.conns[index].send(None)
+            except (OSError, AttributeError):
+                pass
+            proc.join(timeout=10)
+            if proc.is_alive():
+                proc.terminate()
+        if self.shm is not None:
+            self.shm.close()
+            self.shm.unlink()
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+
+
+class InferenceClient:
+    """
+    Callable stand-in for romp(frame) that runs the frame on the inference server.
+    Each thread keeps its own connection; slots are only held for one frame.
+    """
+
+    def __init__(self, socket_path=DEFAULT_SOCKET, timeout=300.0):
+        self.socket_path = socket_path
+        self.timeout = timeout
+        self._local = threading.local()
+        self._shm = {}
+        self._shm_lock = threading.Lock()
+
+    def _attach(self, name):
+        # One attachment per process, shared by all connections
+        with self._shm_lock:
+            if name not in self._shm:
+                self._shm[name] = attach_shared_memory(name)
+            return self._shm[name]
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.settimeout(self.timeout)
+            sock.connect(self.socket_path)
+            stream = sock.makefile("rwb")
+            hello = json.loads(stream.readline())
+            conn = {"sock": sock, "stream": stream, "hello": hello, "shm": self._attach(hello["shm"])}
+            self._local.conn = conn
+        return conn
+
+    def _request(self, conn, message, reply=True):
+        conn["stream"].write(json.dumps(message).encode() + b"\n")
+        conn["stream"].flush()
+        if not reply:
+            return None
+        line = conn["stream"].readline()
+        if not line:
+            raise ConnectionError("Inference server closed the connection")
+        return json.loads(line)
+
+    def close(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            self._local.conn = None
+            try:
+                conn["stream"].close()
+                conn["sock"].close()
+            except Exception:
+                pass
+
+    def info(self):
+        """Server description from the handshake (model processes, backend, precision)."""
+        return dict(self._connection()["hello"])
+
+    def _infer(self, conn, frame):
+        hello = conn["hello"]
+        if frame.nbytes > hello["input_bytes"]:
+            raise SlotCapacityError(f"Frame {'x'.join(map(str, frame.shape))} ({frame.nbytes} bytes) exceeds the "
+                                    f"inference server's slot capacity of {hello['input_bytes']} bytes; "
+                                    f"raise KNOT_SHM_INPUT_BYTES on the server")
+        slot = self._request(conn, {"op": "acquire"})["slot"]
+        try:
+            input_offset = slot * hello["slot_bytes"]
+            target = np.ndarray(frame.shape, dtype=frame.dtype, buffer=conn["shm"].buf, offset=input_offset)
+            target[...] = frame
+            del target
+            reply = self._request(conn, {"op": "infer", "slot": slot, "shape": list(frame.shape), "dtype": frame.dtype.str})
+            if reply.get("unavailable"):
+                raise InferenceUnavailable(f"Inference server error: {reply.get('error')}")
+            if reply.get("capacity"):
+                raise SlotCapacityError(reply.get("error"))
+            if not reply.get("ok"):
+                raise RuntimeError(f"Inference server error: {reply.get('error')}")
+            if reply.get("none"):
+                return None
+            return unpack_outputs(reply["layout"], conn["shm"].buf, input_offset + hello["input_bytes"])
+        finally:
+            self._request(conn, {"op": "release", "slot": slot}, reply=False)
+
+    def __call__(self, frame):
+        frame = np.ascontiguousarray(frame)
+        try:
+            return self._infer(self._connection(), frame)
+        except (ConnectionError, OSError):
+            # Server restarted: reconnect once
+            self.close()
+        try:
+            return self._infer(self._connection(), frame)
+        except (ConnectionError, OSError) as e:
+            self.close()
+            raise InferenceUnavailable(f"Inference server unreachable at {self.socket_path}: {e}") from e
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Shared-memory ROMP inference server")
+    parser.add_argument("--servers", type=int, default=1, help="number of model processes")
+    parser.add_argument("--socket", default=os.getenv("KNOT_INFERENCE_SOCKET", DEFAULT_SOCKET))
+    parser.add_argument("--slots", type=int, help="concurrent in-flight frames (default KNOT_SHM_SLOTS or 16)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    server = InferenceServer(args.servers, socket_path=args.socket, slots=args.slots)
+    signal.signal(signal.SIGTERM, lambda *_: (_ for _ in ()).throw(KeyboardInterrupt()))
+    try:
+        server.start()
+        server.serve_forever()
+    except RuntimeError as e:
+        logger.error(str(e))
+        return 1
+    finally:
+        server.shutdown()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,99 +1,41 @@
-from fastapi import FastAPI, UploadFile, File
+from fastapi import FastAPI, UploadFile, File, Form, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response
+from fastapi.concurrency import run_in_threadpool
+from typing import List
 from pathlib import Path
 import shutil
-import cv2
+import tempfile
+import time
 import numpy as np
 import logging
 import os
-import urllib.request
-import argparse
-import sys
-import zipfile
-import torch
 import functools
-import inspect
-import numpy as np
-import pickle
-import io
 import math
 
-# Fix chumpy compatibility with Python 3.13 and NumPy 1.26+
-# chumpy uses inspect.getargspec which was removed in Python 3.11+
-if not hasattr(inspect, 'getargspec'):
-    inspect.getargspec = inspect.getfullargspec
-
-# Fix chumpy's numpy imports (numpy.bool, numpy.int etc. removed in newer NumPy)
-# Patch numpy module before chumpy imports
-_original_numpy = np
-class NumpyCompat:
-    def __getattr__(self, name):
-        if name in ['bool', 'int', 'float', 'complex', 'object', 'unicode', 'str']:
-            # Map to new NumPy names
-            mapping = {
-                'bool': np.bool_,
-                'int': np.int_,
-                'float': np.float_,
-                'complex': np.complex_,
-                'object': np.object_,
-                'unicode': np.str_,
-                'str': np.str_
-            }
-            return mapping.get(name, getattr(_original_numpy, name))
-        return getattr(_original_numpy, name)
-    
-    def __getitem__(self, key):
-        return _original_numpy[key]
-
-# Patch numpy for chumpy compatibility (before ROMP imports chumpy)
-import sys
-if 'chumpy' not in sys.modules:
-    # Patch numpy attributes that chumpy expects
-    _numpy_attrs = {}
-    for attr in ['bool', 'int', 'float', 'complex', 'object', 'unicode', 'str']:
-        if not hasattr(np, attr):
-            mapping = {
-                'bool': 'bool_',
-                'int': 'int_',
-                'float': 'float_',
-                'complex': 'complex_',
-                'object': 'object_',
-                'unicode': 'str_',
-                'str': 'str_'
-            }
-            if mapping[attr] in dir(np):
-                setattr(np, attr, getattr(np, mapping[attr]))
-
-# Monkeypatch torch.load to default weights_only=False to support legacy pickles
-# This handles the "Weights only load failed" error in newer PyTorch versions
-# Also handle Python 2 pickles with latin1 encoding
-original_torch_load = torch.load
-# Patch torch.serialization._legacy_load to handle Python 2 pickles
-import torch.serialization
-_original_legacy_load = torch.serialization._legacy_load
-def patched_legacy_load(opened_file, map_location, pickle_module, **pickle_load_args):
-    # For Python 2 pickles, we need to use encoding='latin1'
-    # Python 3.11's pickle.load supports encoding parameter
-    _original_pickle_load = pickle_module.load
-    def patched_pickle_module_load(file, **kwargs):
-        # Use encoding='latin1' for Python 2 pickles
-        if 'encoding' not in kwargs:
-            kwargs['encoding'] = 'latin1'
-        return _original_pickle_load(file, **kwargs)
-    pickle_module.load = patched_pickle_module_load
-    try:
-        result = _original_legacy_load(opened_file, map_location, pickle_module, **pickle_load_args)
-        return result
-    finally:
-        pickle_module.load = _original_pickle_load
-torch.serialization._legacy_load = patched_legacy_load
+import compat
+from compat import load_smpl_model_data
+import romp_loader
+import provisioning
+from measurements import compute_measurements
+from mock_body import MockBody
+import stage_timing
+import pipeline
+import smpl_lod
+import metrics
+import profiling
+import scan_store
+import admission
+import frame_cache
+from inference_server import InferenceUnavailable
+import person_roi
+import probe
+import profiles
+import torch_runtime
 
-def patched_torch_load(*args, **kwargs):
-    if 'weights_only' not in kwargs:
-        kwargs['weights_only'] = False
-    return original_torch_load(*args, **kwargs)
-torch.load = patched_torch_load
+# Heavy modules load on first use, so the mock / health paths start without them
+cv2 = compat.lazy_import("cv2")
+smpl_lbs = compat.lazy_import("smpl_lbs")
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -113,351 +55,100 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing"],
 )
 
-# Initialize models - support both ROMP and BEV
-romp = None
-bev = None
-USE_BEV = os.getenv("USE_BEV", "false").lower() == "true"  # Set USE_BEV=true to use BEV
-
-def check_and_download_models():
-    """Download and extract ROMP/SMPL model data from the master zip."""
-    home_dir = Path.home()
-    romp_dir = home_dir / ".romp"
-    romp_dir.mkdir(parents=True, exist_ok=True)
-    
-    # We will verify just one key file to see if we need to download
-    # Usually ROMP.pkl or SMPL_NEUTRAL.pth
-    key_file = romp_dir / "ROMP.pkl"
-    smpl_file = romp_dir / "SMPL_NEUTRAL.pth"
-    
-    if key_file.exists() and smpl_file.exists():
-        logger.info("ROMP models appear to be present.")
-        return True
+# Feed per-request stage timings into the /metrics histograms
+stage_timing.add_listener(metrics.observe_timings)
 
-    logger.info("ROMP models missing. Downloading smpl_model_data.zip...")
-    
-    # URL found in ROMP repo README
-    zip_url = "https://github.com/Arthur151/ROMP/releases/download/V2.0/smpl_model_data.zip"
-    zip_path = romp_dir / "smpl_model_data.zip"
-    
-    try:
-        # Download
-        urllib.request.urlretrieve(zip_url, zip_path)
-        logger.info("Download complete. Extracting...")
-        
-        # Extract
-        with zipfile.ZipFile(zip_path, 'r') as zip_ref:
-            zip_ref.extractall(romp_dir)
-            
-        logger.info("Extraction complete.")
-        
-        # Move files from subdirectory if needed
-        # The zip usually contains a folder "smpl_model_data"
-        extracted_folder = romp_dir / "smpl_model_data"
-        if extracted_folder.exists():
-            for file in extracted_folder.iterdir():
-                # Move to .romp root where simple_romp expects them
-                dest = romp_dir / file.name
-                if not dest.exists():
-                    shutil.move(str(file), str(dest))
-            # Cleanup
-            shutil.rmtree(extracted_folder)
-            
-        # Cleanup zip
-        if zip_path.exists():
-            zip_path.unlink()
-            
-        return True
-    except Exception as e:
-        logger.error(f"Failed to download/extract models: {e}")
-        return False
+@app.middleware("http")
+async def add_server_timing(request: Request, call_next):
+    """Expose the stage timings recorded by the handler as a Server-Timing header."""
+    response = await call_next(request)
+    timings = getattr(request.state, "timings", None)
+    if timings is not None:
+        response.headers["Server-Timing"] = metrics.server_timing_header(timings)
+    return response
 
-# Try to initialize BEV first if requested, otherwise use ROMP
-if USE_BEV:
-    logger.info("Attempting to initialize BEV (Body Estimation in the Wild)...")
-    try:
-        # BEV installation would be: pip install git+https://github.com/Arthur151/BEV.git
-        # For now, we'll try to import it
-        import bev
-        # BEV initialization (adjust based on actual BEV API)
-        # bev_model = bev.BEV()  # This will need to be adjusted based on actual API
-        logger.info("BEV model initialized successfully.")
-        # bev = bev_model  # Uncomment when BEV is properly installed
-    except ImportError:
-        logger.warning("BEV not available. Falling back to ROMP.")
-        USE_BEV = False
-    except Exception as e:
-        logger.warning(f"Failed to initialize BEV: {e}. Falling back to ROMP.")
-        USE_BEV = False
+@app.middleware("http")
+async def profile_sampled_requests(request: Request, call_next):
+    """Mark sampled (or ?profile=1 admin) requests; run_admitted profiles their scan work."""
+    request.state.profile = profiling.wants_profile(request, SCAN_PATHS)
+    return await call_next(request)
 
-# Initialize ROMP (either as primary or fallback)
-if not USE_BEV:
+# Initialize models - support both ROMP and BEV
+INFERENCE_SOCKET = os.getenv("KNOT_INFERENCE_SOCKET", "")
+if INFERENCE_SOCKET:
+    # Model runs in inference_server.py processes; this worker only decodes and post-processes
+    from inference_server import InferenceClient
+    romp, bev = InferenceClient(INFERENCE_SOCKET), None
+    USE_BEV = False
+    INFERENCE_SERVERS = 1
     try:
-        # Ensure models exist
-        check_and_download_models()
-
-        # Prevent argparse conflict by modifying sys.argv BEFORE import
-        original_argv = sys.argv
-        sys.argv = [sys.argv[0]]
-        
-        try:
-            # Import ROMP - torch.load monkeypatch is already applied at top of file
-            import romp as simple_romp
-            
-            # Re-mock argv
-            sys.argv = [sys.argv[0]]
-            
-            if hasattr(simple_romp, 'romp_settings'):
-                settings = simple_romp.romp_settings()
-            else:
-                settings = argparse.Namespace()
-                settings.mode = 'video'
-                settings.calc_smpl = True
-                settings.render_mesh = False
-                settings.show_largest = True
-                settings.save_video = False
-                settings.show = False
-            
-            # Set SMPL model path - ALWAYS prefer Python 3 converted version
-            # (has extra_joints_index and works with Python 3.11)
-            home_dir = Path.home()
-            romp_dir = home_dir / ".romp"
-            smpl_path_py3 = romp_dir / "SMPL_NEUTRAL_py3.pth"
-            smpl_path = romp_dir / "SMPL_NEUTRAL.pth"
-            
-            # Always set smpl_path explicitly to use converted version
-            if smpl_path_py3.exists():
-                settings.smpl_path = str(smpl_path_py3)
-                logger.info(f"✅ Using Python 3 converted SMPL model at: {smpl_path_py3}")
-            elif smpl_path.exists():
-                settings.smpl_path = str(smpl_path)
-                logger.warning(f"⚠️  Using original SMPL model at: {smpl_path} (may have encoding issues)")
-            else:
-                logger.warning(f"❌ SMPL model not found at: {smpl_path} or {smpl_path_py3}")
-            
-            # Optimize ROMP settings for better accuracy (based on ROMP best practices)
-            # Reference: https://www.12-technology.com/2022/01/romp-ai3d.html
-            # Lower center_thresh = detect more people (but may have false positives)
-            # Make it more sensitive to detect bodies in various conditions
-            if hasattr(settings, 'center_thresh'):
-                settings.center_thresh = 0.15  # Lowered from 0.25 to 0.15 for better detection
-            # Temporal smoothing coefficient (higher = more smoothing across frames)
-            # This is critical for video processing to reduce jitter
-            if hasattr(settings, 'smooth_coeff'):
-                settings.smooth_coeff = 5.0  # Increased for better temporal stability
-            # Enable SMPL calculation
-            if hasattr(settings, 'calc_smpl'):
-                settings.calc_smpl = True
-            # Additional settings for video processing
-            if hasattr(settings, 'mode'):
-                settings.mode = 'video'  # Explicitly set video mode
-            if hasattr(settings, 'temporal_optimization'):
-                settings.temporal_optimization = True  # Enable temporal optimization if available
-            
-            # Before initializing ROMP, patch SMPL model loading to convert numpy arrays to torch tensors
-            # This fixes the "cannot assign 'numpy.ndarray' object to buffer" error
-            original_smpl_init = None
-            if hasattr(simple_romp, 'smpl') and hasattr(simple_romp.smpl, 'SMPL'):
-                original_smpl_init = simple_romp.smpl.SMPL.__init__
-                
-                def patched_smpl_init(self, model_path, model_type='smpl', dtype=torch.float32):
-                    """Patched SMPL.__init__ that converts numpy arrays to torch tensors"""
-                    import torch.nn as nn
-                    super(simple_romp.smpl.SMPL, self).__init__()
-                    self.dtype = dtype
-                    
-                    # Try to load as pickle first (for Python 3 converted files)
-                    # If that fails, use torch.load
-                    model_info = None
-                    try:
-                        import pickle
-                        with open(model_path, 'rb') as f:
-                            model_info = pickle.load(f, encoding='latin1')
-                        logger.debug(f"Loaded {model_path} as pickle file")
-                    except:
-                        # Fall back to torch.load
-                        model_info = torch.load(model_path, map_location='cpu', weights_only=False)
-                        logger.debug(f"Loaded {model_path} as torch file")
-                    
-                    # Convert all numpy arrays, chumpy objects, and scipy sparse matrices to torch tensors
-                    converted_info = {}
-                    for key, value in model_info.items():
-                        if isinstance(value, np.ndarray):
-                            converted_info[key] = torch.from_numpy(value).to(dtype)
-                            logger.debug(f"Converted {key} from numpy to torch tensor")
-                        elif isinstance(value, torch.Tensor):
-                            converted_info[key] = value.to(dtype)
-                        elif hasattr(value, 'todense'):  # scipy sparse matrix
-                            # Convert sparse matrix to dense numpy, then to torch
-                            try:
-                                np_value = np.array(value.todense())
-                                converted_info[key] = torch.from_numpy(np_value).to(dtype)
-                                logger.debug(f"Converted {key} from scipy sparse to torch tensor")
-                            except:
-                                logger.warning(f"Could not convert {key} from scipy sparse, keeping original")
-                                converted_info[key] = value
-                        elif hasattr(value, 'r'):  # chumpy object has .r attribute
-                            # Convert chumpy object to numpy, then to torch
-                            try:
-                                np_value = np.array(value.r)
-                                converted_info[key] = torch.from_numpy(np_value).to(dtype)
-                                logger.debug(f"Converted {key} from chumpy to torch tensor")
-                            except:
-                                logger.warning(f"Could not convert {key} from chumpy, keeping original")
-                                converted_info[key] = value
-                        else:
-                            converted_info[key] = value
-                    
-                    # Now use converted_info instead of model_info
-                    model_info = converted_info
-                    
-                    # Rest of the original __init__ logic
-                    # Ensure extra_joints_index is long/int type for indexing
-                    extra_joints_idx = model_info['extra_joints_index']
-                    if isinstance(extra_joints_idx, torch.Tensor):
-                        if extra_joints_idx.dtype != torch.long and extra_joints_idx.dtype != torch.int32 and extra_joints_idx.dtype != torch.int64:
-                            logger.info(f"Converting extra_joints_index from {extra_joints_idx.dtype} to long")
-                            extra_joints_idx = extra_joints_idx.long()
-                    
-                    # Ensure J_regressor tensors are float type
-                    J_regressor_extra9 = model_info['J_regressor_extra9']
-                    if isinstance(J_regressor_extra9, torch.Tensor) and J_regressor_extra9.dtype != dtype:
-                        J_regressor_extra9 = J_regressor_extra9.to(dtype)
-                    
-                    J_regressor_h36m17 = model_info['J_regressor_h36m17']
-                    if isinstance(J_regressor_h36m17, torch.Tensor) and J_regressor_h36m17.dtype != dtype:
-                        J_regressor_h36m17 = J_regressor_h36m17.to(dtype)
-                    
-                    self.vertex_joint_selector = simple_romp.smpl.VertexJointSelector(
-                        extra_joints_idx,
-                        J_regressor_extra9,
-                        J_regressor_h36m17,
-                        dtype=self.dtype
-                    )
-                    self.register_buffer('faces_tensor', model_info['f'])
-                    self.register_buffer('v_template', model_info['v_template'])
-                    
-                    # ROMP expects only top 10 PCA components of shapedirs
-                    # If shapedirs has more than 10 dimensions, take only first 10
-                    if model_type == 'smpl':
-                        shapedirs = model_info['shapedirs']
-                        if isinstance(shapedirs, torch.Tensor):
-                            # shapedirs shape: [6890, 3, num_components]
-                            # ROMP expects: [6890, 3, 10]
-                            if shapedirs.shape[2] > 10:
-                                logger.info(f"Truncating shapedirs from {shapedirs.shape[2]} to 10 components")
-                                shapedirs = shapedirs[:, :, :10]
-                        self.register_buffer('shapedirs', shapedirs)
-                    elif model_type == 'smpla':
-                        self.register_buffer('shapedirs', model_info['smpla_shapedirs'])
-                    
-                    self.register_buffer('J_regressor', model_info['J_regressor'])
-                    
-                    # ROMP expects posedirs in shape [207, 6890*3]
-                    # Original SMPL has shape [6890, 3, 207]
-                    # Need to reshape: [6890, 3, 207] -> [207, 6890*3]
-                    posedirs = model_info['posedirs']
-                    if isinstance(posedirs, torch.Tensor):
-                        if len(posedirs.shape) == 3 and posedirs.shape[2] == 207:
-                            # Shape: [6890, 3, 207] -> [207, 6890*3]
-                            logger.info(f"Reshaping posedirs from {posedirs.shape} to [207, {6890*3}]")
-                            posedirs = posedirs.reshape(-1, 207).T  # [6890*3, 207] -> [207, 6890*3]
-                        elif len(posedirs.shape) == 2 and posedirs.shape[0] != 207:
-                            # If already 2D but wrong shape, try to fix
-                            if posedirs.shape[1] == 207:
-                                posedirs = posedirs.T
-                            elif posedirs.shape[0] == 207:
-                                pass  # Already correct
-                            else:
-                                logger.warning(f"Unexpected posedirs shape: {posedirs.shape}, attempting reshape")
-                    self.register_buffer('posedirs', posedirs)
-                    
-                    # kintree_table (parents) must be long/int type for indexing
-                    # ROMP expects shape [2, 24] where first row is parents, second row is children
-                    # Original SMPL has shape [2, 24] but may need adjustment
-                    parents = model_info['kintree_table']
-                    if isinstance(parents, torch.Tensor):
-                        # Ensure correct shape: [2, 24]
-                        if len(parents.shape) == 2:
-                            if parents.shape[1] == 23:
-                                # Pad to 24 if needed (add root joint)
-                                logger.info(f"Padding kintree_table from {parents.shape} to [2, 24]")
-                                padded = torch.zeros(2, 24, dtype=parents.dtype)
-                                padded[:, :23] = parents
-                                padded[0, 23] = -1  # Root joint has no parent
-                                parents = padded
-                            elif parents.shape[1] != 24:
-                                logger.warning(f"Unexpected kintree_table shape: {parents.shape}, expected [2, 24]")
-                        # Convert to long for indexing
-                        if parents.dtype != torch.long and parents.dtype != torch.int32 and parents.dtype != torch.int64:
-                            logger.info(f"Converting parents from {parents.dtype} to long")
-                            parents = parents.long()
-                        # Extract first row (parent indices) for ROMP
-                        parents = parents[0] if len(parents.shape) == 2 else parents
-                    self.register_buffer('parents', parents)
-                    
-                    self.register_buffer('lbs_weights', model_info['weights'])
-                
-                # Apply the patch
-                simple_romp.smpl.SMPL.__init__ = patched_smpl_init
-                logger.info("Applied SMPL initialization patch to convert numpy arrays to torch tensors")
-            
-            # Instantiate ROMP
-            romp = simple_romp.ROMP(settings)
-            logger.info("ROMP model initialized successfully.")
-            
-        except ImportError:
-            logger.error("Could not import 'romp' package. Check installation.")
-        except Exception as e:
-            logger.error(f"Error initializing ROMP: {e}")
-            logger.exception("Traceback:")
-        finally:
-            sys.argv = original_argv
+        server_info = romp.info()
+        romp.close()
+        INFERENCE_BACKEND = server_info.get("inference_backend", "remote")
+        INFERENCE_PRECISION = server_info.get("inference_precision", "fp32")
+        INFERENCE_SERVERS = int(server_info.get("servers", 1))
+        logger.info(f"Using inference server at {INFERENCE_SOCKET} ({server_info['servers']} model process(es))")
+    except OSError as e:
+        INFERENCE_BACKEND, INFERENCE_PRECISION = "remote", "fp32"
+        logger.warning(f"Inference server not reachable at {INFERENCE_SOCKET} ({e}); will retry per request")
+else:
+    romp, bev = romp_loader.load_models()
+    USE_BEV = romp_loader.USE_BEV
+    INFERENCE_BACKEND = romp_loader.INFERENCE_BACKEND
+    INFERENCE_PRECISION = romp_loader.INFERENCE_PRECISION
+    INFERENCE_SERVERS = 1
+# Precisions a profile can pick per request (the model processes behind the inference server run their own)
+AVAILABLE_PRECISIONS = [INFERENCE_PRECISION] if INFERENCE_SOCKET else romp_loader.AVAILABLE_PRECISIONS
 
-    except Exception as e:
-        logger.error(f"Failed to setup ROMP: {e}")
+@functools.lru_cache(maxsize=1)
+def load_smpl_faces():
+    """
+    SMPL faces from the plain copy provisioning.py writes, or None. Workers behind the
+    inference server only use this copy: the SMPL file is torch-saved, and loading it
+    would import torch.
+    """
+    path = provisioning.smpl_faces_path()
+    if not path.exists():
+        return None
+    try:
+        return np.load(path)
+    except (OSError, ValueError) as e:
+        logger.warning(f"Could not read {path}: {e}")
+        return None
 
 def get_smpl_faces_template():
     """
     Get standard SMPL face template (13776 faces for 6890 vertices).
     This is a fallback when faces can't be extracted from the model.
-    In production, load this from the SMPL model file.
+    Read from the provisioned faces copy, else from the SMPL model file.
     """
+    faces = load_smpl_faces()
+    if faces is not None:
+        return faces.tolist()
+    if INFERENCE_SOCKET:
+        logger.warning("No SMPL faces copy; run provisioning.py so inference-server workers can send faces")
+        return None
     try:
-        # Try to load from SMPL model if available
-        home_dir = Path.home()
-        romp_dir = home_dir / ".romp"
-        smpl_file_py3 = romp_dir / "SMPL_NEUTRAL_py3.pth"
-        smpl_file = romp_dir / "SMPL_NEUTRAL.pth"
-        
-        # Prefer Python 3 converted version
-        smpl_file_to_use = smpl_file_py3 if smpl_file_py3.exists() else smpl_file
-        
-        if smpl_file_to_use.exists():
-            try:
-                # Try pickle first (for Python 3 converted files), then torch.load
-                try:
-                    import pickle
-                    with open(str(smpl_file_to_use), 'rb') as f:
-                        smpl_data = pickle.load(f, encoding='latin1')
-                except:
-                    smpl_data = torch.load(str(smpl_file_to_use), map_location='cpu', weights_only=False)
-                # SMPL model structure varies, try common keys
-                if 'faces' in smpl_data:
-                    faces = smpl_data['faces']
-                    if hasattr(faces, 'numpy'):
-                        return faces.numpy().tolist()
-                    elif isinstance(faces, np.ndarray):
-                        return faces.tolist()
-                elif 'f' in smpl_data:
-                    faces = smpl_data['f']
-                    if hasattr(faces, 'numpy'):
-                        return faces.numpy().tolist()
-                    elif isinstance(faces, np.ndarray):
-                        return faces.tolist()
-            except Exception as e:
-                logger.debug(f"Could not load faces from SMPL file: {e}")
+        if load_smpl_model_data.cache_info().currsize:
+            metrics.CACHE_HITS.inc(cache="smpl_model")
+        smpl_data = load_smpl_model_data()
+        if smpl_data is not None:
+            # SMPL model structure varies, try common keys
+            if 'faces' in smpl_data:
+                faces = smpl_data['faces']
+                if hasattr(faces, 'numpy'):
+                    return faces.numpy().tolist()
+                elif isinstance(faces, np.ndarray):
+                    return faces.tolist()
+            elif 'f' in smpl_data:
+                faces = smpl_data['f']
+                if hasattr(faces, 'numpy'):
+                    return faces.numpy().tolist()
+                elif isinstance(faces, np.ndarray):
+                    return faces.tolist()
         
         # If we can't load from file, return None (frontend will generate)
         return None
@@ -465,10 +156,149 @@ def get_smpl_faces_template():
         logger.debug(f"Error in get_smpl_faces_template: {e}")
         return None
 
-def normalize_mesh(vertices):
+# MOCK MODE body: built once, copied per request
+_mock_body = None
+
+def get_mock_body():
+    """Return the precomputed mock body, building it on first use."""
+    global _mock_body
+    if _mock_body is None:
+        _mock_body = MockBody(load_smpl_model_data())
+    else:
+        metrics.CACHE_HITS.inc(cache="mock_body")
+    return _mock_body
+
+if romp is None and bev is None:
+    get_mock_body()
+
+# Take girths from the observed pose, or re-skin the SMPL betas into a canonical pose (t / a)
+MEASUREMENT_POSE = os.getenv("KNOT_MEASUREMENT_POSE", "observed").lower()
+
+@functools.lru_cache(maxsize=1)
+def get_lbs_model():
+    """Batched SMPL skinning engine built from the SMPL model file (None if unavailable)."""
+    smpl_data = load_smpl_model_data()
+    if smpl_data is None:
+        return None
+    try:
+        return smpl_lbs.SMPLModel.from_model_data(smpl_data)
+    except Exception as e:
+        logger.warning(f"Could not build SMPL skinning model: {e}")
+        return None
+
+# Mesh level of detail returned by process_scan: full / medium / low (per request via the lod form field)
+MESH_LOD = os.getenv("KNOT_MESH_LOD", "full").lower()
+FRAME_MESH_LOD = os.getenv("KNOT_FRAME_MESH_LOD", MESH_LOD).lower()
+
+@functools.lru_cache(maxsize=1)
+def get_smpl_lod():
+    """
+    Decimated SMPL topologies, loaded on the first request for a reduced LOD (built
+    ahead of time by provisioning.py; a cold cache is built here once, except behind
+    the inference server, where building would torch-load the SMPL file).
+    """
+    try:
+        faces = load_smpl_faces()
+        lods = smpl_lod.SMPLLod.load(faces) if faces is not None else None
+        if lods is None and INFERENCE_SOCKET:
+            logger.warning("No mesh LOD cache; run provisioning.py. Serving full meshes")
+        elif lods is None:
+            lods = provisioning.build_mesh_lods()
+        return lods
+    except Exception as e:
+        logger.warning(f"Could not build mesh LODs, serving full meshes: {e}")
+        return None
+
+def lod_mesh(lod, num_vertices):
+    """(index_map, faces) for a mesh with num_vertices at lod; (None, None) when it stays full."""
+    if lod == "full":
+        return None, None
+    lods = get_smpl_lod()
+    if lods is None:
+        return None, None
+    index_map = lods.index_map(lod, num_vertices)
+    return (index_map, lods.faces[lod]) if index_map is not None else (None, None)
+
+# Persistent store of scan params + measurements (KNOT_SCAN_STORE; None = disabled)
+SCAN_STORE = scan_store.ScanStore.from_env()
+if SCAN_STORE is not None:
+    logger.info(f"Scan store: {SCAN_STORE.path}")
+
+# Admission control / load shedding for the scan endpoints (KNOT_ADMISSION; None = disabled)
+ADMISSION = admission.AdmissionController.from_env(default_concurrency=INFERENCE_SERVERS)
+if ADMISSION is not None:
+    logger.info(f"Admission control: {ADMISSION.max_concurrent} concurrent scan(s), queue limits {ADMISSION.queue_limits}")
+
+# Decoded-frame cache for re-processing uploaded videos (KNOT_FRAME_CACHE_MB; None = disabled)
+FRAME_CACHE = frame_cache.FrameCache.from_env()
+if FRAME_CACHE is not None:
+    logger.info(f"Frame cache: {FRAME_CACHE.max_bytes >> 20} MB in memory, spill to {FRAME_CACHE.spill_dir or '(none)'}")
+
+SCAN_PATHS = ("/process-scan", "/process-photos", "/reprocess-scan")
+
+def scan_priority(request):
+    return request.headers.get(admission.PRIORITY_HEADER, admission.DEFAULT_PRIORITY).lower()
+
+def overloaded_response(e):
+    return JSONResponse({"error": f"Server busy: {e.reason}", "retry_after": e.retry_after},
+                        status_code=e.status_code, headers={"Retry-After": str(e.retry_after)})
+
+def unavailable_response(e):
+    logger.error(str(e))
+    return JSONResponse({"error": str(e), "retry_after": e.retry_after},
+                        status_code=503, headers={"Retry-After": str(e.retry_after)})
+
+@app.middleware("http")
+async def shed_scan_load(request: Request, call_next):
+    """Reject scan uploads before their body is read when the admission queue is saturated."""
+    if ADMISSION is not None and request.method == "POST" and request.url.path in SCAN_PATHS:
+        priority = scan_priority(request)
+        rejection = ADMISSION.precheck(priority) if priority in admission.PRIORITIES else None
+        if rejection is not None:
+            return overloaded_response(rejection)
+    return await call_next(request)
+
+@app.middleware("http")
+async def reject_oversize_upload(request: Request, call_next):
+    """Reject scan uploads whose Content-Length is over the upload limit before their body is read."""
+    if request.method == "POST" and request.url.path in SCAN_PATHS:
+        length = request.headers.get("content-length")
+        if length is not None and length.isdigit() and int(length) > probe.MAX_UPLOAD_BYTES:
+            return JSONResponse({"error": f"Upload is larger than {probe.MAX_UPLOAD_BYTES / (1 << 20):.4g} MB"}, status_code=413)
+    return await call_next(request)
+
+async def run_admitted(request, work, timings, fn, *args):
+    """
+    fn(*args) in the threadpool, once admitted when admission control is on: scans never
+    block the event loop (/metrics, health checks). Profiled requests run fn under the
+    profiler in the thread that executes it (cProfile is per-thread).
+    """
+    if getattr(request.state, "profile", False):
+        fn = profiling.profiled(fn, request.url.path)
+    if ADMISSION is None:
+        return await run_in_threadpool(fn, *args)
+    with timings.stage("admission"):
+        await ADMISSION.acquire(work, scan_priority(request))
+    start = time.perf_counter()
+    try:
+        return await run_in_threadpool(fn, *args)
+    finally:
+        ADMISSION.release(work, time.perf_counter() - start)
+
+def canonical_measurements(params, pose):
+    """Measurements of the scanned body shape (betas) re-skinned into a canonical pose."""
+    model = get_lbs_model()
+    betas = params.get('betas') if isinstance(params, dict) else None
+    if model is None or betas is None:
+        return None
+    vertices = model.canonical(pipeline.to_numpy(betas), pose=pose)[0]
+    return compute_measurements(vertices, assumed_height_cm=170.0)
+
+def normalize_mesh(vertices, index_map=None):
     """
     Normalize mesh vertices to center and scale appropriately.
     This helps with visualization consistency.
+    index_map gathers a LOD subset after normalizing, so every LOD shares the full mesh's frame.
     """
     # Handle numpy arrays properly - check length first
     if vertices is None:
@@ -505,6 +335,9 @@ def normalize_mesh(vertices):
     if max_dim > 0:
         scale = 2.0 / max_dim
         verts_centered = verts_centered * scale
+
+    if index_map is not None:
+        verts_centered = verts_centered[index_map]
     
     # Return as list for JSON serialization
     return verts_centered.tolist()
@@ -514,348 +347,278 @@ async def root():
     return {"message": "Knot Fashion backend is running"}
 
 
-@app.post("/process-scan")
-async def process_scan(video: UploadFile = File(...)):
-    tmp_path = Path("/tmp/knot_input.mp4")
-    tmp_path.parent.mkdir(parents=True, exist_ok=True)
+@app.get("/metrics")
+async def get_metrics():
+    """Prometheus text exposition of stage histograms and pipeline counters."""
+    return Response(metrics.REGISTRY.render(), media_type=metrics.CONTENT_TYPE)
+
+
+@app.get("/profiles")
+async def list_profiles():
+    """Scan profiles (profiles.py) and the network precisions this server can run them at."""
+    return {
+        "default": profiles.get_profile().name,
+        "profiles": [
+            {**p.as_dict(), "inference_precision": inference_precision(p)} for p in profiles.PROFILES.values()
+        ],
+        "available_precisions": AVAILABLE_PRECISIONS,
+        "reference_clip": dict(zip(("width", "height", "frames"), profiles.REFERENCE_CLIP)),
+    }
 
+
+@app.get("/admin/profiling")
+async def get_profiling(request: Request):
+    if not profiling.is_admin(request):
+        return JSONResponse({"error": "Forbidden"}, status_code=403)
+    return profiling.status()
+
+
+@app.post("/admin/profiling")
+async def set_profiling(request: Request):
+    """Toggle request sampling, e.g. {"sample_rate": 0.05, "mode": "cprofile"}."""
+    if not profiling.is_admin(request):
+        return JSONResponse({"error": "Forbidden"}, status_code=403)
+    body = await request.json()
     try:
-        with tmp_path.open("wb") as buffer:
-            shutil.copyfileobj(video.file, buffer)
+        return profiling.configure(sample_rate=body.get("sample_rate"), mode=body.get("mode"))
+    except ValueError as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
 
-        logger.info(f"Video saved to {tmp_path}")
 
-        # MOCK MODE: Generate dummy 3D mesh if no model loaded
-        if romp is None and bev is None:
-            logger.warning("ROMP not loaded. Using MOCK data for testing.")
-            
-            # Generate a simple human-like point cloud
-            mock_vertices = []
-            
-            def add_cylinder(p1, p2, radius=0.05, steps=50):
-                """Add points along a cylinder from p1 to p2"""
-                vec = np.array(p2) - np.array(p1)
-                length = np.linalg.norm(vec)
-                if length == 0:
-                    return
-                axis = vec / length
-                
-                # Perpendicular vector
-                if abs(axis[0]) < 0.9:
-                    perp = np.cross(axis, [1, 0, 0])
-                else:
-                    perp = np.cross(axis, [0, 1, 0])
-                perp = perp / (np.linalg.norm(perp) + 1e-8)
-                
-                for i in range(steps):
-                    t = i / max(steps - 1, 1)
-                    center = np.array(p1) + vec * t
-                    # Add ring of points around center
-                    for angle in np.linspace(0, 2 * np.pi, 8):
-                        offset = radius * (np.cos(angle) * perp + np.sin(angle) * np.cross(axis, perp))
-                        mock_vertices.append((center + offset).tolist())
-
-            # Human skeleton points (normalized coordinates)
-            head = [0, 0.6, 0]
-            neck = [0, 0.45, 0]
-            hips = [0, 0.0, 0]
-            l_shoulder = [-0.2, 0.45, 0]
-            r_shoulder = [0.2, 0.45, 0]
-            l_hand = [-0.4, 0.1, 0]
-            r_hand = [0.4, 0.1, 0]
-            l_knee = [-0.1, -0.4, 0]
-            r_knee = [0.1, -0.4, 0]
-            l_foot = [-0.1, -0.8, 0]
-            r_foot = [0.1, -0.8, 0]
-
-            # Build body
-            add_cylinder(head, neck, 0.1, 30)
-            add_cylinder(neck, hips, 0.15, 100)
-            add_cylinder(neck, l_shoulder, 0.05, 40)
-            add_cylinder(neck, r_shoulder, 0.05, 40)
-            add_cylinder(l_shoulder, l_hand, 0.04, 80)
-            add_cylinder(r_shoulder, r_hand, 0.04, 80)
-            add_cylinder(hips, l_knee, 0.06, 80)
-            add_cylinder(hips, r_knee, 0.06, 80)
-            add_cylinder(l_knee, l_foot, 0.05, 80)
-            add_cylinder(r_knee, r_foot, 0.05, 80)
-
-            # Generate simple faces for mock data (basic triangulation)
-            # For a proper mesh, we'd need proper face indices, but for mock we'll let frontend handle it
-            mock_faces = []  # Frontend will generate faces using convex hull
-            
-            return JSONResponse({
-                "message": "Processed successfully (MOCK MODE - Install SMPL models for real AI)",
-                "original_filename": video.filename,
-                "smpl_vertices": mock_vertices,
-                "smpl_faces": mock_faces,
-                "joints": [],
-                "params": {},
-                "is_mock": True
-            })
+# Parameter sets per /reskin request: each one is skinned, measured and serialized
+MAX_RESKIN_BATCH = int(os.getenv("KNOT_MAX_RESKIN_BATCH", "256"))
 
-        # REAL MODE: Use selected model (BEV or ROMP) with multi-frame processing
-        cap = cv2.VideoCapture(str(tmp_path))
-        if not cap.isOpened():
-            return JSONResponse({"error": "Could not open video file"}, status_code=400)
+def param_rows(value):
+    """Parameter sets in a betas / poses field (a flat list is one). ValueError if malformed."""
+    if isinstance(value, list) and len(value) > MAX_RESKIN_BATCH:
+        return len(value)  # over the limit whatever the nesting: skip the conversion
+    shape = np.shape(np.asarray(value, dtype=np.float32))
+    return int(np.prod(shape[:-1])) if len(shape) > 1 else 1
 
-        frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-        if frame_count == 0:
-             return JSONResponse({"error": "Video has no frames"}, status_code=400)
+def reskin_response(model, betas, poses, pose, include_vertices):
+    """Skin, measure and serialize one /reskin batch; runs in the threadpool."""
+    if pose == "observed":
+        vertices = model.forward(betas, poses)
+    else:
+        vertices = model.canonical(betas, pose)
+    response = {
+        "count": int(vertices.shape[0]),
+        "pose": pose,
+        "measurements": [compute_measurements(v, assumed_height_cm=170.0) for v in vertices],
+    }
+    if include_vertices:
+        response["vertices"] = vertices.tolist()
+    return JSONResponse(response)
 
-        # Process multiple frames for better accuracy
-        # Based on: https://www.12-technology.com/2022/01/romp-ai3d.html
-        # Process more frames for better temporal stability (reduce jitter)
-        # Sample frames evenly across the video, focusing on middle section where person is most stable
-        num_frames_to_process = min(10, max(5, frame_count // 10))  # 10 frames or 10% of video, whichever is smaller
-        frame_ratios = np.linspace(0.2, 0.8, num_frames_to_process).tolist()  # Focus on middle 60% of video
-        results = []
-        
-        model_name = "BEV" if USE_BEV and bev is not None else "ROMP"
-        logger.info(f"Using {model_name} model. Processing {len(frame_ratios)} frames from {frame_count} total frames...")
-        
-        for ratio in frame_ratios:
-            frame_idx = int(frame_count * ratio)
-            cap.set(cv2.CAP_PROP_POS_FRAMES, frame_idx)
-            success, frame = cap.read()
-            
-            if not success:
-                continue
-            
-            # Preprocess frame for better detection
-            # Resize if too large (ROMP works better with reasonable sizes)
-            height, width = frame.shape[:2]
-            max_dim = 1024
-            if max(height, width) > max_dim:
-                scale = max_dim / max(height, width)
-                new_width = int(width * scale)
-                new_height = int(height * scale)
-                frame = cv2.resize(frame, (new_width, new_height), interpolation=cv2.INTER_LINEAR)
-                logger.debug(f"Resized frame from {width}x{height} to {new_width}x{new_height}")
-                
-            try:
-                # Use BEV if available, otherwise ROMP
-                if USE_BEV and bev is not None:
-                    # BEV API (adjust based on actual BEV implementation)
-                    outputs = romp(frame) if romp is not None else None  # Fallback for now
-                else:
-                    # ROMP processing - pass frame directly
-                    # ROMP expects input as numpy array or PIL Image
-                    # Convert BGR to RGB if needed
-                    if len(frame.shape) == 3 and frame.shape[2] == 3:
-                        # OpenCV uses BGR, ROMP might expect RGB
-                        frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-                    else:
-                        frame_rgb = frame
-                    
-                    # ROMP can be called directly with image
-                    try:
-                        outputs = romp(frame_rgb) if romp is not None else None
-                    except Exception as romp_error:
-                        logger.warning(f"ROMP processing error: {romp_error}")
-                        # Try with original frame
-                        outputs = romp(frame) if romp is not None else None
-                
-                # ROMP returns a dict with detection results or None
-                # Check if we have valid detection
-                if outputs and isinstance(outputs, dict):
-                    # Check if this is a valid detection (has vertices or joints)
-                    has_verts = 'verts' in outputs and outputs.get('verts') is not None
-                    has_joints = 'joints' in outputs and outputs.get('joints') is not None
-                    
-                    if has_verts or has_joints:
-                        # Valid detection - add metadata
-                        # Debug: log the shape of verts
-                        if 'verts' in outputs:
-                            verts = outputs['verts']
-                            if hasattr(verts, 'shape'):
-                                logger.debug(f"Frame {frame_idx}: verts shape = {verts.shape}, type = {type(verts)}")
-                            elif isinstance(verts, (list, tuple)):
-                                logger.debug(f"Frame {frame_idx}: verts length = {len(verts)}, first element type = {type(verts[0]) if len(verts) > 0 else 'empty'}")
-                        outputs['_frame_idx'] = frame_idx
-                        outputs['_frame_ratio'] = ratio
-                        results.append(outputs)
-                        logger.info(f"Successfully processed frame {frame_idx}/{frame_count} (person detected)")
-                    else:
-                        logger.warning(f"No valid detection in frame {frame_idx} (outputs keys: {list(outputs.keys())})")
-                elif isinstance(outputs, list) and len(outputs) > 0:
-                    # Handle list format (if ROMP ever returns a list)
-                    best_detection = outputs[0]
-                    if isinstance(best_detection, dict):
-                        best_detection['_frame_idx'] = frame_idx
-                        best_detection['_frame_ratio'] = ratio
-                        results.append(best_detection)
-                        logger.info(f"Successfully processed frame {frame_idx}/{frame_count} ({len(outputs)} person(s) detected)")
-                elif outputs is not None:
-                    # Unexpected format - log for debugging
-                    logger.warning(f"Unexpected outputs format in frame {frame_idx}: {type(outputs)}, value: {str(outputs)[:100]}")
-                else:
-                    logger.warning(f"No person detected in frame {frame_idx} (outputs is None)")
-            except Exception as e:
-                logger.warning(f"Failed to process frame {frame_idx}: {e}")
-                logger.exception("Frame processing error:")
-                continue
-        
-        cap.release()
-
-        if not results:
-            # Provide more helpful error message
-            error_msg = (
-                "No body detected in any frame. "
-                "Tips: Ensure the person is fully visible, well-lit, and facing the camera. "
-                "Try a video with clearer background and better lighting."
-            )
-            logger.warning(f"Body detection failed: {error_msg}")
-            return JSONResponse({"error": error_msg}, status_code=400)
-
-        # Exponential smoothing for better temporal stability (reduces jitter)
-        # Based on: https://www.12-technology.com/2022/01/romp-ai3d.html
-        # Article mentions: "フレームごとの誤差をうまく丸め込み、3Dモデルの滑らかな動きを実現する必要がある"
-        def exponential_smooth_results(results_list, alpha=0.6):
-            """
-            Apply exponential moving average to smooth results across frames.
-            alpha: smoothing factor (0-1), higher = more weight to recent frames
-            """
-            if not results_list or len(results_list) == 0:
-                return None
-            
-            if len(results_list) == 1:
-                return results_list[0]
-            
-            # Start with first result
-            smoothed = {}
-            first = results_list[0]
-            
-            # Initialize smoothed with first result
-            for key in ['verts', 'joints', 'params']:
-                if key in first:
-                    val = first[key]
-                    if hasattr(val, 'copy'):
-                        smoothed[key] = val.copy()
-                    elif isinstance(val, dict):
-                        smoothed[key] = val.copy()
-                    else:
-                        smoothed[key] = np.array(val) if isinstance(val, (list, tuple)) else val
-            
-            # Apply exponential smoothing to subsequent results
-            for i in range(1, len(results_list)):
-                current = results_list[i]
-                for key in ['verts', 'joints']:
-                    if key in current and key in smoothed:
-                        curr_val = current[key]
-                        smooth_val = smoothed[key]
-                        
-                        # Handle torch Tensor
-                        if hasattr(curr_val, 'cpu'):
-                            curr_val = curr_val.cpu()
-                        if hasattr(curr_val, 'detach'):
-                            curr_val = curr_val.detach()
-                        if hasattr(curr_val, 'numpy'):
-                            curr_val = curr_val.numpy()
-                        elif hasattr(curr_val, 'tolist'):
-                            curr_val = np.array(curr_val.tolist())
-                        
-                        # Convert to numpy arrays for computation
-                        if not isinstance(curr_val, np.ndarray):
-                            curr_val = np.array(curr_val)
-                        if not isinstance(smooth_val, np.ndarray):
-                            smooth_val = np.array(smooth_val)
-                        
-                        # Handle batch dimension: [batch, vertices, 3] -> [vertices, 3]
-                        if len(curr_val.shape) == 3:
-                            curr_val = curr_val[0]
-                        if len(smooth_val.shape) == 3:
-                            smooth_val = smooth_val[0]
-                        
-                        # Ensure same shape
-                        if curr_val.shape == smooth_val.shape:
-                            smoothed[key] = alpha * curr_val + (1 - alpha) * smooth_val
-                        else:
-                            logger.warning(f"Shape mismatch for {key}: {curr_val.shape} vs {smooth_val.shape}, skipping smoothing")
-                
-                # Smooth params (if they're numeric arrays)
-                if 'params' in current and 'params' in smoothed:
-                    for param_key in current['params']:
-                        if param_key in smoothed['params']:
-                            curr_p = current['params'][param_key]
-                            smooth_p = smoothed['params'][param_key]
-                            
-                            if hasattr(curr_p, 'shape') and hasattr(smooth_p, 'shape'):
-                                if curr_p.shape == smooth_p.shape:
-                                    smoothed['params'][param_key] = alpha * curr_p + (1 - alpha) * smooth_p
-            
-            return smoothed
-        
-        # Process all frames and return per-frame meshes for video sync
-        # Also compute averaged mesh for standalone viewer
-        logger.info(f"Processing {len(results)} detections for video overlay...")
-        
-        # Extract and convert per-frame meshes
-        per_frame_meshes = []
-        for i, result in enumerate(results):
-            frame_idx = result.get('_frame_idx', i)
-            frame_ratio = result.get('_frame_ratio', i / len(results) if len(results) > 0 else 0)
-            
-            # Extract vertices for this frame
-            frame_verts = result.get('verts', [])
-            
-            # Handle torch Tensor
-            if hasattr(frame_verts, 'cpu'):
-                frame_verts = frame_verts.cpu()
-            if hasattr(frame_verts, 'detach'):
-                frame_verts = frame_verts.detach()
-            if hasattr(frame_verts, 'numpy'):
-                frame_verts = frame_verts.numpy()
-            
-            # Convert to numpy array if not already
-            if not isinstance(frame_verts, np.ndarray):
-                if hasattr(frame_verts, 'tolist'):
-                    frame_verts = np.array(frame_verts.tolist())
-                elif isinstance(frame_verts, (list, tuple)):
-                    frame_verts = np.array(frame_verts)
-                else:
-                    continue
-            
-            # Handle batch dimension: [batch, vertices, 3] -> [vertices, 3]
-            if len(frame_verts.shape) == 3:
-                frame_verts = frame_verts[0]
-            elif len(frame_verts.shape) != 2:
-                continue
-            
-            # Normalize vertices for consistent scale and position
-            frame_verts_normalized = normalize_mesh(frame_verts)
-            
-            # Ensure it's a list (normalize_mesh should return list, but double-check)
-            if isinstance(frame_verts_normalized, np.ndarray):
-                frame_verts_normalized = frame_verts_normalized.tolist()
-            elif not isinstance(frame_verts_normalized, list):
-                # If it's something else, try to convert
-                try:
-                    frame_verts_normalized = list(frame_verts_normalized)
-                except:
-                    logger.warning(f"Could not convert frame_verts to list, skipping frame {frame_idx}")
-                    continue
-            
-            per_frame_meshes.append({
-                'frame_idx': int(frame_idx),  # Ensure int for JSON
-                'frame_ratio': float(frame_ratio),  # Ensure float for JSON
-                'vertices': frame_verts_normalized  # Should be list now
-            })
-        
-        # Also compute averaged mesh for standalone viewer
-        logger.info(f"Computing averaged mesh from {len(results)} detections...")
-        best_result = exponential_smooth_results(results, alpha=0.7)
-        
-        if best_result is None:
-            return JSONResponse({"error": "Failed to process results"}, status_code=500)
 
+@app.post("/reskin")
+async def reskin(request: Request):
+    """
+    Re-skin stored SMPL parameters without running ROMP, e.g.
+    {"betas": [[...10]], "poses": [[...72]], "pose": "t", "include_vertices": false}
+    pose: "observed" (use poses) or a canonical pose ("t" / "a"). At most
+    KNOT_MAX_RESKIN_BATCH parameter sets per request.
+    """
+    body = await request.json()
+    pose = str(body.get("pose", "observed")).lower()
+    if body.get("betas") is None:
+        return JSONResponse({"error": "betas is required"}, status_code=400)
+    if pose != "observed" and pose not in smpl_lbs.CANONICAL_POSES:
+        return JSONResponse({"error": f"pose must be 'observed' or one of {smpl_lbs.CANONICAL_POSES}"}, status_code=400)
+    poses = body.get("poses") if pose == "observed" else None
+    try:
+        rows = max(param_rows(body["betas"]), param_rows(poses) if poses is not None else 1)
+    except (TypeError, ValueError):
+        return JSONResponse({"error": "betas and poses must be numeric arrays"}, status_code=400)
+    if rows > MAX_RESKIN_BATCH:
+        return JSONResponse({"error": f"At most {MAX_RESKIN_BATCH} parameter sets per request"}, status_code=400)
+    model = get_lbs_model()
+    if model is None:
+        return JSONResponse({"error": "SMPL model not available. Install the SMPL models first."}, status_code=503)
+
+    try:
+        return await run_in_threadpool(reskin_response, model, body["betas"], poses, pose,
+                                       body.get("include_vertices", True))
+    except ValueError as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
+
+
+@app.get("/scans")
+async def list_scans(user_id: str = None, since: float = None, until: float = None, limit: int = 100):
+    """Stored scan summaries (newest first), filtered by user and/or created_at range (unix seconds)."""
+    if SCAN_STORE is None:
+        return JSONResponse({"error": "Scan store disabled. Set KNOT_SCAN_STORE."}, status_code=503)
+    scans = await run_in_threadpool(SCAN_STORE.list_scans, user_id, since, until, min(max(limit, 1), 1000))
+    return {"count": len(scans), "scans": scans}
+
+
+@app.get("/scans/{scan_id}")
+async def get_scan(scan_id: str, mesh: bool = False, per_frame: bool = False, lod: str = "full"):
+    """
+    A stored scan: params and measurements. mesh=true rebuilds the averaged mesh
+    from the stored params; per_frame=true adds one mesh per processed frame.
+    lod (full / medium / low) applies to both.
+    """
+    if lod not in smpl_lod.LOD_LEVELS:
+        return JSONResponse({"error": f"lod must be one of {smpl_lod.LOD_LEVELS}"}, status_code=400)
+    if SCAN_STORE is None:
+        return JSONResponse({"error": "Scan store disabled. Set KNOT_SCAN_STORE."}, status_code=503)
+    record = await run_in_threadpool(SCAN_STORE.get, scan_id)
+    if record is None:
+        return JSONResponse({"error": "Scan not found"}, status_code=404)
+
+    response = {k: v for k, v in record.items() if k not in ("params", "frame_params", "frame_idx")}
+    response["params"] = {k: None if v is None else v.tolist() for k, v in record["params"].items()}
+    if not (mesh or per_frame):
+        return response
+
+    model = get_lbs_model()
+    if model is None or record["params"]["betas"] is None:
+        return JSONResponse({"error": "SMPL model not available. Install the SMPL models first."}, status_code=503)
+    index_map, lod_faces = lod_mesh(lod, model.v_template.shape[0])
+    faces = lod_faces if index_map is not None else model.faces
+    response["lod"] = lod if index_map is not None else "full"
+    response["smpl_faces"] = faces.tolist() if faces is not None else []
+    if mesh:
+        vertices = await run_in_threadpool(model.forward, record["params"]["betas"], record["params"]["poses"])
+        response["smpl_vertices"] = normalize_mesh(vertices[0], index_map=index_map)
+    if per_frame and record["frame_idx"] is not None and len(record["frame_idx"]):
+        frame_params = record["frame_params"]
+        # Frames saved without params are NaN rows: skin the others, null vertices for these
+        rows = np.flatnonzero(np.isfinite(frame_params["betas"]).all(axis=1)
+                              & np.isfinite(frame_params["poses"]).all(axis=1))
+        vertices = await run_in_threadpool(model.forward, frame_params["betas"][rows],
+                                           frame_params["poses"][rows]) if len(rows) else []
+        meshes = dict(zip(rows.tolist(), vertices))
+        response["per_frame_meshes"] = [
+            {"frame_idx": int(idx), "vertices": normalize_mesh(meshes.get(i), index_map=index_map)}
+            for i, idx in enumerate(record["frame_idx"])
+        ]
+    return response
+
+
+def resolve_lods(lod, frame_lod, profile=None):
+    """
+    (lod, frame_lod) from the form fields, then the scan profile, then the configured
+    defaults; per-frame meshes follow an explicit lod unless frame_lod is given too.
+    """
+    profile = profile or profiles.get_profile()
+    frame_lod = (frame_lod or lod or profile.frame_lod or FRAME_MESH_LOD).lower()
+    lod = (lod or profile.lod or MESH_LOD).lower()
+    return lod, frame_lod
+
+def inference_precision(profile):
+    """Precision the profile's forward passes run at: its own if available, else the configured one."""
+    return profile.precision if profile.precision in AVAILABLE_PRECISIONS else INFERENCE_PRECISION
+
+def mock_scan_response(timings, lod, source):
+    """MOCK MODE response (no model loaded): the precomputed SMPL-sized body."""
+    logger.warning("ROMP not loaded. Using MOCK data for testing.")
+    metrics.MOCK_MODE_HITS.inc()
+
+    # Precomputed SMPL-sized body (copy of a cached buffer)
+    mock = get_mock_body()
+    mock_vertices = mock.vertices.copy()
+    with timings.stage("measurement"):
+        measurements = compute_measurements(mock_vertices, assumed_height_cm=170.0)
+
+    with timings.stage("serialize"):
+        index_map, lod_faces = lod_mesh(lod, len(mock_vertices))
+        mock_vertices = normalize_mesh(mock_vertices, index_map=index_map)
+        mock_faces = (lod_faces if index_map is not None else mock.faces).tolist()
+
+        return JSONResponse({
+            "message": "Processed successfully (MOCK MODE - Install SMPL models for real AI)",
+            **source,
+            "smpl_vertices": mock_vertices,
+            "smpl_faces": mock_faces,
+            "joints": [],
+            "params": {},
+            "measurements": measurements,
+            "lod": lod if index_map is not None else "full",
+            "is_mock": True
+        })
+
+def frame_mesh(result, frame_lod, fallback_idx=0, fallback_ratio=0.0):
+    """
+    Per-frame overlay entry for one detection: frame_idx, frame_ratio and the normalized
+    vertices reduced to frame_lod. Returns (entry, num_vertices), or (None, None) if
+    the detection has no usable vertices.
+    """
+    frame_idx = result.get('_frame_idx', fallback_idx)
+    frame_ratio = result.get('_frame_ratio', fallback_ratio)
+
+    # Extract vertices for this frame
+    frame_verts = pipeline.vertex_array(result.get('verts', []))
+    if frame_verts is None:
+        return None, None
+
+    # Normalize vertices for consistent scale and position (reduced to frame_lod)
+    frame_index_map, _ = lod_mesh(frame_lod, len(frame_verts))
+    frame_verts_normalized = normalize_mesh(frame_verts, index_map=frame_index_map)
+
+    # Ensure it's a list (normalize_mesh should return list, but double-check)
+    if isinstance(frame_verts_normalized, np.ndarray):
+        frame_verts_normalized = frame_verts_normalized.tolist()
+    elif not isinstance(frame_verts_normalized, list):
+        # If it's something else, try to convert
+        try:
+            frame_verts_normalized = list(frame_verts_normalized)
+        except:
+            logger.warning(f"Could not convert frame_verts to list, skipping frame {frame_idx}")
+            return None, None
+
+    return {
+        'frame_idx': int(frame_idx),  # Ensure int for JSON
+        'frame_ratio': float(frame_ratio),  # Ensure float for JSON
+        'vertices': frame_verts_normalized  # Should be list now
+    }, len(frame_verts)
+
+def scan_response(reducer, timings, lod, frame_lod, user_id, detected, source, per_frame_meshes=None,
+                  frame_vertices=None, profile=None):
+    """
+    Per-frame meshes, smoothed result, measurements, persistence and the JSON response
+    shared by /process-scan and /process-photos, from the detections reduced by
+    reducer (pipeline.ResultReducer).
+    detected summarizes the detection count for the message; source (filenames,
+    frame/photo count) goes into the response and the stored scan metadata.
+    per_frame_meshes / frame_vertices (mesh vertex count) are passed when the
+    meshes were already built while the detections arrived (dense mode).
+    The scan profile decides which artifacts are produced (profiles.py).
+    """
+    model_name = "BEV" if USE_BEV and bev is not None else "ROMP"
+    profile = profile or profiles.get_profile()
+    results = reducer.frames
+
+    # Process all frames and return per-frame meshes for video sync
+    # Also compute averaged mesh for standalone viewer
+    logger.info(f"Processing {len(results)} detections for video overlay...")
+
+    # Extract and convert per-frame meshes
+    with timings.stage("smoothing"):
+        if per_frame_meshes is None:
+            per_frame_meshes = []
+            for i, result in enumerate(results if profile.produces("per_frame_meshes") else []):
+                entry, num_vertices = frame_mesh(result, frame_lod, i, i / len(results) if len(results) > 0 else 0)
+                if entry is not None:
+                    per_frame_meshes.append(entry)
+                    frame_vertices = num_vertices
+        frame_index_map, frame_faces = lod_mesh(frame_lod, frame_vertices) if frame_vertices else (None, None)
+
+    # Averaged mesh for standalone viewer (smoothed online as the detections arrived)
+    best_result = reducer.result()
+
+    if best_result is None:
+        return JSONResponse({"error": "Failed to process results"}, status_code=500)
+
+    with timings.stage("serialize"):
         # Extract and convert results for averaged mesh
         # ROMP returns verts as numpy array (via convert_tensor2numpy) with shape [batch, vertices, 3] or [vertices, 3]
         smpl_vertices = best_result.get('verts', [])
-        
+
         # Debug: log original type and shape
         logger.debug(f"Original verts type: {type(smpl_vertices)}, shape/len: {getattr(smpl_vertices, 'shape', len(smpl_vertices) if hasattr(smpl_vertices, '__len__') else 'N/A')}")
-        
+
         # Handle torch Tensor (if not already converted)
         if hasattr(smpl_vertices, 'cpu'):
             smpl_vertices = smpl_vertices.cpu()
@@ -863,7 +626,7 @@ async def process_scan(video: UploadFile = File(...)):
             smpl_vertices = smpl_vertices.detach()
         if hasattr(smpl_vertices, 'numpy'):
             smpl_vertices = smpl_vertices.numpy()
-        
+
         # Convert to numpy array if not already
         if not isinstance(smpl_vertices, np.ndarray):
             if hasattr(smpl_vertices, 'tolist'):
@@ -873,7 +636,7 @@ async def process_scan(video: UploadFile = File(...)):
             else:
                 logger.warning(f"Unexpected verts type: {type(smpl_vertices)}, value: {smpl_vertices}")
                 smpl_vertices = np.array([])
-        
+
         # Handle shape: [batch, vertices, 3] -> [vertices, 3]
         if isinstance(smpl_vertices, np.ndarray):
             if len(smpl_vertices.shape) == 3:
@@ -891,17 +654,17 @@ async def process_scan(video: UploadFile = File(...)):
                     logger.info(f"Reshaped to: {smpl_vertices.shape}")
             else:
                 logger.warning(f"Unexpected shape: {smpl_vertices.shape}")
-        
+
         # Convert to list for JSON serialization
         if isinstance(smpl_vertices, np.ndarray):
             smpl_vertices = smpl_vertices.tolist()
-        
+
         # Log the final shape for debugging
         if smpl_vertices:
             logger.info(f"Extracted vertices: {len(smpl_vertices)} vertices (first vertex: {smpl_vertices[0] if len(smpl_vertices) > 0 else 'empty'})")
         else:
             logger.warning("No vertices extracted!")
-        
+
         # Get faces if available from model output
         smpl_faces = best_result.get('faces', [])
         if not smpl_faces or len(smpl_faces) == 0:
@@ -933,7 +696,7 @@ async def process_scan(video: UploadFile = File(...)):
                 except Exception as e:
                     logger.warning(f"Could not get faces from model: {e}")
                     logger.exception("Face extraction error:")
-                
+
                 if not smpl_faces or len(smpl_faces) == 0:
                     # SMPL has 6890 vertices and 13776 faces
                     # If we have 6890 vertices, use standard SMPL face template
@@ -955,16 +718,14 @@ async def process_scan(video: UploadFile = File(...)):
                     else:
                         smpl_faces = []
                         logger.info(f"Mesh has {len(smpl_vertices)} vertices (not standard SMPL 6890). Frontend will generate faces.")
-        
+
         # Convert faces to list format
         if smpl_faces is not None and len(smpl_faces) > 0:
             if hasattr(smpl_faces, 'tolist'):
                 smpl_faces = smpl_faces.tolist()
             elif isinstance(smpl_faces, np.ndarray):
                 smpl_faces = smpl_faces.tolist()
-            elif isinstance(smpl_faces, torch.Tensor):
-                smpl_faces = smpl_faces.cpu().numpy().tolist()
-            
+
         joints = best_result.get('joints', [])
         if hasattr(joints, 'tolist'):
             joints = joints.tolist()
@@ -976,88 +737,49 @@ async def process_scan(video: UploadFile = File(...)):
             k: v.tolist() if hasattr(v, 'tolist') else (v.tolist() if isinstance(v, np.ndarray) else v)
             for k, v in params.items()
         }
-        
+
         # Remove internal metadata
         parsed_params.pop('_frame_idx', None)
 
-        # Compute measurements before normalization (using assumed 170 cm height)
-        def _convex_hull_2d(points):
-            pts = sorted(set((float(p[0]), float(p[1])) for p in points))
-            if len(pts) <= 1:
-                return pts
-            def cross(o, a, b):
-                return (a[0]-o[0])*(b[1]-o[1]) - (a[1]-o[1])*(b[0]-o[0])
-            lower = []
-            for p in pts:
-                while len(lower) >= 2 and cross(lower[-2], lower[-1], p) <= 0:
-                    lower.pop()
-                lower.append(p)
-            upper = []
-            for p in reversed(pts):
-                while len(upper) >= 2 and cross(upper[-2], upper[-1], p) <= 0:
-                    upper.pop()
-                upper.append(p)
-            return lower[:-1] + upper[:-1]
-
-        def _perimeter(poly):
-            if len(poly) < 2:
-                return 0.0
-            per = 0.0
-            for i in range(len(poly)):
-                x1, y1 = poly[i]
-                x2, y2 = poly[(i+1) % len(poly)]
-                per += math.hypot(x2 - x1, y2 - y1)
-            return per
-
-        def compute_measurements(vertices, assumed_height_cm=170.0):
-            if vertices is None:
-                return {}
-            verts_np = np.array(vertices, dtype=np.float32)
-            if verts_np.ndim != 2 or verts_np.shape[1] < 3:
-                return {}
-            min_y = float(np.min(verts_np[:, 1]))
-            max_y = float(np.max(verts_np[:, 1]))
-            mesh_height = max_y - min_y
-            if mesh_height <= 1e-6:
-                return {}
-            scale = assumed_height_cm / mesh_height
-
-            def slice_girth(y_low_ratio, y_high_ratio):
-                y_low = min_y + y_low_ratio * mesh_height
-                y_high = min_y + y_high_ratio * mesh_height
-                mask = (verts_np[:, 1] >= y_low) & (verts_np[:, 1] <= y_high)
-                slice_pts = verts_np[mask]
-                if slice_pts.shape[0] < 3:
-                    return 0.0, slice_pts.shape[0]
-                xz = slice_pts[:, [0, 2]]
-                hull = _convex_hull_2d(xz)
-                per = _perimeter(hull) * scale
-                return per, slice_pts.shape[0]
-
-            height_cm = mesh_height * scale
-            chest_cm, chest_n = slice_girth(0.53, 0.56)
-            waist_cm, waist_n = slice_girth(0.44, 0.46)
-            hips_cm, hips_n = slice_girth(0.34, 0.36)
-
-            return {
-                "assumed_height_cm": assumed_height_cm,
-                "scale_cm_per_unit": scale,
-                "height_cm": height_cm,
-                "chest_cm": chest_cm,
-                "waist_cm": waist_cm,
-                "hips_cm": hips_cm,
-                "slice_counts": {
-                    "chest": int(chest_n),
-                    "waist": int(waist_n),
-                    "hips": int(hips_n),
-                },
-            }
+    # Compute measurements before normalization (using assumed 170 cm height)
+    with timings.stage("measurement"):
+        measurements, measurement_pose = None, None
+        if profile.produces("measurements"):
+            measurements = compute_measurements(smpl_vertices, assumed_height_cm=170.0)
+            measurement_pose = "observed"
+        pose = profile.measurement_pose or MEASUREMENT_POSE
+        if profile.produces("canonical_measurements") and pose != "observed" and pose in smpl_lbs.CANONICAL_POSES:
+            canonical = canonical_measurements(best_result.get('params', {}), pose)
+            if canonical:
+                measurements, measurement_pose = canonical, pose
 
-        measurements = compute_measurements(smpl_vertices, assumed_height_cm=170.0)
+    scan_id = None
+    if SCAN_STORE is not None and profile.produces("persist"):
+        with timings.stage("persist"):
+            try:
+                scan_id = SCAN_STORE.save(best_result, results, measurements, user_id=user_id, metadata={
+                    **source,
+                    "model_used": model_name,
+                    "inference_backend": INFERENCE_BACKEND,
+                    "profile": profile.name,
+                })
+            except Exception as e:
+                logger.warning(f"Could not store scan: {e}")
+
+    with timings.stage("serialize"):
+        # Normalize mesh for consistent visualization, reduced to the requested LOD
+        index_map, lod_faces = lod_mesh(lod, len(smpl_vertices))
+        smpl_vertices = normalize_mesh(smpl_vertices, index_map=index_map)
+        full_faces = smpl_faces
+        if index_map is not None:
+            smpl_faces = lod_faces.tolist()
+        mesh_lod = lod if index_map is not None else "full"
+        per_frame_lod = frame_lod if frame_index_map is not None else "full"
+        # Per-frame meshes on another topology than smpl_vertices carry their own faces
+        per_frame_faces = None
+        if per_frame_meshes and per_frame_lod != mesh_lod:
+            per_frame_faces = frame_faces.tolist() if frame_index_map is not None else full_faces
 
-        # Normalize mesh for consistent visualization
-        smpl_vertices = normalize_mesh(smpl_vertices)
-        
         # Ensure smpl_vertices is a list (normalize_mesh returns list, but double-check)
         if isinstance(smpl_vertices, np.ndarray):
             smpl_vertices = smpl_vertices.tolist()
@@ -1067,13 +789,13 @@ async def process_scan(video: UploadFile = File(...)):
             except:
                 logger.warning("Could not convert smpl_vertices to list")
                 smpl_vertices = []
-        
+
         logger.info(f"Final mesh: {len(smpl_vertices)} vertices, {len(smpl_faces)} faces, {len(joints)} joints (normalized)")
 
         return JSONResponse(
             {
-                "message": f"Processed successfully ({len(results)}/{len(frame_ratios)} frames detected, exponentially smoothed)",
-                "original_filename": video.filename,
+                "message": f"Processed successfully ({detected}, exponentially smoothed)",
+                **source,
                 "smpl_vertices": smpl_vertices,  # Averaged mesh for standalone viewer (list)
                 "smpl_faces": smpl_faces,  # Add faces for proper mesh rendering (list)
                 "joints": joints,  # List
@@ -1082,12 +804,400 @@ async def process_scan(video: UploadFile = File(...)):
                 "smoothing_applied": True,
                 "smoothing_method": "exponential_moving_average",
                 "model_used": model_name,  # String
+                "inference_backend": INFERENCE_BACKEND,
+                "inference_precision": inference_precision(profile),
+                "profile": profile.name,
                 "per_frame_meshes": per_frame_meshes,  # List of dicts with lists
-                "video_frame_count": int(frame_count),  # Int for JSON
                 "measurements": measurements,
+                "measurement_pose": measurement_pose,
+                "scan_id": scan_id,
+                "lod": mesh_lod,
+                "per_frame_lod": per_frame_lod,
+                "per_frame_faces": per_frame_faces,
             }
         )
 
+# Dense overlay mode (frame_stride form field): per-frame meshes default to a light LOD,
+# and the stride grows so that at most MAX_DENSE_FRAMES frames go through the model
+DENSE_FRAME_MESH_LOD = os.getenv("KNOT_DENSE_FRAME_LOD", "low").lower()
+MAX_DENSE_FRAMES = int(os.getenv("KNOT_MAX_DENSE_FRAMES", "900"))
+# Temporal smoothing of dense passes (ROMP video-mode settings; 0 disables)
+TEMPORAL_SMOOTH_COEFF = romp_loader.SMOOTH_COEFF
+
+@app.post("/process-scan")
+async def process_scan(request: Request, video: UploadFile = File(...), user_id: str = Form(None),
+                       lod: str = Form(None), frame_lod: str = Form(None), frame_stride: int = Form(None),
+                       profile: str = Form(None)):
+    """
+    Body scan from a video. By default ~10 frames are sampled from the middle of
+    the clip. frame_stride=N switches to dense mode: every Nth frame of the whole
+    video is processed (pipelined, see pipeline.detect_dense_frames) so the
+    overlay gets a mesh per processed frame. profile (preview / standard / precise,
+    see profiles.py) sets the frame budget, resolution, precision, LODs and outputs.
+    """
+    try:
+        profile = profiles.get_profile(profile)
+    except ValueError as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
+    lod, frame_lod = resolve_lods(lod, frame_lod or (DENSE_FRAME_MESH_LOD if frame_stride else None), profile)
+    if lod not in smpl_lod.LOD_LEVELS or frame_lod not in smpl_lod.LOD_LEVELS:
+        return JSONResponse({"error": f"lod must be one of {smpl_lod.LOD_LEVELS}"}, status_code=400)
+    if frame_stride is not None and frame_stride < 1:
+        return JSONResponse({"error": "frame_stride must be >= 1"}, status_code=400)
+    if ADMISSION is not None and scan_priority(request) not in admission.PRIORITIES:
+        return JSONResponse({"error": f"{admission.PRIORITY_HEADER} must be one of {admission.PRIORITIES}"}, status_code=400)
+    tmp_path = None
+    cap = None
+    video_id = None
+    timings = stage_timing.StageTimings()
+    request.state.timings = timings
+
+    try:
+        # Container header first: unusable or oversize videos are rejected before the upload is copied
+        with timings.stage("probe"):
+            info = probe.probe(video.file)
+            probe.check(info, probe.upload_size(video.file))
+        if info is not None:
+            logger.info(f"Probed {info.container}/{info.codec} {info.width}x{info.height}, "
+                        f"{info.frame_count} frames, keyframe interval {info.keyframe_interval}")
+
+        # One file per request: admitted scans can run concurrently
+        fd, tmp_name = tempfile.mkstemp(prefix="knot_input_", suffix=".mp4")
+        tmp_path = Path(tmp_name)
+        with timings.stage("upload"), os.fdopen(fd, "wb") as buffer:
+            if FRAME_CACHE is not None:
+                video_id = frame_cache.copy_and_hash(video.file, buffer)
+            else:
+                shutil.copyfileobj(video.file, buffer)
+
+        logger.info(f"Video saved to {tmp_path}")
+
+        # MOCK MODE: Generate dummy 3D mesh if no model loaded
+        if romp is None and bev is None:
+            return mock_scan_response(timings, lod, {"original_filename": video.filename})
+
+        # REAL MODE: Use selected model (BEV or ROMP) with multi-frame processing
+        cap = cv2.VideoCapture(str(tmp_path))
+        if not cap.isOpened():
+            return JSONResponse({"error": "Could not open video file"}, status_code=400)
+
+        frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        if frame_count == 0:
+             return JSONResponse({"error": "Video has no frames"}, status_code=400)
+
+        width, height = cap.get(cv2.CAP_PROP_FRAME_WIDTH), cap.get(cv2.CAP_PROP_FRAME_HEIGHT)
+        source = {"original_filename": video.filename, "video_frame_count": int(frame_count)}
+        if info is not None:
+            source["video_info"] = info.as_dict()
+        keyframes = info.keyframes if info is not None else None
+        if frame_stride is not None:
+            stride = max(frame_stride, math.ceil(frame_count / MAX_DENSE_FRAMES))
+            # Sequential read: every frame is decoded, skipped ones included
+            work = admission.estimate_work(math.ceil(frame_count / stride), width, height, decoded=frame_count)
+            return await run_admitted(request, work, timings, run_dense_scan, cap, frame_count, stride,
+                                      cap.get(cv2.CAP_PROP_FPS), timings, lod, frame_lod, user_id, source, profile)
+
+        # Process multiple frames for better accuracy
+        frame_ratios = pipeline.frame_sample_ratios(frame_count, profile.min_frames, profile.max_frames)
+        if video_id is not None:
+            FRAME_CACHE.add_video(video_id, tmp_path, frame_count=frame_count, width=width, height=height,
+                                  filename=video.filename)
+            source["video_id"] = video_id
+        # Price the scan from the container header before decoding anything
+        work = scan_work(frame_count, frame_ratios, width, height, video_id, keyframes,
+                         max_dim=profile.sampled_max_dim(person_roi.enabled_from_env()))
+        return await run_admitted(request, work, timings,
+                                  functools.partial(run_video_scan, alpha=profile.alpha, keyframes=keyframes,
+                                                    profile=profile),
+                                  cap, frame_count, frame_ratios, timings, lod, frame_lod, user_id, source, video_id)
+
+    except probe.Rejected as e:
+        logger.info(f"Rejected upload {video.filename!r}: {e.reason}")
+        return JSONResponse({"error": e.reason}, status_code=e.status_code)
+    except admission.Overloaded as e:
+        return overloaded_response(e)
+    except InferenceUnavailable as e:
+        return unavailable_response(e)
     except Exception as e:
         logger.error(f"Error processing scan: {str(e)}", exc_info=True)
         return JSONResponse({"error": f"Processing failed: {str(e)}"}, status_code=500)
+    finally:
+        if cap is not None:
+            cap.release()
+        if tmp_path is not None:
+            tmp_path.unlink(missing_ok=True)
+        stage_timing.publish(timings)
+
+def scan_work(frame_count, frame_ratios, width, height, video_id=None, keyframes=None,
+              max_dim=pipeline.MAX_FRAME_DIM):
+    """
+    Admission work units for a video scan. Frames already in the frame cache only cost
+    inference (the cache is only read at max_dim == MAX_FRAME_DIM, see
+    pipeline.iter_sampled_frames); with the keyframes from the probe, each read is
+    priced from where decoding starts.
+    """
+    indices = pipeline.sample_indices(frame_count, frame_ratios)
+    if video_id is not None and max_dim == pipeline.MAX_FRAME_DIM:
+        indices = [i for i in indices if not FRAME_CACHE.contains(video_id, i)]
+    cached = len(frame_ratios) - len(indices)
+    return (admission.estimate_work(len(indices), width, height, decoded=pipeline.frames_decoded(indices, keyframes))
+            + admission.estimate_work(cached, 0, 0))
+
+def run_video_scan(cap, frame_count, frame_ratios, timings, lod, frame_lod, user_id, source, video_id=None,
+                   alpha=pipeline.SMOOTHING_ALPHA, keyframes=None, profile=None):
+    """
+    Detection over the sampled video frames through to the response (the admitted part
+    of /process-scan and /reprocess-scan). With video_id, frames go through FRAME_CACHE;
+    keyframes (from the container probe) let nearby samples be read on to instead of seeked to.
+    """
+    model_name = "BEV" if USE_BEV and bev is not None else "ROMP"
+    profile = profile or profiles.get_profile()
+    logger.info(f"Using {model_name} model ({profile.name} profile). "
+                f"Processing {len(frame_ratios)} frames from {frame_count} total frames...")
+
+    reducer = pipeline.ResultReducer(alpha=alpha)
+    with torch_runtime.use_precision(inference_precision(profile)):
+        results = pipeline.detect_sampled_frames(romp, bev, USE_BEV, cap, frame_count, frame_ratios, timings,
+                                                 reducer=reducer, cache=FRAME_CACHE if video_id else None,
+                                                 video_id=video_id, keyframes=keyframes,
+                                                 max_dim=profile.sampled_max_dim(person_roi.enabled_from_env()))
+
+    if not results:
+        # Provide more helpful error message
+        error_msg = (
+            "No body detected in any frame. "
+            "Tips: Ensure the person is fully visible, well-lit, and facing the camera. "
+            "Try a video with clearer background and better lighting."
+        )
+        logger.warning(f"Body detection failed: {error_msg}")
+        return JSONResponse({"error": error_msg}, status_code=400)
+
+    return scan_response(reducer, timings, lod, frame_lod, user_id,
+                         f"{len(results)}/{len(frame_ratios)} frames detected", source, profile=profile)
+
+def run_dense_scan(cap, frame_count, stride, fps, timings, lod, frame_lod, user_id, source, profile=None):
+    """
+    Dense pass over every stride-th frame through to the response (the admitted part of
+    dense /process-scan). Per-frame meshes are always built: they are what dense mode is for.
+    """
+    model_name = "BEV" if USE_BEV and bev is not None else "ROMP"
+    profile = profile or profiles.get_profile()
+    logger.info(f"Using {model_name} model ({profile.name} profile). "
+                f"Dense pass over {frame_count} frames (stride {stride})...")
+
+    reducer = pipeline.ResultReducer(alpha=profile.alpha)
+    fps = fps if fps and fps > 0 else 30.0
+    temporal = pipeline.TemporalFilter(TEMPORAL_SMOOTH_COEFF, freq=fps / stride) if TEMPORAL_SMOOTH_COEFF > 0 else None
+    per_frame_meshes = []
+    frame_vertices = None
+
+    def add_mesh(frame):
+        # Post-processing stage: the overlay mesh is built while later frames are still in inference
+        nonlocal frame_vertices
+        with timings.stage("serialize"):
+            entry, num_vertices = frame_mesh(frame, frame_lod)
+        if entry is not None:
+            per_frame_meshes.append(entry)
+            frame_vertices = num_vertices
+
+    stats = {}
+    with torch_runtime.use_precision(inference_precision(profile)):
+        results = pipeline.detect_dense_frames(romp, bev, USE_BEV, cap, frame_count, stride, timings, reducer=reducer,
+                                               temporal=temporal, on_frame=add_mesh, stats=stats,
+                                               max_dim=profile.max_dim)
+    if not results:
+        error_msg = (
+            "No body detected in any frame. "
+            "Tips: Ensure the person is fully visible, well-lit, and facing the camera."
+        )
+        logger.warning(f"Body detection failed: {error_msg}")
+        return JSONResponse({"error": error_msg}, status_code=400)
+
+    source = {
+        **source,
+        "dense": True,
+        "frame_stride": stride,
+        "frames_inferred": stats["frames_inferred"],
+        "frames_per_second": round(stats["fps"], 2),
+        "temporal_smoothing": {"method": "one_euro", "smooth_coeff": TEMPORAL_SMOOTH_COEFF} if temporal else None,
+    }
+    return scan_response(reducer, timings, lod, frame_lod, user_id,
+                         f"{len(results)}/{stats['frames_inferred']} frames detected, dense", source,
+                         per_frame_meshes=per_frame_meshes, frame_vertices=frame_vertices, profile=profile)
+
+# Upper bound on sampled frames per reprocess (frame_ratios)
+MAX_REPROCESS_FRAMES = int(os.getenv("KNOT_MAX_REPROCESS_FRAMES", "60"))
+
+def parse_frame_ratios(value, frame_count=None):
+    """
+    Comma-separated sampling positions (0-1) from a form field, ascending and without
+    duplicates (per-frame meshes must come back in frame order; with frame_count, ratios
+    landing on an already sampled frame are dropped). ValueError if malformed.
+    """
+    ratios = [float(part) for part in value.split(",") if part.strip()]
+    if not ratios or len(ratios) > MAX_REPROCESS_FRAMES or any(not 0.0 <= r < 1.0 for r in ratios):
+        raise ValueError(f"frame_ratios must be 1-{MAX_REPROCESS_FRAMES} comma-separated values in [0, 1)")
+    ratios = sorted(set(ratios))
+    if frame_count:
+        by_frame = {}
+        for ratio, frame_idx in zip(ratios, pipeline.sample_indices(frame_count, ratios)):
+            by_frame.setdefault(frame_idx, ratio)
+        ratios = list(by_frame.values())
+    return ratios
+
+
+@app.post("/reprocess-scan")
+async def reprocess_scan(request: Request, video_id: str = Form(...), frame_ratios: str = Form(None),
+                         smoothing_alpha: float = Form(None), user_id: str = Form(None),
+                         lod: str = Form(None), frame_lod: str = Form(None), profile: str = Form(None)):
+    """
+    Re-run a video uploaded earlier through /process-scan (by the video_id it returned)
+    with other settings: sampling positions (frame_ratios, e.g. "0.1,0.3,0.5"),
+    smoothing_alpha and/or profile. Frames come from the decoded-frame cache
+    (frame_cache.py), so cached frames skip decoding and only pay for inference.
+    """
+    try:
+        profile = profiles.get_profile(profile)
+    except ValueError as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
+    lod, frame_lod = resolve_lods(lod, frame_lod, profile)
+    if lod not in smpl_lod.LOD_LEVELS or frame_lod not in smpl_lod.LOD_LEVELS:
+        return JSONResponse({"error": f"lod must be one of {smpl_lod.LOD_LEVELS}"}, status_code=400)
+    if ADMISSION is not None and scan_priority(request) not in admission.PRIORITIES:
+        return JSONResponse({"error": f"{admission.PRIORITY_HEADER} must be one of {admission.PRIORITIES}"}, status_code=400)
+    if smoothing_alpha is not None and not 0.0 < smoothing_alpha <= 1.0:
+        return JSONResponse({"error": "smoothing_alpha must be in (0, 1]"}, status_code=400)
+    if FRAME_CACHE is None:
+        return JSONResponse({"error": "Frame cache disabled. Set KNOT_FRAME_CACHE_MB."}, status_code=503)
+    info = FRAME_CACHE.video(video_id) if frame_cache.is_video_id(video_id) else None
+    if info is None:
+        return JSONResponse({"error": "Unknown video_id (no longer cached); upload the video to /process-scan"},
+                            status_code=404)
+    frame_count = int(info["frame_count"])
+    try:
+        ratios = (parse_frame_ratios(frame_ratios, frame_count) if frame_ratios
+                  else pipeline.frame_sample_ratios(frame_count, profile.min_frames, profile.max_frames))
+    except ValueError as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
+    # The cache holds frames at the default resolution; other sizes are decoded again
+    if (profile.sampled_max_dim(person_roi.enabled_from_env()) != pipeline.MAX_FRAME_DIM
+            and FRAME_CACHE.source_path(video_id) is None):
+        return JSONResponse({"error": f"The {profile.name} profile needs the video itself, which is no longer kept; "
+                                      "upload it to /process-scan"}, status_code=409)
+    alpha = smoothing_alpha or profile.alpha
+    timings = stage_timing.StageTimings()
+    request.state.timings = timings
+    source = {"original_filename": info.get("filename"), "video_frame_count": frame_count, "video_id": video_id,
+              "frame_ratios": ratios, "smoothing_alpha": alpha}
+
+    if romp is None and bev is None:
+        try:
+            return mock_scan_response(timings, lod, source)
+        finally:
+            stage_timing.publish(timings)
+
+    cap = None
+    try:
+        # Frames missing from the cache are decoded from the kept copy of the video, if any
+        source_path = FRAME_CACHE.source_path(video_id)
+        if source_path is not None:
+            cap = cv2.VideoCapture(str(source_path))
+        work = scan_work(frame_count, ratios, info.get("width"), info.get("height"), video_id,
+                         max_dim=profile.sampled_max_dim(person_roi.enabled_from_env()))
+        return await run_admitted(request, work, timings,
+                                  functools.partial(run_video_scan, alpha=alpha, profile=profile),
+                                  cap, frame_count, ratios, timings, lod, frame_lod, user_id, source, video_id)
+
+    except admission.Overloaded as e:
+        return overloaded_response(e)
+    except InferenceUnavailable as e:
+        return unavailable_response(e)
+    except Exception as e:
+        logger.error(f"Error reprocessing scan: {str(e)}", exc_info=True)
+        return JSONResponse({"error": f"Processing failed: {str(e)}"}, status_code=500)
+    finally:
+        if cap is not None:
+            cap.release()
+        stage_timing.publish(timings)
+
+# Photo scans take a handful of views (front / side / back, ...)
+MAX_PHOTOS = int(os.getenv("KNOT_MAX_PHOTOS", "8"))
+
+@app.post("/process-photos")
+async def process_photos(request: Request, photos: List[UploadFile] = File(...), user_id: str = Form(None),
+                         lod: str = Form(None), frame_lod: str = Form(None), profile: str = Form(None)):
+    """
+    Body scan from a few still photos (e.g. front / side / back) instead of a video.
+    The images are decoded straight from the upload buffers (no temp file) and run
+    through the model in one pass; the rest matches /process-scan (the profile's
+    frame budget does not apply: every photo is used).
+    """
+    try:
+        profile = profiles.get_profile(profile)
+    except ValueError as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
+    lod, frame_lod = resolve_lods(lod, frame_lod, profile)
+    if lod not in smpl_lod.LOD_LEVELS or frame_lod not in smpl_lod.LOD_LEVELS:
+        return JSONResponse({"error": f"lod must be one of {smpl_lod.LOD_LEVELS}"}, status_code=400)
+    if len(photos) > MAX_PHOTOS:
+        return JSONResponse({"error": f"At most {MAX_PHOTOS} photos per scan"}, status_code=400)
+    if ADMISSION is not None and scan_priority(request) not in admission.PRIORITIES:
+        return JSONResponse({"error": f"{admission.PRIORITY_HEADER} must be one of {admission.PRIORITIES}"}, status_code=400)
+    timings = stage_timing.StageTimings()
+    request.state.timings = timings
+
+    try:
+        with timings.stage("upload"):
+            buffers = [await photo.read() for photo in photos]
+        filenames = [photo.filename for photo in photos]
+        source = {"original_filenames": filenames, "photo_count": len(photos)}
+
+        if romp is None and bev is None:
+            return mock_scan_response(timings, lod, source)
+
+        frames = []
+        work = 0.0
+        for filename, data in zip(filenames, buffers):
+            with timings.stage("decode"):
+                frame = pipeline.decode_image(data)
+            if frame is None:
+                return JSONResponse({"error": f"Could not decode image {filename} (expected JPEG or PNG)"}, status_code=400)
+            work += admission.estimate_work(1, frame.shape[1], frame.shape[0])
+            with timings.stage("preprocess"):
+                frames.append(pipeline.preprocess_frame(frame, profile.max_dim))
+        del buffers
+
+        return await run_admitted(request, work, timings, run_photo_scan, frames, timings, lod, frame_lod,
+                                  user_id, source, profile)
+
+    except admission.Overloaded as e:
+        return overloaded_response(e)
+    except InferenceUnavailable as e:
+        return unavailable_response(e)
+    except Exception as e:
+        logger.error(f"Error processing photos: {str(e)}", exc_info=True)
+        return JSONResponse({"error": f"Processing failed: {str(e)}"}, status_code=500)
+    finally:
+        stage_timing.publish(timings)
+
+def run_photo_scan(frames, timings, lod, frame_lod, user_id, source, profile=None):
+    """Detection over the decoded photos through to the response (the admitted part of /process-photos)."""
+    model_name = "BEV" if USE_BEV and bev is not None else "ROMP"
+    profile = profile or profiles.get_profile()
+    logger.info(f"Using {model_name} model ({profile.name} profile). Processing {len(frames)} photos...")
+    # Model processes behind the inference server take the photos concurrently
+    workers = len(frames) if INFERENCE_SOCKET else 1
+    reducer = pipeline.ResultReducer(alpha=profile.alpha)
+    with torch_runtime.use_precision(inference_precision(profile)):
+        results = pipeline.detect_images(romp, bev, USE_BEV, frames, timings, workers=workers, reducer=reducer)
+
+    if not results:
+        error_msg = (
+            "No body detected in any photo. "
+            "Tips: Ensure the person is fully visible, well-lit, and facing the camera."
+        )
+        logger.warning(f"Body detection failed: {error_msg}")
+        return JSONResponse({"error": error_msg}, status_code=400)
+
+    return scan_response(reducer, timings, lod, frame_lod, user_id,
+                         f"{len(results)}/{len(frames)} photos detected", source, profile=profile)
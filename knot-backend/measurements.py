@@ -0,0 +1,86 @@
+"""
+Body measurements derived from SMPL mesh vertices.
+
+Girths are estimated from horizontal slices of the mesh: the vertices inside a
+height band are projected onto the XZ plane and the perimeter of their convex
+hull is scaled to centimetres using an assumed body height.
+"""
+
+import math
+
+import numpy as np
+
+
+def _convex_hull_2d(points):
+    pts = sorted(set((float(p[0]), float(p[1])) for p in points))
+    if len(pts) <= 1:
+        return pts
+    def cross(o, a, b):
+        return (a[0]-o[0])*(b[1]-o[1]) - (a[1]-o[1])*(b[0]-o[0])
+    lower = []
+    for p in pts:
+        while len(lower) >= 2 and cross(lower[-2], lower[-1], p) <= 0:
+            lower.pop()
+        lower.append(p)
+    upper = []
+    for p in reversed(pts):
+        while len(upper) >= 2 and cross(upper[-2], upper[-1], p) <= 0:
+            upper.pop()
+        upper.append(p)
+    return lower[:-1] + upper[:-1]
+
+
+def _perimeter(poly):
+    if len(poly) < 2:
+        return 0.0
+    per = 0.0
+    for i in range(len(poly)):
+        x1, y1 = poly[i]
+        x2, y2 = poly[(i+1) % len(poly)]
+        per += math.hypot(x2 - x1, y2 - y1)
+    return per
+
+
+def compute_measurements(vertices, assumed_height_cm=170.0):
+    if vertices is None:
+        return {}
+    verts_np = np.array(vertices, dtype=np.float32)
+    if verts_np.ndim != 2 or verts_np.shape[1] < 3:
+        return {}
+    min_y = float(np.min(verts_np[:, 1]))
+    max_y = float(np.max(verts_np[:, 1]))
+    mesh_height = max_y - min_y
+    if mesh_height <= 1e-6:
+        return {}
+    scale = assumed_height_cm / mesh_height
+
+    def slice_girth(y_low_ratio, y_high_ratio):
+        y_low = min_y + y_low_ratio * mesh_height
+        y_high = min_y + y_high_ratio * mesh_height
+        mask = (verts_np[:, 1] >= y_low) & (verts_np[:, 1] <= y_high)
+        slice_pts = verts_np[mask]
+        if slice_pts.shape[0] < 3:
+            return 0.0, slice_pts.shape[0]
+        xz = slice_pts[:, [0, 2]]
+        hull = _convex_hull_2d(xz)
+        per = _perimeter(hull) * scale
+        return per, slice_pts.shape[0]
+
+    height_cm = mesh_height * scale
+    chest_cm, chest_n = slice_girth(0.53, 0.56)
+    waist_cm, waist_n = slice_girth(0.44, 0.46)
+    hips_cm, hips_n = slice_girth(0.34, 0.36)
+
+    return {
+        "assumed_height_cm": assumed_height_cm,
+        "scale_cm_per_unit": scale,
+        "height_cm": height_cm,
+        "chest_cm": chest_cm,
+        "waist_cm": waist_cm,
+        "hips_cm": hips_cm,
+        "slice_counts": {
+            "chest": int(chest_n),
+            "waist": int(waist_n),
+            "hips": int(hips_n),
+        },
+    }
@@ -0,0 +1,201 @@
+"""
+Prometheus-style metrics for the scan backend.
+
+A small in-process registry of counters and histograms rendered in the
+Prometheus text exposition format on /metrics. Stage histograms are fed from
+stage_timing (see observe_timings), and the same timings are exposed per
+request as a Server-Timing header.
+"""
+
+import threading
+
+# Seconds; covers sub-millisecond serialization up to minute-long scans
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _format_labels(labelnames, values, extra=None):
+    pairs = list(zip(labelnames, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ""
+    inner = ",".join(f'{k}="{str(v)}"' for k, v in pairs)
+    return "{" + inner + "}"
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value))
+
+
+class Counter:
+    """Monotonically increasing counter with optional labels."""
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(str(labels.get(n, "")) for n in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels):
+        key = tuple(str(labels.get(n, "")) for n in self.labelnames)
+        return self._values.get(key, 0.0)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            items = sorted(self._values.items())
+        if not items and not self.labelnames:
+            items = [((), 0.0)]
+        for key, value in items:
+            lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}")
+        return lines
+
+
+class Gauge:
+    """Value that can go up and down, with optional labels."""
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def set(self, value, **labels):
+        key = tuple(str(labels.get(n, "")) for n in self.labelnames)
+        with self._lock:
+            self._values[key] = float(value)
+
+    def inc(self, amount=1, **labels):
+        key = tuple(str(labels.get(n, "")) for n in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    def value(self, **labels):
+        key = tuple(str(labels.get(n, "")) for n in self.labelnames)
+        return self._values.get(key, 0.0)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} gauge"]
+        with self._lock:
+            items = sorted(self._values.items())
+        if not items and not self.labelnames:
+            items = [((), 0.0)]
+        for key, value in items:
+            lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}")
+        return lines
+
+
+class Histogram:
+    """Cumulative-bucket histogram with optional labels."""
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels.get(n, "")) for n in self.labelnames)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = {"counts": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series["counts"][i] += 1
+            series["sum"] += value
+            series["count"] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = sorted((k, dict(v, counts=list(v["counts"]))) for k, v in self._series.items())
+        for key, series in items:
+            for bound, count in zip(self.buckets, series["counts"]):
+                labels = _format_labels(self.labelnames, key, ("le", _format_value(bound)))
+                lines.append(f"{self.name}_bucket{labels} {count}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(series['sum'])}")
+            lines.append(f"{self.name}_count{labels} {series['count']}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+STAGE_SECONDS = REGISTRY.register(Histogram(
+    "knot_stage_seconds", "Time spent per /process-scan pipeline stage.", labelnames=("stage",)))
+REQUEST_SECONDS = REGISTRY.register(Histogram(
+    "knot_request_seconds", "Total /process-scan handler time."))
+FRAMES_INFERRED = REGISTRY.register(Counter(
+    "knot_frames_inferred_total", "Frames passed through the model."))
+DETECTIONS = REGISTRY.register(Counter(
+    "knot_detections_total", "Frames with a valid person detection."))
+MOCK_MODE_HITS = REGISTRY.register(Counter(
+    "knot_mock_mode_requests_total", "Requests answered in MOCK MODE."))
+CACHE_HITS = REGISTRY.register(Counter(
+    "knot_cache_hits_total", "Cache hits by cache name.", labelnames=("cache",)))
+CACHE_MISSES = REGISTRY.register(Counter(
+    "knot_cache_misses_total", "Cache misses by cache name.", labelnames=("cache",)))
+FRAME_CACHE_BYTES = REGISTRY.register(Gauge(
+    "knot_frame_cache_bytes", "Bytes held by the decoded-frame cache, by tier.", labelnames=("tier",)))
+PREFILTER_FRAMES = REGISTRY.register(Counter(
+    "knot_prefilter_frames_total", "Frames scored by the person prefilter.", labelnames=("decision",)))
+PREFILTER_FALSE_REJECTS = REGISTRY.register(Counter(
+    "knot_prefilter_false_rejects_total", "Prefilter-rejected frames where the model still found a person (audit mode)."))
+PREFILTER_SAVED_SECONDS = REGISTRY.register(Counter(
+    "knot_prefilter_saved_seconds_total", "Estimated model seconds saved by prefilter-skipped frames."))
+ROI_FRAMES = REGISTRY.register(Counter(
+    "knot_roi_frames_total", "Detections by ROI mode (crop, full frame, fallback after a lost crop).", labelnames=("mode",)))
+SCANS_RUNNING = REGISTRY.register(Gauge(
+    "knot_scans_running", "Scans admitted and currently processing."))
+SCANS_QUEUED = REGISTRY.register(Gauge(
+    "knot_scans_queued", "Scans waiting for admission, by priority class.", labelnames=("priority",)))
+ADMISSION_WAIT_SECONDS = REGISTRY.register(Histogram(
+    "knot_admission_wait_seconds", "Time admitted scans spent queued.", labelnames=("priority",)))
+ADMISSION_REJECTS = REGISTRY.register(Counter(
+    "knot_admission_rejects_total", "Scans shed by admission control.", labelnames=("status", "priority")))
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def observe_timings(timings):
+    """stage_timing listener: record stage durations into the histograms."""
+    for stage, seconds in timings.durations.items():
+        STAGE_SECONDS.observe(seconds, stage=stage)
+    REQUEST_SECONDS.observe(timings.total())
+
+
+def server_timing_header(timings):
+    """Format stage timings as a Server-Timing header value (milliseconds)."""
+    parts = [f"{stage};dur={seconds * 1000:.1f}" for stage, seconds in timings.durations.items()]
+    parts.append(f"total;dur={timings.total() * 1000:.1f}")
+    return ", ".join(parts)
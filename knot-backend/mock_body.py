@@ -0,0 +1,134 @@
+"""
+Precomputed body mesh for MOCK MODE.
+
+When no model is loaded, process_scan still answers with an SMPL-sized mesh
+(6890 vertices, 13776 faces) so load tests exercise the same serialization and
+measurement code as real scans. The body is built once with vectorized NumPy
+and every request only gets a copy of the vertex buffer.
+
+If the SMPL model file is available, its rest-pose template and real faces are
+used. Otherwise a procedural closed body with the same vertex/face counts is
+generated (SMPL is a closed genus-0 mesh, so F = 2V - 4).
+"""
+
+import logging
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+SMPL_NUM_VERTICES = 6890
+SMPL_NUM_FACES = 13776
+
+# Procedural layout: 84 rings x 82 segments + 2 poles = 6890 vertices,
+# 2 * 84 * 82 = 13776 triangles.
+_RINGS = 84
+_SEGMENTS = 82
+
+# Body profile from head (top pole) to feet (bottom pole), in the same
+# normalized coordinates the old cylinder mock used.
+# Columns: y, half-width (x), half-depth (z)
+_PROFILE = np.array([
+    [0.72, 0.000, 0.000],  # top of head
+    [0.66, 0.070, 0.080],
+    [0.60, 0.090, 0.100],  # head
+    [0.52, 0.070, 0.085],  # chin
+    [0.48, 0.055, 0.055],  # neck
+    [0.44, 0.200, 0.100],  # shoulders
+    [0.32, 0.170, 0.120],  # chest
+    [0.16, 0.140, 0.100],  # waist
+    [0.00, 0.180, 0.120],  # hips
+    [-0.20, 0.170, 0.090],  # thighs
+    [-0.45, 0.140, 0.060],  # knees
+    [-0.75, 0.120, 0.050],  # ankles
+    [-0.80, 0.000, 0.000],  # soles
+], dtype=np.float64)
+
+
+def _to_numpy(value):
+    """Convert torch tensors / chumpy objects / arrays from the SMPL file to numpy."""
+    if hasattr(value, 'detach'):
+        value = value.detach().cpu().numpy()
+    elif hasattr(value, 'r'):  # chumpy
+        value = value.r
+    elif hasattr(value, 'todense'):  # scipy sparse
+        value = value.todense()
+    return np.asarray(value)
+
+
+def _procedural_body():
+    """Build a closed, body-shaped surface of revolution with SMPL vertex/face counts."""
+    # Ring parameters: skip the poles (t=0 and t=1)
+    t = np.linspace(0.0, 1.0, _RINGS + 2)[1:-1]
+    knots = np.linspace(0.0, 1.0, len(_PROFILE))
+    y = np.interp(t, knots, _PROFILE[:, 0])
+    rx = np.interp(t, knots, _PROFILE[:, 1])
+    rz = np.interp(t, knots, _PROFILE[:, 2])
+
+    theta = np.linspace(0.0, 2 * np.pi, _SEGMENTS, endpoint=False)
+    cos_t = np.cos(theta)
+    sin_t = np.sin(theta)
+
+    # Pinch the front/back centre below the hips to suggest two legs
+    leg_weight = np.clip(-y / 0.2, 0.0, 1.0)[:, None]
+    pinch = 1.0 - 0.6 * leg_weight * np.abs(cos_t)[None, :] ** 8
+
+    ring_x = rx[:, None] * sin_t[None, :]
+    ring_z = rz[:, None] * cos_t[None, :] * pinch
+    ring_y = np.broadcast_to(y[:, None], ring_x.shape)
+    rings = np.stack([ring_x, ring_y, ring_z], axis=-1).reshape(-1, 3)
+
+    top = np.array([[0.0, _PROFILE[0, 0], 0.0]])
+    bottom = np.array([[0.0, _PROFILE[-1, 0], 0.0]])
+    vertices = np.concatenate([top, rings, bottom]).astype(np.float32)
+
+    # Faces
+    seg = np.arange(_SEGMENTS)
+    seg_next = (seg + 1) % _SEGMENTS
+    last = len(vertices) - 1
+
+    top_cap = np.stack([np.zeros(_SEGMENTS, dtype=np.int64), 1 + seg_next, 1 + seg], axis=1)
+    last_ring = 1 + (_RINGS - 1) * _SEGMENTS
+    bottom_cap = np.stack([np.full(_SEGMENTS, last), last_ring + seg, last_ring + seg_next], axis=1)
+
+    ring_start = 1 + np.arange(_RINGS - 1)[:, None] * _SEGMENTS
+    a = (ring_start + seg[None, :]).ravel()
+    b = (ring_start + seg_next[None, :]).ravel()
+    c = a + _SEGMENTS
+    d = b + _SEGMENTS
+    quads = np.concatenate([np.stack([a, b, c], axis=1), np.stack([b, d, c], axis=1)])
+
+    faces = np.concatenate([top_cap, quads, bottom_cap]).astype(np.int32)
+    return vertices, faces
+
+
+def build_mock_body(smpl_data=None):
+    """
+    Build the mock body once.
+
+    Returns (vertices [6890, 3] float32, faces [13776, 3] int32, source) where
+    source is "smpl_template" or "procedural".
+    """
+    if smpl_data:
+        try:
+            vertices = _to_numpy(smpl_data['v_template']).astype(np.float32)
+            faces = _to_numpy(smpl_data['faces'] if 'faces' in smpl_data else smpl_data['f']).astype(np.int32)
+            if vertices.shape == (SMPL_NUM_VERTICES, 3) and faces.shape == (SMPL_NUM_FACES, 3):
+                return vertices, faces, "smpl_template"
+            logger.warning(f"Unexpected SMPL template shapes {vertices.shape}/{faces.shape}, using procedural mock body")
+        except Exception as e:
+            logger.warning(f"Could not use SMPL template for mock body: {e}")
+
+    vertices, faces = _procedural_body()
+    return vertices, faces, "procedural"
+
+
+class MockBody:
+    """Precomputed SMPL-sized body handed out as cheap copies."""
+
+    def __init__(self, smpl_data=None):
+        self.vertices, self.faces, self.source = build_mock_body(smpl_data)
+        self.vertices.setflags(write=False)
+        self.faces.setflags(write=False)
+        logger.info(f"Mock body ready: {len(self.vertices)} vertices, {len(self.faces)} faces ({self.source})")
+
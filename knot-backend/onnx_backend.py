@@ -0,0 +1,202 @@
+"""
+ONNX Runtime CPU backend for the ROMP network.
+
+export_onnx() traces the ROMP backbone + heads (``romp.model``) to ONNX once,
+using the exact tensors ROMP's own preprocessing feeds it, and checks that ONNX
+Runtime reproduces the eager torch outputs within tolerance. enable_onnx_backend()
+then swaps ``romp.model`` for an OrtModel, so ``romp(frame)`` in the existing
+frame loop keeps its pre/post-processing (SMPL, smoothing) and only the network
+runs in ONNX Runtime's CPU execution provider.
+
+Environment:
+    KNOT_INFERENCE_BACKEND  torch | onnx (default torch)
+    KNOT_ONNX_PATH          exported model (default ~/.romp/ROMP_knot.onnx)
+
+The export writes <model>.json next to the .onnx file with the output layout
+and the parity check results.
+"""
+
+import json
+import logging
+import os
+import time
+from pathlib import Path
+
+import numpy as np
+import torch
+import torch.nn as nn
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_ONNX_PATH = Path.home() / ".romp" / "ROMP_knot.onnx"
+INPUT_NAME = "image"
+
+
+def onnx_path_from_env():
+    return Path(os.getenv("KNOT_ONNX_PATH", str(DEFAULT_ONNX_PATH)))
+
+
+def network_module(romp):
+    """The nn.Module ROMP runs on the preprocessed image (unwrapping DataParallel)."""
+    net = getattr(romp, "model", None)
+    if net is None:
+        raise RuntimeError("ROMP instance has no 'model' attribute to export")
+    return getattr(net, "module", net)
+
+
+def _flatten_outputs(outputs):
+    """Return (kind, names, tensors) for a tensor / tuple / dict network output."""
+    if isinstance(outputs, torch.Tensor):
+        return "tensor", ["output_0"], [outputs]
+    if isinstance(outputs, dict):
+        names = list(outputs.keys())
+        return "dict", names, [outputs[k] for k in names]
+    if isinstance(outputs, (list, tuple)):
+        return "tuple", [f"output_{i}" for i in range(len(outputs))], list(outputs)
+    raise TypeError(f"Unsupported network output type: {type(outputs)}")
+
+
+def capture_network_inputs(romp, frames):
+    """Run ROMP on frames and record the preprocessed tensors passed to the network."""
+    net = network_module(romp)
+    captured = []
+    handle = net.register_forward_pre_hook(lambda module, inputs: captured.append(
+        tuple(t.detach().clone() for t in inputs)))
+    try:
+        with torch.no_grad():
+            for frame in frames:
+                romp(frame)
+    finally:
+        handle.remove()
+    if not captured:
+        raise RuntimeError("ROMP never called its network; cannot determine the input layout")
+    return captured
+
+
+def create_session(onnx_path, threads=None, providers=None):
+    import onnxruntime as ort
+
+    options = ort.SessionOptions()
+    options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+    if threads:
+        options.intra_op_num_threads = threads
+        options.inter_op_num_threads = 1
+    return ort.InferenceSession(str(onnx_path), sess_options=options,
+                                providers=providers or ["CPUExecutionProvider"])
+
+
+def compare_outputs(session, net, inputs_list, output_names):
+    """Max absolute / relative difference between eager torch and ONNX Runtime."""
+    max_abs = 0.0
+    max_rel = 0.0
+    for inputs in inputs_list:
+        with torch.no_grad():
+            _, _, eager = _flatten_outputs(net(*inputs))
+        feed = {INPUT_NAME if i == 0 else f"input_{i}": t.cpu().numpy() for i, t in enumerate(inputs)}
+        ort_outputs = session.run(output_names, feed)
+        for ref, got in zip(eager, ort_outputs):
+            ref = ref.detach().cpu().numpy()
+            diff = np.abs(ref - got)
+            max_abs = max(max_abs, float(diff.max()) if diff.size else 0.0)
+            scale = float(np.abs(ref).max()) if ref.size else 0.0
+            if scale > 0:
+                max_rel = max(max_rel, float(diff.max()) / scale)
+    return max_abs, max_rel
+
+
+def export_onnx(romp, frames, onnx_path=None, opset=17, tolerance=1e-3):
+    """
+    Export ROMP's network to ONNX and verify it against eager torch.
+
+    frames are RGB images used both to capture the real input layout and for the
+    parity check. Raises RuntimeError if the relative difference exceeds tolerance.
+    """
+    onnx_path = Path(onnx_path or onnx_path_from_env())
+    onnx_path.parent.mkdir(parents=True, exist_ok=True)
+    net = network_module(romp).eval()
+
+    inputs_list = capture_network_inputs(romp, frames)
+    example = inputs_list[0]
+    with torch.no_grad():
+        kind, output_names, _ = _flatten_outputs(net(*example))
+
+    input_names = [INPUT_NAME] + [f"input_{i}" for i in range(1, len(example))]
+    dynamic_axes = {name: {0: "batch"} for name in input_names + output_names}
+    logger.info(f"Exporting ROMP network to {onnx_path} (input {tuple(example[0].shape)}, outputs {output_names})")
+    torch.onnx.export(
+        net, example, str(onnx_path),
+        input_names=input_names, output_names=output_names,
+        dynamic_axes=dynamic_axes, opset_version=opset,
+    )
+
+    session = create_session(onnx_path)
+    max_abs, max_rel = compare_outputs(session, net, inputs_list, output_names)
+    metadata = {
+        "output_kind": kind,
+        "output_names": output_names,
+        "input_names": input_names,
+        "input_shape": list(example[0].shape),
+        "opset": opset,
+        "torch_version": torch.__version__,
+        "exported_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "parity": {"frames": len(inputs_list), "max_abs_diff": max_abs, "max_rel_diff": max_rel, "tolerance": tolerance},
+    }
+    onnx_path.with_suffix(".json").write_text(json.dumps(metadata, indent=2))
+    if max_rel > tolerance:
+        raise RuntimeError(f"ONNX outputs differ from torch: max relative diff {max_rel:.2e} > {tolerance:.0e}")
+    logger.info(f"ONNX export verified: max abs diff {max_abs:.2e}, max rel diff {max_rel:.2e}")
+    return metadata
+
+
+class OrtModel(nn.Module):
+    """Drop-in replacement for romp.model that runs the exported graph in ONNX Runtime."""
+
+    def __init__(self, session, metadata):
+        super().__init__()
+        self.session = session
+        self.output_kind = metadata["output_kind"]
+        self.output_names = metadata["output_names"]
+        self.input_names = metadata.get("input_names", [INPUT_NAME])
+
+    def forward(self, *inputs):
+        feed = {name: t.detach().cpu().numpy() if isinstance(t, torch.Tensor) else np.asarray(t)
+                for name, t in zip(self.input_names, inputs)}
+        outputs = [torch.from_numpy(o) for o in self.session.run(self.output_names, feed)]
+        if self.output_kind == "tensor":
+            return outputs[0]
+        if self.output_kind == "dict":
+            return dict(zip(self.output_names, outputs))
+        return tuple(outputs)
+
+
+def load_onnx_network(onnx_path=None, threads=None):
+    """OrtModel for an exported graph (and its .json metadata), or None if it cannot be loaded."""
+    onnx_path = Path(onnx_path or onnx_path_from_env())
+    meta_path = onnx_path.with_suffix(".json")
+    if not onnx_path.exists() or not meta_path.exists():
+        logger.warning(f"ONNX model not found at {onnx_path}. Run: python export_onnx.py")
+        return None
+    try:
+        metadata = json.loads(meta_path.read_text())
+        session = create_session(onnx_path, threads=threads)
+    except ImportError:
+        logger.warning("onnxruntime is not installed; staying on eager torch")
+        return None
+    except Exception as e:
+        logger.warning(f"Could not load ONNX model {onnx_path}: {e}")
+        return None
+    logger.info(f"Loaded ONNX Runtime CPU network ({onnx_path.name}, parity {metadata.get('parity')})")
+    return OrtModel(session, metadata)
+
+
+def enable_onnx_backend(romp, onnx_path=None, threads=None):
+    """
+    Swap romp.model for an ONNX Runtime session. Returns the previous (eager)
+    network, or None if the backend could not be enabled.
+    """
+    network = load_onnx_network(onnx_path, threads=threads)
+    if network is None:
+        return None
+    eager = romp.model
+    romp.model = network
+    return eager
@@ -0,0 +1,132 @@
+"""
+Person-ROI cropping across sampled frames.
+
+After a detection, the 2D joints ROMP returns (``pj2d_org``, pixel coordinates
+of its input image) give the person's box. The next sampled frame is cropped
+to that box plus padding before inference. The model then sees fewer
+background pixels, and the person fills more of ROMP's 512px input. If the
+cropped frame yields no detection, the same frame is retried at full size and
+tracking restarts from the next detection.
+
+``pj2d_org`` in the returned outputs is shifted back to full-frame coordinates.
+Camera outputs (cam, cam_trans) stay relative to the crop.
+
+Environment:
+    KNOT_ROI_CROP      on | off (default off)
+    KNOT_ROI_PADDING   padding around the joint box, as a fraction of its size (default 0.3)
+    KNOT_ROI_MIN_SIZE  smallest crop side in pixels (default 256)
+"""
+
+import logging
+import os
+
+import numpy as np
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+JOINTS_2D_KEY = "pj2d_org"
+
+
+def enabled_from_env():
+    return os.getenv("KNOT_ROI_CROP", "off").lower() in ("1", "on", "true", "yes")
+
+
+def joint_box(outputs):
+    """(x0, y0, x1, y1) around the first person's 2D joints, or None."""
+    joints = outputs.get(JOINTS_2D_KEY) if isinstance(outputs, dict) else None
+    if joints is None:
+        return None
+    joints = np.asarray(joints, dtype=np.float32)
+    if joints.ndim == 3:
+        joints = joints[0]
+    if joints.ndim != 2 or joints.shape[-1] < 2 or len(joints) == 0:
+        return None
+    valid = np.isfinite(joints[:, :2]).all(axis=1)
+    if not valid.any():
+        return None
+    xy = joints[valid, :2]
+    return (float(xy[:, 0].min()), float(xy[:, 1].min()), float(xy[:, 0].max()), float(xy[:, 1].max()))
+
+
+class RoiTracker:
+    """Crop region for the next sampled frame of one video."""
+
+    def __init__(self, padding=None, min_size=None):
+        self.padding = float(os.getenv("KNOT_ROI_PADDING", "0.3")) if padding is None else padding
+        self.min_size = int(os.getenv("KNOT_ROI_MIN_SIZE", "256")) if min_size is None else min_size
+        self.box = None  # last person box in full-frame coordinates
+        self.cropped = 0
+        self.full = 0
+        self.fallbacks = 0
+        self.area_fractions = []
+
+    @classmethod
+    def from_env(cls):
+        return cls() if enabled_from_env() else None
+
+    def crop_region(self, frame_shape):
+        """(x0, y0, x1, y1) integer crop for a frame of frame_shape, or None for full frame."""
+        if self.box is None:
+            return None
+        height, width = frame_shape[:2]
+        x0, y0, x1, y1 = self.box
+        pad_x = (x1 - x0) * self.padding
+        pad_y = (y1 - y0) * self.padding
+        x0, x1 = _expand(x0 - pad_x, x1 + pad_x, self.min_size, width)
+        y0, y1 = _expand(y0 - pad_y, y1 + pad_y, self.min_size, height)
+        if (x1 - x0) * (y1 - y0) >= 0.9 * width * height:
+            return None  # cropping would save next to nothing
+        return x0, y0, x1, y1
+
+    def crop(self, frame, frame_rgb):
+        """Return (frame, frame_rgb, region) for inference; region is None for the full frame."""
+        region = self.crop_region(frame.shape)
+        if region is None:
+            return frame, frame_rgb, None
+        x0, y0, x1, y1 = region
+        return (np.ascontiguousarray(frame[y0:y1, x0:x1]),
+                np.ascontiguousarray(frame_rgb[y0:y1, x0:x1]), region)
+
+    def update(self, outputs, region, frame_shape):
+        """Shift a detection back to full-frame coordinates and track its box."""
+        if region is not None:
+            x0, y0 = region[0], region[1]
+            joints = outputs.get(JOINTS_2D_KEY)
+            if joints is not None:
+                joints = np.array(joints, dtype=np.float32, copy=True)
+                joints[..., 0] += x0
+                joints[..., 1] += y0
+                outputs[JOINTS_2D_KEY] = joints
+            self.cropped += 1
+            self.area_fractions.append((region[2] - x0) * (region[3] - y0) / float(frame_shape[0] * frame_shape[1]))
+            metrics.ROI_FRAMES.inc(mode="crop")
+        else:
+            self.full += 1
+            metrics.ROI_FRAMES.inc(mode="full")
+        self.box = joint_box(outputs)
+
+    def lost(self):
+        """The cropped frame had no detection: retry at full size, re-acquire later."""
+        self.fallbacks += 1
+        self.box = None
+        metrics.ROI_FRAMES.inc(mode="fallback")
+
+    def finish(self):
+        stats = {
+            "cropped_frames": self.cropped,
+            "full_frames": self.full,
+            "fallbacks": self.fallbacks,
+            "mean_crop_area": round(float(np.mean(self.area_fractions)), 3) if self.area_fractions else None,
+        }
+        logger.info(f"Person ROI: {stats}")
+        return stats
+
+
+def _expand(lo, hi, min_size, limit):
+    """Clamp [lo, hi) to [0, limit), growing it around its centre to at least min_size."""
+    size = min(limit, max(hi - lo, min_size))
+    centre = (lo + hi) / 2.0
+    lo = int(round(min(max(centre - size / 2.0, 0), limit - size)))
+    return lo, int(lo + size)
@@ -0,0 +1,645 @@
+"""
+Frame pipeline shared by the /process-scan and /process-photos endpoints and the bulk CLI.
+
+Sampling, decoding, preprocessing, per-frame detection and temporal smoothing
+live here so that offline reprocessing produces exactly what the API returns.
+
+Two ways through a video:
+
+    sampled  up to 10 frames across the middle of the clip, each seeked to
+             (detect_sampled_frames); enough for measurements
+    dense    every Nth frame, read sequentially, with decode, preprocess,
+             inference and post-processing as concurrent stages joined by
+             bounded queues (detect_dense_frames); for the video overlay
+"""
+
+import bisect
+import contextvars
+import logging
+import math
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+
+import numpy as np
+
+import compat
+import metrics
+import person_filter
+import person_roi
+import torch_runtime
+from inference_server import InferenceUnavailable, SlotCapacityError
+
+cv2 = compat.lazy_import("cv2")
+
+logger = logging.getLogger(__name__)
+
+VIDEO_SUFFIXES = {".mp4", ".mov", ".avi", ".mkv", ".webm"}
+MAX_FRAME_DIM = 1024  # ROMP works better with reasonable sizes
+SMOOTHING_ALPHA = 0.7
+DENSE_QUEUE_DEPTH = 8  # frames buffered between dense stages
+SEEK_PREROLL = 16  # cv2's FFmpeg backend seeks this many frames before the target, then decodes forward
+
+
+def frame_sample_ratios(frame_count, min_frames=5, max_frames=10):
+    """
+    Positions (0-1) of the frames to process.
+    Based on: https://www.12-technology.com/2022/01/romp-ai3d.html
+    Samples evenly across the middle 60% of the video, where the person is most stable.
+    The budget comes from the scan profile (profiles.py).
+    """
+    num_frames_to_process = min(max_frames, max(min_frames, frame_count // 10))  # 10% of video, within the budget
+    return np.linspace(0.2, 0.8, num_frames_to_process).tolist()
+
+
+def preprocess_frame(frame, max_dim=MAX_FRAME_DIM):
+    """Resize frames larger than max_dim and convert to RGB. Returns (frame, frame_rgb)."""
+    height, width = frame.shape[:2]
+    if max(height, width) > max_dim:
+        scale = max_dim / max(height, width)
+        new_width = int(width * scale)
+        new_height = int(height * scale)
+        frame = cv2.resize(frame, (new_width, new_height), interpolation=cv2.INTER_LINEAR)
+        logger.debug(f"Resized frame from {width}x{height} to {new_width}x{new_height}")
+    # OpenCV uses BGR, ROMP might expect RGB
+    if len(frame.shape) == 3 and frame.shape[2] == 3:
+        frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+    else:
+        frame_rgb = frame
+    return frame, frame_rgb
+
+
+def sample_indices(frame_count, frame_ratios):
+    """Frame index of each sampling ratio."""
+    return [int(frame_count * ratio) for ratio in frame_ratios]
+
+
+def seek_cost(frame_idx, keyframes):
+    """Frames decoded by a seek to frame_idx: from the keyframe at or before frame_idx - SEEK_PREROLL."""
+    start = max(frame_idx - SEEK_PREROLL, 0)
+    pos = bisect.bisect_right(keyframes, start)
+    return frame_idx - (keyframes[pos - 1] if pos else 0) + 1
+
+
+def read_forward(position, frame_idx, keyframes):
+    """
+    Whether to reach frame_idx by reading on from position (the next frame the
+    capture returns) rather than seeking: true when that decodes no more frames.
+    Needs the keyframe table from the container probe (probe.VideoInfo.keyframes).
+    """
+    if not keyframes or position is None or frame_idx < position:
+        return False
+    return frame_idx - position + 1 <= seek_cost(frame_idx, keyframes)
+
+
+def frames_decoded(indices, keyframes):
+    """Frames decoded to read the frames at indices in order (see read_forward); one each without keyframes."""
+    if not keyframes:
+        return len(indices)
+    total, position = 0, None
+    for idx in indices:
+        total += idx - position + 1 if read_forward(position, idx, keyframes) else seek_cost(idx, keyframes)
+        position = idx + 1
+    return total
+
+
+def iter_sampled_frames(cap, frame_count, frame_ratios, timings=None, prefilter=None, cache=None, video_id=None,
+                        keyframes=None, max_dim=MAX_FRAME_DIM):
+    """
+    Yield (frame_idx, ratio, frame, frame_rgb) for each sampled frame that decodes.
+    With keyframes, samples close enough together are read on to instead of seeked
+    to (see read_forward); the frames are the same either way.
+    With a person_filter.PersonPrefilter, rejected frames are replaced with a
+    nearby candidate, or the sample is dropped if none passes.
+    With a frame_cache.FrameCache, frames of video_id are served from it when
+    cached and cached after preprocessing when not; cap may then be None if the
+    video itself is gone (uncached frames are skipped). The cache holds frames
+    resized to MAX_FRAME_DIM, so it is bypassed for any other max_dim.
+    """
+    if max_dim != MAX_FRAME_DIM:
+        cache = None
+    position = None  # next frame cap.read() returns, when known
+    for ratio, sample_idx in zip(frame_ratios, sample_indices(frame_count, frame_ratios)):
+        candidates = prefilter.candidates(sample_idx, frame_count) if prefilter is not None else [sample_idx]
+        served_idx = None
+        for frame_idx in candidates:
+            with _stage(timings, "decode"):
+                cached = cache.get(video_id, frame_idx) if cache is not None else None
+                if cached is None and cap is not None:
+                    if read_forward(position, frame_idx, keyframes):
+                        success = all(cap.grab() for _ in range(frame_idx - position))
+                        success, frame = cap.read() if success else (False, None)
+                    else:
+                        cap.set(cv2.CAP_PROP_POS_FRAMES, frame_idx)
+                        success, frame = cap.read()
+                    position = frame_idx + 1 if success else None
+                else:
+                    success = False
+            if cached is not None:
+                frame, frame_rgb = cached
+            elif not success:
+                continue
+            else:
+                with _stage(timings, "preprocess"):
+                    frame, frame_rgb = preprocess_frame(frame, max_dim)
+                if cache is not None:
+                    cache.put(video_id, frame_idx, frame, frame_rgb)
+            if prefilter is not None:
+                with _stage(timings, "prefilter"):
+                    if not prefilter.check(frame_idx, frame):
+                        continue
+            served_idx = frame_idx
+            yield frame_idx, ratio, frame, frame_rgb
+            break
+        if prefilter is not None:
+            prefilter.sample_resolved(served_idx, sample_idx)
+
+
+def detect_sampled_frames(romp, bev, use_bev, cap, frame_count, frame_ratios, timings=None, prefetch_frames=False,
+                          reducer=None, cache=None, video_id=None, keyframes=None, max_dim=MAX_FRAME_DIM):
+    """
+    Decode the sampled frames and run the model on each; returns the (slim) detections.
+    Each detection goes through reducer (a new ResultReducer if none is given) as soon
+    as it arrives. prefetch_frames decodes in a background thread (see prefetch).
+    cache / video_id serve and keep decoded frames, keyframes plans the reads and
+    max_dim sizes the frames (see iter_sampled_frames).
+    """
+    prefilter = person_filter.PersonPrefilter.from_env()
+    roi = person_roi.RoiTracker.from_env()
+    frames = iter_sampled_frames(cap, frame_count, frame_ratios, timings, prefilter, cache, video_id, keyframes,
+                                 max_dim)
+    if prefetch_frames:
+        frames = prefetch(frames)
+    reducer = reducer if reducer is not None else ResultReducer()
+    for frame_idx, ratio, frame, frame_rgb in frames:
+        start = time.perf_counter()
+        if roi is not None:
+            model_frame, model_frame_rgb, region = roi.crop(frame, frame_rgb)
+            detection = detect_person(romp, bev, use_bev, model_frame, model_frame_rgb, frame_idx, ratio,
+                                      frame_count, timings)
+            if detection is None and region is not None:
+                # Tracking lost: retry this frame uncropped
+                roi.lost()
+                region = None
+                detection = detect_person(romp, bev, use_bev, frame, frame_rgb, frame_idx, ratio, frame_count, timings)
+            if detection is not None:
+                roi.update(detection, region, frame.shape)
+        else:
+            detection = detect_person(romp, bev, use_bev, frame, frame_rgb, frame_idx, ratio, frame_count, timings)
+        if prefilter is not None:
+            prefilter.observe(frame_idx, detection is not None, time.perf_counter() - start)
+        if detection is not None:
+            with _stage(timings, "smoothing"):
+                reducer.add(detection)
+    if prefilter is not None:
+        prefilter.finish()
+    if roi is not None:
+        roi.finish()
+    return reducer.frames
+
+
+def read_frames(cap, frame_count, stride=1):
+    """
+    Yield (frame_idx, frame) for every stride-th frame, reading sequentially
+    (no seeks). Frames in between are only grabbed, skipping the colour conversion.
+    """
+    frame_idx = 0
+    while frame_count <= 0 or frame_idx < frame_count:
+        if frame_idx % stride == 0:
+            success, frame = cap.read()
+            if not success:
+                return
+            yield frame_idx, frame
+        elif not cap.grab():
+            return
+        frame_idx += 1
+
+
+def detect_dense_frames(romp, bev, use_bev, cap, frame_count, stride=1, timings=None, reducer=None, temporal=None,
+                        on_frame=None, stats=None, depth=DENSE_QUEUE_DEPTH, max_dim=MAX_FRAME_DIM):
+    """
+    Run the model on every stride-th frame; returns the (slim) detections in frame order.
+    Decode, preprocess and inference each run in their own thread (see prefetch),
+    connected by queues of at most depth frames, and post-processing runs in the
+    calling thread. Inference stays a single in-order stage, so per-video temporal
+    state sees the frames in sequence.
+    Post-processing slims each detection, runs it through temporal (a
+    TemporalFilter), folds it into reducer and passes it to on_frame (e.g. to build
+    the per-frame mesh), so all four stages overlap. Stage timings then add up to
+    more than the wall time. stats, if given, gets frames_read, frames_inferred,
+    detections, seconds and fps (frames inferred per wall-clock second).
+    """
+    reducer = reducer if reducer is not None else ResultReducer()
+    counts = {"frames_read": 0, "frames_inferred": 0}
+
+    def decoded():
+        frames = read_frames(cap, frame_count, stride)
+        while True:
+            with _stage(timings, "decode"):
+                item = next(frames, None)
+            if item is None:
+                return
+            counts["frames_read"] += 1
+            yield item
+
+    def preprocess(item):
+        frame_idx, frame = item
+        with _stage(timings, "preprocess"):
+            return (frame_idx,) + preprocess_frame(frame, max_dim)
+
+    def infer(item):
+        frame_idx, frame, frame_rgb = item
+        counts["frames_inferred"] += 1
+        ratio = frame_idx / frame_count if frame_count > 0 else 0.0
+        return detect_person(romp, bev, use_bev, frame, frame_rgb, frame_idx, ratio, frame_count, timings)
+
+    start = time.perf_counter()
+    stages = prefetch(map(infer, prefetch(map(preprocess, prefetch(decoded(), depth)), depth)), depth)
+    for detection in stages:
+        if detection is None:
+            continue
+        with _stage(timings, "smoothing"):
+            frame = slim_detection(detection)
+            del detection
+            if temporal is not None:
+                temporal(frame)
+            reducer.add(frame)
+        if on_frame is not None:
+            on_frame(frame)
+    seconds = time.perf_counter() - start
+    if stats is not None:
+        stats.update(counts, detections=len(reducer), seconds=seconds,
+                     fps=counts["frames_inferred"] / seconds if seconds > 0 else 0.0)
+    logger.info(f"Dense pass: {counts['frames_inferred']} frames (stride {stride}) in {seconds:.1f}s "
+                f"({counts['frames_inferred'] / max(seconds, 1e-9):.1f} frames/s), {len(reducer)} detections")
+    return reducer.frames
+
+
+class OneEuroFilter:
+    """
+    One Euro filter (Casiez et al., CHI 2012) over numpy arrays, element-wise:
+    a low-pass whose cutoff rises with speed, so slow jitter is smoothed and fast
+    motion is not lagged. min_cutoff (Hz) sets the smoothing at rest, beta the
+    speed coefficient.
+    """
+
+    def __init__(self, min_cutoff=1.0, beta=0.0, d_cutoff=1.0, freq=30.0):
+        self.min_cutoff, self.beta, self.d_cutoff, self.freq = min_cutoff, beta, d_cutoff, freq
+        self.x_prev = None
+        self.dx_prev = None
+
+    def _alpha(self, cutoff):
+        tau = 1.0 / (2 * math.pi * cutoff)
+        return 1.0 / (1.0 + tau * self.freq)
+
+    def __call__(self, x):
+        x = np.asarray(x, dtype=np.float32)
+        if self.x_prev is None or self.x_prev.shape != x.shape:
+            self.x_prev, self.dx_prev = x, np.zeros_like(x)
+            return x
+        a_d = self._alpha(self.d_cutoff)
+        dx = a_d * (x - self.x_prev) * self.freq + (1 - a_d) * self.dx_prev
+        a = self._alpha(self.min_cutoff + self.beta * np.abs(dx))
+        x_hat = (a * x + (1 - a) * self.x_prev).astype(np.float32)
+        self.x_prev, self.dx_prev = x_hat, dx
+        return x_hat
+
+
+class TemporalFilter:
+    """
+    Per-video temporal smoothing for dense passes, with the One Euro settings ROMP
+    uses in video mode: pose (and the mesh and joints derived from it) at
+    min_cutoff = smooth_coeff, camera at 1.6 and shape at 0.6, beta 0.7. freq is the
+    rate of the processed frames (video fps / stride). Applied after the model, so it
+    behaves the same with every inference backend and per-scan state never mixes
+    between concurrent requests. Call it on each slim detection in frame order.
+    """
+
+    CUTOFFS = {"poses": None, "verts": None, "joints": None, "cam": 1.6, "betas": 0.6}
+
+    def __init__(self, smooth_coeff, freq=30.0, beta=0.7):
+        self.filters = {key: OneEuroFilter(cutoff or smooth_coeff, beta, freq=freq)
+                        for key, cutoff in self.CUTOFFS.items()}
+
+    def __call__(self, frame):
+        for key in ("verts", "joints"):
+            if frame.get(key) is not None:
+                frame[key] = self.filters[key](frame[key])
+        params = frame.get("params")
+        if isinstance(params, dict):
+            for key in ("poses", "cam", "betas"):
+                if params.get(key) is not None and hasattr(params[key], "shape"):
+                    params[key] = self.filters[key](params[key])
+        return frame
+
+
+def decode_image(data):
+    """BGR frame decoded from JPEG/PNG bytes in memory (no temp file), or None if undecodable."""
+    if not data:
+        return None
+    return cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+
+
+def detect_images(romp, bev, use_bev, frames, timings=None, workers=1, reducer=None):
+    """
+    Run the model on still photos in one pass; returns the (slim) detections in photo order.
+    frames are preprocessed (frame, frame_rgb) pairs. Each detection is tagged with the
+    photo index as _frame_idx and its position (0-1) in the set as _frame_ratio, then
+    reduced as in detect_sampled_frames.
+    workers > 1 submits the photos concurrently, which only helps when the model runs
+    in inference_server.py processes (an in-process model handles one frame at a time);
+    the batch is then timed as a single "inference" span.
+    """
+    count = len(frames)
+    reducer = reducer if reducer is not None else ResultReducer()
+
+    def detect(idx, timings=timings):
+        frame, frame_rgb = frames[idx]
+        ratio = idx / (count - 1) if count > 1 else 0.0
+        detection = detect_person(romp, bev, use_bev, frame, frame_rgb, idx, ratio, count, timings)
+        return slim_detection(detection) if detection is not None else None
+
+    if workers > 1 and count > 1:
+        with _stage(timings, "inference"), ThreadPoolExecutor(max_workers=min(workers, count)) as executor:
+            # Each photo runs in a copy of this context (e.g. torch_runtime.use_precision)
+            futures = [executor.submit(contextvars.copy_context().run, detect, idx, None) for idx in range(count)]
+            detections = [future.result() for future in futures]
+    else:
+        detections = map(detect, range(count))
+    # Smoothing is order-dependent: fold the photos in in order
+    for detection in detections:
+        if detection is not None:
+            with _stage(timings, "smoothing"):
+                reducer.add(detection)
+    return reducer.frames
+
+
+def prefetch(iterable, depth=4):
+    """
+    Run iterable in a background thread, buffering up to depth items, so decoding
+    overlaps with inference (cv2 and torch both release the GIL). The thread runs in
+    a copy of the caller's context (e.g. torch_runtime.use_precision).
+    """
+    items = queue.Queue(maxsize=depth)
+    done = object()
+    stop = threading.Event()
+
+    def produce():
+        try:
+            for item in iterable:
+                if stop.is_set():
+                    return
+                items.put(item)
+        except Exception as e:
+            items.put(e)
+        finally:
+            items.put(done)
+
+    thread = threading.Thread(target=contextvars.copy_context().run, args=(produce,), daemon=True)
+    thread.start()
+    try:
+        while True:
+            item = items.get()
+            if item is done:
+                return
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        stop.set()
+        while thread.is_alive():
+            try:
+                items.get_nowait()
+            except queue.Empty:
+                thread.join(timeout=0.05)
+
+
+def detect_person(romp, bev, use_bev, frame, frame_rgb, frame_idx, ratio, frame_count, timings=None):
+    """
+    Run the model on one frame. Returns the detection dict (tagged with
+    _frame_idx / _frame_ratio) or None if no person was found.
+    """
+    try:
+        # Use BEV if available, otherwise ROMP
+        metrics.FRAMES_INFERRED.inc()
+        with _stage(timings, "inference"), torch_runtime.inference_context():
+            if use_bev and bev is not None:
+                # BEV API (adjust based on actual BEV implementation)
+                outputs = romp(frame) if romp is not None else None  # Fallback for now
+            else:
+                # ROMP processing - pass frame directly
+                # ROMP expects input as numpy array or PIL Image
+                # ROMP can be called directly with image
+                try:
+                    outputs = romp(frame_rgb) if romp is not None else None
+                except (SlotCapacityError, InferenceUnavailable):
+                    raise
+                except Exception as romp_error:
+                    logger.warning(f"ROMP processing error: {romp_error}")
+                    # Try with original frame
+                    outputs = romp(frame) if romp is not None else None
+
+        # ROMP returns a dict with detection results or None
+        # Check if we have valid detection
+        if outputs and isinstance(outputs, dict):
+            # Check if this is a valid detection (has vertices or joints)
+            has_verts = 'verts' in outputs and outputs.get('verts') is not None
+            has_joints = 'joints' in outputs and outputs.get('joints') is not None
+
+            if has_verts or has_joints:
+                # Valid detection - add metadata
+                # Debug: log the shape of verts
+                if 'verts' in outputs:
+                    verts = outputs['verts']
+                    if hasattr(verts, 'shape'):
+                        logger.debug(f"Frame {frame_idx}: verts shape = {verts.shape}, type = {type(verts)}")
+                    elif isinstance(verts, (list, tuple)):
+                        logger.debug(f"Frame {frame_idx}: verts length = {len(verts)}, first element type = {type(verts[0]) if len(verts) > 0 else 'empty'}")
+                outputs['_frame_idx'] = frame_idx
+                outputs['_frame_ratio'] = ratio
+                metrics.DETECTIONS.inc()
+                logger.info(f"Successfully processed frame {frame_idx}/{frame_count} (person detected)")
+                return outputs
+            logger.warning(f"No valid detection in frame {frame_idx} (outputs keys: {list(outputs.keys())})")
+        elif isinstance(outputs, list) and len(outputs) > 0:
+            # Handle list format (if ROMP ever returns a list)
+            best_detection = outputs[0]
+            if isinstance(best_detection, dict):
+                best_detection['_frame_idx'] = frame_idx
+                best_detection['_frame_ratio'] = ratio
+                metrics.DETECTIONS.inc()
+                logger.info(f"Successfully processed frame {frame_idx}/{frame_count} ({len(outputs)} person(s) detected)")
+                return best_detection
+        elif outputs is not None:
+            # Unexpected format - log for debugging
+            logger.warning(f"Unexpected outputs format in frame {frame_idx}: {type(outputs)}, value: {str(outputs)[:100]}")
+        else:
+            logger.warning(f"No person detected in frame {frame_idx} (outputs is None)")
+    except (SlotCapacityError, InferenceUnavailable):
+        # The model could not run the frame, not a missed detection: fail the scan with it
+        raise
+    except Exception as e:
+        logger.warning(f"Failed to process frame {frame_idx}: {e}")
+        logger.exception("Frame processing error:")
+    return None
+
+
+def to_numpy(value):
+    """Convert a torch Tensor / list to a numpy array."""
+    # Handle torch Tensor
+    if hasattr(value, 'cpu'):
+        value = value.cpu()
+    if hasattr(value, 'detach'):
+        value = value.detach()
+    if hasattr(value, 'numpy'):
+        value = value.numpy()
+    if isinstance(value, np.ndarray):
+        return value
+    if hasattr(value, 'tolist'):
+        return np.array(value.tolist())
+    return np.asarray(value)
+
+
+def vertex_array(value):
+    """[vertices, 3] array from a verts output ([batch, vertices, 3] or [vertices, 3]), else None."""
+    verts = to_numpy(value)
+    # Handle batch dimension: [batch, vertices, 3] -> [vertices, 3]
+    if len(verts.shape) == 3:
+        return verts[0]
+    if len(verts.shape) == 2:
+        return verts
+    return None
+
+
+# Exponential smoothing for better temporal stability (reduces jitter)
+# Based on: https://www.12-technology.com/2022/01/romp-ai3d.html
+# Article mentions: "フレームごとの誤差をうまく丸め込み、3Dモデルの滑らかな動きを実現する必要がある"
+def exponential_smooth_results(results_list, alpha=0.6):
+    """
+    Apply exponential moving average to smooth results across frames.
+    alpha: smoothing factor (0-1), higher = more weight to recent frames
+    """
+    if not results_list or len(results_list) == 0:
+        return None
+
+    if len(results_list) == 1:
+        return results_list[0]
+
+    # Start with first result, then apply exponential smoothing to subsequent results
+    smoothed = _smooth_init(results_list[0])
+    for current in results_list[1:]:
+        _smooth_update(smoothed, current, alpha)
+    return smoothed
+
+
+def _smooth_init(first):
+    """Smoothing state initialized from the first result."""
+    smoothed = {}
+    for key in ['verts', 'joints', 'params']:
+        if key in first:
+            val = first[key]
+            if hasattr(val, 'copy'):
+                smoothed[key] = val.copy()
+            elif isinstance(val, dict):
+                smoothed[key] = val.copy()
+            else:
+                smoothed[key] = np.array(val) if isinstance(val, (list, tuple)) else val
+    return smoothed
+
+
+def _smooth_update(smoothed, current, alpha):
+    """Fold one more result into the smoothing state (in place)."""
+    for key in ['verts', 'joints']:
+        if key in current and key in smoothed:
+            curr_val = to_numpy(current[key])
+            smooth_val = smoothed[key]
+
+            # Convert to numpy arrays for computation
+            if not isinstance(smooth_val, np.ndarray):
+                smooth_val = np.array(smooth_val)
+
+            # Handle batch dimension: [batch, vertices, 3] -> [vertices, 3]
+            if len(curr_val.shape) == 3:
+                curr_val = curr_val[0]
+            if len(smooth_val.shape) == 3:
+                smooth_val = smooth_val[0]
+
+            # Ensure same shape
+            if curr_val.shape == smooth_val.shape:
+                smoothed[key] = alpha * curr_val + (1 - alpha) * smooth_val
+            else:
+                logger.warning(f"Shape mismatch for {key}: {curr_val.shape} vs {smooth_val.shape}, skipping smoothing")
+
+    # Smooth params (if they're numeric arrays)
+    if 'params' in current and 'params' in smoothed:
+        for param_key in current['params']:
+            if param_key in smoothed['params']:
+                curr_p = current['params'][param_key]
+                smooth_p = smoothed['params'][param_key]
+
+                if hasattr(curr_p, 'shape') and hasattr(smooth_p, 'shape'):
+                    if curr_p.shape == smooth_p.shape:
+                        smoothed['params'][param_key] = alpha * curr_p + (1 - alpha) * smooth_p
+
+
+# Detection fields read after detection (meshes, smoothing, measurements, scan store)
+RESULT_KEYS = ("verts", "joints", "params", "faces", "mesh_faces", "_frame_idx", "_frame_ratio")
+
+
+def slim_detection(detection):
+    """
+    Copy of a detection with only RESULT_KEYS, tensors moved to numpy. Everything
+    else the model returned (2D projections, center maps, image-sized outputs) is dropped.
+    """
+    slim = {}
+    for key in RESULT_KEYS:
+        value = detection.get(key)
+        if value is None:
+            continue
+        if key == "params" and isinstance(value, dict):
+            slim[key] = {k: to_numpy(v) if hasattr(v, "shape") else v for k, v in value.items()}
+        elif hasattr(value, "shape"):
+            slim[key] = to_numpy(value)
+        else:
+            slim[key] = value
+    return slim
+
+
+class ResultReducer:
+    """
+    Streaming replacement for collecting every detection and then calling
+    exponential_smooth_results. add() slims each detection as it arrives (see
+    slim_detection) and folds it into the smoothing state right away, so full model
+    outputs are never retained. frames keeps the slim per-frame results for the
+    per-frame meshes and the scan store; result() equals
+    exponential_smooth_results(frames, alpha).
+    """
+
+    def __init__(self, alpha=SMOOTHING_ALPHA):
+        self.alpha = alpha
+        self.frames = []
+        self._smoothed = None
+
+    def __len__(self):
+        return len(self.frames)
+
+    def add(self, detection):
+        frame = slim_detection(detection)
+        self.frames.append(frame)
+        if len(self.frames) == 2:
+            self._smoothed = _smooth_init(self.frames[0])
+        if len(self.frames) >= 2:
+            _smooth_update(self._smoothed, frame, self.alpha)
+        return frame
+
+    def result(self):
+        """The smoothed result (the only frame if there is one), or None."""
+        if not self.frames:
+            return None
+        return self.frames[0] if len(self.frames) == 1 else self._smoothed
+
+
+def _stage(timings, name):
+    return timings.stage(name) if timings is not None else nullcontext()
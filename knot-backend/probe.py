@@ -0,0 +1,472 @@
+"""
+Container probe: codec, dimensions, duration, frame rate and keyframes of an
+uploaded video, read from the container header before anything is decoded or
+copied to disk.
+
+process_scan used to find out that a video was unusable only after copying
+the upload and opening it with cv2. Now the header is parsed straight from the
+upload buffer. Only box / element headers are read: an MP4 whose moov box sits
+after the media data is found by seeking over mdat, not by reading it.
+
+    MP4 / MOV (ISO BMFF)  moov: mvhd, tkhd, mdhd, hdlr, stsd, stts, stss
+    AVI (RIFF)            hdrl: avih, strh, strf (no keyframe table)
+    Matroska / WebM       EBML header, Info, Tracks (no keyframe table; browser
+                          recordings often have no duration either)
+
+Anything else (MPEG-TS, FLV, 3GP variants, ...) returns None and is left to
+cv2, as is a recognized container whose header cannot be parsed. Empty uploads
+are rejected (400). Fragmented MP4 (moov with mvex, samples in moof boxes) has
+no sample tables up front: codec and size are probed, frame count and duration
+are left unknown.
+
+The probe result rejects inputs early (see check) and feeds scheduling and
+sampling. A seek decodes from the keyframe before the target (cv2 starts a few
+frames earlier still), so with the keyframe table admission prices the frames
+actually decoded (pipeline.frames_decoded), and the sampler reads on to the
+next sample instead of seeking when that decodes fewer frames
+(pipeline.read_forward).
+
+Environment:
+    KNOT_MAX_UPLOAD_MB        largest accepted upload (default 512); also checked
+                              against Content-Length before the body is read
+    KNOT_MAX_VIDEO_SECONDS    longest accepted video (default 300)
+    KNOT_MAX_VIDEO_DIM        longest accepted side in pixels (default 4096)
+    KNOT_PROBE_CODECS         accepted codecs (default h264,hevc,mpeg4,vp8,vp9,av1,mjpeg,prores)
+"""
+
+import logging
+import os
+import statistics
+import struct
+
+logger = logging.getLogger(__name__)
+
+MAX_UPLOAD_BYTES = int(float(os.getenv("KNOT_MAX_UPLOAD_MB", "512")) * (1 << 20))
+MAX_VIDEO_SECONDS = float(os.getenv("KNOT_MAX_VIDEO_SECONDS", "300"))
+MAX_VIDEO_DIM = int(os.getenv("KNOT_MAX_VIDEO_DIM", "4096"))
+SUPPORTED_CODECS = tuple(c.strip() for c in os.getenv(
+    "KNOT_PROBE_CODECS", "h264,hevc,mpeg4,vp8,vp9,av1,mjpeg,prores").lower().split(",") if c.strip())
+MAX_HEADER_BYTES = 64 << 20  # moov / hdrl / Tracks larger than this are not parsed
+
+INTRA_CODECS = ("mjpeg", "prores")  # every frame is a keyframe
+
+# Sample-entry FourCCs / Matroska CodecIDs -> codec name
+CODEC_NAMES = {
+    "avc1": "h264", "avc3": "h264", "h264": "h264", "x264": "h264", "v_mpeg4/iso/avc": "h264",
+    "hvc1": "hevc", "hev1": "hevc", "hevc": "hevc", "h265": "hevc", "v_mpegh/iso/hevc": "hevc",
+    "mp4v": "mpeg4", "xvid": "mpeg4", "divx": "mpeg4", "dx50": "mpeg4", "fmp4": "mpeg4",
+    "v_mpeg4/iso/sp": "mpeg4", "v_mpeg4/iso/asp": "mpeg4",
+    "vp08": "vp8", "v_vp8": "vp8", "vp09": "vp9", "v_vp9": "vp9", "av01": "av1", "v_av1": "av1",
+    "mjpg": "mjpeg", "jpeg": "mjpeg", "mjpa": "mjpeg", "mjpb": "mjpeg", "v_mjpeg": "mjpeg",
+    "apch": "prores", "apcn": "prores", "apcs": "prores", "apco": "prores", "ap4h": "prores", "ap4x": "prores",
+}
+
+
+class Rejected(Exception):
+    """An upload refused from its header: HTTP status and reason."""
+
+    def __init__(self, status_code, reason):
+        super().__init__(reason)
+        self.status_code = status_code
+        self.reason = reason
+
+
+class VideoInfo:
+    """What the container header says about the video track."""
+
+    def __init__(self, container, codec=None, width=None, height=None, duration=None, fps=None,
+                 frame_count=None, keyframes=None, has_video=True, header_bytes=0):
+        self.container = container
+        self.codec = codec
+        self.width = width
+        self.height = height
+        self.duration = duration
+        self.fps = fps
+        self.frame_count = frame_count
+        self.keyframes = keyframes  # sorted frame indices, or None if the container has no table up front
+        self.has_video = has_video
+        self.header_bytes = header_bytes
+
+    @property
+    def keyframe_interval(self):
+        """Median frames between keyframes (1 = intra-only), or None if unknown."""
+        if not self.keyframes:
+            return None
+        if len(self.keyframes) == 1:
+            return self.frame_count or None
+        return statistics.median(b - a for a, b in zip(self.keyframes, self.keyframes[1:]))
+
+    def as_dict(self):
+        return {
+            "container": self.container,
+            "codec": self.codec,
+            "width": self.width,
+            "height": self.height,
+            "duration_seconds": round(self.duration, 3) if self.duration else self.duration,
+            "fps": round(self.fps, 3) if self.fps else self.fps,
+            "frame_count": self.frame_count,
+            "keyframe_interval": self.keyframe_interval,
+        }
+
+
+def upload_size(fileobj):
+    """Size of a seekable upload in bytes (position is restored)."""
+    position = fileobj.tell()
+    try:
+        return fileobj.seek(0, os.SEEK_END)
+    finally:
+        fileobj.seek(position)
+
+
+def probe(fileobj):
+    """
+    VideoInfo from the header of a seekable binary file, or None if the container
+    is not recognized. A recognized header that cannot be parsed gives a VideoInfo
+    with only the container set. The file position is restored. Raises Rejected when
+    the container is recognized but cannot be used (e.g. an MP4 without a moov box).
+    """
+    position = fileobj.tell()
+    try:
+        fileobj.seek(0)
+        head = fileobj.read(16)
+        if len(head) < 12:
+            return None
+        if head[4:8] in (b"ftyp", b"moov", b"mdat", b"free", b"wide", b"skip", b"pnot"):
+            container, parse = "mp4", _probe_isobmff
+        elif head[:4] == b"RIFF" and head[8:12] == b"AVI ":
+            container, parse = "avi", _probe_avi
+        elif head[:4] == b"\x1a\x45\xdf\xa3":
+            container, parse = "matroska", _probe_matroska
+        else:
+            return None
+        try:
+            info = parse(fileobj)
+        except (struct.error, ValueError, IndexError) as e:
+            logger.info(f"Probe could not parse the {container} header: {e}")
+            return VideoInfo(container)
+        if info.keyframes is None and info.codec in INTRA_CODECS and info.frame_count:
+            info.keyframes = _every_frame(info.frame_count)
+        return info
+    finally:
+        fileobj.seek(position)
+
+
+def check(info, size=None):
+    """
+    Raise Rejected if the upload is empty or too large, has no usable video track
+    or an unsupported codec. An unrecognized container (info None) is left to cv2.
+    """
+    if size == 0:
+        raise Rejected(400, "Empty upload")
+    if size is not None and size > MAX_UPLOAD_BYTES:
+        raise Rejected(413, f"Upload is {size / (1 << 20):.1f} MB; the limit is {MAX_UPLOAD_BYTES / (1 << 20):.4g} MB")
+    if info is None:
+        return
+    if not info.has_video:
+        raise Rejected(415, f"No video track in the {info.container} file")
+    if info.codec is not None and info.codec not in SUPPORTED_CODECS:
+        raise Rejected(415, f"Unsupported video codec {info.codec!r} (supported: {', '.join(SUPPORTED_CODECS)})")
+    if info.frame_count == 0 or info.duration == 0:
+        raise Rejected(400, "Video has no frames")
+    if info.duration is not None and info.duration > MAX_VIDEO_SECONDS:
+        raise Rejected(413, f"Video is {info.duration:.0f}s long; the limit is {MAX_VIDEO_SECONDS:.0f}s")
+    if info.width and info.height and max(info.width, info.height) > MAX_VIDEO_DIM:
+        raise Rejected(413, f"Video is {info.width}x{info.height}; the longest side may be at most {MAX_VIDEO_DIM}px")
+
+
+def _every_frame(frame_count):
+    return list(range(frame_count)) if frame_count <= 1_000_000 else None
+
+
+def codec_name(tag):
+    tag = tag.strip().lower()
+    return CODEC_NAMES.get(tag, tag)
+
+
+# ISO BMFF (MP4 / MOV)
+
+def _box_header(f, end):
+    """(type, payload_start, box_end) of the box at the current position, or None at end."""
+    start = f.tell()
+    if start + 8 > end:
+        return None
+    size, box_type = struct.unpack(">I4s", f.read(8))
+    header = 8
+    if size == 1:
+        size = struct.unpack(">Q", f.read(8))[0]
+        header = 16
+    elif size == 0:
+        size = end - start
+    if size < header:
+        raise ValueError(f"bad box size {size}")
+    return box_type.decode("latin-1"), start + header, start + size
+
+
+def _children(data, start=0, end=None):
+    """Iterate (type, payload) over the boxes in data[start:end]."""
+    end = len(data) if end is None else end
+    offset = start
+    while offset + 8 <= end:
+        size, box_type = struct.unpack_from(">I4s", data, offset)
+        header = 8
+        if size == 1:
+            size = struct.unpack_from(">Q", data, offset + 8)[0]
+            header = 16
+        elif size == 0:
+            size = end - offset
+        if size < header or offset + size > end:
+            return
+        yield box_type.decode("latin-1"), data[offset + header:offset + size]
+        offset += size
+
+
+def _probe_isobmff(f):
+    end = f.seek(0, os.SEEK_END)
+    f.seek(0)
+    container, moov, header_bytes = "mp4", None, 0
+    while True:
+        box_start = f.tell()
+        box = _box_header(f, end)
+        if box is None:
+            break
+        box_type, payload_start, box_end = box
+        header_bytes += payload_start - box_start
+        if box_type == "ftyp":
+            brand = f.read(4)
+            container = "mov" if brand == b"qt  " else "mp4"
+            header_bytes += 4
+        elif box_type == "moov":
+            if box_end - payload_start > MAX_HEADER_BYTES:
+                raise Rejected(413, "Video header (moov) is too large")
+            moov = f.read(box_end - payload_start)
+            header_bytes += len(moov)
+            break
+        f.seek(box_end)
+    if moov is None:
+        raise Rejected(400, "Could not open video file (no moov box: truncated upload or unfinished recording)")
+
+    movie_duration = None
+    video = None
+    fragmented = False
+    for box_type, payload in _children(moov):
+        if box_type == "mvhd":
+            timescale, duration = _timescale_duration(payload, creation_fields=2)
+            movie_duration = duration / timescale if timescale else None
+        elif box_type == "trak":
+            track = _parse_trak(payload)
+            if track is not None and video is None:
+                video = track
+        elif box_type == "mvex":
+            fragmented = True
+    if fragmented:
+        # Samples live in the moof boxes after moov; the tables in moov are empty or partial
+        movie_duration = None
+        if video is not None:
+            for key in ("frame_count", "duration", "keyframes"):
+                video.pop(key, None)
+    if video is None:
+        return VideoInfo(container, has_video=False, duration=movie_duration, header_bytes=header_bytes)
+
+    frame_count = video.get("frame_count")
+    duration = video.get("duration") or movie_duration or None
+    fps = frame_count / duration if frame_count and duration else None
+    keyframes = video.get("keyframes")
+    if keyframes is None and frame_count:
+        keyframes = _every_frame(frame_count)  # no stss: every sample is a sync sample
+    return VideoInfo(container, codec=video.get("codec"), width=video.get("width"), height=video.get("height"),
+                     duration=duration, fps=fps, frame_count=frame_count, keyframes=keyframes,
+                     header_bytes=header_bytes)
+
+
+def _timescale_duration(payload, creation_fields):
+    """(timescale, duration) of an mvhd / mdhd payload."""
+    version = payload[0]
+    if version == 1:
+        return struct.unpack_from(">IQ", payload, 4 + 8 * creation_fields)
+    return struct.unpack_from(">II", payload, 4 + 4 * creation_fields)
+
+
+def _parse_trak(trak):
+    """Fields of a video track, or None for other tracks."""
+    track = {}
+    for box_type, payload in _children(trak):
+        if box_type == "tkhd":
+            # 16.16 fixed-point presentation size, at the end of the box
+            track["width"] = struct.unpack_from(">I", payload, len(payload) - 8)[0] >> 16
+            track["height"] = struct.unpack_from(">I", payload, len(payload) - 4)[0] >> 16
+        elif box_type == "mdia":
+            for mdia_type, mdia in _children(payload):
+                if mdia_type == "hdlr" and mdia[8:12] != b"vide":
+                    return None
+                if mdia_type == "mdhd":
+                    timescale, duration = _timescale_duration(mdia, creation_fields=2)
+                    track["duration"] = duration / timescale if timescale and duration else None
+                elif mdia_type == "minf":
+                    for minf_type, minf in _children(mdia):
+                        if minf_type == "stbl":
+                            _parse_stbl(minf, track)
+    return track if "codec" in track else None
+
+
+def _parse_stbl(stbl, track):
+    for box_type, payload in _children(stbl):
+        if box_type == "stsd" and struct.unpack_from(">I", payload, 4)[0] > 0:
+            # First sample entry: size, format, then the visual sample entry fields
+            track["codec"] = codec_name(payload[12:16].decode("latin-1"))
+            width, height = struct.unpack_from(">HH", payload, 16 + 24)
+            if width and height:
+                track["width"], track["height"] = width, height
+        elif box_type == "stts":
+            count = struct.unpack_from(">I", payload, 4)[0]
+            if count:  # empty in fragmented files: frame count unknown, not zero
+                track["frame_count"] = sum(struct.unpack_from(">I", payload, 8 + 8 * i)[0] for i in range(count))
+        elif box_type == "stss":
+            count = struct.unpack_from(">I", payload, 4)[0]
+            track["keyframes"] = [n - 1 for n in struct.unpack_from(f">{count}I", payload, 8)]
+
+
+# AVI (RIFF)
+
+def _probe_avi(f):
+    f.seek(12)
+    chunk_id, size, list_type = struct.unpack("<4sI4s", f.read(12))
+    if chunk_id != b"LIST" or list_type != b"hdrl":
+        return VideoInfo("avi", has_video=False, header_bytes=24)
+    if size > MAX_HEADER_BYTES:
+        raise Rejected(413, "Video header (hdrl) is too large")
+    hdrl = f.read(size - 4)
+    info = {"frame_count": None, "fps": None}
+    codec, width, height, has_video = None, None, None, False
+    for chunk_id, data in _riff_chunks(hdrl):
+        if chunk_id == b"avih":
+            us_per_frame, _, _, _, total_frames = struct.unpack_from("<5I", data)
+            width, height = struct.unpack_from("<II", data, 32)
+            info["frame_count"] = total_frames
+            info["fps"] = 1e6 / us_per_frame if us_per_frame else None
+        elif chunk_id == b"LIST" and data[:4] == b"strl":
+            strh = dict(_riff_chunks(data[4:]))
+            if b"strh" in strh and strh[b"strh"][:4] == b"vids" and not has_video:
+                has_video = True
+                handler = strh[b"strh"][4:8]
+                # strf is a BITMAPINFOHEADER: biCompression names the codec more reliably
+                strf = strh.get(b"strf", b"")
+                compression = strf[16:20] if len(strf) >= 20 else b""
+                tag = compression if compression.strip(b"\x00") else handler
+                codec = codec_name(tag.decode("latin-1"))
+    frame_count, fps = info["frame_count"], info["fps"]
+    duration = frame_count / fps if frame_count is not None and fps else None
+    return VideoInfo("avi", codec=codec, width=width, height=height, duration=duration, fps=fps,
+                     frame_count=frame_count, has_video=has_video, header_bytes=24 + len(hdrl))
+
+
+def _riff_chunks(data):
+    offset = 0
+    while offset + 8 <= len(data):
+        chunk_id, size = struct.unpack_from("<4sI", data, offset)
+        yield chunk_id, data[offset + 8:offset + 8 + size]
+        offset += 8 + size + (size & 1)
+
+
+# Matroska / WebM (EBML)
+
+EBML_IDS = {
+    "segment": 0x18538067, "info": 0x1549A966, "tracks": 0x1654AE6B, "cluster": 0x1F43B675,
+    "timecode_scale": 0x2AD7B1, "duration": 0x4489, "track_entry": 0xAE, "track_type": 0x83,
+    "codec_id": 0x86, "default_duration": 0x23E383, "video": 0xE0, "pixel_width": 0xB0, "pixel_height": 0xBA,
+}
+UNKNOWN_SIZE = -1
+
+
+def _ebml_vint(data, offset, keep_marker):
+    first = data[offset]
+    length = 1
+    while length <= 8 and not first & (0x80 >> (length - 1)):
+        length += 1
+    if length > 8:
+        raise ValueError("bad EBML vint")
+    value = first if keep_marker else first & (0xFF >> length)
+    for byte in data[offset + 1:offset + length]:
+        value = (value << 8) | byte
+    if not keep_marker and value == (1 << (7 * length)) - 1:
+        value = UNKNOWN_SIZE
+    return value, offset + length
+
+
+def _ebml_elements(data, start=0, end=None):
+    """Iterate (id, payload_start, payload_end) over data[start:end]; unknown sizes run to end."""
+    end = len(data) if end is None else end
+    offset = start
+    while offset < end:
+        element_id, offset = _ebml_vint(data, offset, keep_marker=True)
+        size, offset = _ebml_vint(data, offset, keep_marker=False)
+        payload_end = end if size == UNKNOWN_SIZE else min(offset + size, end)
+        yield element_id, offset, payload_end
+        if size == UNKNOWN_SIZE:
+            return
+        offset = payload_end
+
+
+def _ebml_uint(data, start, end):
+    return int.from_bytes(data[start:end], "big") if end > start else 0
+
+
+def _probe_matroska(f):
+    # Metadata precedes the first Cluster: read growing prefixes until one holds it
+    data, limit = b"", 64 << 10
+    while True:
+        f.seek(0)
+        data = f.read(limit)
+        if b"\x1f\x43\xb6\x75" in data or len(data) < limit or limit >= MAX_HEADER_BYTES:
+            break
+        limit *= 4
+    segment = None
+    for element_id, start, end in _ebml_elements(data):
+        if element_id == EBML_IDS["segment"]:
+            segment = (start, end)
+            break
+    if segment is None:
+        return VideoInfo("matroska", has_video=False, header_bytes=len(data))
+
+    timecode_scale, duration_ticks, video = 1_000_000, None, None
+    header_end = segment[1]
+    for element_id, start, end in _ebml_elements(data, *segment):
+        if element_id == EBML_IDS["cluster"]:
+            header_end = start
+            break
+        if element_id == EBML_IDS["info"]:
+            for child_id, child_start, child_end in _ebml_elements(data, start, end):
+                if child_id == EBML_IDS["timecode_scale"]:
+                    timecode_scale = _ebml_uint(data, child_start, child_end)
+                elif child_id == EBML_IDS["duration"]:
+                    fmt = ">f" if child_end - child_start == 4 else ">d"
+                    duration_ticks = struct.unpack(fmt, data[child_start:child_end])[0]
+        elif element_id == EBML_IDS["tracks"]:
+            for entry_id, entry_start, entry_end in _ebml_elements(data, start, end):
+                if entry_id == EBML_IDS["track_entry"] and video is None:
+                    video = _parse_track_entry(data, entry_start, entry_end)
+    if video is None:
+        return VideoInfo("matroska", has_video=False, header_bytes=header_end)
+
+    duration = duration_ticks * timecode_scale / 1e9 if duration_ticks else None
+    fps = 1e9 / video["default_duration"] if video.get("default_duration") else None
+    frame_count = int(round(duration * fps)) if duration and fps else None
+    return VideoInfo("matroska", codec=video.get("codec"), width=video.get("width"), height=video.get("height"),
+                     duration=duration, fps=fps, frame_count=frame_count, header_bytes=header_end)
+
+
+def _parse_track_entry(data, start, end):
+    track = {}
+    for element_id, child_start, child_end in _ebml_elements(data, start, end):
+        if element_id == EBML_IDS["track_type"] and _ebml_uint(data, child_start, child_end) != 1:
+            return None
+        if element_id == EBML_IDS["codec_id"]:
+            track["codec"] = codec_name(data[child_start:child_end].decode("latin-1").rstrip("\x00"))
+        elif element_id == EBML_IDS["default_duration"]:
+            track["default_duration"] = _ebml_uint(data, child_start, child_end)
+        elif element_id == EBML_IDS["video"]:
+            for video_id, video_start, video_end in _ebml_elements(data, child_start, child_end):
+                if video_id == EBML_IDS["pixel_width"]:
+                    track["width"] = _ebml_uint(data, video_start, video_end)
+                elif video_id == EBML_IDS["pixel_height"]:
+                    track["height"] = _ebml_uint(data, video_start, video_end)
+    return track if "codec" in track else None
@@ -0,0 +1,123 @@
+"""
+Speed / quality profiles for scan processing.
+
+The frame budget, the input resolution, the network precision, the mesh LODs
+and what a scan produces used to be fixed in process_scan. A profile names one
+combination of them. Clients pick one per request with the `profile` form field
+of /process-scan, /process-photos and /reprocess-scan (GET /profiles lists them).
+
+               frames              max_dim     precision  lod / per-frame   artifacts                          p95 target
+    preview    3                   512         int8       low / low         measurements                       2.5 s
+    standard   5-10 (10% of clip)  1024        configured configured        per-frame meshes, measurements     6 s
+                                                                            (KNOT_MEASUREMENT_POSE), persisted
+    precise    10-20 (10% of clip) 1024 (1536  fp32       full / medium     per-frame meshes, measurements,    10 s
+                                   with ROI)                                A-pose measurements, persisted
+
+- frames      sampled frames: 10% of the clip, clamped to [min_frames, max_frames]
+              (sampled mode; dense mode is set by frame_stride)
+- max_dim     longest side frames are resized to before the model. ROMP works at
+              512 internally, so above 1024 it only matters for person_roi crops:
+              roi_max_dim applies instead to sampled frames when KNOT_ROI_CROP is on.
+              MAX_INPUT_DIM sizes the inference server's frame slots
+- precision   int8 needs the gated INT8 model (quantize_int8.py); without it, or
+              when the model runs in inference_server.py processes, the configured
+              precision is used. The response's inference_precision says which ran
+- artifacts   per_frame_meshes (video overlay), measurements (observed pose),
+              canonical_measurements (re-skinned into measurement_pose) and
+              persist (scan store)
+
+Standard reads its LODs, precision and measurement pose from the KNOT_* settings,
+so with no profile field a scan is processed exactly as before. lod / frame_lod
+form fields still override the profile's.
+
+The latency targets are p95 of /process-scan for REFERENCE_CLIP (synthetic, 720p,
+5 s) with the real model, eager torch on an 8-core x86 CPU.
+`benchmarks/bench_process_scan.py --profiles preview,standard,precise` fails when
+a profile misses its target (--target-scale for other hardware).
+
+Environment:
+    KNOT_SCAN_PROFILE   profile used when a request names none (default standard)
+"""
+
+import os
+
+REFERENCE_CLIP = (1280, 720, 150)  # width, height, frames (30 fps)
+
+ARTIFACTS = ("per_frame_meshes", "measurements", "canonical_measurements", "persist")
+
+
+class ScanProfile:
+    """One named set of processing settings; None means the configured default."""
+
+    def __init__(self, name, description, min_frames, max_frames, max_dim, latency_target_ms,
+                 precision=None, lod=None, frame_lod=None, alpha=0.7, measurement_pose=None,
+                 artifacts=ARTIFACTS, roi_max_dim=None):
+        self.name = name
+        self.description = description
+        self.min_frames = min_frames
+        self.max_frames = max_frames
+        self.max_dim = max_dim
+        self.roi_max_dim = roi_max_dim
+        self.latency_target_ms = latency_target_ms
+        self.precision = precision
+        self.lod = lod
+        self.frame_lod = frame_lod
+        self.alpha = alpha
+        self.measurement_pose = measurement_pose
+        self.artifacts = frozenset(artifacts)
+
+    def produces(self, artifact):
+        return artifact in self.artifacts
+
+    def sampled_max_dim(self, roi_crop):
+        """max_dim for sampled video frames; roi_max_dim when person-ROI cropping is on."""
+        return self.roi_max_dim if roi_crop and self.roi_max_dim else self.max_dim
+
+    def as_dict(self):
+        return {
+            "name": self.name,
+            "description": self.description,
+            "frames": [self.min_frames, self.max_frames],
+            "max_dim": self.max_dim,
+            "roi_max_dim": self.roi_max_dim,
+            "precision": self.precision,
+            "lod": self.lod,
+            "frame_lod": self.frame_lod,
+            "smoothing_alpha": self.alpha,
+            "measurement_pose": self.measurement_pose,
+            "artifacts": sorted(self.artifacts),
+            "latency_target_ms": self.latency_target_ms,
+        }
+
+
+PROFILES = {
+    "preview": ScanProfile(
+        "preview", "Fast first look: 3 frames at low resolution, INT8, light meshes, no overlay or storage",
+        min_frames=3, max_frames=3, max_dim=512, latency_target_ms=2500, precision="int8",
+        lod="low", frame_lod="low", measurement_pose="observed", artifacts=("measurements",)),
+    "standard": ScanProfile(
+        "standard", "Default: up to 10 frames, configured precision and LODs",
+        min_frames=5, max_frames=10, max_dim=1024, latency_target_ms=6000),
+    "precise": ScanProfile(
+        "precise", "Most frames, full resolution for ROI crops, fp32, full mesh, A-pose measurements",
+        min_frames=10, max_frames=20, max_dim=1024, roi_max_dim=1536, latency_target_ms=10000, precision="fp32",
+        lod="full", frame_lod="medium", measurement_pose="a", artifacts=ARTIFACTS),
+}
+
+# Largest frame side any profile sends to the model (inference_server.py sizes its slots for it)
+MAX_INPUT_DIM = max(max(p.max_dim, p.roi_max_dim or 0) for p in PROFILES.values())
+
+DEFAULT_PROFILE = os.getenv("KNOT_SCAN_PROFILE", "standard").lower()
+
+
+def get_profile(name=None):
+    """The named profile (KNOT_SCAN_PROFILE when name is empty); ValueError for an unknown name."""
+    name = (name or DEFAULT_PROFILE).lower()
+    if name not in PROFILES:
+        raise ValueError(f"profile must be one of {tuple(PROFILES)}")
+    return PROFILES[name]
+
+
+def precisions():
+    """Network precisions the profiles ask for (beyond the configured one)."""
+    return {p.precision for p in PROFILES.values() if p.precision is not None}
@@ -0,0 +1,202 @@
+"""
+On-demand request profiling for live workers.
+
+A sampled fraction of scan requests (or a single request with ?profile=1 and
+a valid admin token) is run under cProfile or the torch profiler. Output goes
+to KNOT_PROFILE_DIR:
+
+- cprofile: <name>.prof (snakeviz / pstats) and <name>.folded
+- torch:    <name>.json (chrome://tracing) and <name>.folded (self CPU time)
+
+.folded files are collapsed stacks that flamegraph.pl / speedscope read
+directly. When sampling is off, wants_profile() costs one float comparison.
+cProfile only sees the thread it was enabled in, so the scan work is wrapped
+with profiled() where it runs (the threadpool thread executing the scan).
+
+Environment:
+    KNOT_ADMIN_TOKEN          enables /admin/profiling and ?profile=1
+    KNOT_PROFILE_SAMPLE_RATE  fraction of requests to profile (default 0)
+    KNOT_PROFILE_MODE         cprofile | torch (default cprofile)
+    KNOT_PROFILE_DIR          output directory (default /tmp/knot_profiles)
+    KNOT_PROFILE_MAX_FILES    oldest outputs are pruned beyond this (default 200)
+"""
+
+import cProfile
+import functools
+import hmac
+import itertools
+import logging
+import os
+import pstats
+import random
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+MODES = ("cprofile", "torch")
+
+ADMIN_TOKEN = os.getenv("KNOT_ADMIN_TOKEN", "")
+
+_state = {
+    "sample_rate": float(os.getenv("KNOT_PROFILE_SAMPLE_RATE", "0")),
+    "mode": os.getenv("KNOT_PROFILE_MODE", "cprofile"),
+    "output_dir": Path(os.getenv("KNOT_PROFILE_DIR", "/tmp/knot_profiles")),
+    "max_files": int(os.getenv("KNOT_PROFILE_MAX_FILES", "200")),
+    "profiled": 0,
+}
+
+# cProfile and the torch profiler are process-wide hooks; profile one request at a time
+_profile_lock = threading.Lock()
+# Numbers this worker's outputs: several profiles can finish within the same second
+_sequence = itertools.count(1)
+
+
+def is_admin(request):
+    """True if the request carries the configured X-Admin-Token."""
+    if not ADMIN_TOKEN:
+        return False
+    token = request.headers.get("x-admin-token", "")
+    return hmac.compare_digest(token, ADMIN_TOKEN)
+
+
+def wants_profile(request, paths):
+    """Decide whether this request should be profiled; only requests to paths (the heavy endpoints) are."""
+    if request.url.path not in paths:
+        return False
+    rate = _state["sample_rate"]
+    if rate > 0 and random.random() < rate:
+        return True
+    return request.query_params.get("profile") == "1" and is_admin(request)
+
+
+def configure(sample_rate=None, mode=None):
+    """Update sampling settings at runtime (admin toggle)."""
+    if sample_rate is not None:
+        sample_rate = float(sample_rate)
+        if not 0.0 <= sample_rate <= 1.0:
+            raise ValueError("sample_rate must be between 0 and 1")
+        _state["sample_rate"] = sample_rate
+    if mode is not None:
+        if mode not in MODES:
+            raise ValueError(f"mode must be one of {MODES}")
+        _state["mode"] = mode
+    logger.info(f"Profiling configured: sample_rate={_state['sample_rate']}, mode={_state['mode']}")
+    return status()
+
+
+def status():
+    output_dir = _state["output_dir"]
+    recent = []
+    if output_dir.exists():
+        recent = [p.name for p in sorted(output_dir.glob("*.folded"), key=lambda p: p.stat().st_mtime)[-10:]]
+    return {
+        "sample_rate": _state["sample_rate"],
+        "mode": _state["mode"],
+        "output_dir": str(output_dir),
+        "profiled_requests": _state["profiled"],
+        "recent": recent,
+    }
+
+
+def _frame_label(func):
+    filename, line, name = func
+    if filename == "~":
+        return name  # builtins, e.g. <built-in method ...>
+    return f"{name} ({Path(filename).name}:{line})"
+
+
+def write_folded_from_pstats(stats, path, max_depth=64):
+    """
+    Convert cProfile stats to collapsed stacks.
+
+    cProfile only records caller->callee edges, so each edge's time is split
+    proportionally down the call tree (same approach as flameprof).
+    """
+    raw = stats.stats
+    callees = {}
+    for func, (_, _, _, _, callers) in raw.items():
+        for caller, edge in callers.items():
+            callees.setdefault(caller, {})[func] = edge
+    roots = [func for func, entry in raw.items() if not entry[4]]
+
+    lines = {}
+
+    def walk(func, path_labels, cumulative, stack):
+        entry = raw.get(func)
+        if entry is None or func in stack or len(stack) >= max_depth:
+            return
+        total_ct = entry[3]
+        ratio = cumulative / total_ct if total_ct > 0 else 0.0
+        labels = path_labels + [_frame_label(func)]
+        self_us = int(entry[2] * ratio * 1e6)
+        if self_us > 0:
+            key = ";".join(labels)
+            lines[key] = lines.get(key, 0) + self_us
+        for child, edge in callees.get(func, {}).items():
+            walk(child, labels, edge[3] * ratio, stack | {func})
+
+    for root in roots:
+        walk(root, [], raw[root][3], frozenset())
+
+    with open(path, "w") as f:
+        for key, value in sorted(lines.items()):
+            f.write(f"{key} {value}\n")
+
+
+def _prune(output_dir, max_files):
+    files = sorted(output_dir.glob("*"), key=lambda p: p.stat().st_mtime)
+    for old in files[:-max_files] if max_files > 0 else []:
+        try:
+            old.unlink()
+        except OSError:
+            pass
+
+
+def profiled(fn, name):
+    """fn wrapped to run under profile_request(name) in whichever thread calls it."""
+    @functools.wraps(fn)
+    def run(*args, **kwargs):
+        with profile_request(name):
+            return fn(*args, **kwargs)
+    return run
+
+
+@contextmanager
+def profile_request(name):
+    """Profile the enclosed block with the configured mode and write the outputs."""
+    if not _profile_lock.acquire(blocking=False):
+        # Another request is already being profiled in this worker
+        yield
+        return
+
+    mode = _state["mode"]
+    output_dir = _state["output_dir"]
+    output_dir.mkdir(parents=True, exist_ok=True)
+    stem = output_dir / (f"{time.strftime('%Y%m%d-%H%M%S')}_{os.getpid()}-{next(_sequence)}_"
+                         f"{name.strip('/').replace('/', '_')}_{mode}")
+
+    try:
+        if mode == "torch":
+            import torch.profiler
+
+            with torch.profiler.profile(activities=[torch.profiler.ProfilerActivity.CPU], with_stack=True) as prof:
+                yield
+            prof.export_chrome_trace(f"{stem}.json")
+            prof.export_stacks(f"{stem}.folded", "self_cpu_time_total")
+        else:
+            profiler = cProfile.Profile()
+            profiler.enable()
+            try:
+                yield
+            finally:
+                profiler.disable()
+            profiler.dump_stats(f"{stem}.prof")
+            write_folded_from_pstats(pstats.Stats(profiler), f"{stem}.folded")
+        _state["profiled"] += 1
+        logger.info(f"Wrote {mode} profile to {stem}.*")
+        _prune(output_dir, _state["max_files"])
+    finally:
+        _profile_lock.release()
@@ -0,0 +1,442 @@
+#!/usr/bin/env python3
+"""
+Model provisioning for ~/.romp (ROMP / SMPL model data).
+
+Replaces the single-stream urlretrieve + extractall with:
+
+- parallel chunked download over HTTP range requests, falling back to one
+  stream when the server does not support ranges
+- resume after interruption: chunks land in ``<zip>.part`` and the finished
+  ones are recorded in ``<zip>.part.json`` (keyed by size + ETag)
+- hash verification: the archive against KNOT_MODEL_SHA256 (optional), and
+  every extracted file against a manifest (``.provisioned.json``) written at
+  extraction time, or against KNOT_MODEL_MANIFEST when one is given
+- a cross-process file lock, so workers starting together provision once and
+  the others wait, then see the finished files
+- a local mirror: a directory holding the archive or already extracted
+  files, or another base URL
+
+Run it ahead of time (e.g. in the image build) so server startup never
+downloads:
+
+    python provisioning.py
+    python provisioning.py --verify
+    python provisioning.py --mirror /mnt/artifacts/romp
+
+It also builds the decimated mesh LODs (smpl_lod.py) into their cache, so the
+quadric decimation never runs in a server worker, and writes the SMPL faces as
+a plain .npy (SMPL_FACES_NAME): HTTP workers behind the inference server read
+them from there instead of torch-loading the SMPL file.
+
+Environment:
+    KNOT_MODEL_URL           archive URL (default: the ROMP V2.0 smpl_model_data.zip release)
+    KNOT_MODEL_MIRROR        directory or base URL tried before KNOT_MODEL_URL
+    KNOT_MODEL_SHA256        expected sha256 of the archive
+    KNOT_MODEL_MANIFEST      JSON {"relative path": "sha256", ...} for the extracted files
+    KNOT_DOWNLOAD_CONNECTIONS  parallel range requests (default 4)
+    KNOT_DOWNLOAD_CHUNK_MB   chunk size (default 8)
+"""
+
+import argparse
+import fcntl
+import hashlib
+import json
+import logging
+import os
+import shutil
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_URL = "https://github.com/Arthur151/ROMP/releases/download/V2.0/smpl_model_data.zip"
+ARCHIVE_NAME = "smpl_model_data.zip"
+REQUIRED_FILES = ("ROMP.pkl", "SMPL_NEUTRAL.pth")
+MANIFEST_NAME = ".provisioned.json"
+SMPL_FACES_NAME = "smpl_faces.npy"
+LOCK_NAME = ".provision.lock"
+RETRIES = 3
+TIMEOUT = 60
+
+
+class ProvisioningError(RuntimeError):
+    pass
+
+
+def sha256_file(path, block_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+@contextmanager
+def file_lock(path, timeout=None):
+    """Exclusive flock on path, waiting up to timeout seconds (None = forever)."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "w") as lock_file:
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                break
+            except BlockingIOError:
+                if deadline is not None and time.monotonic() > deadline:
+                    raise ProvisioningError(f"Timed out waiting for {path}")
+                time.sleep(0.5)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def _probe(url):
+    """(size or None, accepts ranges, etag) of url."""
+    request = urllib.request.Request(url, headers={"Range": "bytes=0-0"})
+    with urllib.request.urlopen(request, timeout=TIMEOUT) as response:
+        etag = response.headers.get("ETag", "")
+        content_range = response.headers.get("Content-Range", "")
+        if response.status == 206 and "/" in content_range:
+            total = content_range.rsplit("/", 1)[1]
+            return (int(total) if total.isdigit() else None), True, etag
+        length = response.headers.get("Content-Length")
+        return (int(length) if length else None), False, etag
+
+
+def _fetch_range(url, part_path, start, end):
+    """Download bytes [start, end] of url into part_path at the same offset."""
+    request = urllib.request.Request(url, headers={"Range": f"bytes={start}-{end}"})
+    for attempt in range(RETRIES):
+        try:
+            with urllib.request.urlopen(request, timeout=TIMEOUT) as response, open(part_path, "r+b") as f:
+                if response.status != 206:
+                    raise ProvisioningError(f"Expected 206 for a range request, got {response.status}")
+                f.seek(start)
+                written = 0
+                while True:
+                    block = response.read(1 << 20)
+                    if not block:
+                        break
+                    f.write(block)
+                    written += len(block)
+                # On disk before the chunk is recorded as done
+                f.flush()
+                os.fsync(f.fileno())
+            if written != end - start + 1:
+                raise ProvisioningError(f"Short read for bytes {start}-{end}: {written}")
+            return
+        except (OSError, urllib.error.URLError, ProvisioningError) as e:
+            if attempt == RETRIES - 1:
+                raise
+            logger.warning(f"Chunk {start}-{end} failed ({e}), retrying")
+            time.sleep(2 ** attempt)
+
+
+def download(url, dest, connections=None, chunk_size=None, sha256=None):
+    """
+    Download url to dest: parallel range requests with resume when the server
+    supports them, one stream otherwise. Verifies sha256 when given.
+    """
+    dest = Path(dest)
+    connections = connections or int(os.getenv("KNOT_DOWNLOAD_CONNECTIONS", "4"))
+    chunk_size = chunk_size or int(float(os.getenv("KNOT_DOWNLOAD_CHUNK_MB", "8")) * (1 << 20))
+    part_path = dest.with_name(dest.name + ".part")
+    state_path = dest.with_name(dest.name + ".part.json")
+    dest.parent.mkdir(parents=True, exist_ok=True)
+
+    size, ranges, etag = _probe(url)
+    start_time = time.perf_counter()
+    if ranges and size:
+        chunks = [(start, min(start + chunk_size, size) - 1) for start in range(0, size, chunk_size)]
+        state = {"url": url, "size": size, "etag": etag, "chunk_size": chunk_size, "done": []}
+        if part_path.exists() and state_path.exists():
+            try:
+                saved = json.loads(state_path.read_text())
+                same = all(saved.get(key) == state[key] for key in ("size", "etag", "chunk_size"))
+                if same and part_path.stat().st_size == size:
+                    state["done"] = saved.get("done", [])
+                    logger.info(f"Resuming {dest.name}: {len(state['done'])}/{len(chunks)} chunks present")
+            except (OSError, ValueError):
+                pass
+        if not state["done"]:
+            with open(part_path, "wb") as f:
+                f.truncate(size)
+
+        state_lock = threading.Lock()
+
+        def fetch(index):
+            start, end = chunks[index]
+            _fetch_range(url, part_path, start, end)
+            with state_lock:
+                state["done"].append(index)
+                tmp_state = state_path.with_suffix(".tmp")
+                tmp_state.write_text(json.dumps(state))
+                os.replace(tmp_state, state_path)
+
+        pending = [i for i in range(len(chunks)) if i not in set(state["done"])]
+        with ThreadPoolExecutor(max_workers=max(1, connections)) as pool:
+            for future in [pool.submit(fetch, i) for i in pending]:
+                future.result()
+    else:
+        # No range support: a single stream, restarted from scratch after an interruption
+        with urllib.request.urlopen(url, timeout=TIMEOUT) as response, open(part_path, "wb") as f:
+            shutil.copyfileobj(response, f, 1 << 20)
+
+    with open(part_path, "rb+") as f:
+        os.fsync(f.fileno())
+    if sha256:
+        actual = sha256_file(part_path)
+        if actual != sha256.lower():
+            part_path.unlink(missing_ok=True)
+            state_path.unlink(missing_ok=True)
+            raise ProvisioningError(f"sha256 mismatch for {url}: {actual} != {sha256}")
+    os.replace(part_path, dest)
+    state_path.unlink(missing_ok=True)
+    elapsed = time.perf_counter() - start_time
+    logger.info(f"Downloaded {dest.name} ({dest.stat().st_size / 1e6:.1f} MB in {elapsed:.1f} s, "
+                f"{'ranged x' + str(connections) if ranges and size else 'single stream'})")
+    return dest
+
+
+def extract(archive, target_dir):
+    """
+    Extract archive into target_dir (flattening one top-level folder) via a
+    staging directory, so a crash never leaves half-written model files.
+    Returns {path relative to target_dir: sha256} of every extracted file,
+    including those in subfolders.
+    """
+    target_dir = Path(target_dir)
+    staging = target_dir / ".extract-tmp"
+    shutil.rmtree(staging, ignore_errors=True)
+    staging.mkdir(parents=True)
+    try:
+        with zipfile.ZipFile(archive) as zf:
+            bad = zf.testzip()
+            if bad is not None:
+                raise ProvisioningError(f"Corrupt member in {archive}: {bad}")
+            for member in zf.infolist():
+                member_path = (staging / member.filename).resolve()
+                if not str(member_path).startswith(str(staging.resolve()) + os.sep):
+                    raise ProvisioningError(f"Unsafe path in {archive}: {member.filename}")
+            zf.extractall(staging)
+
+        # The release zip wraps everything in a smpl_model_data/ folder
+        entries = [p for p in staging.iterdir() if not p.name.startswith("__MACOSX")]
+        source = entries[0] if len(entries) == 1 and entries[0].is_dir() else staging
+        hashes = {}
+        for path in sorted(source.iterdir()):
+            dest = target_dir / path.name
+            if path.is_dir():
+                shutil.rmtree(dest, ignore_errors=True)
+            files = [path] if path.is_file() else sorted(p for p in path.rglob("*") if p.is_file())
+            for file in files:
+                hashes[file.relative_to(source).as_posix()] = sha256_file(file)
+            os.replace(path, dest)
+        return hashes
+    finally:
+        shutil.rmtree(staging, ignore_errors=True)
+
+
+def _expected_hashes():
+    manifest = os.getenv("KNOT_MODEL_MANIFEST")
+    return json.loads(Path(manifest).read_text()) if manifest else {}
+
+
+def verify(romp_dir, full=False):
+    """
+    Missing or mismatching files in romp_dir. The quick check compares sizes
+    with the manifest; full=True re-hashes every file.
+    """
+    romp_dir = Path(romp_dir)
+    manifest_path = romp_dir / MANIFEST_NAME
+    recorded = json.loads(manifest_path.read_text()) if manifest_path.exists() else {}
+    expected = {**recorded.get("files", {}), **_expected_hashes()}
+    sizes = recorded.get("sizes", {})
+    problems = [f"missing {name}" for name in REQUIRED_FILES if not (romp_dir / name).exists()]
+    for name, digest in expected.items():
+        path = romp_dir / name
+        if not path.exists():
+            if f"missing {name}" not in problems:
+                problems.append(f"missing {name}")
+        elif name in sizes and path.stat().st_size != sizes[name]:
+            problems.append(f"size mismatch {name}")
+        elif full and sha256_file(path) != digest:
+            problems.append(f"sha256 mismatch {name}")
+    return problems
+
+
+def _write_manifest(romp_dir, source, hashes):
+    manifest = {
+        "source": source,
+        "files": hashes,
+        "sizes": {name: (romp_dir / name).stat().st_size for name in hashes},
+    }
+    tmp_manifest = romp_dir / (MANIFEST_NAME + ".tmp")
+    tmp_manifest.write_text(json.dumps(manifest, indent=2))
+    os.replace(tmp_manifest, romp_dir / MANIFEST_NAME)
+
+
+def _from_mirror(mirror, romp_dir):
+    """
+    Provision from a local mirror directory: True if extracted files were
+    copied, the archive path if the mirror holds the archive, else None.
+    """
+    mirror = Path(mirror)
+    archive = mirror / ARCHIVE_NAME
+    if archive.exists():
+        logger.info(f"Using archive from mirror {archive}")
+        return archive
+    if all((mirror / name).exists() for name in REQUIRED_FILES):
+        logger.info(f"Copying extracted model files from mirror {mirror}")
+        hashes = {}
+        for path in sorted(mirror.iterdir()):
+            if path.is_file() and not path.name.startswith(".") and path.name != ARCHIVE_NAME:
+                tmp_path = romp_dir / (path.name + ".tmp")
+                shutil.copyfile(path, tmp_path)
+                hashes[path.name] = sha256_file(tmp_path)
+                os.replace(tmp_path, romp_dir / path.name)
+        _write_manifest(romp_dir, str(mirror), hashes)
+        return True
+    logger.warning(f"Mirror {mirror} has neither {ARCHIVE_NAME} nor the extracted files")
+    return None
+
+
+def ensure_models(romp_dir=None, url=None, mirror=None, sha256=None, lock_timeout=None):
+    """
+    Make sure the ROMP / SMPL model data is in romp_dir (default ~/.romp).
+    Safe to call from several processes at once. Returns True when the files are present and verified.
+    """
+    romp_dir = Path(romp_dir or Path.home() / ".romp")
+    url = url or os.getenv("KNOT_MODEL_URL", DEFAULT_URL)
+    mirror = mirror if mirror is not None else os.getenv("KNOT_MODEL_MIRROR", "")
+    sha256 = sha256 or os.getenv("KNOT_MODEL_SHA256") or None
+    romp_dir.mkdir(parents=True, exist_ok=True)
+
+    if not verify(romp_dir):
+        logger.info("ROMP models appear to be present.")
+        return True
+
+    with file_lock(romp_dir / LOCK_NAME, timeout=lock_timeout):
+        # Another process may have finished while we waited for the lock
+        if not verify(romp_dir):
+            logger.info("ROMP models provisioned by another process.")
+            return True
+
+        archive = None
+        if mirror and not mirror.startswith(("http://", "https://")):
+            found = _from_mirror(mirror, romp_dir)
+            if found is True:
+                problems = verify(romp_dir, full=True)
+                if problems:
+                    raise ProvisioningError(f"Mirror files failed verification: {problems}")
+                return True
+            archive = found
+        if archive is None:
+            sources = [mirror.rstrip("/") + "/" + ARCHIVE_NAME] if mirror.startswith(("http://", "https://")) else []
+            sources.append(url)
+            archive = romp_dir / ARCHIVE_NAME
+            error = None
+            for source in sources:
+                try:
+                    logger.info(f"ROMP models missing. Downloading {source}...")
+                    download(source, archive, sha256=sha256)
+                    break
+                except (OSError, urllib.error.URLError, ProvisioningError) as e:
+                    logger.warning(f"Download from {source} failed: {e}")
+                    error = e
+            else:
+                raise ProvisioningError(f"Could not download the model archive from any source (last error: {error})")
+        elif sha256 and sha256_file(archive) != sha256.lower():
+            raise ProvisioningError(f"sha256 mismatch for mirror archive {archive}")
+
+        hashes = extract(archive, romp_dir)
+        expected = _expected_hashes()
+        mismatched = [name for name, digest in expected.items() if name in hashes and hashes[name] != digest]
+        if mismatched:
+            raise ProvisioningError(f"Extracted files do not match KNOT_MODEL_MANIFEST: {mismatched}")
+        _write_manifest(romp_dir, str(archive) if archive.parent != romp_dir else url, hashes)
+        if archive.parent == romp_dir:
+            archive.unlink(missing_ok=True)
+        logger.info(f"Extraction complete: {len(hashes)} files verified.")
+
+        problems = verify(romp_dir)
+        if problems:
+            raise ProvisioningError(f"Model data incomplete after extraction: {problems}")
+        return True
+
+
+def smpl_faces_path(romp_dir=None):
+    return Path(romp_dir or Path.home() / ".romp") / SMPL_FACES_NAME
+
+
+def build_mesh_lods(cache_path=None, romp_dir=None):
+    """
+    Decimated SMPL topologies (smpl_lod.SMPLLod), loaded from their cache or built and cached.
+    Built from the same body as the mock mesh: the SMPL template, or the procedural body without it.
+    With the SMPL template, its faces are also written to smpl_faces_path(romp_dir).
+    """
+    import numpy as np
+
+    from compat import load_smpl_model_data
+    from mock_body import build_mock_body
+    import smpl_lod
+
+    vertices, faces, source = build_mock_body(load_smpl_model_data())
+    if source == "smpl_template":
+        faces_path = smpl_faces_path(romp_dir)
+        tmp_path = faces_path.with_name(f".{faces_path.stem}.{os.getpid()}.{threading.get_ident()}.tmp.npy")
+        try:
+            np.save(tmp_path, faces)
+            os.replace(tmp_path, faces_path)
+        except OSError as e:
+            logger.warning(f"Could not write {faces_path}: {e}")
+        finally:
+            tmp_path.unlink(missing_ok=True)
+    return smpl_lod.SMPLLod.build(vertices, faces, cache_path or smpl_lod.DEFAULT_CACHE)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Download and verify the ROMP / SMPL model data")
+    parser.add_argument("--dir", default=str(Path.home() / ".romp"))
+    parser.add_argument("--url", default=None)
+    parser.add_argument("--mirror", default=None, help="directory or base URL with smpl_model_data.zip")
+    parser.add_argument("--sha256", default=None, help="expected sha256 of the archive")
+    parser.add_argument("--verify", action="store_true", help="re-hash the installed files and exit")
+    parser.add_argument("--skip-lods", action="store_true", help="do not build the mesh LOD cache or the SMPL faces copy")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    if args.verify:
+        problems = verify(args.dir, full=True)
+        for problem in problems:
+            print(f"❌ {problem}")
+        if not problems:
+            print(f"✅ Model data in {args.dir} verified")
+        return 1 if problems else 0
+
+    try:
+        ensure_models(args.dir, url=args.url, mirror=args.mirror, sha256=args.sha256)
+    except (ProvisioningError, OSError, urllib.error.URLError) as e:
+        print(f"❌ Provisioning failed: {e}")
+        return 1
+    print(f"✅ Model data ready in {args.dir}")
+    if not args.skip_lods:
+        try:
+            lods = build_mesh_lods()
+        except Exception as e:
+            print(f"❌ Could not build mesh LODs: {e}")
+            return 1
+        print(f"✅ Mesh LODs ready ({', '.join(f'{name} {len(f)} faces' for name, f in lods.faces.items())})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
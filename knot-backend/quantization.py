@@ -0,0 +1,249 @@
+"""
+INT8 inference for the ROMP network with an accuracy gate.
+
+quantize_int8() quantizes the fp32 ONNX export (see onnx_backend) with ONNX
+Runtime, either dynamically or statically. Static mode uses per-channel QDQ,
+calibrated on network inputs captured from locally generated or local video
+frames. The accuracy gate then runs romp(frame) end to end with the float32
+network and the INT8 graph, and compares:
+
+- per-vertex distance (cm)
+- compute_measurements girths (chest/waist/hips, cm)
+
+The result is stored next to the INT8 model. enable_int8_backend() refuses to
+switch the backend unless a recorded gate passed at the currently configured
+tolerance. add_int8_network() keeps the float32 network as well, behind a
+PrecisionRouter, so each request can pick its precision (profiles.py).
+
+Environment:
+    KNOT_INFERENCE_PRECISION  fp32 | int8 (default fp32)
+    KNOT_INT8_ONNX_PATH       INT8 model (default ~/.romp/ROMP_knot_int8.onnx)
+    KNOT_INT8_TOLERANCE_CM    allowed girth / vertex drift in cm (default 1.0)
+"""
+
+import json
+import logging
+import os
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+import numpy as np
+import torch.nn as nn
+
+import onnx_backend
+import torch_runtime
+from measurements import compute_measurements
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_INT8_PATH = Path.home() / ".romp" / "ROMP_knot_int8.onnx"
+QUANT_MODES = ("static", "dynamic")
+GIRTHS = ("chest_cm", "waist_cm", "hips_cm")
+
+
+def int8_path_from_env():
+    return Path(os.getenv("KNOT_INT8_ONNX_PATH", str(DEFAULT_INT8_PATH)))
+
+
+def tolerance_from_env():
+    return float(os.getenv("KNOT_INT8_TOLERANCE_CM", "1.0"))
+
+
+@contextmanager
+def temporal_smoothing_disabled(romp):
+    """Turn off ROMP's cross-frame smoothing so fp32/int8 runs don't feed each other."""
+    settings = getattr(romp, "settings", None)
+    saved = {}
+    for name in ("temporal_optimize", "temporal_optimization"):
+        if settings is not None and hasattr(settings, name):
+            saved[name] = getattr(settings, name)
+            setattr(settings, name, False)
+    try:
+        yield
+    finally:
+        for name, value in saved.items():
+            setattr(settings, name, value)
+
+
+class _CalibrationReader:
+    """onnxruntime CalibrationDataReader over captured network inputs."""
+
+    def __init__(self, inputs_list, input_names):
+        self._feeds = iter([
+            {name: t.cpu().numpy() for name, t in zip(input_names, inputs)} for inputs in inputs_list
+        ])
+
+    def get_next(self):
+        return next(self._feeds, None)
+
+
+def _vertices(outputs):
+    if not isinstance(outputs, dict) or outputs.get("verts") is None:
+        return None
+    verts = np.asarray(outputs["verts"], dtype=np.float32)
+    return verts[0] if verts.ndim == 3 else verts
+
+
+def accuracy_gate(romp, int8_net, frames, tolerance_cm):
+    """
+    Compare float32 and INT8 end to end on frames.
+    ROMP vertices are in metres; drift is reported in cm.
+    """
+    vertex_mean = []
+    vertex_max = []
+    girth_drift = {name: 0.0 for name in GIRTHS}
+    compared = 0
+
+    fp32_net = romp.model
+    with temporal_smoothing_disabled(romp):
+        for frame in frames:
+            romp.model = fp32_net
+            ref = _vertices(romp(frame))
+            romp.model = int8_net
+            got = _vertices(romp(frame))
+            if ref is None or got is None or ref.shape != got.shape:
+                continue
+            compared += 1
+            dist_cm = np.linalg.norm(ref - got, axis=1) * 100.0
+            vertex_mean.append(float(dist_cm.mean()))
+            vertex_max.append(float(dist_cm.max()))
+            ref_m = compute_measurements(ref)
+            got_m = compute_measurements(got)
+            for name in GIRTHS:
+                if name in ref_m and name in got_m:
+                    girth_drift[name] = max(girth_drift[name], abs(ref_m[name] - got_m[name]))
+    romp.model = fp32_net
+
+    worst_girth = max(girth_drift.values()) if compared else None
+    mean_vertex = float(np.mean(vertex_mean)) if vertex_mean else None
+    passed = compared > 0 and worst_girth <= tolerance_cm and mean_vertex <= tolerance_cm
+    return {
+        "passed": bool(passed),
+        "tolerance_cm": tolerance_cm,
+        "frames_compared": compared,
+        "vertex_mean_cm": mean_vertex,
+        "vertex_max_cm": float(max(vertex_max)) if vertex_max else None,
+        "girth_drift_cm": girth_drift,
+        "max_girth_drift_cm": worst_girth,
+    }
+
+
+def quantize_int8(romp, calibration_frames, validation_frames, mode="static",
+                  fp32_path=None, int8_path=None, tolerance_cm=None):
+    """
+    Build the INT8 model from the fp32 export and run the accuracy gate.
+    Returns the metadata written next to the INT8 model (gate result included).
+    """
+    from onnxruntime.quantization import (CalibrationMethod, QuantFormat, QuantType,
+                                          quantize_dynamic, quantize_static)
+
+    if mode not in QUANT_MODES:
+        raise ValueError(f"mode must be one of {QUANT_MODES}")
+    fp32_path = Path(fp32_path or onnx_backend.onnx_path_from_env())
+    int8_path = Path(int8_path or int8_path_from_env())
+    tolerance_cm = tolerance_from_env() if tolerance_cm is None else tolerance_cm
+
+    fp32_meta_path = fp32_path.with_suffix(".json")
+    if not fp32_path.exists() or not fp32_meta_path.exists():
+        raise FileNotFoundError(f"fp32 ONNX export not found at {fp32_path}; run export_onnx.py first")
+    metadata = json.loads(fp32_meta_path.read_text())
+
+    start = time.perf_counter()
+    if mode == "static":
+        inputs_list = onnx_backend.capture_network_inputs(romp, calibration_frames)
+        quantize_static(
+            str(fp32_path), str(int8_path),
+            _CalibrationReader(inputs_list, metadata["input_names"]),
+            quant_format=QuantFormat.QDQ,
+            activation_type=QuantType.QUInt8,
+            weight_type=QuantType.QInt8,
+            per_channel=True,
+            calibrate_method=CalibrationMethod.MinMax,
+        )
+    else:
+        quantize_dynamic(str(fp32_path), str(int8_path), weight_type=QuantType.QInt8)
+    logger.info(f"Quantized ({mode}) {fp32_path.name} -> {int8_path.name} in {time.perf_counter() - start:.1f}s")
+
+    session = onnx_backend.create_session(int8_path)
+    int8_net = onnx_backend.OrtModel(session, metadata)
+    gate = accuracy_gate(romp, int8_net, validation_frames, tolerance_cm)
+
+    metadata = dict(metadata)
+    metadata["quantization"] = {
+        "mode": mode,
+        "source": fp32_path.name,
+        "calibration_frames": len(calibration_frames) if mode == "static" else 0,
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "gate": gate,
+    }
+    int8_path.with_suffix(".json").write_text(json.dumps(metadata, indent=2))
+    level = logging.INFO if gate["passed"] else logging.WARNING
+    logger.log(level, f"INT8 accuracy gate {'passed' if gate['passed'] else 'FAILED'}: "
+                      f"max girth drift {gate['max_girth_drift_cm']} cm, mean vertex drift {gate['vertex_mean_cm']} cm "
+                      f"(tolerance {tolerance_cm} cm)")
+    return metadata
+
+
+def _int8_network(threads=None, int8_path=None):
+    """The INT8 OrtModel if its recorded accuracy gate passed within the configured tolerance, else None."""
+    int8_path = Path(int8_path or int8_path_from_env())
+    meta_path = int8_path.with_suffix(".json")
+    if not meta_path.exists():
+        logger.warning(f"INT8 model not found at {int8_path}. Run: python quantize_int8.py")
+        return None
+
+    gate = json.loads(meta_path.read_text()).get("quantization", {}).get("gate", {})
+    tolerance_cm = tolerance_from_env()
+    drift = [gate.get("max_girth_drift_cm"), gate.get("vertex_mean_cm")]
+    if not gate.get("passed") or any(d is None or d > tolerance_cm for d in drift):
+        logger.warning(f"Refusing INT8 mode: accuracy gate {gate or 'missing'} exceeds {tolerance_cm} cm tolerance")
+        return None
+    return onnx_backend.load_onnx_network(int8_path, threads=threads)
+
+
+def enable_int8_backend(romp, threads=None, int8_path=None):
+    """
+    Switch romp.model to the INT8 graph if its recorded accuracy gate passed
+    within the configured tolerance. Returns the previous network or None.
+    """
+    network = _int8_network(threads, int8_path)
+    if network is None:
+        return None
+    eager = romp.model
+    romp.model = network
+    return eager
+
+
+class PrecisionRouter(nn.Module):
+    """
+    romp.model holding one network per precision; each forward pass goes to the
+    one requested with torch_runtime.use_precision (default when none or unknown).
+    """
+
+    def __init__(self, networks, default):
+        super().__init__()
+        self.networks = nn.ModuleDict(networks)
+        self.default = default
+
+    @property
+    def precisions(self):
+        return list(self.networks.keys())
+
+    def forward(self, *inputs):
+        precision = torch_runtime.requested_precision()
+        network = self.networks[precision if precision in self.networks else self.default]
+        return network(*inputs)
+
+
+def add_int8_network(romp, threads=None, int8_path=None):
+    """
+    Keep the current (float32) network and add the INT8 graph next to it behind a
+    PrecisionRouter. Returns True if INT8 is now selectable per request.
+    """
+    network = _int8_network(threads, int8_path)
+    if network is None:
+        return False
+    romp.model = PrecisionRouter({"fp32": romp.model, "int8": network}, default="fp32")
+    logger.info("INT8 network available per request next to fp32")
+    return True
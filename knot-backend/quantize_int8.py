@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Build the INT8 ROMP model and run its accuracy gate.
+
+Calibrates on frames sampled from local scan videos (--calibration-dir) or on
+synthetic frames, quantizes the fp32 ONNX export, and compares vertices and
+girths against float32. The backend only uses the INT8 model
+(KNOT_INFERENCE_PRECISION=int8) if the gate passed.
+
+Usage:
+    python quantize_int8.py
+    python quantize_int8.py --mode static --calibration-dir ~/scans --tolerance-cm 0.5
+    python quantize_int8.py --mode dynamic
+"""
+
+import argparse
+import os
+import sys
+from pathlib import Path
+
+import cv2
+
+from export_onnx import load_frames
+from pipeline import VIDEO_SUFFIXES
+
+
+def collect_frames(directory, per_video, limit):
+    frames = []
+    for path in sorted(Path(directory).expanduser().iterdir()):
+        if path.suffix.lower() in VIDEO_SUFFIXES:
+            frames.extend(load_frames(path, per_video))
+        if len(frames) >= limit:
+            break
+    return frames[:limit]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Quantize ROMP to INT8 with an accuracy gate")
+    parser.add_argument("--mode", choices=["static", "dynamic"], default="static")
+    parser.add_argument("--calibration-dir", help="directory of local scan videos (default: synthetic frames)")
+    parser.add_argument("--calibration-frames", type=int, default=32)
+    parser.add_argument("--validation-frames", type=int, default=12)
+    parser.add_argument("--tolerance-cm", type=float, help="default: KNOT_INT8_TOLERANCE_CM or 1.0")
+    parser.add_argument("--output", help="INT8 model (default: KNOT_INT8_ONNX_PATH)")
+    args = parser.parse_args()
+
+    os.environ["KNOT_INFERENCE_BACKEND"] = "torch"
+    os.environ["KNOT_INFERENCE_PRECISION"] = "fp32"
+    os.chdir(Path(__file__).resolve().parent)
+    sys.argv = sys.argv[:1]
+    import main as app_main
+    import onnx_backend
+    import quantization
+    from synthetic_video import synthetic_frame
+
+    romp = app_main.romp
+    if romp is None:
+        print("❌ ROMP is not loaded (MOCK MODE). Install ROMP and the SMPL models first.")
+        return 1
+
+    total = args.calibration_frames + args.validation_frames
+    if args.calibration_dir:
+        frames = collect_frames(args.calibration_dir, per_video=4, limit=total)
+    else:
+        frames = [cv2.cvtColor(synthetic_frame(1280, 720, t=i / 7, seed=i), cv2.COLOR_BGR2RGB) for i in range(total)]
+    # Hold out every k-th frame for validation so both sets cover all clips
+    step = max(2, len(frames) // max(1, args.validation_frames))
+    validation = frames[::step][:args.validation_frames]
+    calibration = [f for i, f in enumerate(frames) if i % step != 0]
+    if not calibration or not validation:
+        print("❌ Not enough frames for calibration and validation")
+        return 1
+
+    if not onnx_backend.onnx_path_from_env().exists():
+        print("🔄 fp32 ONNX export not found, exporting first...")
+        onnx_backend.export_onnx(romp, calibration[:4])
+
+    print(f"🔄 Quantizing ({args.mode}) with {len(calibration)} calibration / {len(validation)} validation frames...")
+    metadata = quantization.quantize_int8(romp, calibration, validation, mode=args.mode,
+                                          int8_path=args.output, tolerance_cm=args.tolerance_cm)
+    gate = metadata["quantization"]["gate"]
+    print(f"   max girth drift: {gate['max_girth_drift_cm']} cm {gate['girth_drift_cm']}")
+    print(f"   vertex drift: mean {gate['vertex_mean_cm']} cm, max {gate['vertex_max_cm']} cm")
+    if not gate["passed"]:
+        print(f"❌ Accuracy gate failed (tolerance {gate['tolerance_cm']} cm); INT8 mode will stay disabled")
+        return 1
+    print("✅ Accuracy gate passed. Start the backend with KNOT_INFERENCE_PRECISION=int8")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,341 @@
+"""
+ROMP model loading.
+
+Applies the chumpy / numpy / torch.load compatibility patches ROMP's SMPL
+files need (compat.py), downloads the model data if missing, and builds the
+ROMP (or BEV) model. Used by the HTTP app and by inference_server model
+processes, which load the model without the FastAPI app. torch is only
+imported once ROMP is installed and a model is actually built.
+"""
+
+import argparse
+import importlib.util
+import logging
+import os
+import sys
+from pathlib import Path
+
+import numpy as np
+
+import compat
+import profiles
+import provisioning
+import torch_runtime
+
+torch = compat.lazy_import("torch")
+
+logger = logging.getLogger(__name__)
+
+# chumpy / NumPy shims are cheap; the torch.load patches are applied in load_models
+compat.apply_python_compat()
+
+# Model selection - support both ROMP and BEV
+USE_BEV = os.getenv("USE_BEV", "false").lower() == "true"  # Set USE_BEV=true to use BEV
+# Network runtime for ROMP: "torch" (eager) or "onnx" (ONNX Runtime CPU, see export_onnx.py)
+INFERENCE_BACKEND = os.getenv("KNOT_INFERENCE_BACKEND", "torch").lower()
+# "int8" runs the quantized ONNX model, only if its accuracy gate passed (see quantize_int8.py)
+INFERENCE_PRECISION = os.getenv("KNOT_INFERENCE_PRECISION", "fp32").lower()
+# Precisions a request can pick (profiles.py): the configured one, plus int8 next to fp32 when its model passed the gate
+AVAILABLE_PRECISIONS = [INFERENCE_PRECISION]
+# Skip the model entirely and serve MOCK MODE (load tests of the non-model path)
+MOCK_MODE = os.getenv("KNOT_MOCK_MODE", "0").lower() in ("1", "true", "on")
+# ROMP's temporal smoothing coefficient (video mode); also drives the dense-mode filter (pipeline.TemporalFilter)
+SMOOTH_COEFF = float(os.getenv("KNOT_SMOOTH_COEFF", "5.0"))
+
+def check_and_download_models():
+    """Make sure the ROMP/SMPL model data is in ~/.romp (locked, resumable, verified; see provisioning.py)."""
+    try:
+        return provisioning.ensure_models()
+    except Exception as e:
+        logger.error(f"Failed to download/extract models: {e}")
+        return False
+
+def load_models():
+    """
+    Initialize the configured model. Returns (romp, bev); both are None when
+    nothing could be loaded (MOCK MODE).
+    """
+    global USE_BEV, INFERENCE_BACKEND, INFERENCE_PRECISION, AVAILABLE_PRECISIONS
+    romp = None
+    bev = None
+
+    if MOCK_MODE:
+        logger.warning("KNOT_MOCK_MODE is set: not loading a model (MOCK MODE)")
+        return romp, bev
+
+    if importlib.util.find_spec("romp") is None and not (USE_BEV and importlib.util.find_spec("bev")):
+        # MOCK MODE: keep the SMPL data download, skip importing torch
+        check_and_download_models()
+        logger.error("Could not import 'romp' package. Check installation.")
+        return romp, bev
+
+    compat.apply_torch_compat()
+    # Thread counts / CPU affinity must be set before the model is built
+    torch_runtime.configure_torch_runtime()
+
+    # Try to initialize BEV first if requested, otherwise use ROMP
+    if USE_BEV:
+        logger.info("Attempting to initialize BEV (Body Estimation in the Wild)...")
+        try:
+            # BEV installation would be: pip install git+https://github.com/Arthur151/BEV.git
+            # For now, we'll try to import it
+            import bev
+            # BEV initialization (adjust based on actual BEV API)
+            # bev_model = bev.BEV()  # This will need to be adjusted based on actual API
+            logger.info("BEV model initialized successfully.")
+            # bev = bev_model  # Uncomment when BEV is properly installed
+        except ImportError:
+            logger.warning("BEV not available. Falling back to ROMP.")
+            USE_BEV = False
+        except Exception as e:
+            logger.warning(f"Failed to initialize BEV: {e}. Falling back to ROMP.")
+            USE_BEV = False
+
+    # Initialize ROMP (either as primary or fallback)
+    if not USE_BEV:
+        try:
+            # Ensure models exist
+            check_and_download_models()
+
+            # Prevent argparse conflict by modifying sys.argv BEFORE import
+            original_argv = sys.argv
+            sys.argv = [sys.argv[0]]
+        
+            try:
+                # Import ROMP - torch.load monkeypatch is already applied at top of file
+                import romp as simple_romp
+            
+                # Re-mock argv
+                sys.argv = [sys.argv[0]]
+            
+                if hasattr(simple_romp, 'romp_settings'):
+                    settings = simple_romp.romp_settings()
+                else:
+                    settings = argparse.Namespace()
+                    settings.mode = 'video'
+                    settings.calc_smpl = True
+                    settings.render_mesh = False
+                    settings.show_largest = True
+                    settings.save_video = False
+                    settings.show = False
+            
+                # Set SMPL model path - ALWAYS prefer Python 3 converted version
+                # (has extra_joints_index and works with Python 3.11)
+                home_dir = Path.home()
+                romp_dir = home_dir / ".romp"
+                smpl_path_py3 = romp_dir / "SMPL_NEUTRAL_py3.pth"
+                smpl_path = romp_dir / "SMPL_NEUTRAL.pth"
+            
+                # Always set smpl_path explicitly to use converted version
+                if smpl_path_py3.exists():
+                    settings.smpl_path = str(smpl_path_py3)
+                    logger.info(f"✅ Using Python 3 converted SMPL model at: {smpl_path_py3}")
+                elif smpl_path.exists():
+                    settings.smpl_path = str(smpl_path)
+                    logger.warning(f"⚠️  Using original SMPL model at: {smpl_path} (may have encoding issues)")
+                else:
+                    logger.warning(f"❌ SMPL model not found at: {smpl_path} or {smpl_path_py3}")
+            
+                # Optimize ROMP settings for better accuracy (based on ROMP best practices)
+                # Reference: https://www.12-technology.com/2022/01/romp-ai3d.html
+                # Lower center_thresh = detect more people (but may have false positives)
+                # Make it more sensitive to detect bodies in various conditions
+                if hasattr(settings, 'center_thresh'):
+                    settings.center_thresh = 0.15  # Lowered from 0.25 to 0.15 for better detection
+                # Temporal smoothing coefficient (higher = more smoothing across frames)
+                # This is critical for video processing to reduce jitter
+                if hasattr(settings, 'smooth_coeff'):
+                    settings.smooth_coeff = SMOOTH_COEFF  # Increased (default 5.0) for better temporal stability
+                # Enable SMPL calculation
+                if hasattr(settings, 'calc_smpl'):
+                    settings.calc_smpl = True
+                # Additional settings for video processing
+                if hasattr(settings, 'mode'):
+                    settings.mode = 'video'  # Explicitly set video mode
+                if hasattr(settings, 'temporal_optimization'):
+                    settings.temporal_optimization = True  # Enable temporal optimization if available
+            
+                # Before initializing ROMP, patch SMPL model loading to convert numpy arrays to torch tensors
+                # This fixes the "cannot assign 'numpy.ndarray' object to buffer" error
+                original_smpl_init = None
+                if hasattr(simple_romp, 'smpl') and hasattr(simple_romp.smpl, 'SMPL'):
+                    original_smpl_init = simple_romp.smpl.SMPL.__init__
+                
+                    def patched_smpl_init(self, model_path, model_type='smpl', dtype=torch.float32):
+                        """Patched SMPL.__init__ that converts numpy arrays to torch tensors"""
+                        import torch.nn as nn
+                        super(simple_romp.smpl.SMPL, self).__init__()
+                        self.dtype = dtype
+                    
+                        # Try to load as pickle first (for Python 3 converted files)
+                        # If that fails, use torch.load
+                        model_info = None
+                        try:
+                            import pickle
+                            with open(model_path, 'rb') as f:
+                                model_info = pickle.load(f, encoding='latin1')
+                            logger.debug(f"Loaded {model_path} as pickle file")
+                        except:
+                            # Fall back to torch.load
+                            model_info = torch.load(model_path, map_location='cpu', weights_only=False)
+                            logger.debug(f"Loaded {model_path} as torch file")
+                    
+                        # Convert all numpy arrays, chumpy objects, and scipy sparse matrices to torch tensors
+                        converted_info = {}
+                        for key, value in model_info.items():
+                            if isinstance(value, np.ndarray):
+                                converted_info[key] = torch.from_numpy(value).to(dtype)
+                                logger.debug(f"Converted {key} from numpy to torch tensor")
+                            elif isinstance(value, torch.Tensor):
+                                converted_info[key] = value.to(dtype)
+                            elif hasattr(value, 'todense'):  # scipy sparse matrix
+                                # Convert sparse matrix to dense numpy, then to torch
+                                try:
+                                    np_value = np.array(value.todense())
+                                    converted_info[key] = torch.from_numpy(np_value).to(dtype)
+                                    logger.debug(f"Converted {key} from scipy sparse to torch tensor")
+                                except:
+                                    logger.warning(f"Could not convert {key} from scipy sparse, keeping original")
+                                    converted_info[key] = value
+                            elif hasattr(value, 'r'):  # chumpy object has .r attribute
+                                # Convert chumpy object to numpy, then to torch
+                                try:
+                                    np_value = np.array(value.r)
+                                    converted_info[key] = torch.from_numpy(np_value).to(dtype)
+                                    logger.debug(f"Converted {key} from chumpy to torch tensor")
+                                except:
+                                    logger.warning(f"Could not convert {key} from chumpy, keeping original")
+                                    converted_info[key] = value
+                            else:
+                                converted_info[key] = value
+                    
+                        # Now use converted_info instead of model_info
+                        model_info = converted_info
+                    
+                        # Rest of the original __init__ logic
+                        # Ensure extra_joints_index is long/int type for indexing
+                        extra_joints_idx = model_info['extra_joints_index']
+                        if isinstance(extra_joints_idx, torch.Tensor):
+                            if extra_joints_idx.dtype != torch.long and extra_joints_idx.dtype != torch.int32 and extra_joints_idx.dtype != torch.int64:
+                                logger.info(f"Converting extra_joints_index from {extra_joints_idx.dtype} to long")
+                                extra_joints_idx = extra_joints_idx.long()
+                    
+                        # Ensure J_regressor tensors are float type
+                        J_regressor_extra9 = model_info['J_regressor_extra9']
+                        if isinstance(J_regressor_extra9, torch.Tensor) and J_regressor_extra9.dtype != dtype:
+                            J_regressor_extra9 = J_regressor_extra9.to(dtype)
+                    
+                        J_regressor_h36m17 = model_info['J_regressor_h36m17']
+                        if isinstance(J_regressor_h36m17, torch.Tensor) and J_regressor_h36m17.dtype != dtype:
+                            J_regressor_h36m17 = J_regressor_h36m17.to(dtype)
+                    
+                        self.vertex_joint_selector = simple_romp.smpl.VertexJointSelector(
+                            extra_joints_idx,
+                            J_regressor_extra9,
+                            J_regressor_h36m17,
+                            dtype=self.dtype
+                        )
+                        self.register_buffer('faces_tensor', model_info['f'])
+                        self.register_buffer('v_template', model_info['v_template'])
+                    
+                        # ROMP expects only top 10 PCA components of shapedirs
+                        # If shapedirs has more than 10 dimensions, take only first 10
+                        if model_type == 'smpl':
+                            shapedirs = model_info['shapedirs']
+                            if isinstance(shapedirs, torch.Tensor):
+                                # shapedirs shape: [6890, 3, num_components]
+                                # ROMP expects: [6890, 3, 10]
+                                if shapedirs.shape[2] > 10:
+                                    logger.info(f"Truncating shapedirs from {shapedirs.shape[2]} to 10 components")
+                                    shapedirs = shapedirs[:, :, :10]
+                            self.register_buffer('shapedirs', shapedirs)
+                        elif model_type == 'smpla':
+                            self.register_buffer('shapedirs', model_info['smpla_shapedirs'])
+                    
+                        self.register_buffer('J_regressor', model_info['J_regressor'])
+                    
+                        # ROMP expects posedirs in shape [207, 6890*3]
+                        # Original SMPL has shape [6890, 3, 207]
+                        # Need to reshape: [6890, 3, 207] -> [207, 6890*3]
+                        posedirs = model_info['posedirs']
+                        if isinstance(posedirs, torch.Tensor):
+                            if len(posedirs.shape) == 3 and posedirs.shape[2] == 207:
+                                # Shape: [6890, 3, 207] -> [207, 6890*3]
+                                logger.info(f"Reshaping posedirs from {posedirs.shape} to [207, {6890*3}]")
+                                posedirs = posedirs.reshape(-1, 207).T  # [6890*3, 207] -> [207, 6890*3]
+                            elif len(posedirs.shape) == 2 and posedirs.shape[0] != 207:
+                                # If already 2D but wrong shape, try to fix
+                                if posedirs.shape[1] == 207:
+                                    posedirs = posedirs.T
+                                elif posedirs.shape[0] == 207:
+                                    pass  # Already correct
+                                else:
+                                    logger.warning(f"Unexpected posedirs shape: {posedirs.shape}, attempting reshape")
+                        self.register_buffer('posedirs', posedirs)
+                    
+                        # kintree_table (parents) must be long/int type for indexing
+                        # ROMP expects shape [2, 24] where first row is parents, second row is children
+                        # Original SMPL has shape [2, 24] but may need adjustment
+                        parents = model_info['kintree_table']
+                        if isinstance(parents, torch.Tensor):
+                            # Ensure correct shape: [2, 24]
+                            if len(parents.shape) == 2:
+                                if parents.shape[1] == 23:
+                                    # Pad to 24 if needed (add root joint)
+                                    logger.info(f"Padding kintree_table from {parents.shape} to [2, 24]")
+                                    padded = torch.zeros(2, 24, dtype=parents.dtype)
+                                    padded[:, :23] = parents
+                                    padded[0, 23] = -1  # Root joint has no parent
+                                    parents = padded
+                                elif parents.shape[1] != 24:
+                                    logger.warning(f"Unexpected kintree_table shape: {parents.shape}, expected [2, 24]")
+                            # Convert to long for indexing
+                            if parents.dtype != torch.long and parents.dtype != torch.int32 and parents.dtype != torch.int64:
+                                logger.info(f"Converting parents from {parents.dtype} to long")
+                                parents = parents.long()
+                            # Extract first row (parent indices) for ROMP
+                            parents = parents[0] if len(parents.shape) == 2 else parents
+                        self.register_buffer('parents', parents)
+                    
+                        self.register_buffer('lbs_weights', model_info['weights'])
+                
+                    # Apply the patch
+                    simple_romp.smpl.SMPL.__init__ = patched_smpl_init
+                    logger.info("Applied SMPL initialization patch to convert numpy arrays to torch tensors")
+            
+                # Instantiate ROMP
+                romp = simple_romp.ROMP(settings)
+                logger.info("ROMP model initialized successfully.")
+            
+                runtime_threads = torch_runtime.configure_torch_runtime()["threads"]
+                if INFERENCE_PRECISION == "int8":
+                    import quantization
+                    if quantization.enable_int8_backend(romp, threads=runtime_threads) is not None:
+                        INFERENCE_BACKEND = "onnx"
+                    else:
+                        INFERENCE_PRECISION = "fp32"
+                if INFERENCE_BACKEND == "onnx" and INFERENCE_PRECISION != "int8":
+                    import onnx_backend
+                    if onnx_backend.enable_onnx_backend(romp, threads=runtime_threads) is None:
+                        INFERENCE_BACKEND = "torch"
+                AVAILABLE_PRECISIONS = [INFERENCE_PRECISION]
+                if INFERENCE_PRECISION == "fp32" and "int8" in profiles.precisions():
+                    import quantization
+                    # Only when the INT8 model was built: its absence is normal here, unlike with KNOT_INFERENCE_PRECISION=int8
+                    if (quantization.int8_path_from_env().with_suffix(".json").exists()
+                            and quantization.add_int8_network(romp, threads=runtime_threads)):
+                        AVAILABLE_PRECISIONS = ["fp32", "int8"]
+                torch_runtime.warm_up(romp)
+            
+            except ImportError:
+                logger.error("Could not import 'romp' package. Check installation.")
+            except Exception as e:
+                logger.error(f"Error initializing ROMP: {e}")
+                logger.exception("Traceback:")
+            finally:
+                sys.argv = original_argv
+
+        except Exception as e:
+            logger.error(f"Failed to setup ROMP: {e}")
+
+    return romp, bev
@@ -0,0 +1,196 @@
+"""
+Persistent scan store (SQLite).
+
+Keeps the compact result of each scan instead of the response JSON: SMPL
+params and camera as float32 BLOB columns (averaged plus one row per
+processed frame), girths as REAL columns, and metadata. A scan is a few KB
+against megabytes of vertex lists. Meshes are rebuilt on demand from the
+params with smpl_lbs.
+
+Lookups by scan_id (primary key) and user_id, and time-range scans for
+analytics, are indexed. Several uvicorn workers can share one file (WAL mode).
+
+Environment:
+    KNOT_SCAN_STORE   path of the SQLite file; unset = scans are not stored
+"""
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from pathlib import Path
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+PARAM_WIDTHS = {"betas": 10, "poses": 72, "cam": 3}
+MEASUREMENT_COLUMNS = ("height_cm", "chest_cm", "waist_cm", "hips_cm")
+SUMMARY_COLUMNS = ("scan_id", "user_id", "created_at", "model_used", "inference_backend",
+                   "frames_processed", "video_frame_count") + MEASUREMENT_COLUMNS
+
+SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS scans (
+    scan_id TEXT PRIMARY KEY,
+    user_id TEXT,
+    created_at REAL NOT NULL,
+    original_filename TEXT,
+    model_used TEXT,
+    inference_backend TEXT,
+    frames_processed INTEGER,
+    video_frame_count INTEGER,
+    {", ".join(f"{c} REAL" for c in MEASUREMENT_COLUMNS)},
+    measurements TEXT,
+    betas BLOB,
+    poses BLOB,
+    cam BLOB,
+    frame_idx BLOB,
+    frame_betas BLOB,
+    frame_poses BLOB,
+    frame_cam BLOB
+);
+CREATE INDEX IF NOT EXISTS scans_user ON scans (user_id, created_at);
+CREATE INDEX IF NOT EXISTS scans_created ON scans (created_at);
+"""
+
+
+def param_array(params, name):
+    """Flat float32 vector of one SMPL param (first person), or None."""
+    value = params.get(name) if isinstance(params, dict) else None
+    if value is None:
+        return None
+    if hasattr(value, "detach"):
+        value = value.detach().cpu().numpy()
+    value = np.asarray(value, dtype=np.float32)
+    if value.ndim > 1:
+        value = value[0]
+    return value.reshape(-1)
+
+
+def _blob(array, dtype=np.float32):
+    return None if array is None else np.ascontiguousarray(array, dtype=dtype).tobytes()
+
+
+def _unblob(blob, width=None, dtype=np.float32):
+    if blob is None:
+        return None
+    array = np.frombuffer(blob, dtype=dtype).copy()
+    return array.reshape(-1, width) if width else array
+
+
+class ScanStore:
+    def __init__(self, path):
+        self.path = Path(path).expanduser()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False, timeout=30)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+
+    @classmethod
+    def from_env(cls):
+        path = os.getenv("KNOT_SCAN_STORE")
+        return cls(path) if path else None
+
+    def save(self, best_result, frame_results, measurements, user_id=None, metadata=None):
+        """Store one scan from the smoothed result and the per-frame detections. Returns its scan_id."""
+        metadata = metadata or {}
+        scan_id = uuid.uuid4().hex
+        params = best_result.get("params", {}) if isinstance(best_result, dict) else {}
+
+        frame_idx, frame_params = [], {name: [] for name in PARAM_WIDTHS}
+        for i, result in enumerate(frame_results):
+            frame_idx.append(int(result.get("_frame_idx", i)))
+            for name, width in PARAM_WIDTHS.items():
+                value = param_array(result.get("params", {}), name)
+                frame_params[name].append(value if value is not None and value.size == width
+                                          else np.full(width, np.nan, dtype=np.float32))
+
+        row = {
+            "scan_id": scan_id,
+            "user_id": user_id,
+            "created_at": time.time(),
+            "original_filename": metadata.get("original_filename"),
+            "model_used": metadata.get("model_used"),
+            "inference_backend": metadata.get("inference_backend"),
+            "frames_processed": len(frame_results),
+            "video_frame_count": metadata.get("video_frame_count"),
+            "measurements": json.dumps(measurements or {}),
+            "betas": _blob(param_array(params, "betas")),
+            "poses": _blob(param_array(params, "poses")),
+            "cam": _blob(param_array(params, "cam")),
+            "frame_idx": _blob(np.array(frame_idx), dtype=np.int32),
+        }
+        for column in MEASUREMENT_COLUMNS:
+            value = (measurements or {}).get(column)
+            row[column] = float(value) if isinstance(value, (int, float)) else None
+        for name in PARAM_WIDTHS:
+            row[f"frame_{name}"] = _blob(np.stack(frame_params[name])) if frame_idx else None
+
+        columns = ", ".join(row)
+        placeholders = ", ".join(f":{k}" for k in row)
+        with self._lock, self._conn:
+            self._conn.execute(f"INSERT INTO scans ({columns}) VALUES ({placeholders})", row)
+        return scan_id
+
+    def get(self, scan_id):
+        """Full scan record with params decoded to numpy arrays, or None."""
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM scans WHERE scan_id = ?", (scan_id,)).fetchone()
+        if row is None:
+            return None
+        record = {k: row[k] for k in row.keys() if k not in PARAM_WIDTHS and not k.startswith("frame_")}
+        record["measurements"] = json.loads(row["measurements"] or "{}")
+        record["params"] = {name: _unblob(row[name]) for name in PARAM_WIDTHS}
+        record["frame_idx"] = _unblob(row["frame_idx"], dtype=np.int32)
+        record["frame_params"] = {name: _unblob(row[f"frame_{name}"], width)
+                                  for name, width in PARAM_WIDTHS.items()}
+        return record
+
+    def list_scans(self, user_id=None, since=None, until=None, limit=100):
+        """Scan summaries (no params), newest first."""
+        clauses, args = [], []
+        if user_id is not None:
+            clauses.append("user_id = ?")
+            args.append(user_id)
+        if since is not None:
+            clauses.append("created_at >= ?")
+            args.append(since)
+        if until is not None:
+            clauses.append("created_at < ?")
+            args.append(until)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        query = f"SELECT {', '.join(SUMMARY_COLUMNS)} FROM scans {where} ORDER BY created_at DESC LIMIT ?"
+        with self._lock:
+            rows = self._conn.execute(query, (*args, int(limit))).fetchall()
+        return [dict(row) for row in rows]
+
+    def column_arrays(self, since=None, until=None, params=("betas",)):
+        """
+        Columnar view of a time range for analytics: measurement columns as
+        float arrays and the requested params stacked into [N, width] arrays.
+        """
+        columns = ["scan_id", "created_at", *MEASUREMENT_COLUMNS, *params]
+        query = f"SELECT {', '.join(columns)} FROM scans WHERE created_at >= ? AND created_at < ? ORDER BY created_at"
+        with self._lock:
+            rows = self._conn.execute(query, (since or 0.0, until or float("inf"))).fetchall()
+        result = {
+            "scan_id": np.array([r["scan_id"] for r in rows]),
+            "created_at": np.array([r["created_at"] for r in rows], dtype=np.float64),
+        }
+        for column in MEASUREMENT_COLUMNS:
+            result[column] = np.array([np.nan if r[column] is None else r[column] for r in rows], dtype=np.float32)
+        for name in params:
+            width = PARAM_WIDTHS[name]
+            result[name] = np.stack([_unblob(r[name]) if r[name] is not None else np.full(width, np.nan, np.float32)
+                                     for r in rows]) if rows else np.zeros((0, width), np.float32)
+        return result
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
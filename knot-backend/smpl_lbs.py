@@ -0,0 +1,185 @@
+"""
+Batched SMPL linear blend skinning on the server.
+
+Re-skins stored SMPL parameters (betas / poses from earlier scans) without
+running ROMP. The buffers are the ones patched_smpl_init registers for ROMP
+(romp_loader.py): v_template, shapedirs (first num_betas components),
+posedirs as [207, V*3], J_regressor, weights and the parent row of
+kintree_table. They come from the same SMPL_NEUTRAL file.
+
+Each step is a batched tensor op, and batches are processed in chunks so
+memory stays bounded. Thousands of parameter sets per second fit on CPU.
+
+Canonical poses ("t", "a") drop the global orientation and body pose, which
+lets girths be measured on a posture-neutral body:
+
+    model = SMPLModel.from_model_data(compat.load_smpl_model_data())
+    verts = model.canonical(betas, pose="t")         # [B, 6890, 3]
+    verts, joints = model.forward(betas, poses, return_joints=True)
+"""
+
+import logging
+import math
+
+import numpy as np
+import torch
+
+logger = logging.getLogger(__name__)
+
+NUM_JOINTS = 24
+POSE_DIM = NUM_JOINTS * 3
+LEFT_SHOULDER, RIGHT_SHOULDER = 16, 17
+CANONICAL_POSES = ("t", "a")
+
+
+def _to_numpy(value):
+    """numpy array from a numpy / torch / scipy-sparse / chumpy buffer."""
+    if isinstance(value, torch.Tensor):
+        return value.detach().cpu().numpy()
+    if hasattr(value, "todense"):  # scipy sparse matrix
+        return np.asarray(value.todense())
+    if hasattr(value, "r"):  # chumpy object has .r attribute
+        return np.asarray(value.r)
+    return np.asarray(value)
+
+
+def batch_rodrigues(rotvecs):
+    """Axis-angle [N, 3] -> rotation matrices [N, 3, 3]."""
+    angle = torch.linalg.norm(rotvecs + 1e-8, dim=1, keepdim=True)
+    axis = rotvecs / angle
+    cos = torch.cos(angle)[:, :, None]
+    sin = torch.sin(angle)[:, :, None]
+    x, y, z = axis[:, 0], axis[:, 1], axis[:, 2]
+    zeros = torch.zeros_like(x)
+    K = torch.stack([zeros, -z, y, z, zeros, -x, -y, x, zeros], dim=1).view(-1, 3, 3)
+    eye = torch.eye(3, dtype=rotvecs.dtype, device=rotvecs.device)[None]
+    return eye + sin * K + (1 - cos) * torch.bmm(K, K)
+
+
+def canonical_pose(kind="t"):
+    """Pose vector [72] for a canonical posture: "t" (T-pose) or "a" (arms 45 degrees down)."""
+    if kind not in CANONICAL_POSES:
+        raise ValueError(f"pose must be one of {CANONICAL_POSES}")
+    pose = np.zeros(POSE_DIM, dtype=np.float32)
+    if kind == "a":
+        # SMPL is Y-up with the left arm along +X: rotate the shoulders about Z
+        pose[LEFT_SHOULDER * 3 + 2] = -math.pi / 4
+        pose[RIGHT_SHOULDER * 3 + 2] = math.pi / 4
+    return pose
+
+
+class SMPLModel:
+    """SMPL vertices from (betas, poses), vectorized over the batch."""
+
+    def __init__(self, v_template, shapedirs, posedirs, J_regressor, weights, parents,
+                 faces=None, dtype=torch.float32, device="cpu"):
+        as_tensor = lambda a: torch.as_tensor(np.asarray(a), dtype=dtype, device=device)
+        self.dtype = dtype
+        self.device = device
+        self.v_template = as_tensor(v_template)                       # [V, 3]
+        self.shapedirs = as_tensor(shapedirs)                         # [V, 3, L]
+        self.posedirs = as_tensor(posedirs)                           # [207, V*3]
+        self.J_regressor = as_tensor(J_regressor)                     # [24, V]
+        self.weights = as_tensor(weights)                             # [V, 24]
+        self.parents = [int(p) for p in np.asarray(parents).reshape(-1)[:NUM_JOINTS]]
+        self.parents[0] = -1
+        self.faces = None if faces is None else np.asarray(faces, dtype=np.int32)
+
+    @property
+    def num_betas(self):
+        return self.shapedirs.shape[-1]
+
+    @classmethod
+    def from_model_data(cls, model_info, num_betas=10, **kwargs):
+        """Build from the raw SMPL dict, with the same conversions patched_smpl_init applies."""
+        shapedirs = _to_numpy(model_info["shapedirs"])[:, :, :num_betas]
+        posedirs = _to_numpy(model_info["posedirs"])
+        if posedirs.ndim == 3:
+            # Original SMPL has [6890, 3, 207]; ROMP uses [207, 6890*3]
+            posedirs = posedirs.reshape(-1, posedirs.shape[-1]).T
+        elif posedirs.shape[0] != 207 and posedirs.shape[1] == 207:
+            posedirs = posedirs.T
+        parents = _to_numpy(model_info["kintree_table"])
+        parents = parents[0] if parents.ndim == 2 else parents
+        return cls(
+            v_template=_to_numpy(model_info["v_template"]),
+            shapedirs=shapedirs,
+            posedirs=posedirs,
+            J_regressor=_to_numpy(model_info["J_regressor"]),
+            weights=_to_numpy(model_info["weights"]),
+            parents=parents.astype(np.int64),
+            faces=_to_numpy(model_info["f"]) if "f" in model_info else None,
+            **kwargs,
+        )
+
+    def _as_batch(self, value, width):
+        value = torch.as_tensor(np.asarray(value, dtype=np.float32), dtype=self.dtype, device=self.device)
+        value = value.reshape(-1, value.shape[-1]) if value.ndim > 1 else value[None]
+        if value.shape[1] < width:
+            value = torch.nn.functional.pad(value, (0, width - value.shape[1]))
+        return value[:, :width]
+
+    def _skin(self, betas, poses):
+        batch = betas.shape[0]
+        v_shaped = self.v_template + torch.einsum("bl,vcl->bvc", betas, self.shapedirs)
+        joints = torch.einsum("jv,bvc->bjc", self.J_regressor, v_shaped)
+
+        rot = batch_rodrigues(poses.reshape(-1, 3)).view(batch, NUM_JOINTS, 3, 3)
+        eye = torch.eye(3, dtype=self.dtype, device=self.device)
+        pose_feature = (rot[:, 1:] - eye).reshape(batch, -1)
+        if torch.count_nonzero(pose_feature):
+            v_posed = v_shaped + (pose_feature @ self.posedirs).view(batch, -1, 3)
+        else:
+            v_posed = v_shaped  # rest pose: pose blend shapes vanish
+
+        # Forward kinematics: world transform of every joint
+        rel_joints = joints.clone()
+        rel_joints[:, 1:] -= joints[:, self.parents[1:]]
+        local = torch.zeros(batch, NUM_JOINTS, 4, 4, dtype=self.dtype, device=self.device)
+        local[:, :, :3, :3] = rot
+        local[:, :, :3, 3] = rel_joints
+        local[:, :, 3, 3] = 1.0
+        chain = [local[:, 0]]
+        for i in range(1, NUM_JOINTS):
+            chain.append(chain[self.parents[i]] @ local[:, i])
+        world = torch.stack(chain, dim=1)
+        posed_joints = world[:, :, :3, 3].clone()
+
+        # Remove the rest-pose joint location so transforms apply to rest-pose vertices
+        world[:, :, :3, 3] -= torch.einsum("bjmn,bjn->bjm", world[:, :, :3, :3], joints)
+        per_vertex = (self.weights @ world[:, :, :3, :].reshape(batch, NUM_JOINTS, 12)).view(batch, -1, 3, 4)
+        verts = torch.einsum("bvmn,bvn->bvm", per_vertex[:, :, :3, :3], v_posed) + per_vertex[:, :, :3, 3]
+        return verts, posed_joints
+
+    @torch.inference_mode()
+    def forward(self, betas, poses=None, batch_size=128, return_joints=False):
+        """
+        Vertices [B, V, 3] (and joints [B, 24, 3]) for betas [B, <=L] and poses [B, 72].
+        poses=None skins the rest (T) pose.
+        """
+        betas = self._as_batch(betas, self.num_betas)
+        if poses is None:
+            poses = torch.zeros(betas.shape[0], POSE_DIM, dtype=self.dtype, device=self.device)
+        else:
+            poses = self._as_batch(poses, POSE_DIM)
+        if poses.shape[0] != betas.shape[0]:
+            if betas.shape[0] == 1:
+                betas = betas.expand(poses.shape[0], -1)
+            elif poses.shape[0] == 1:
+                poses = poses.expand(betas.shape[0], -1)
+            else:
+                raise ValueError(f"betas batch {betas.shape[0]} != poses batch {poses.shape[0]}")
+
+        verts_out, joints_out = [], []
+        for start in range(0, betas.shape[0], batch_size):
+            verts, joints = self._skin(betas[start:start + batch_size], poses[start:start + batch_size])
+            verts_out.append(verts.cpu().numpy())
+            joints_out.append(joints.cpu().numpy())
+        verts = np.concatenate(verts_out)
+        return (verts, np.concatenate(joints_out)) if return_joints else verts
+
+    __call__ = forward
+
+    def canonical(self, betas, pose="t", batch_size=128):
+        """Vertices in a canonical posture, for posture-neutral measurements."""
+        return self.forward(betas, canonical_pose(pose)[None], batch_size=batch_size)
@@ -0,0 +1,216 @@
+"""
+Level-of-detail SMPL topologies.
+
+Every response used to carry the full 6890-vertex / 13776-face mesh, including
+the per-frame overlay meshes and previews. This module decimates the SMPL
+topology once, using quadric-error half-edge collapses, into nested levels:
+
+    full    6890 vertices (unchanged)
+    medium  ~1720 vertices
+    low     ~430 vertices
+
+A half-edge collapse merges a vertex into one of its neighbours and never
+creates new positions. Every LOD vertex is therefore an original SMPL vertex,
+and a LOD mesh is a plain gather ``vertices[..., index_map]`` with a fixed face
+list. That holds for any betas and pose.
+
+The levels are computed from the rest-pose template. They are cached next to
+the SMPL files (~/.romp/smpl_lod.npz or KNOT_LOD_CACHE, keyed by a hash of the
+faces). The build takes a few seconds, so it runs at provisioning time
+(provisioning.py) and the server only loads the cache, on the first request
+for a reduced LOD.
+"""
+
+import hashlib
+import heapq
+import logging
+import os
+import threading
+from pathlib import Path
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+LOD_TARGETS = {"medium": 1723, "low": 431}
+LOD_LEVELS = ("full",) + tuple(LOD_TARGETS)
+DEFAULT_CACHE = Path(os.getenv("KNOT_LOD_CACHE", Path.home() / ".romp" / "smpl_lod.npz"))
+
+
+def faces_digest(faces):
+    return hashlib.sha1(np.ascontiguousarray(faces, dtype=np.int32).tobytes()).hexdigest()[:16]
+
+
+def _face_quadrics(vertices, faces):
+    """Per-vertex sum of area-weighted plane quadrics [V, 4, 4]."""
+    v0, v1, v2 = (vertices[faces[:, i]] for i in range(3))
+    normals = np.cross(v1 - v0, v2 - v0)
+    area = np.linalg.norm(normals, axis=1, keepdims=True)
+    normals = normals / np.maximum(area, 1e-12)
+    planes = np.concatenate([normals, -(normals * v0).sum(1, keepdims=True)], axis=1)
+    face_q = area[:, :, None] * planes[:, :, None] * planes[:, None, :]
+    quadrics = np.zeros((len(vertices), 4, 4))
+    for i in range(3):
+        np.add.at(quadrics, faces[:, i], face_q)
+    return quadrics
+
+
+def decimate(vertices, faces, targets):
+    """
+    Nested half-edge-collapse decimation.
+
+    Returns {target_vertex_count: (index_map [K] int32, faces [F, 3] int32)} where
+    index_map holds original vertex indices and faces index into index_map.
+    """
+    vertices = np.asarray(vertices, dtype=np.float64)
+    faces = [list(f) for f in np.asarray(faces, dtype=np.int64)]
+    num_vertices = len(vertices)
+    homogeneous = np.concatenate([vertices, np.ones((num_vertices, 1))], axis=1)
+    quadrics = _face_quadrics(vertices, np.asarray(faces))
+
+    vertex_faces = [set() for _ in range(num_vertices)]
+    for fi, face in enumerate(faces):
+        for v in face:
+            vertex_faces[v].add(fi)
+    face_alive = [True] * len(faces)
+    alive = np.ones(num_vertices, dtype=bool)
+    version = [0] * num_vertices
+
+    def neighbours(v):
+        return {u for fi in vertex_faces[v] for u in faces[fi]} - {v}
+
+    def push_edges(edges, heap):
+        """Push both directions of each (u, v); the cost of u -> v is p_v^T (Q_u + Q_v) p_v."""
+        if not edges:
+            return
+        edges = np.array(list(edges))
+        u, v = edges[:, 0], edges[:, 1]
+        p = homogeneous[v]
+        costs = np.einsum("ei,eij,ej->e", p, quadrics[u] + quadrics[v], p)
+        for c, a, b in zip(costs.tolist(), u.tolist(), v.tolist()):
+            heapq.heappush(heap, (c, a, b, version[a], version[b]))
+
+    def collapse_ok(u, v):
+        # Link condition: the edge is shared by exactly two triangles whose third vertices are the only common neighbours
+        if len(neighbours(u) & neighbours(v)) != 2:
+            return False
+        # No triangle around u may flip or degenerate when u moves onto v
+        moved = np.array([faces[fi] for fi in vertex_faces[u] if v not in faces[fi]])
+        if len(moved) == 0:
+            return True
+        old = vertices[moved]
+        new = old.copy()
+        new[moved == u] = vertices[v]
+        old_n = np.cross(old[:, 1] - old[:, 0], old[:, 2] - old[:, 0])
+        new_n = np.cross(new[:, 1] - new[:, 0], new[:, 2] - new[:, 0])
+        dots = (old_n * new_n).sum(1)
+        return bool(np.all(dots > 0.2 * np.linalg.norm(old_n, axis=1) * np.linalg.norm(new_n, axis=1)))
+
+    heap = []
+    push_edges({(u, v) for v in range(num_vertices) for u in neighbours(v)}, heap)
+
+    levels = {}
+    remaining = num_vertices
+    for target in sorted(targets, reverse=True):
+        while remaining > target and heap:
+            _, u, v, ver_u, ver_v = heapq.heappop(heap)
+            if not (alive[u] and alive[v]) or ver_u != version[u] or ver_v != version[v]:
+                continue
+            if not collapse_ok(u, v):
+                continue
+            for fi in list(vertex_faces[u]):
+                face = faces[fi]
+                if v in face:
+                    face_alive[fi] = False
+                    for x in face:
+                        vertex_faces[x].discard(fi)
+                else:
+                    face[face.index(u)] = v
+                    vertex_faces[v].add(fi)
+            vertex_faces[u].clear()
+            alive[u] = False
+            quadrics[v] += quadrics[u]
+            remaining -= 1
+            # Only v's quadric changed: re-price its edges (validity is re-checked on pop)
+            version[v] += 1
+            push_edges({e for y in neighbours(v) for e in ((v, y), (y, v))}, heap)
+
+        index_map = np.flatnonzero(alive).astype(np.int32)
+        remap = np.full(num_vertices, -1, dtype=np.int64)
+        remap[index_map] = np.arange(len(index_map))
+        level_faces = remap[np.array([f for f, ok in zip(faces, face_alive) if ok])].astype(np.int32)
+        levels[target] = (index_map, level_faces)
+        logger.info(f"LOD {target}: {len(index_map)} vertices, {len(level_faces)} faces")
+    return levels
+
+
+class SMPLLod:
+    """Precomputed LOD index maps and faces for one topology."""
+
+    def __init__(self, faces, levels):
+        self.faces = {"full": np.asarray(faces, dtype=np.int32)}
+        self.index_maps = {"full": None}
+        for name, (index_map, level_faces) in levels.items():
+            self.index_maps[name] = index_map
+            self.faces[name] = level_faces
+        self.num_vertices = int(self.faces["full"].max()) + 1
+
+    @classmethod
+    def load(cls, faces, cache_path=DEFAULT_CACHE):
+        """The levels for this topology from cache_path, or None if they are not cached there."""
+        faces = np.asarray(faces, dtype=np.int32)
+        cache_path = Path(cache_path) if cache_path else None
+        if cache_path is None or not cache_path.exists():
+            return None
+        try:
+            cached = np.load(cache_path)
+            if str(cached["digest"]) == faces_digest(faces):
+                return cls(faces, {name: (cached[f"{name}_index_map"], cached[f"{name}_faces"])
+                                   for name in LOD_TARGETS})
+            logger.info(f"LOD cache {cache_path} is for another topology")
+        except Exception as e:
+            logger.warning(f"Could not read LOD cache {cache_path}: {e}")
+        return None
+
+    @classmethod
+    def build(cls, vertices, faces, cache_path=DEFAULT_CACHE):
+        """Load the levels for this topology from cache_path, or decimate and cache them."""
+        faces = np.asarray(faces, dtype=np.int32)
+        digest = faces_digest(faces)
+        cache_path = Path(cache_path) if cache_path else None
+        cached = cls.load(faces, cache_path)
+        if cached is not None:
+            return cached
+
+        decimated = decimate(vertices, faces, LOD_TARGETS.values())
+        levels = {name: decimated[target] for name, target in LOD_TARGETS.items()}
+        if cache_path is not None:
+            try:
+                cache_path.parent.mkdir(parents=True, exist_ok=True)
+                arrays = {"digest": np.array(digest)}
+                for name, (index_map, level_faces) in levels.items():
+                    arrays[f"{name}_index_map"] = index_map
+                    arrays[f"{name}_faces"] = level_faces
+                # Per-process name: workers starting together on a cold cache each write their own
+                tmp_path = cache_path.with_name(f".{cache_path.stem}.{os.getpid()}.{threading.get_ident()}.tmp.npz")
+                try:
+                    np.savez(tmp_path, **arrays)
+                    os.replace(tmp_path, cache_path)
+                finally:
+                    tmp_path.unlink(missing_ok=True)
+            except OSError as e:
+                logger.warning(f"Could not write LOD cache {cache_path}: {e}")
+        return cls(faces, levels)
+
+    def index_map(self, lod, num_vertices):
+        """Vertex gather indices for lod, or None for the full mesh / an unknown topology."""
+        if lod not in self.index_maps:
+            raise ValueError(f"lod must be one of {LOD_LEVELS}")
+        if num_vertices != self.num_vertices:
+            return None
+        return self.index_maps[lod]
+
+    def gather(self, vertices, lod):
+        """vertices [..., V, 3] reduced to lod."""
+        index_map = self.index_map(lod, np.shape(vertices)[-2])
+        return vertices if index_map is None else np.asarray(vertices)[..., index_map, :]
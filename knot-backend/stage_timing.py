@@ -0,0 +1,76 @@
+"""
+Per-request stage timing for the /process-scan pipeline.
+
+process_scan wraps each stage in ``timings.stage(name)``; repeated stages (one
+decode per sampled frame, ...) accumulate. When the request finishes the
+timings are published to every registered listener, which is how the
+benchmark harness collects its per-stage breakdown.
+
+Stages may be recorded from several threads (the prefetch thread, concurrent
+photo workers). Spans that overlap add up to more than the wall-clock time, so
+concurrent work should be recorded as one span around the whole batch.
+"""
+
+import logging
+import threading
+import time
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+# Pipeline stages in execution order
+STAGES = (
+    "probe",        # parse the container header of an uploaded video (probe.py)
+    "upload",       # copy the uploaded video to disk (photos: read into memory)
+    "admission",    # wait for a processing slot (admission.py, when enabled)
+    "decode",       # seek + decode sampled frames (photos: imdecode from memory)
+    "preprocess",   # resize + BGR->RGB conversion
+    "prefilter",    # person-presence check (person_filter.py, when enabled)
+    "inference",    # model forward pass
+    "smoothing",    # per-frame extraction + temporal smoothing
+    "measurement",  # compute_measurements
+    "persist",      # write the scan to the scan store (scan_store.py, when enabled)
+    "serialize",    # list conversion + JSON rendering
+)
+
+_listeners = []
+
+
+class StageTimings:
+    """Accumulated wall-clock seconds per stage for a single request."""
+
+    def __init__(self):
+        self.durations = {}
+        self.started = time.perf_counter()
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                self.durations[name] = self.durations.get(name, 0.0) + elapsed
+
+    def total(self):
+        return time.perf_counter() - self.started
+
+
+def add_listener(listener):
+    """Register ``listener(timings)`` to be called after every request."""
+    _listeners.append(listener)
+
+
+def remove_listener(listener):
+    if listener in _listeners:
+        _listeners.remove(listener)
+
+
+def publish(timings):
+    for listener in list(_listeners):
+        try:
+            listener(timings)
+        except Exception as e:
+            logger.warning(f"Stage timing listener failed: {e}")
@@ -0,0 +1,76 @@
+"""
+Synthetic scan clips for benchmarks and calibration.
+
+Frames show a simple figure (head, torso, limbs) swaying slightly in front of
+a textured background, so decoding and resizing do realistic work without
+needing real scan videos on disk.
+"""
+
+import logging
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Container extension per FourCC
+CODEC_EXTENSIONS = {
+    "mp4v": ".mp4",
+    "avc1": ".mp4",
+    "MJPG": ".avi",
+    "XVID": ".avi",
+}
+
+
+def synthetic_frame(width, height, t=0.0, seed=0):
+    """Render one BGR frame of the synthetic figure at time t (seconds)."""
+    rng = np.random.default_rng(seed)
+    # Gradient background with a little noise
+    ys = np.linspace(60, 200, height, dtype=np.float32)[:, None]
+    xs = np.linspace(40, 120, width, dtype=np.float32)[None, :]
+    base = (ys + xs) / 2
+    frame = np.stack([base, base * 0.9, base * 0.8], axis=-1)
+    frame += rng.normal(0, 6, size=frame.shape).astype(np.float32)
+    frame = np.clip(frame, 0, 255).astype(np.uint8)
+
+    unit = min(width, height) / 10.0
+    sway = np.sin(2 * np.pi * 0.5 * t) * unit * 0.3
+    cx = int(width / 2 + sway)
+    top = int(height / 2 - 4 * unit)
+
+    skin = (140, 170, 220)
+    shirt = (160, 90, 40)
+    pants = (60, 50, 40)
+    thick = max(2, int(unit * 0.5))
+
+    def p(dx, dy):
+        return (int(cx + dx * unit), int(top + dy * unit))
+
+    cv2.ellipse(frame, p(0, 0.6), (int(unit * 0.45), int(unit * 0.6)), 0, 0, 360, skin, -1)
+    cv2.ellipse(frame, p(0, 2.6), (int(unit * 0.9), int(unit * 1.5)), 0, 0, 360, shirt, -1)
+    arm_swing = np.sin(2 * np.pi * 0.5 * t) * 0.3
+    cv2.line(frame, p(-0.8, 1.5), p(-1.6, 3.6 + arm_swing), skin, thick)
+    cv2.line(frame, p(0.8, 1.5), p(1.6, 3.6 - arm_swing), skin, thick)
+    cv2.line(frame, p(-0.4, 3.9), p(-0.5, 7.6), pants, int(thick * 1.4))
+    cv2.line(frame, p(0.4, 3.9), p(0.5, 7.6), pants, int(thick * 1.4))
+    return frame
+
+
+def write_synthetic_video(path, width, height, num_frames, fps=30, codec="mp4v"):
+    """
+    Write a synthetic clip with cv2.VideoWriter.
+    Returns the written Path, or None if the codec is not available.
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    writer = cv2.VideoWriter(str(path), cv2.VideoWriter_fourcc(*codec), fps, (width, height))
+    if not writer.isOpened():
+        logger.warning(f"Codec {codec} not available for {path.suffix}")
+        return None
+    try:
+        for i in range(num_frames):
+            writer.write(synthetic_frame(width, height, t=i / fps, seed=i))
+    finally:
+        writer.release()
+    return path
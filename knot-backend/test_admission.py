@@ -0,0 +1,138 @@
+"""Admission control (admission.py): shedding, priority order and slot release."""
+
+import asyncio
+
+import pytest
+
+import admission
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+async def queued(controller, work, priority="interactive"):
+    """Task waiting in the controller's queue."""
+    task = asyncio.ensure_future(controller.acquire(work, priority))
+    await asyncio.sleep(0)
+    assert not task.done()
+    return task
+
+
+def test_idle_controller_admits_immediately():
+    async def scenario():
+        controller = admission.AdmissionController(max_concurrent=2)
+        await controller.acquire(1.0)
+        await controller.acquire(1.0)
+        assert controller.running == 2 and controller.running_work == 2.0
+        controller.release(1.0)
+        assert controller.running == 1
+
+    run(scenario())
+
+
+def test_429_when_class_queue_is_full():
+    async def scenario():
+        controller = admission.AdmissionController(max_concurrent=1, max_queued=1, max_latency=1000)
+        await controller.acquire(1.0)
+        waiting = await queued(controller, 1.0)
+        with pytest.raises(admission.Overloaded) as shed:
+            await controller.acquire(1.0)
+        assert shed.value.status_code == 429
+        assert shed.value.retry_after >= 1
+        # The batch queue is half the interactive one (0 here): full before anything waits in it
+        assert controller.precheck("batch").status_code == 429
+        controller.release(1.0)
+        await waiting
+        assert controller.queued["interactive"] == 0
+
+    run(scenario())
+
+
+def test_503_when_estimated_completion_exceeds_the_limit():
+    async def scenario():
+        controller = admission.AdmissionController(max_concurrent=1, max_latency=10, seconds_per_unit=1.0)
+        await controller.acquire(5.0)
+        # 5 s until the slot frees up + 6 s of its own work > 10 s
+        with pytest.raises(admission.Overloaded) as shed:
+            await controller.acquire(6.0)
+        assert shed.value.status_code == 503
+        assert shed.value.retry_after == 5
+        assert controller.queued["interactive"] == 0
+        # Before the body is read only the wait counts
+        assert controller.precheck("interactive") is None
+        assert controller.check("interactive", 4.0) is None
+
+    run(scenario())
+
+
+def test_dispatch_serves_interactive_before_batch_fifo_within_class():
+    async def scenario():
+        controller = admission.AdmissionController(max_concurrent=1, max_queued=8, max_queued_batch=8,
+                                                   max_latency=1000, seconds_per_unit=0.01)
+        order = []
+
+        async def scan(name, priority):
+            await controller.acquire(1.0, priority)
+            order.append(name)
+            controller.release(1.0)
+
+        await controller.acquire(1.0)
+        tasks = [asyncio.ensure_future(scan(name, priority)) for name, priority in
+                 [("batch-1", "batch"), ("interactive-1", "interactive"),
+                  ("batch-2", "batch"), ("interactive-2", "interactive")]]
+        await asyncio.sleep(0)
+        assert controller.queued == {"interactive": 2, "batch": 2}
+        controller.release(1.0)
+        await asyncio.gather(*tasks)
+        assert order == ["interactive-1", "interactive-2", "batch-1", "batch-2"]
+        assert controller.running == 0
+
+    run(scenario())
+
+
+def test_cancelled_waiter_is_dequeued_and_skipped():
+    async def scenario():
+        controller = admission.AdmissionController(max_concurrent=1, max_latency=1000, seconds_per_unit=0.01)
+        await controller.acquire(1.0)
+        waiting = await queued(controller, 3.0)
+        assert controller.queued_work["interactive"] == 3.0
+        waiting.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiting
+        assert controller.queued["interactive"] == 0
+        assert controller.queued_work["interactive"] == 0.0
+        # Its slot is not handed to the cancelled request
+        controller.release(1.0)
+        assert controller.running == 0 and controller.running_work == 0.0
+
+    run(scenario())
+
+
+def test_waiter_times_out_with_503_and_is_dequeued():
+    async def scenario():
+        # Waits at most max(max_latency - own work, 1 s)
+        controller = admission.AdmissionController(max_concurrent=1, max_latency=1.0, seconds_per_unit=0.01)
+        await controller.acquire(1.0)
+        with pytest.raises(admission.Overloaded) as shed:
+            await controller.acquire(1.0)
+        assert shed.value.status_code == 503
+        assert "not admitted" in shed.value.reason
+        assert controller.queued["interactive"] == 0
+        controller.release(1.0)
+        assert controller.running == 0
+
+    run(scenario())
+
+
+def test_release_refines_seconds_per_unit():
+    controller = admission.AdmissionController(seconds_per_unit=0.5)
+    controller._start(10.0)
+    controller.release(10.0, seconds=10.0)
+    assert controller.seconds_per_unit == pytest.approx(0.5 + admission.COST_SMOOTHING * (1.0 - 0.5))
+
+
+def test_estimate_work_prices_decoded_frames_by_resolution():
+    assert admission.estimate_work(10, 0, 0) == 10
+    assert admission.estimate_work(10, 1000, 1000, decoded=100) == pytest.approx(
+        10 + 100 * admission.DECODE_UNITS_PER_MEGAPIXEL)
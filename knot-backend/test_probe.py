@@ -0,0 +1,260 @@
+"""Container probe (probe.py) on small MP4 / AVI / Matroska headers built in memory."""
+
+import io
+import struct
+
+import pytest
+
+import probe
+
+
+# ISO BMFF
+
+def box(box_type, payload=b""):
+    return struct.pack(">I4s", 8 + len(payload), box_type) + payload
+
+
+def full_box(box_type, payload, version=0):
+    return box(box_type, struct.pack(">B3x", version) + payload)
+
+
+def sample_entry(codec=b"avc1", width=640, height=360):
+    # SampleEntry (6 reserved, data_reference_index), then VisualSampleEntry up to width / height
+    fields = bytes(6) + struct.pack(">H", 1) + bytes(16) + struct.pack(">HH", width, height) + bytes(50)
+    return struct.pack(">I4s", 8 + len(fields), codec) + fields
+
+
+def video_trak(codec=b"avc1", width=640, height=360, tkhd_size=(640, 360), timescale=30000, duration=90000,
+               frames=90, keyframes=(1, 31, 61), handler=b"vide", stts=None, mdhd_version=0):
+    tkhd = full_box(b"tkhd", bytes(72) + struct.pack(">II", tkhd_size[0] << 16, tkhd_size[1] << 16))
+    if mdhd_version == 1:
+        mdhd = full_box(b"mdhd", struct.pack(">QQIQ", 0, 0, timescale, duration) + bytes(4), version=1)
+    else:
+        mdhd = full_box(b"mdhd", struct.pack(">IIII", 0, 0, timescale, duration) + bytes(4))
+    hdlr = full_box(b"hdlr", bytes(4) + handler + bytes(12) + b"VideoHandler\x00")
+    stsd = full_box(b"stsd", struct.pack(">I", 1) + sample_entry(codec, width, height))
+    if stts is None:
+        stts = full_box(b"stts", struct.pack(">III", 1, frames, duration // max(frames, 1)) if frames
+                        else struct.pack(">I", 0))
+    stbl = stsd + stts
+    if keyframes is not None:
+        stbl += full_box(b"stss", struct.pack(f">I{len(keyframes)}I", len(keyframes), *keyframes))
+    minf = box(b"minf", box(b"stbl", stbl))
+    return box(b"trak", tkhd + box(b"mdia", mdhd + hdlr + minf))
+
+
+def moov(*traks, mvex=False, timescale=1000, duration=3000):
+    mvhd = full_box(b"mvhd", struct.pack(">IIII", 0, 0, timescale, duration) + bytes(80))
+    children = mvhd + b"".join(traks)
+    if mvex:
+        children += box(b"mvex", full_box(b"trex", bytes(20)))
+    return box(b"moov", children)
+
+
+def ftyp(brand=b"isom"):
+    return box(b"ftyp", brand + struct.pack(">I", 512) + brand)
+
+
+def run_probe(data):
+    f = io.BytesIO(data)
+    f.seek(5)
+    info = probe.probe(f)
+    assert f.tell() == 5  # position restored
+    return info
+
+
+def test_mp4_faststart():
+    info = run_probe(ftyp() + moov(video_trak()) + box(b"mdat", bytes(1000)))
+    assert (info.container, info.codec, info.width, info.height) == ("mp4", "h264", 640, 360)
+    assert info.frame_count == 90
+    assert info.duration == pytest.approx(3.0)
+    assert info.fps == pytest.approx(30.0)
+    assert info.keyframes == [0, 30, 60]
+    assert info.keyframe_interval == 30
+    probe.check(info, size=2000)
+
+
+def test_mp4_moov_after_mdat():
+    mdat_payload = bytes(256 << 10)
+    # 64-bit largesize mdat, as long recordings write
+    mdat = struct.pack(">I4sQ", 1, b"mdat", 16 + len(mdat_payload)) + mdat_payload
+    info = run_probe(ftyp() + mdat + moov(video_trak(codec=b"hvc1", width=1920, height=1080)))
+    assert (info.codec, info.width, info.height, info.frame_count) == ("hevc", 1920, 1080, 90)
+    # Only box headers were read on the way to moov, not the media data
+    assert info.header_bytes < len(mdat_payload)
+
+
+def test_mov_brand_and_mdhd_version_1():
+    info = run_probe(ftyp(b"qt  ") + moov(video_trak(timescale=600, duration=1200, frames=48, mdhd_version=1)))
+    assert info.container == "mov"
+    assert info.duration == pytest.approx(2.0)
+    assert info.fps == pytest.approx(24.0)
+
+
+def test_tkhd_size_when_sample_entry_has_none():
+    info = run_probe(ftyp() + moov(video_trak(width=0, height=0, tkhd_size=(1280, 720))))
+    assert (info.width, info.height) == (1280, 720)
+
+
+def test_no_stss_means_every_frame_is_a_keyframe():
+    info = run_probe(ftyp() + moov(video_trak(frames=5, duration=5000, keyframes=None)))
+    assert info.keyframes == [0, 1, 2, 3, 4]
+    assert info.keyframe_interval == 1
+
+
+def test_fragmented_mp4():
+    # The sample tables in moov only describe the first fragment, if anything
+    trak = video_trak(frames=10, keyframes=(1,), duration=10000)
+    info = run_probe(ftyp(b"iso5") + moov(trak, mvex=True) + box(b"moof", bytes(32)))
+    assert (info.codec, info.width, info.height) == ("h264", 640, 360)
+    assert info.frame_count is None and info.duration is None and info.keyframes is None
+    probe.check(info, size=1000)
+
+
+def test_mp4_without_video_track():
+    info = run_probe(ftyp() + moov(video_trak(handler=b"soun")))
+    assert not info.has_video
+    with pytest.raises(probe.Rejected) as rejected:
+        probe.check(info)
+    assert rejected.value.status_code == 415
+
+
+def test_mp4_without_moov_is_rejected():
+    with pytest.raises(probe.Rejected) as rejected:
+        run_probe(ftyp() + box(b"mdat", bytes(100)))
+    assert rejected.value.status_code == 400
+
+
+def test_truncated_sample_table_keeps_only_the_container():
+    # stts announces more entries than the box holds
+    stts = full_box(b"stts", struct.pack(">III", 5, 90, 1000))
+    info = run_probe(ftyp() + moov(video_trak(stts=stts)))
+    assert info.container == "mp4"
+    assert info.codec is None and info.frame_count is None
+    probe.check(info)
+
+
+def test_truncated_upload_is_left_to_cv2():
+    assert run_probe(ftyp()[:10]) is None
+
+
+def test_oversized_moov_is_rejected_before_reading():
+    header = struct.pack(">I4s", probe.MAX_HEADER_BYTES + 64, b"moov")
+    with pytest.raises(probe.Rejected) as rejected:
+        run_probe(ftyp() + header + bytes(64))
+    assert rejected.value.status_code == 413
+
+
+def test_unrecognized_container():
+    assert run_probe(b"\x47" + bytes(187) * 2) is None
+
+
+# AVI
+
+def riff_chunk(chunk_id, data):
+    return struct.pack("<4sI", chunk_id, len(data)) + data + b"\x00" * (len(data) & 1)
+
+
+def avi(handler=b"H264", compression=b"H264", stream_type=b"vids", hdrl_size=None):
+    avih = struct.pack("<10I", 33333, 0, 0, 0, 150, 0, 1, 0, 1280, 720) + bytes(16)
+    strh = stream_type + handler + bytes(48)
+    strf = struct.pack("<IiiHH4s", 40, 1280, 720, 1, 24, compression) + bytes(20)
+    strl = b"strl" + riff_chunk(b"strh", strh) + riff_chunk(b"strf", strf)
+    hdrl = b"hdrl" + riff_chunk(b"avih", avih) + riff_chunk(b"LIST", strl)
+    size = len(hdrl) if hdrl_size is None else hdrl_size
+    body = b"AVI " + struct.pack("<4sI", b"LIST", size) + hdrl
+    return b"RIFF" + struct.pack("<I", len(body)) + body
+
+
+def test_avi():
+    info = run_probe(avi())
+    assert (info.container, info.codec, info.width, info.height) == ("avi", "h264", 1280, 720)
+    assert info.frame_count == 150
+    assert info.fps == pytest.approx(30.0, rel=1e-3)
+    assert info.duration == pytest.approx(5.0, rel=1e-3)
+
+
+def test_avi_codec_from_handler_without_compression():
+    assert run_probe(avi(handler=b"XVID", compression=bytes(4))).codec == "mpeg4"
+
+
+def test_avi_without_video_stream():
+    assert not run_probe(avi(stream_type=b"auds")).has_video
+
+
+def test_oversized_avi_header_is_rejected():
+    with pytest.raises(probe.Rejected) as rejected:
+        run_probe(avi(hdrl_size=probe.MAX_HEADER_BYTES + 8))
+    assert rejected.value.status_code == 413
+
+
+# Matroska / WebM
+
+UNKNOWN = b"\x01\xff\xff\xff\xff\xff\xff\xff"
+
+
+def element(name, payload=b"", unknown_size=False):
+    element_id = probe.EBML_IDS[name] if isinstance(name, str) else name
+    size = UNKNOWN if unknown_size else b"\x01" + len(payload).to_bytes(7, "big")
+    return element_id.to_bytes((element_id.bit_length() + 7) // 8, "big") + size + payload
+
+
+def uint(name, value, width=4):
+    return element(name, value.to_bytes(width, "big"))
+
+
+def matroska(track_type=1, codec=b"V_VP9", with_info=True):
+    header = element(0x1A45DFA3, element(0x4282, b"webm"))
+    info = element("info", uint("timecode_scale", 1_000_000, 3) + element("duration", struct.pack(">f", 2000.0)))
+    video = element("video", uint("pixel_width", 1280, 2) + uint("pixel_height", 720, 2))
+    entry = element("track_entry", uint("track_type", track_type, 1) + element("codec_id", codec)
+                    + uint("default_duration", 33_333_333) + video)
+    # Live recordings write Segment and Cluster with unknown sizes
+    cluster = element("cluster", bytes(64), unknown_size=True)
+    segment = element("segment", (info if with_info else b"") + element("tracks", entry) + cluster, unknown_size=True)
+    return header + segment
+
+
+def test_matroska_with_unknown_sizes():
+    info = run_probe(matroska())
+    assert (info.container, info.codec, info.width, info.height) == ("matroska", "vp9", 1280, 720)
+    assert info.duration == pytest.approx(2.0)
+    assert info.fps == pytest.approx(30.0)
+    assert info.frame_count == 60
+    assert info.keyframes is None
+
+
+def test_matroska_without_duration():
+    info = run_probe(matroska(with_info=False))
+    assert info.codec == "vp9"
+    assert info.duration is None and info.frame_count is None
+    probe.check(info)
+
+
+def test_matroska_without_video_track():
+    info = run_probe(matroska(track_type=2, codec=b"A_OPUS"))
+    assert not info.has_video
+
+
+def test_ebml_vint_unknown_size():
+    assert probe._ebml_vint(UNKNOWN, 0, keep_marker=False) == (probe.UNKNOWN_SIZE, 8)
+    assert probe._ebml_vint(b"\x81", 0, keep_marker=False) == (1, 1)
+    assert probe._ebml_vint(b"\x1a\x45\xdf\xa3", 0, keep_marker=True) == (0x1A45DFA3, 4)
+
+
+# check()
+
+def test_check_rejects_empty_and_oversized_uploads():
+    with pytest.raises(probe.Rejected) as rejected:
+        probe.check(None, size=0)
+    assert rejected.value.status_code == 400
+    with pytest.raises(probe.Rejected) as rejected:
+        probe.check(None, size=probe.MAX_UPLOAD_BYTES + 1)
+    assert rejected.value.status_code == 413
+    probe.check(None, size=100)
+
+
+def test_check_rejects_unsupported_codec():
+    with pytest.raises(probe.Rejected) as rejected:
+        probe.check(probe.VideoInfo("mp4", codec="theora"))
+    assert rejected.value.status_code == 415
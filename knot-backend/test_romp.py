@@ -4,58 +4,11 @@
 import sys
 import argparse
 from pathlib import Path
-import inspect
-import numpy
 
-# Fix chumpy compatibility with Python 3.13 and NumPy 1.26+
-if not hasattr(inspect, 'getargspec'):
-    inspect.getargspec = inspect.getfullargspec
+import compat
 
-# Patch numpy for chumpy compatibility
-for attr in ['bool', 'int', 'float', 'complex', 'object', 'unicode', 'str']:
-    if not hasattr(numpy, attr):
-        mapping = {
-            'bool': 'bool_',
-            'int': 'int_',
-            'float': 'float_',
-            'complex': 'complex_',
-            'object': 'object_',
-            'unicode': 'str_',
-            'str': 'str_'
-        }
-        if mapping[attr] in dir(numpy):
-            setattr(numpy, attr, getattr(numpy, mapping[attr]))
-
-# Apply monkeypatch before importing ROMP
-import torch
-import functools
-import pickle
-
-# Patch torch.serialization._legacy_load to handle Python 2 pickles
-import torch.serialization
-_original_legacy_load = torch.serialization._legacy_load
-def patched_legacy_load(opened_file, map_location, pickle_module, **pickle_load_args):
-    # Replace pickle_module.load with a version that uses latin1 encoding
-    _original_pickle_load = pickle_module.load
-    def patched_pickle_module_load(file, **kwargs):
-        # Create Unpickler with latin1 encoding
-        unpickler = pickle.Unpickler(file, encoding='latin1')
-        return unpickler.load()
-    pickle_module.load = patched_pickle_module_load
-    try:
-        result = _original_legacy_load(opened_file, map_location, pickle_module, **pickle_load_args)
-        return result
-    finally:
-        # Restore original
-        pickle_module.load = _original_pickle_load
-torch.serialization._legacy_load = patched_legacy_load
-
-original_torch_load = torch.load
-def patched_torch_load(*args, **kwargs):
-    if 'weights_only' not in kwargs:
-        kwargs['weights_only'] = False
-    return original_torch_load(*args, **kwargs)
-torch.load = patched_torch_load
+# chumpy / NumPy / torch.load patches, before ROMP is imported
+compat.apply()
 
 # Prevent argparse conflict
 original_argv = sys.argv
@@ -0,0 +1,67 @@
+"""Scan store (scan_store.py) round trips, and stored scans served by GET /scans/{scan_id}."""
+
+import asyncio
+import json
+
+import numpy as np
+import pytest
+
+import scan_store
+
+
+def params(seed):
+    rng = np.random.default_rng(seed)
+    return {"betas": rng.normal(size=(1, 10)) * 0.5, "poses": rng.normal(size=(1, 72)) * 0.1,
+            "cam": np.array([[1.0, 0.0, 0.0]])}
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = scan_store.ScanStore(tmp_path / "scans.db")
+    yield store
+    store.close()
+
+
+def save_partial_scan(store):
+    """A scan whose second processed frame has no params (no person detected)."""
+    frames = [{"_frame_idx": 0, "params": params(1)}, {"_frame_idx": 5, "params": {}},
+              {"_frame_idx": 10, "params": params(2)}]
+    return store.save({"params": params(0)}, frames, {"height_cm": 170.0}, user_id="u1")
+
+
+def test_round_trip_keeps_frames_without_params_as_nan_rows(store):
+    record = store.get(save_partial_scan(store))
+    assert record["user_id"] == "u1" and record["height_cm"] == pytest.approx(170.0)
+    assert record["frame_idx"].tolist() == [0, 5, 10]
+    np.testing.assert_allclose(record["params"]["betas"], params(0)["betas"][0], rtol=1e-6)
+    betas = record["frame_params"]["betas"]
+    assert betas.shape == (3, 10)
+    assert np.isnan(betas[1]).all() and np.isfinite(betas[[0, 2]]).all()
+    assert store.get("missing") is None
+
+
+def test_get_scan_per_frame_returns_null_vertices_for_frames_without_params(store, monkeypatch):
+    pytest.importorskip("fastapi")
+    pytest.importorskip("torch")
+    import main
+    import smpl_lbs
+
+    rng = np.random.default_rng(0)
+    num_vertices = 16
+    model = smpl_lbs.SMPLModel(
+        v_template=rng.normal(size=(num_vertices, 3)),
+        shapedirs=rng.normal(size=(num_vertices, 3, 10)) * 0.01,
+        posedirs=np.zeros((207, num_vertices * 3)),
+        J_regressor=np.full((smpl_lbs.NUM_JOINTS, num_vertices), 1.0 / num_vertices),
+        weights=np.eye(smpl_lbs.NUM_JOINTS)[np.arange(num_vertices) % smpl_lbs.NUM_JOINTS],
+        parents=np.concatenate([[-1], np.zeros(smpl_lbs.NUM_JOINTS - 1)]),
+    )
+    monkeypatch.setattr(main, "SCAN_STORE", store)
+    monkeypatch.setattr(main, "get_lbs_model", lambda: model)
+
+    response = asyncio.run(main.get_scan(save_partial_scan(store), per_frame=True))
+    meshes = response["per_frame_meshes"]
+    assert [m["frame_idx"] for m in meshes] == [0, 5, 10]
+    assert meshes[1]["vertices"] is None
+    assert len(meshes[0]["vertices"]) == len(meshes[2]["vertices"]) == num_vertices
+    json.dumps(response, allow_nan=False)  # what JSONResponse does: no NaN may reach it
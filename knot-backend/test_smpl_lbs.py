@@ -0,0 +1,80 @@
+"""Batched SMPL skinning (smpl_lbs.py) on a synthetic rig: a body and two arms on the shoulder joints."""
+
+import math
+
+import numpy as np
+import pytest
+
+pytest.importorskip("torch")
+import smpl_lbs  # noqa: E402
+
+SMPL_PARENTS = [-1, 0, 0, 0, 1, 2, 3, 4, 5, 6, 7, 8, 9, 9, 9, 12, 13, 14, 16, 17, 18, 19, 20, 21]
+
+# Body vertex at the origin, each shoulder 0.2 to the side, each hand 0.4 further out along X
+TEMPLATE = np.array([[0.0, 0.0, 0.0], [0.2, 0.4, 0.0], [0.6, 0.4, 0.0], [-0.2, 0.4, 0.0], [-0.6, 0.4, 0.0]])
+BODY, LEFT_HAND, RIGHT_HAND = 0, 2, 4
+
+
+def rig_model_data():
+    """Model dict in the SMPL file layout: the shoulders move the hands, every other joint sits on the body."""
+    num_vertices = len(TEMPLATE)
+    regressor = np.zeros((smpl_lbs.NUM_JOINTS, num_vertices))
+    regressor[:, BODY] = 1.0
+    regressor[smpl_lbs.LEFT_SHOULDER] = np.eye(num_vertices)[1]
+    regressor[smpl_lbs.RIGHT_SHOULDER] = np.eye(num_vertices)[3]
+    weights = np.zeros((num_vertices, smpl_lbs.NUM_JOINTS))
+    weights[[0, 1, 3], 0] = 1.0
+    weights[LEFT_HAND, smpl_lbs.LEFT_SHOULDER] = 1.0
+    weights[RIGHT_HAND, smpl_lbs.RIGHT_SHOULDER] = 1.0
+    shapedirs = np.zeros((num_vertices, 3, 10))
+    shapedirs[:, 1, 0] = 0.1  # beta 0 raises the whole body
+    return {
+        "v_template": TEMPLATE,
+        "shapedirs": shapedirs,
+        "posedirs": np.zeros((num_vertices, 3, 207)),
+        "J_regressor": regressor,
+        "weights": weights,
+        "kintree_table": np.stack([SMPL_PARENTS, np.arange(smpl_lbs.NUM_JOINTS)]),
+    }
+
+
+@pytest.fixture(scope="module")
+def model():
+    return smpl_lbs.SMPLModel.from_model_data(rig_model_data())
+
+
+def test_rest_pose_returns_the_shaped_template(model):
+    np.testing.assert_allclose(model.forward(np.zeros(10))[0], TEMPLATE, atol=1e-6)
+    betas = np.zeros((1, 10))
+    betas[0, 0] = 2.0
+    vertices, joints = model.forward(betas, np.zeros((1, smpl_lbs.POSE_DIM)), return_joints=True)
+    np.testing.assert_allclose(vertices[0], TEMPLATE + [0.0, 0.2, 0.0], atol=1e-6)
+    np.testing.assert_allclose(joints[0, smpl_lbs.LEFT_SHOULDER], [0.2, 0.6, 0.0], atol=1e-6)
+    np.testing.assert_allclose(model.canonical(betas, pose="t"), vertices, atol=1e-6)
+
+
+def test_a_pose_lowers_both_arms(model):
+    vertices = model.canonical(np.zeros(10), pose="a")[0]
+    drop = 0.4 * math.sin(math.pi / 4)
+    np.testing.assert_allclose(vertices[LEFT_HAND], [0.2 + 0.4 * math.cos(math.pi / 4), 0.4 - drop, 0.0], atol=1e-5)
+    np.testing.assert_allclose(vertices[RIGHT_HAND], [-0.2 - 0.4 * math.cos(math.pi / 4), 0.4 - drop, 0.0], atol=1e-5)
+    np.testing.assert_allclose(vertices[[0, 1, 3]], TEMPLATE[[0, 1, 3]], atol=1e-6)
+    with pytest.raises(ValueError):
+        model.canonical(np.zeros(10), pose="x")
+
+
+def test_single_betas_broadcast_over_a_pose_batch(model):
+    rng = np.random.default_rng(0)
+    betas = rng.normal(size=(1, 10))
+    poses = rng.normal(size=(3, smpl_lbs.POSE_DIM)) * 0.3
+    batch = model.forward(betas, poses, batch_size=2)  # two chunks
+    assert batch.shape == (3, len(TEMPLATE), 3)
+    for i in range(3):
+        np.testing.assert_allclose(batch[i], model.forward(betas, poses[i])[0], atol=1e-5)
+    # And a single pose over a betas batch
+    assert model.forward(rng.normal(size=(4, 10)), poses[0]).shape == (4, len(TEMPLATE), 3)
+
+
+def test_mismatched_batches_raise(model):
+    with pytest.raises(ValueError, match="batch"):
+        model.forward(np.zeros((2, 10)), np.zeros((3, smpl_lbs.POSE_DIM)))
@@ -0,0 +1,187 @@
+"""
+Torch CPU runtime configuration for the model worker.
+
+Several uvicorn workers on one box each default to one torch thread per core,
+which oversubscribes the CPU. configure_torch_runtime() splits the available
+cores across workers, optionally pins each worker to its own block of cores,
+and must run before the model is built. inference_context() wraps forward
+passes, and warm_up() runs the model once at startup so the first real
+request doesn't pay for lazy initialization. use_precision() picks the network
+precision for the forward passes of one request (see quantization.PrecisionRouter).
+
+Environment:
+    KNOT_WORKERS                number of worker processes on this node
+                                (falls back to WEB_CONCURRENCY, default 1)
+    KNOT_TORCH_THREADS          intra-op threads per worker (default cores // workers)
+    KNOT_TORCH_INTEROP_THREADS  inter-op threads per worker (default 1)
+    KNOT_CPU_AFFINITY           "" (off), "auto" (one core block per worker) or a
+                                core list such as "0-7,16-23"
+    KNOT_TORCH_GRAD_MODE        inference | no_grad | off (default inference)
+    KNOT_WARMUP_RUNS            warm-up forward passes at startup (default 1, 0 = off)
+"""
+
+import contextlib
+import contextvars
+import fcntl
+import logging
+import os
+import time
+
+import compat
+
+cv2 = compat.lazy_import("cv2")
+torch = compat.lazy_import("torch")
+
+logger = logging.getLogger(__name__)
+
+GRAD_MODES = ("inference", "no_grad", "off")
+
+_config = {}
+# Network precision requested for forward passes in this context (None = the configured one)
+_precision = contextvars.ContextVar("knot_inference_precision", default=None)
+# Keeps the "auto" affinity slot lock alive for the lifetime of the worker
+_slot_lock_file = None
+
+
+def _parse_cpu_list(text):
+    """Parse "0-3,8,10-11" into a sorted list of core ids."""
+    cores = set()
+    for part in text.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        if "-" in part:
+            start, end = part.split("-", 1)
+            cores.update(range(int(start), int(end) + 1))
+        else:
+            cores.add(int(part))
+    return sorted(cores)
+
+
+def _available_cores():
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def _claim_worker_slot(workers):
+    """
+    Claim a free worker slot in [0, workers) with an exclusive file lock.
+    uvicorn doesn't tell workers their index, so the first free lock wins.
+    """
+    global _slot_lock_file
+    for slot in range(workers):
+        lock_file = open(f"/tmp/knot_worker_slot_{slot}.lock", "w")
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            continue
+        _slot_lock_file = lock_file
+        return slot
+    return None
+
+
+def _apply_affinity(setting, workers):
+    if not setting or not hasattr(os, "sched_setaffinity"):
+        return None
+    cores = _available_cores()
+    if setting == "auto":
+        slot = _claim_worker_slot(workers)
+        if slot is None:
+            logger.warning("No free worker slot for CPU affinity; leaving affinity unchanged")
+            return None
+        per_worker = max(1, len(cores) // workers)
+        selected = cores[slot * per_worker:(slot + 1) * per_worker] or cores
+    else:
+        selected = _parse_cpu_list(setting)
+    os.sched_setaffinity(0, selected)
+    return selected
+
+
+def configure_torch_runtime():
+    """Apply thread counts and CPU affinity from the environment. Call once, before building the model."""
+    if _config:
+        return _config
+
+    workers = max(1, int(os.getenv("KNOT_WORKERS", os.getenv("WEB_CONCURRENCY", "1"))))
+    pinned = _apply_affinity(os.getenv("KNOT_CPU_AFFINITY", "").strip(), workers)
+    usable = len(pinned) if pinned else max(1, len(_available_cores()) // workers)
+
+    threads = int(os.getenv("KNOT_TORCH_THREADS", "0")) or usable
+    interop_threads = int(os.getenv("KNOT_TORCH_INTEROP_THREADS", "1"))
+    grad_mode = os.getenv("KNOT_TORCH_GRAD_MODE", "inference")
+    if grad_mode not in GRAD_MODES:
+        logger.warning(f"Unknown KNOT_TORCH_GRAD_MODE={grad_mode}, using 'inference'")
+        grad_mode = "inference"
+
+    torch.set_num_threads(threads)
+    try:
+        torch.set_num_interop_threads(interop_threads)
+    except RuntimeError as e:
+        # Only allowed before any inter-op work has started
+        logger.warning(f"Could not set inter-op threads: {e}")
+    # OpenCV's decode/resize pool competes for the same cores
+    cv2.setNumThreads(threads)
+
+    _config.update({
+        "workers": workers,
+        "threads": torch.get_num_threads(),
+        "interop_threads": torch.get_num_interop_threads(),
+        "cpu_affinity": pinned,
+        "grad_mode": grad_mode,
+    })
+    logger.info(f"Torch runtime: {_config}")
+    return _config
+
+
+def inference_context():
+    """
+    Context manager for model forward passes (inference_mode by default). A no-op
+    until configure_torch_runtime() has run in this process: HTTP workers whose model
+    is behind the inference server never build one and must not import torch.
+    """
+    if not _config:
+        return contextlib.nullcontext()
+    mode = _config.get("grad_mode", "inference")
+    if mode == "inference":
+        return torch.inference_mode()
+    if mode == "no_grad":
+        return torch.no_grad()
+    return contextlib.nullcontext()
+
+
+@contextlib.contextmanager
+def use_precision(precision):
+    """Run the forward passes in this context (and threads started from it) at precision."""
+    token = _precision.set(precision)
+    try:
+        yield
+    finally:
+        _precision.reset(token)
+
+
+def requested_precision():
+    return _precision.get()
+
+
+def warm_up(model, runs=None, width=1280, height=720):
+    """Run the model on synthetic frames so lazy init / allocator growth happens at startup."""
+    if model is None:
+        return
+    if runs is None:
+        runs = int(os.getenv("KNOT_WARMUP_RUNS", "1"))
+    if runs <= 0:
+        return
+    from synthetic_video import synthetic_frame
+
+    frame = cv2.cvtColor(synthetic_frame(width, height), cv2.COLOR_BGR2RGB)
+    for i in range(runs):
+        start = time.perf_counter()
+        try:
+            with inference_context():
+                model(frame)
+        except Exception as e:
+            logger.warning(f"Warm-up pass failed: {e}")
+            return
+        logger.info(f"Warm-up pass {i + 1}/{runs}: {(time.perf_counter() - start) * 1000:.0f} ms")
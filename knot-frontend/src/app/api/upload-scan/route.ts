@@ -5,48 +5,98 @@ import { NextRequest, NextResponse } from "next/server";
 const BACKEND_URL =
   process.env.KNOT_BACKEND_URL || "http://localhost:8000";
 
-export async function POST(req: NextRequest) {
-  try {
-    const formData = await req.formData();
-    const file = formData.get("video");
-    const heightCm = formData.get("height_cm");
-
-    if (!file || !(file instanceof File)) {
-      return NextResponse.json(
-        { error: "No video file provided (field name must be 'video')" },
-        { status: 400 }
-      );
-    }
+// Streaming proxy: the multipart upload is piped to the backend as it arrives
+// and the backend's response body is piped back unchanged (no formData() /
+// json() round trip, so the video and the mesh payload are never buffered or
+// re-encoded here). Needs the Node.js runtime for streamed request bodies.
+export const runtime = "nodejs";
+export const dynamic = "force-dynamic";
 
-    // Rebuild FormData to forward to backend
-    const backendFormData = new FormData();
-    backendFormData.append("video", file, file.name);
-    if (heightCm) {
-      backendFormData.append("height_cm", heightCm.toString());
-    }
+// Request headers passed on to the backend. The body is streamed through
+// unchanged, so the client's content-length still holds: forwarding it lets the
+// backend reject an oversized upload (413) before reading it. Without one
+// (a chunked client upload) the body is re-sent chunked.
+const FORWARD_REQUEST_HEADERS = [
+  "content-type",
+  "content-length",
+  "accept",
+  "x-scan-priority",
+];
+
+// Hop-by-hop headers never cross a proxy
+const HOP_BY_HOP_HEADERS = new Set([
+  "connection",
+  "keep-alive",
+  "proxy-authenticate",
+  "proxy-authorization",
+  "te",
+  "trailer",
+  "transfer-encoding",
+  "upgrade",
+]);
+
+function backendRequestHeaders(headers: Headers): Headers {
+  const forwarded = new Headers();
+  for (const name of FORWARD_REQUEST_HEADERS) {
+    const value = headers.get(name);
+    if (value) forwarded.set(name, value);
+  }
+  // Ask for the body as-is so it can be passed through byte for byte
+  forwarded.set("accept-encoding", "identity");
+  return forwarded;
+}
+
+function clientResponseHeaders(headers: Headers): Headers {
+  const forwarded = new Headers();
+  headers.forEach((value, name) => {
+    if (!HOP_BY_HOP_HEADERS.has(name)) forwarded.set(name, value);
+  });
+  // fetch() decodes compressed bodies, so encoded length/encoding no longer apply
+  if (forwarded.has("content-encoding")) {
+    forwarded.delete("content-encoding");
+    forwarded.delete("content-length");
+  }
+  return forwarded;
+}
 
+export async function POST(req: NextRequest) {
+  const contentType = req.headers.get("content-type") || "";
+  if (!req.body || !contentType.startsWith("multipart/form-data")) {
+    return NextResponse.json(
+      { error: "No video file provided (field name must be 'video')" },
+      { status: 400 }
+    );
+  }
+
+  try {
     const res = await fetch(`${BACKEND_URL}/process-scan`, {
       method: "POST",
-      body: backendFormData,
-    });
+      headers: backendRequestHeaders(req.headers),
+      body: req.body,
+      // Required to send a ReadableStream body without buffering it
+      duplex: "half",
+      // Abort the backend request if the client goes away
+      signal: req.signal,
+    } as RequestInit & { duplex: "half" });
 
     if (!res.ok) {
-      const text = await res.text();
-      console.error("Backend error:", res.status, text);
-      return NextResponse.json(
-        { error: "Backend error", status: res.status, details: text },
-        { status: 500 }
-      );
+      console.error("Backend error:", res.status);
     }
 
-    const data = await res.json();
-    return NextResponse.json(data, { status: 200 });
+    return new Response(res.body, {
+      status: res.status,
+      statusText: res.statusText,
+      headers: clientResponseHeaders(res.headers),
+    });
   } catch (err: any) {
+    if (req.signal.aborted) {
+      // Client disconnected mid-upload; nobody is left to answer
+      return new Response(null, { status: 499 });
+    }
     console.error("upload-scan route error:", err);
     return NextResponse.json(
-      { error: "Unexpected error", details: err?.message || String(err) },
-      { status: 500 }
+      { error: "Backend unreachable", details: err?.message || String(err) },
+      { status: 502 }
     );
   }
 }
-
@@ -265,6 +265,12 @@ export default function ScanPage() {
     return [];
   }, [result]);
 
+  // Faces matching derivedVertices: per-frame meshes can use another LOD than the averaged mesh
+  const derivedFaces = useMemo(() => {
+    if (result?.smpl_vertices && result.smpl_vertices.length > 0) return result.smpl_faces;
+    return result?.per_frame_faces ?? result?.smpl_faces;
+  }, [result]);
+
   // Frame options for manual selection
   const frameOptions = useMemo(() => {
     if (!result?.per_frame_meshes) return [];
@@ -614,7 +620,7 @@ export default function ScanPage() {
                     <div style={{ color: colors.muted, fontSize: 12 }}>🖱️ Rotate • Pan • Zoom</div>
                   </div>
                   <div style={{ width: "100%", height: 420 }}>
-                    <ThreeViewer vertices={derivedVertices} faces={result.smpl_faces} />
+                    <ThreeViewer vertices={derivedVertices} faces={derivedFaces} />
                   </div>
                 </div>
               )}
@@ -159,7 +159,9 @@ export default function VideoMeshOverlay({
 }: VideoMeshOverlayProps) {
   const containerRef = useRef<HTMLDivElement>(null);
   const videoRef = useRef<HTMLVideoElement>(null);
-  const [currentVertices, setCurrentVertices] = useState<number[][]>(vertices);
+  const [currentVertices, setCurrentVertices] = useState<number[][]>(
+    perFrameMeshes?.[0]?.vertices ?? vertices
+  );
   const meshRef = useRef<THREE.Mesh>(null);
 
   // Early return if no video URL or no vertices
@@ -198,20 +200,23 @@ export default function VideoMeshOverlay({
       // Calculate current frame ratio (0 to 1)
       const currentRatio = Math.max(0, Math.min(1, currentTime / duration));
       
-      // Find the closest frame mesh
-      let closestMesh = perFrameMeshes[0];
-      let closestIndex = 0;
-      let minDiff = Math.abs(perFrameMeshes[0].frame_ratio - currentRatio);
-      
-      for (let i = 0; i < perFrameMeshes.length; i++) {
-        const mesh = perFrameMeshes[i];
-        const diff = Math.abs(mesh.frame_ratio - currentRatio);
-        if (diff < minDiff) {
-          minDiff = diff;
-          closestMesh = mesh;
-          closestIndex = i;
-        }
+      // Find the closest frame mesh (meshes are in frame order; dense scans have hundreds)
+      let lo = 0;
+      let hi = perFrameMeshes.length - 1;
+      while (lo < hi) {
+        const mid = (lo + hi) >> 1;
+        if (perFrameMeshes[mid].frame_ratio < currentRatio) lo = mid + 1;
+        else hi = mid;
+      }
+      let closestIndex = lo;
+      if (
+        lo > 0 &&
+        Math.abs(perFrameMeshes[lo - 1].frame_ratio - currentRatio) <=
+          Math.abs(perFrameMeshes[lo].frame_ratio - currentRatio)
+      ) {
+        closestIndex = lo - 1;
       }
+      const closestMesh = perFrameMeshes[closestIndex];
       
       // Only update if we have a different mesh to avoid unnecessary updates
       if (closestIndex !== lastMeshIndex && closestMesh && closestMesh.vertices && closestMesh.vertices.length > 0) {